@@ -121,6 +121,9 @@ def build_config() -> Dict[str, Any]:
     cfg["API_HOST"] = _get_str("API_HOST", "0.0.0.0")
     cfg["API_PORT"] = _get_int("API_PORT", 8000)
     cfg["FRONTEND_ORIGIN"] = _get_str("FRONTEND_ORIGIN", "*")
+    cfg["STARTUP_MAX_WORKERS"] = _get_int("STARTUP_MAX_WORKERS", 4)
+    cfg["STARTUP_WARMUP_ENABLED"] = _get_bool("STARTUP_WARMUP_ENABLED", True)
+    cfg["STARTUP_BACKGROUND_LOADING"] = _get_bool("STARTUP_BACKGROUND_LOADING", False)
 
     cfg["DIAGENT_ENABLED"] = _get_bool("DIAGENT_ENABLED", False)
     cfg["DIAGENT_API_URL"] = _get_str("DIAGENT_API_URL", "http://localhost:8000")
@@ -145,6 +148,35 @@ def build_config() -> Dict[str, Any]:
 
     cfg["CAMERA_INDEX"] = _get_int("CAMERA_INDEX", 0)
 
+    # CPU thread budget shared by all models; 0 = all cores / auto split
+    cfg["CPU_THREAD_BUDGET"] = _get_int("CPU_THREAD_BUDGET", 0)
+    cfg["T5_INTRA_OP_THREADS"] = _get_int("T5_INTRA_OP_THREADS", 0)
+    cfg["T5_INTER_OP_THREADS"] = _get_int("T5_INTER_OP_THREADS", 1)
+    cfg["T5_SESSION_REPLICAS"] = _get_int("T5_SESSION_REPLICAS", 1)
+    # per-pool overrides; 0 = use the T5_* value above (auto splits T5's share encoder 1 : decoder 3)
+    for pool in ("T5_ENCODER", "T5_DECODER"):
+        for suffix in ("INTRA_OP_THREADS", "INTER_OP_THREADS", "SESSION_REPLICAS"):
+            cfg[f"{pool}_{suffix}"] = _get_int(f"{pool}_{suffix}", 0)
+    cfg["CLS_INTRA_OP_THREADS"] = _get_int("CLS_INTRA_OP_THREADS", 0)
+    cfg["CLS_INTER_OP_THREADS"] = _get_int("CLS_INTER_OP_THREADS", 1)
+    cfg["CLS_SESSION_REPLICAS"] = _get_int("CLS_SESSION_REPLICAS", 1)
+    cfg["YOLO_INTRA_OP_THREADS"] = _get_int("YOLO_INTRA_OP_THREADS", 0)
+    cfg["YOLO_INTER_OP_THREADS"] = _get_int("YOLO_INTER_OP_THREADS", 1)
+    cfg["YOLO_SESSION_REPLICAS"] = _get_int("YOLO_SESSION_REPLICAS", 1)
+    cfg["EMBED_TORCH_THREADS"] = _get_int("EMBED_TORCH_THREADS", 0)
+    # micro-batching of concurrent single-input calls (off = one run per call)
+    cfg["CLS_BATCHING_ENABLED"] = _get_bool("CLS_BATCHING_ENABLED", False)
+    cfg["CLS_MAX_BATCH_SIZE"] = _get_int("CLS_MAX_BATCH_SIZE", 16)
+    cfg["CLS_BATCH_WAIT_MS"] = _get_float("CLS_BATCH_WAIT_MS", 2.0)
+    cfg["EMBED_BATCHING_ENABLED"] = _get_bool("EMBED_BATCHING_ENABLED", False)
+    cfg["EMBED_MAX_BATCH_SIZE"] = _get_int("EMBED_MAX_BATCH_SIZE", 32)
+    cfg["EMBED_BATCH_WAIT_MS"] = _get_float("EMBED_BATCH_WAIT_MS", 2.0)
+    cfg["YOLO_BATCHING_ENABLED"] = _get_bool("YOLO_BATCHING_ENABLED", False)
+    cfg["YOLO_MAX_BATCH_SIZE"] = _get_int("YOLO_MAX_BATCH_SIZE", 4)
+    cfg["YOLO_BATCH_WAIT_MS"] = _get_float("YOLO_BATCH_WAIT_MS", 5.0)
+    cfg["ORT_GRAPH_CACHE_ENABLED"] = _get_bool("ORT_GRAPH_CACHE_ENABLED", True)
+    cfg["ORT_GRAPH_CACHE_DIR"] = _get_path("ORT_GRAPH_CACHE_DIR", BACKEND_ROOT / "assets" / "models" / ".ort_cache")
+
     nlu_model_dir = _get_path("NLU_MODEL_DIR", BACKEND_ROOT / "assets" / "models" / "nlu")
     cfg["CLS_ONNX"] = _get_path(
         "CLS_ONNX",
@@ -174,8 +206,26 @@ def build_config() -> Dict[str, Any]:
     cfg["T5_MAX_SRC_LEN"] = _get_int("T5_MAX_SRC_LEN", 512)
     cfg["T5_MAX_NEW_TOKENS_CHAT"] = _get_int("T5_MAX_NEW_TOKENS_CHAT", 256)
     cfg["T5_MAX_NEW_TOKENS_RAG"] = _get_int("T5_MAX_NEW_TOKENS_RAG", 64)
+    cfg["T5_CHAT_TEMPERATURE"] = _get_float("T5_CHAT_TEMPERATURE", 0.7)
+    cfg["T5_CHAT_TOP_P"] = _get_float("T5_CHAT_TOP_P", 0.9)
+    cfg["T5_CHAT_TOP_K"] = _get_int("T5_CHAT_TOP_K", 0)
+    cfg["T5_CHAT_REPETITION_PENALTY"] = _get_float("T5_CHAT_REPETITION_PENALTY", 1.0)
+    cfg["T5_SAMPLING_PREFILTER_K"] = _get_int("T5_SAMPLING_PREFILTER_K", 64)
+    cfg["T5_BATCHING_ENABLED"] = _get_bool("T5_BATCHING_ENABLED", False)
+    cfg["T5_MAX_BATCH_SIZE"] = _get_int("T5_MAX_BATCH_SIZE", 8)
+    cfg["T5_BATCH_WAIT_MS"] = _get_float("T5_BATCH_WAIT_MS", 2.0)
+    cfg["T5_DECODE_ENGINE"] = _get_str("T5_DECODE_ENGINE", "numpy").lower()
+    cfg["T5_SPECULATIVE_ENABLED"] = _get_bool("T5_SPECULATIVE_ENABLED", False)
+    cfg["T5_SPECULATIVE_MAX_NGRAM"] = _get_int("T5_SPECULATIVE_MAX_NGRAM", 3)
+    cfg["T5_SPECULATIVE_DRAFT_TOKENS"] = _get_int("T5_SPECULATIVE_DRAFT_TOKENS", 8)
 
     cfg["GENERATION_PROVIDER"] = _get_str("GENERATION_PROVIDER", "local_t5")
+    cfg["MODEL_HOST_SOCKET"] = _get_str("MODEL_HOST_SOCKET", "")
+    cfg["MODEL_HOST_TIMEOUT_SECONDS"] = _get_float("MODEL_HOST_TIMEOUT_SECONDS", 120.0)
+    cfg["MODEL_HOST_SHM_MIN_BYTES"] = _get_int("MODEL_HOST_SHM_MIN_BYTES", 64 * 1024)
+    cfg["GENERATION_CACHE_ENABLED"] = _get_bool("GENERATION_CACHE_ENABLED", True)
+    cfg["GENERATION_CACHE_MAX_BYTES"] = _get_int("GENERATION_CACHE_MAX_BYTES", 4 * 1024 * 1024)
+    cfg["GENERATION_CACHE_TTL_SECONDS"] = _get_float("GENERATION_CACHE_TTL_SECONDS", 600.0)
     cfg["GEMINI_API_KEY"] = _get_str("GEMINI_API_KEY", "")
     cfg["GEMINI_MODEL"] = _get_str("GEMINI_MODEL", "gemini-2.5-flash")
     cfg["GEMINI_TIMEOUT_SECONDS"] = _get_int("GEMINI_TIMEOUT_SECONDS", 30)
@@ -203,6 +253,15 @@ def build_config() -> Dict[str, Any]:
         "RAG_UPLOAD_ALLOWED_EXTENSIONS",
         ".pdf,.docx,.txt,.md,.html,.htm",
     )
+    # /api/upload: save + hash inline, extract/chunk/embed/index on durable queue workers
+    cfg["RAG_INGEST_ASYNC"] = _get_bool("RAG_INGEST_ASYNC", True)
+    cfg["RAG_INGEST_WORKERS"] = _get_int("RAG_INGEST_WORKERS", 1)
+    cfg["RAG_INGEST_MAX_PENDING"] = _get_int("RAG_INGEST_MAX_PENDING", 16)
+    cfg["RAG_INGEST_DB_PATH"] = _get_path("RAG_INGEST_DB_PATH", DATA_ROOT / "rag" / "ingest_jobs.sqlite")
+    # PDFs stream page by page; page ranges of large files are extracted in parallel processes
+    cfg["RAG_PDF_WORKERS"] = _get_int("RAG_PDF_WORKERS", 2)
+    cfg["RAG_PDF_PAGE_WINDOW"] = _get_int("RAG_PDF_PAGE_WINDOW", 32)
+    cfg["RAG_PDF_PARALLEL_MIN_PAGES"] = _get_int("RAG_PDF_PARALLEL_MIN_PAGES", 64)
     cfg["RAG_SCORE_THRESHOLD"] = _get_float("RAG_SCORE_THRESHOLD", 0.40)
     cfg["RAG_TOP_K"] = _get_int("RAG_TOP_K", 4)
     cfg["RAG_MAX_CTX_TOKENS"] = _get_int("RAG_MAX_CTX_TOKENS", 512)
@@ -216,17 +275,49 @@ def build_config() -> Dict[str, Any]:
     cfg["RAG_WORD_CHUNK_OVERLAP"] = _get_int("RAG_WORD_CHUNK_OVERLAP", 20)
 
     cfg["EMBED_MODEL"] = _get_str("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    cfg["EMBED_BACKEND"] = _get_str("EMBED_BACKEND", "torch").lower()
+    embed_model_dir = _get_path("EMBED_MODEL_DIR", BACKEND_ROOT / "assets" / "models" / "embedder")
+    cfg["EMBED_ONNX"] = _get_path("EMBED_ONNX", Path(embed_model_dir) / "model_int8.onnx")
+    cfg["EMBED_TOKENIZER_DIR"] = _get_path("EMBED_TOKENIZER_DIR", Path(embed_model_dir) / "tokenizer")
+    cfg["EMBED_MAX_LEN"] = _get_int("EMBED_MAX_LEN", 0)
     cfg["CHROMA_PATH"] = _get_path(
         "CHROMA_PATH",
         BACKEND_ROOT / "assets" / "rag" / "chroma_db",
         aliases=("RAG_CHROMA_DIR",),
     )
     cfg["RAG_SQLITE_PATH"] = _get_path("RAG_SQLITE_PATH", Path(cfg["CHROMA_PATH"]) / "bm25.sqlite")
+    # FTS5 SQLite: WAL, one writer thread, per-thread read-only connections
+    cfg["RAG_SQLITE_MMAP_BYTES"] = _get_int("RAG_SQLITE_MMAP_BYTES", 256 * 1024 * 1024)
+    cfg["RAG_SQLITE_CACHE_KIB"] = _get_int("RAG_SQLITE_CACHE_KIB", 16 * 1024)
+    cfg["RAG_SQLITE_BUSY_TIMEOUT_MS"] = _get_int("RAG_SQLITE_BUSY_TIMEOUT_MS", 5000)
+    # also keep each chunk's T5 token ids (uint16 blob) so context packing trims without re-encoding
+    cfg["RAG_STORE_TOKEN_IDS"] = _get_bool("RAG_STORE_TOKEN_IDS", False)
+    # persistent (embedding model, sha256(chunk text)) -> vector cache; indexing embeds only misses
+    cfg["RAG_CHUNK_EMBED_CACHE"] = _get_bool("RAG_CHUNK_EMBED_CACHE", True)
+    cfg["RAG_CHUNK_EMBED_CACHE_PATH"] = _get_path(
+        "RAG_CHUNK_EMBED_CACHE_PATH", DATA_ROOT / "rag" / "chunk_embeddings.sqlite"
+    )
     cfg["CHROMA_COLLECTION"] = _get_str("CHROMA_COLLECTION", "pathfinder_corpus")
+    # vector store: chroma | mmap (append-only float32 .npy matrix, exact top-k)
+    cfg["VECTOR_BACKEND"] = _get_str("VECTOR_BACKEND", "chroma").lower()
+    cfg["VECTOR_STORE_PATH"] = _get_path("VECTOR_STORE_PATH", BACKEND_ROOT / "assets" / "rag" / "vectors")
+    # mmap only: none | int8 | binary prefilter codes, optional leading-dims truncation, rescore over-fetch
+    cfg["VECTOR_QUANTIZATION"] = _get_str("VECTOR_QUANTIZATION", "none").lower()
+    cfg["VECTOR_QUANT_DIMS"] = _get_int("VECTOR_QUANT_DIMS", 0)
+    cfg["VECTOR_RESCORE_FACTOR"] = _get_int("VECTOR_RESCORE_FACTOR", 4)
     cfg["VECTOR_WEIGHT"] = _get_float("VECTOR_WEIGHT", 0.75)
     cfg["BM25_WEIGHT"] = _get_float("BM25_WEIGHT", 0.25)
     cfg["RAG_WEB_MIN_STRENGTH"] = _get_float("RAG_WEB_MIN_STRENGTH", 0.75)
     cfg["WEB_CHUNK_SUPPORT_THRESHOLD"] = _get_float("WEB_CHUNK_SUPPORT_THRESHOLD", 0.70)
+    # retrieval fan-out: per-branch timeouts in seconds (0 = no limit)
+    cfg["RAG_VECTOR_TIMEOUT_SECONDS"] = _get_float("RAG_VECTOR_TIMEOUT_SECONDS", 10.0)
+    cfg["RAG_BM25_TIMEOUT_SECONDS"] = _get_float("RAG_BM25_TIMEOUT_SECONDS", 5.0)
+    cfg["RAG_WEB_TIMEOUT_SECONDS"] = _get_float("RAG_WEB_TIMEOUT_SECONDS", 15.0)
+    cfg["RAG_FANOUT_WORKERS"] = _get_int("RAG_FANOUT_WORKERS", 8)
+    cfg["RAG_CACHE_ENABLED"] = _get_bool("RAG_CACHE_ENABLED", True)
+    cfg["RAG_EMBED_CACHE_MAX_BYTES"] = _get_int("RAG_EMBED_CACHE_MAX_BYTES", 4 * 1024 * 1024)
+    cfg["RAG_RESULT_CACHE_MAX_BYTES"] = _get_int("RAG_RESULT_CACHE_MAX_BYTES", 8 * 1024 * 1024)
+    cfg["RAG_RESULT_CACHE_TTL_SECONDS"] = _get_float("RAG_RESULT_CACHE_TTL_SECONDS", 600.0)
 
     cfg["WEB_API_ENDPOINT"] = _get_str("WEB_API_ENDPOINT", "")
     cfg["WEB_API_KEY"] = _get_str("WEB_API_KEY", "")
@@ -261,6 +352,31 @@ def _diagent_readiness() -> Dict[str, Any]:
         }
 
 
+def _runtime_resources_readiness() -> Dict[str, Any]:
+    try:
+        from services.runtime_resources import get_resource_manager
+
+        return get_resource_manager(CFG).report()
+    except Exception as exc:
+        return {"error": str(exc)}
+
+
+def _model_host_readiness() -> Dict[str, Any]:
+    if not CFG.get("MODEL_HOST_SOCKET"):
+        return {"enabled": False}
+    try:
+        from services.model_host import build_model_host_client
+
+        client = build_model_host_client(CFG)
+        try:
+            info = client.info()
+        finally:
+            client.close()
+        return {"enabled": True, "socket": CFG["MODEL_HOST_SOCKET"], "reachable": True, "info": info}
+    except Exception as exc:
+        return {"enabled": True, "socket": CFG["MODEL_HOST_SOCKET"], "reachable": False, "error": str(exc)}
+
+
 def readiness_report() -> Dict[str, Any]:
     provider = CFG.get("GENERATION_PROVIDER", "local_t5")
     
@@ -274,8 +390,13 @@ def readiness_report() -> Dict[str, Any]:
         "nlu_tokenizer": _path_exists(CFG.get("CLS_TOKENIZER_DIR"), kind="dir"),
         "yolo_model": _path_exists(CFG.get("YOLO_ONNX"), kind="file"),
         "yolo_labels": _path_exists(CFG.get("YOLO_LABELS"), kind="file"),
+        "embed_onnx_model": _path_exists(CFG.get("EMBED_ONNX"), kind="file"),
+        "embed_onnx_tokenizer": _path_exists(CFG.get("EMBED_TOKENIZER_DIR"), kind="dir"),
         "rag_corpus": _path_exists(CFG.get("RAG_CORPUS_DIR"), kind="dir"),
-        "rag_index": _path_exists(CFG.get("CHROMA_PATH"), kind="dir"),
+        "rag_index": _path_exists(
+            CFG.get("VECTOR_STORE_PATH") if CFG.get("VECTOR_BACKEND") == "mmap" else CFG.get("CHROMA_PATH"),
+            kind="dir",
+        ),
         "rag_sqlite": _path_exists(CFG.get("RAG_SQLITE_PATH"), kind="file"),
     }
     
@@ -285,6 +406,10 @@ def readiness_report() -> Dict[str, Any]:
             # Only require local T5 assets if provider is local_t5
             if provider == "local_t5" and not ok:
                 missing.append(name)
+        elif name in ("embed_onnx_model", "embed_onnx_tokenizer"):
+            # Only require the exported embedder when EMBED_BACKEND=onnx
+            if CFG.get("EMBED_BACKEND") == "onnx" and not ok:
+                missing.append(name)
         else:
             if not ok:
                 missing.append(name)
@@ -295,6 +420,10 @@ def readiness_report() -> Dict[str, Any]:
     if provider == "gemini" and not gemini_configured:
         missing.append("gemini_api_key")
 
+    model_host = _model_host_readiness()
+    if model_host["enabled"] and not model_host["reachable"]:
+        missing.append("model_host")
+
     return {
         "status": "ok" if not missing else "degraded",
         "config": "loaded",
@@ -308,5 +437,7 @@ def readiness_report() -> Dict[str, Any]:
             "camera_actions": bool(CFG.get("ENABLE_CAMERA_ACTIONS", True)),
         },
         "diagent": _diagent_readiness(),
+        "runtime_resources": _runtime_resources_readiness(),
+        "model_host": model_host,
         "missing": missing,
     }
@@ -28,6 +28,7 @@ class IntentResult(BaseModel):
     is_confident: bool | None = None
     raw_scores: dict[str, float] | None = None
     latency_ms: int | None = None
+    queue_wait_ms: int | None = None
     error: str | None = None
 
 
@@ -63,11 +64,13 @@ class RetrievalResult(BaseModel):
     fallback_used: bool = False
     fallback_reason: str | None = None
     latency_ms: int | None = None
+    queue_wait_ms: int | None = None
     error: str | None = None
     web_search_attempted: bool = False
     web_search_status: str | None = None
     web_candidate_count: int = 0
     web_error_type: str | None = None
+    metadata: dict[str, Any] | None = None
 
 
 class IndexingResult(BaseModel):
@@ -101,6 +104,7 @@ class GenerationResult(BaseModel):
     fallback_used: bool = False
     fallback_reason: str | None = None
     error: str | None = None
+    metadata: dict[str, Any] | None = None
 
 
 class DetectionObject(BaseModel):
@@ -115,6 +119,7 @@ class DetectionResult(BaseModel):
     image_source: str | None = None
     model_name: str | None = None
     latency_ms: int | None = None
+    queue_wait_ms: int | None = None
     status: str = "not_run"
     error: str | None = None
     metadata: dict[str, Any] | None = None
@@ -169,6 +174,7 @@ def intent_result_from_prediction(
     threshold: float | None = None,
     raw_scores: dict[str, float] | None = None,
     latency_ms: int | None = None,
+    queue_wait_ms: int | None = None,
     error: str | None = None,
 ) -> IntentResult:
     is_confident = None
@@ -182,6 +188,7 @@ def intent_result_from_prediction(
         is_confident=is_confident,
         raw_scores=raw_scores,
         latency_ms=latency_ms,
+        queue_wait_ms=queue_wait_ms,
         error=error,
     )
 
@@ -307,6 +314,7 @@ def detection_result_from_legacy(
     image_source: str | None = None,
     model_name: str | None = None,
     latency_ms: int | None = None,
+    queue_wait_ms: int | None = None,
     error: str | None = None,
     metadata: dict[str, Any] | None = None,
     status: str | None = None,
@@ -344,6 +352,7 @@ def detection_result_from_legacy(
         image_source=image_source,
         model_name=model_name,
         latency_ms=latency_ms,
+        queue_wait_ms=queue_wait_ms,
         status=resolved_status,
         error=error,
         metadata=metadata,
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import argparse
+import json
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+QUERY = "Where can passengers find the life jackets on the upper deck?"
+PASSAGE = (
+    "Life jackets are stored in the orange lockers next to each muster station. "
+    "Crew members check the lockers before departure and after every drill. "
+) * 3
+
+
+def _percentiles(samples: list[float]) -> tuple[float, float]:
+    samples = sorted(samples)
+    return statistics.median(samples), samples[max(0, int(len(samples) * 0.95) - 1)]
+
+
+def _child(backend: str, repeats: int, batch: int) -> dict:
+    """Runs in a fresh interpreter so import and load costs are measured cold."""
+    started = time.perf_counter()
+    from config import CFG
+    from services.rag_backend.embedding import build_embedding_model
+
+    model = build_embedding_model({**CFG, "EMBED_BACKEND": backend})
+    model.encode(["warmup"], convert_to_numpy=True)
+    startup_ms = (time.perf_counter() - started) * 1000
+
+    single, batched = [], []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        model.encode([QUERY], convert_to_numpy=True)
+        single.append((time.perf_counter() - t0) * 1000)
+        t0 = time.perf_counter()
+        model.encode([PASSAGE] * batch, convert_to_numpy=True, batch_size=batch)
+        batched.append((time.perf_counter() - t0) * 1000)
+
+    return {
+        "backend": backend,
+        "startup_ms": round(startup_ms, 1),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "torch_imported": "torch" in sys.modules,
+        "query_ms": [round(v, 2) for v in _percentiles(single)],
+        f"batch{batch}_ms": [round(v, 2) for v in _percentiles(batched)],
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare startup, memory and latency of the embedding backends.")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx"], choices=["torch", "onnx"])
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--batch", type=int, default=32, help="passages per indexing-style encode call")
+    parser.add_argument("--child", choices=["torch", "onnx"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(_child(args.child, args.repeats, args.batch)))
+        return 0
+
+    print(f"{'backend':<8} {'startup ms':>11} {'max RSS MB':>11} {'torch':>6} {'query p50/p95 ms':>18} "
+          f"{f'batch{args.batch} p50/p95 ms':>22}")
+    for backend in args.backends:
+        proc = subprocess.run(
+            [sys.executable, __file__, "--child", backend, "--repeats", str(args.repeats), "--batch", str(args.batch)],
+            capture_output=True,
+            text=True,
+            cwd=BACKEND_ROOT,
+        )
+        if proc.returncode != 0:
+            print(f"{backend:<8} failed: {proc.stderr.strip().splitlines()[-1:]}")
+            continue
+        row = json.loads(proc.stdout.strip().splitlines()[-1])
+        query, batch = row["query_ms"], row[f"batch{args.batch}_ms"]
+        print(f"{backend:<8} {row['startup_ms']:>11.1f} {row['max_rss_mb']:>11.1f} {str(row['torch_imported']):>6} "
+              f"{f'{query[0]:.2f}/{query[1]:.2f}':>18} {f'{batch[0]:.2f}/{batch[1]:.2f}':>22}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+from services.sampling import DEFAULT_PREFILTER_K, SamplingParams, make_rng, sample_next_tokens
+from services.t5 import _top_p_sample
+
+
+def _time_us(fn, repeats: int) -> tuple[float, float]:
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1e6)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare the legacy T5 top-p sampler with services.sampling.")
+    parser.add_argument("--vocab", type=int, default=32128, help="vocabulary size (t5-small: 32128)")
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--temperature", type=float, default=0.7)
+    parser.add_argument("--top-p", type=float, default=0.9)
+    parser.add_argument("--prefilter-k", type=int, default=DEFAULT_PREFILTER_K)
+    parser.add_argument("--logit-scale", type=float, default=4.0,
+                        help="std of synthetic logits; larger values give peakier distributions")
+    args = parser.parse_args()
+
+    data_rng = np.random.default_rng(0)
+    params = SamplingParams(temperature=args.temperature, top_p=args.top_p)
+    print(f"vocab={args.vocab} temperature={args.temperature} top_p={args.top_p} prefilter_k={args.prefilter_k}")
+    print(f"{'batch':>5} {'legacy p50 us':>14} {'legacy p95 us':>14} {'vector p50 us':>14} {'vector p95 us':>14} {'speedup':>8}")
+
+    for batch in args.batch:
+        logits = (data_rng.standard_normal((batch, args.vocab)) * args.logit_scale).astype(np.float32)
+        rngs = [make_rng(seed) for seed in range(batch)]
+        history = [[0, 5, 17] for _ in range(batch)]
+
+        def legacy() -> None:
+            for row in logits:
+                _top_p_sample(row, args.top_p, args.temperature)
+
+        def vectorized() -> None:
+            sample_next_tokens(logits, [params] * batch, rngs, history, prefilter_k=args.prefilter_k)
+
+        legacy()
+        vectorized()
+        legacy_p50, legacy_p95 = _time_us(legacy, args.repeats)
+        vector_p50, vector_p95 = _time_us(vectorized, args.repeats)
+        print(
+            f"{batch:>5} {legacy_p50:>14.1f} {legacy_p95:>14.1f} {vector_p50:>14.1f} {vector_p95:>14.1f} "
+            f"{legacy_p50 / max(vector_p50, 1e-9):>7.1f}x"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
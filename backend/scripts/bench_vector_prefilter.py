@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import argparse
+import itertools
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+from services.rag_backend.quantization import EmbeddingQuantizer  # noqa: E402
+from services.rag_backend.vector_store import MmapVectorStore  # noqa: E402
+
+
+def _percentiles(samples: list[float]) -> tuple[float, float]:
+    samples = sorted(samples)
+    return statistics.median(samples), samples[max(0, int(len(samples) * 0.95) - 1)]
+
+
+def _load_vectors(args: argparse.Namespace, rng: np.random.Generator) -> np.ndarray:
+    if args.store:
+        return np.asarray(np.load(Path(args.store) / "embeddings.npy", mmap_mode="r"), dtype=np.float32)
+    # kümelenmiş sentetik veri: gerçek embedding'lere rastgele gürültüden daha yakın
+    centers = rng.normal(size=(max(1, args.synthetic // 200), args.dim))
+    labels = rng.integers(0, len(centers), args.synthetic)
+    return (centers[labels] + rng.normal(scale=0.8, size=(args.synthetic, args.dim))).astype(np.float32)
+
+
+def _run(store: MmapVectorStore, queries: np.ndarray, k: int) -> tuple[list[list[str]], list[float]]:
+    ids, latencies = [], []
+    store.query(queries[:1], k)  # mmap ve kod dosyası sayfaları ısınsın
+    for query in queries:
+        started = time.perf_counter()
+        hits = store.query(query[None, :], k)[0]
+        latencies.append((time.perf_counter() - started) * 1000)
+        ids.append([h.chunk_id for h in hits])
+    return ids, latencies
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Recall@k and latency of quantized prefilter + float32 rescoring against exact mmap search."
+    )
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--store", help="existing mmap vector store directory (VECTOR_STORE_PATH)")
+    source.add_argument("--synthetic", type=int, default=50_000, help="number of synthetic vectors")
+    parser.add_argument("--dim", type=int, default=384, help="synthetic vector dimension")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--modes", nargs="+", default=["int8", "binary"], choices=["int8", "binary"])
+    parser.add_argument("--dims", nargs="+", type=int, default=[0, 128], help="0 = all dimensions")
+    parser.add_argument("--factors", nargs="+", type=int, default=[2, 4, 8], help="rescore over-fetch factors")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    vectors = _load_vectors(args, rng)
+    ids = [str(i) for i in range(len(vectors))]
+    picks = rng.integers(0, len(vectors), args.queries)
+    queries = vectors[picks] + rng.normal(scale=0.5 * vectors.std(), size=(args.queries, vectors.shape[1]))
+    queries = queries.astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        exact_store = MmapVectorStore(Path(tmp) / "exact")
+        exact_store.add(ids, vectors)
+        exact_ids, exact_ms = _run(exact_store, queries, args.k)
+        matrix_mb = exact_store.matrix_path.stat().st_size / (1024 * 1024)
+
+        p50, p95 = _percentiles(exact_ms)
+        print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {args.queries} queries, k={args.k}")
+        print(f"{'config':<22} {'codes MB':>9} {f'recall@{args.k}':>10} {'p50 ms':>8} {'p95 ms':>8}")
+        print(f"{'exact float32':<22} {matrix_mb:>9.1f} {1.0:>10.3f} {p50:>8.2f} {p95:>8.2f}")
+
+        for mode, dims in itertools.product(args.modes, args.dims):
+            quantizer = EmbeddingQuantizer(mode, dims)
+            store = MmapVectorStore(Path(tmp) / f"{mode}_{dims}", quantizer)
+            store.add(ids, vectors)
+            codes_mb = store.codes_path.stat().st_size / (1024 * 1024)
+            for factor in args.factors:
+                store.rescore_factor = factor
+                got_ids, got_ms = _run(store, queries, args.k)
+                recall = statistics.mean(
+                    len(set(got) & set(want)) / max(1, len(want)) for got, want in zip(got_ids, exact_ids)
+                )
+                p50, p95 = _percentiles(got_ms)
+                label = f"{mode} d={dims or vectors.shape[1]} x{factor}"
+                print(f"{label:<22} {codes_mb:>9.1f} {recall:>10.3f} {p50:>8.2f} {p95:>8.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,133 @@
+"""
+Export the sentence-transformers retrieval embedder to ONNX (+ int8 variant).
+
+Needs torch and sentence-transformers, but only here: with EMBED_BACKEND=onnx
+the API loads the exported files with ONNX Runtime and never imports torch.
+
+    python scripts/export_embedder_onnx.py --model sentence-transformers/all-MiniLM-L6-v2 \
+        --out assets/models/embedder
+
+Writes model.onnx, model_int8.onnx (dynamic int8 quantization), tokenizer/
+and embedder_config.json (pooling, normalization, max_seq_length), then
+prints the cosine similarity between torch and ONNX embeddings.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+from services.rag_backend.embedding import EMBEDDER_CONFIG_NAME
+
+SAMPLE_SENTENCES = [
+    "Where is the nearest lifeboat station?",
+    "The engine room is located on deck two, behind the cargo hold.",
+    "kısa",
+    "Passengers must keep their life jackets within reach during the whole voyage.",
+]
+
+
+def _pipeline_settings(model) -> dict:
+    """Pooling / normalization used by the sentence-transformers pipeline."""
+    pooling, normalize = "mean", False
+    for module in model:
+        name = type(module).__name__
+        if name == "Pooling":
+            mode = module.get_pooling_mode_str()
+            pooling = "cls" if mode == "cls" else "mean"
+            if mode not in ("mean", "cls"):
+                raise SystemExit(f"unsupported pooling mode for ONNX export: {mode}")
+        elif name == "Normalize":
+            normalize = True
+        elif name not in ("Transformer",):
+            raise SystemExit(f"unsupported sentence-transformers module for ONNX export: {name}")
+    return {"pooling": pooling, "normalize": normalize, "max_seq_length": int(model.max_seq_length)}
+
+
+def export(model_name: str, out_dir: Path, opset: int) -> dict:
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device="cpu")
+    settings = _pipeline_settings(model)
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tokenizer.save_pretrained(out_dir / "tokenizer")
+    transformer.config.save_pretrained(out_dir / "tokenizer")
+
+    enc = tokenizer(SAMPLE_SENTENCES[:2], padding=True, return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in enc]
+    dynamic = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    class _Encoder(torch.nn.Module):
+        def __init__(self, inner):
+            super().__init__()
+            self.inner = inner
+
+        def forward(self, *inputs):
+            return self.inner(**dict(zip(input_names, inputs))).last_hidden_state
+
+    fp32_path = out_dir / "model.onnx"
+    with torch.no_grad():
+        torch.onnx.export(
+            _Encoder(transformer),
+            tuple(enc[name] for name in input_names),
+            str(fp32_path),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic,
+            opset_version=opset,
+            do_constant_folding=True,
+        )
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    int8_path = out_dir / "model_int8.onnx"
+    quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+
+    (out_dir / EMBEDDER_CONFIG_NAME).write_text(
+        json.dumps({**settings, "source_model": model_name}, indent=2), encoding="utf-8"
+    )
+    return {"model": model, "paths": [fp32_path, int8_path], "settings": settings}
+
+
+def parity(model, onnx_path: Path, tokenizer_dir: Path) -> float:
+    from services.rag_backend.embedding import OnnxSentenceEmbedder
+
+    reference = model.encode(SAMPLE_SENTENCES, convert_to_numpy=True)
+    onnx = OnnxSentenceEmbedder(
+        {"EMBED_ONNX": str(onnx_path), "EMBED_TOKENIZER_DIR": str(tokenizer_dir), "ORT_GRAPH_CACHE_ENABLED": False}
+    ).encode(SAMPLE_SENTENCES)
+    ref = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    got = onnx / np.linalg.norm(onnx, axis=1, keepdims=True)
+    return float(np.min(np.sum(ref * got, axis=1)))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Export the retrieval embedder to ONNX for EMBED_BACKEND=onnx.")
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--out", type=Path, default=BACKEND_ROOT / "assets" / "models" / "embedder")
+    parser.add_argument("--opset", type=int, default=17)
+    args = parser.parse_args()
+
+    result = export(args.model, args.out, args.opset)
+    print(f"settings: {result['settings']}")
+    for path in result["paths"]:
+        cosine = parity(result["model"], path, args.out / "tokenizer")
+        print(f"{path.name}: {path.stat().st_size / 1e6:.1f} MB, min cosine vs torch = {cosine:.5f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
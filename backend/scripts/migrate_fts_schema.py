@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import argparse
+import sqlite3
+import sys
+from pathlib import Path
+
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+
+def _size_mb(path: Path) -> float:
+    files = [path, path.with_name(path.name + "-wal")]
+    return sum(f.stat().st_size for f in files if f.exists()) / (1024 * 1024)
+
+
+def _schema_version(conn: sqlite3.Connection) -> int | None:
+    try:
+        row = conn.execute("SELECT value FROM index_meta WHERE key = 'schema_version';").fetchone()
+    except sqlite3.OperationalError:  # no index_meta table before v2
+        return None
+    return int(row[0]) if row else None
+
+
+def main() -> int:
+    from config import CFG
+    from services.rag_backend.fts_schema import SCHEMA_VERSION, create_schema
+    from services.rag_backend.sqlite_store import build_sqlite_store
+
+    parser = argparse.ArgumentParser(
+        description=(
+            f"Migrate the BM25 SQLite index to the current (v{SCHEMA_VERSION}) schema: v1 'documents' FTS5 rows "
+            "move to the 'chunks' table and older indexed_files manifests get the incremental-sync columns."
+        )
+    )
+    parser.add_argument("--db", default=str(CFG.get("RAG_SQLITE_PATH")), help="SQLite file (default: RAG_SQLITE_PATH)")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM afterwards to give the freed pages back")
+    args = parser.parse_args()
+
+    path = Path(args.db)
+    if not path.is_file():
+        print(f"{path} does not exist; the indexer creates the v{SCHEMA_VERSION} schema on first use.")
+        return 1
+
+    before = _size_mb(path)
+    store = build_sqlite_store(path, CFG)
+    try:
+        previous = store.write(_schema_version)
+        moved = store.write(create_schema)
+        chunks = store.reader().execute("SELECT count(*) FROM chunks;").fetchone()[0]
+        version = _schema_version(store.reader())
+    finally:
+        store.close()
+
+    if args.vacuum:
+        conn = sqlite3.connect(path)
+        try:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+            conn.execute("VACUUM;")
+        finally:
+            conn.close()
+
+    if moved:
+        print(f"migrated {moved} v1 rows -> {chunks} chunks")
+    if previous == version:
+        print(f"already on schema_version {version} ({chunks} chunks)")
+    else:
+        print(f"schema_version: {previous if previous is not None else 'unset'} -> {version} ({chunks} chunks)")
+    print(f"size: {before:.1f} MB -> {_size_mb(path):.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -4,7 +4,7 @@ import hashlib
 import re
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, Iterable, Iterator
 from uuid import uuid4
 
 from config import BACKEND_ROOT, CFG
@@ -102,6 +102,40 @@ def _add_chunks_to_index(chunks: list[dict[str, Any]], document_id: str) -> list
     return add_or_replace_document_chunks(chunks, document_id=document_id)
 
 
+def _stream_chunks_to_index(
+    chunks: Iterable[dict[str, Any]],
+    document_id: str,
+    on_batch: Callable[[int], None],
+) -> tuple[int, list[str]]:
+    from services.rag_backend.indexer import replace_document_chunks_streaming
+
+    return replace_document_chunks_streaming(chunks, document_id, on_batch=on_batch)
+
+
+def _find_indexed_document(document_id: str, content_hash: str) -> dict[str, Any] | None:
+    from services.rag_backend.indexer import find_indexed_document
+
+    return find_indexed_document(document_id, content_hash)
+
+
+def _record_indexed_document(saved_path: Path, document_id: str, content_hash: str, chunk_count: int) -> None:
+    from services.rag_backend.indexer import record_indexed_document
+
+    record_indexed_document(saved_path, document_id, content_hash, chunk_count)
+
+
+class _ExtractionError(Exception):
+    pass
+
+
+def _extraction_guard(chunks: Iterable[dict[str, Any]]) -> Iterator[dict[str, Any]]:
+    """Tell extraction failures inside the chunk stream apart from index write failures."""
+    try:
+        yield from chunks
+    except Exception as exc:
+        raise _ExtractionError(str(exc)) from exc
+
+
 def _failure_result(
     *,
     filename: str,
@@ -127,22 +161,75 @@ def _failure_result(
     )
 
 
-async def index_upload_file(file: Any, cfg: dict[str, Any] | None = None) -> IndexingResult:
+def already_indexed_result(filename: str, metadata: dict[str, Any]) -> IndexingResult | None:
+    """
+    A `skipped` result when this exact content (same content hash, hence the
+    same document_id) is already indexed with the current chunking settings;
+    None when it still has to be indexed.
+    """
+    document_id, content_hash = metadata.get("document_id"), metadata.get("content_hash")
+    if not document_id or not content_hash:
+        return None
+    try:
+        existing = _find_indexed_document(document_id, content_hash)
+    except Exception:
+        return None  # an unreadable manifest only costs a re-index
+    if existing is None:
+        return None
+    return _failure_result(
+        filename=filename,
+        document_id=document_id,
+        saved_path=metadata.get("saved_path"),
+        metadata=metadata,
+        skipped=True,
+        skip_reason="already_indexed",
+    )
+
+
+def _remember_indexed(saved_path: Path, metadata: dict[str, Any], chunk_count: int) -> list[str]:
+    try:
+        _record_indexed_document(saved_path, metadata["document_id"], metadata.get("content_hash"), chunk_count)
+    except Exception as exc:
+        return [f"manifest_update_failed: {exc}"]
+    return []
+
+
+async def save_upload(file: Any, cfg: dict[str, Any] | None = None) -> tuple[Path, str, dict[str, Any]]:
+    """Validate, stream to disk and hash an upload; returns (saved path, original name, chunk metadata)."""
     cfg = cfg or CFG
     saved_path, filename, content_hash, document_id, byte_count = await _save_upload(file, cfg)
-    relative_path = _relative_backend_path(saved_path)
-    uploaded_at = datetime.now(timezone.utc).isoformat()
     metadata = {
         "document_id": document_id,
         "file_name": saved_path.name,
         "source": saved_path.name,
-        "saved_path": relative_path,
+        "saved_path": _relative_backend_path(saved_path),
         "content_hash": content_hash,
-        "uploaded_at": uploaded_at,
+        "uploaded_at": datetime.now(timezone.utc).isoformat(),
         "byte_count": byte_count,
     }
+    return saved_path, filename, metadata
 
-    if byte_count == 0:
+
+def index_saved_upload(
+    saved_path: str | Path,
+    filename: str,
+    metadata: dict[str, Any],
+    progress: Callable[..., None] | None = None,
+) -> IndexingResult:
+    """
+    Extract, chunk and index a file already written by `save_upload`.
+
+    Synchronous and CPU-heavy; the upload endpoint runs it on an ingestion
+    worker thread. `progress(stage, **fields)` is called when extraction,
+    chunking and indexing start. Content that is already indexed with the
+    current chunking settings returns `skipped` before extraction.
+    """
+    saved_path = Path(saved_path)
+    document_id = metadata.get("document_id")
+    relative_path = metadata.get("saved_path") or _relative_backend_path(saved_path)
+    report = progress or (lambda stage, **fields: None)
+
+    if not metadata.get("byte_count"):
         return _failure_result(
             filename=filename,
             document_id=document_id,
@@ -151,11 +238,17 @@ async def index_upload_file(file: Any, cfg: dict[str, Any] | None = None) -> Ind
             skipped=True,
             skip_reason="empty_file",
         )
+    existing = already_indexed_result(filename, metadata)
+    if existing is not None:
+        return existing
+    if saved_path.suffix.lower() == ".pdf":
+        return _index_pdf_stream(saved_path, filename, metadata, relative_path, report)
 
     try:
         from services.rag_backend.io_loader import load_document_from_file
         from services.rag_backend.preprocess import preprocess_documents
 
+        report("extracting")
         document = load_document_from_file(saved_path, metadata=metadata)
     except ValueError as exc:
         return _failure_result(
@@ -187,6 +280,7 @@ async def index_upload_file(file: Any, cfg: dict[str, Any] | None = None) -> Ind
             skip_reason="empty_extracted_text",
         )
 
+    report("chunking")
     chunks = preprocess_documents([document])
     if not chunks:
         return _failure_result(
@@ -198,6 +292,7 @@ async def index_upload_file(file: Any, cfg: dict[str, Any] | None = None) -> Ind
             skip_reason="no_chunks",
         )
 
+    report("indexing", chunk_count=len(chunks))
     try:
         warnings = _add_chunks_to_index(chunks, document_id)
     except Exception as exc:
@@ -210,6 +305,7 @@ async def index_upload_file(file: Any, cfg: dict[str, Any] | None = None) -> Ind
             warnings=[str(exc)],
         )
 
+    warnings += _remember_indexed(saved_path, metadata, len(chunks))
     return IndexingResult(
         filename=filename,
         document_id=document_id,
@@ -221,6 +317,55 @@ async def index_upload_file(file: Any, cfg: dict[str, Any] | None = None) -> Ind
     )
 
 
+def _index_pdf_stream(
+    saved_path: Path,
+    filename: str,
+    metadata: dict[str, Any],
+    relative_path: str,
+    report: Callable[..., None],
+) -> IndexingResult:
+    """
+    PDFs stream page by page into the chunker and then the embedder, so the
+    document text is never held in full. Page ranges of large files are
+    extracted in parallel (RAG_PDF_WORKERS, bounded by RAG_PDF_PAGE_WINDOW).
+    """
+    from services.rag_backend.preprocess import preprocess_pdf
+
+    document_id = metadata.get("document_id")
+    failure = dict(filename=filename, document_id=document_id, saved_path=relative_path, metadata=metadata)
+
+    report("extracting")
+    chunks = _extraction_guard(preprocess_pdf(saved_path, metadata))
+    try:
+        count, warnings = _stream_chunks_to_index(
+            chunks,
+            document_id,
+            lambda total: report("indexing", chunk_count=total),
+        )
+    except _ExtractionError as exc:
+        return _failure_result(**failure, error="text_extraction_failed", warnings=[str(exc)])
+    except Exception as exc:
+        return _failure_result(**failure, error="index_update_failed", warnings=[str(exc)])
+
+    if not count:
+        return _failure_result(**failure, skipped=True, skip_reason="empty_extracted_text", warnings=warnings)
+    warnings += _remember_indexed(saved_path, metadata, count)
+    return IndexingResult(
+        filename=filename,
+        document_id=document_id,
+        saved_path=relative_path,
+        indexed=True,
+        indexed_chunk_count=count,
+        warnings=warnings,
+        metadata=metadata,
+    )
+
+
+async def index_upload_file(file: Any, cfg: dict[str, Any] | None = None) -> IndexingResult:
+    saved_path, filename, metadata = await save_upload(file, cfg)
+    return index_saved_upload(saved_path, filename, metadata)
+
+
 def upload_error_response(exc: UploadIndexingError) -> dict[str, Any]:
     return {
         "ok": False,
@@ -1,10 +1,24 @@
 from abc import ABC, abstractmethod
+from typing import Iterator
 from schemas.pipeline import GenerationResult
 
+
+def stream_from_result(result: GenerationResult) -> Iterator[str | GenerationResult]:
+    """Stream shape for a provider that only has a finished result: one delta, then the result."""
+    if result.text:
+        yield result.text
+    yield result
+
+
+def seed_kwargs(seed: int | None) -> dict[str, int]:
+    """Keyword arguments carrying a sampling seed, empty when the request did not set one."""
+    return {"seed": seed} if seed is not None else {}
+
+
 class BaseGenerationProvider(ABC):
     @abstractmethod
-    def chat_structured(self, user_text: str) -> GenerationResult:
-        """Structured chat generation."""
+    def chat_structured(self, user_text: str, *, seed: int | None = None) -> GenerationResult:
+        """Structured chat generation. `seed` makes sampled output reproducible where supported."""
         pass
 
     @abstractmethod
@@ -39,9 +53,17 @@ class BaseGenerationProvider(ABC):
         """Structured narration for object detection."""
         pass
 
+    def cache_stats(self) -> dict | None:
+        """Generation cache counters, or None when the provider has no cache."""
+        return None
+
+    def warmup(self) -> None:
+        """Pay one-time model initialization before real traffic; remote providers need nothing."""
+        return None
+
     # Legacy string-returning methods delegate to the structured equivalents
-    def chat(self, user_text: str) -> str:
-        return self.chat_structured(user_text).text
+    def chat(self, user_text: str, *, seed: int | None = None) -> str:
+        return self.chat_structured(user_text, seed=seed).text
 
     def answer(self, question: str, context: list[str] | str | None) -> str:
         return self.answer_structured(question, context).text
@@ -60,3 +82,18 @@ class BaseGenerationProvider(ABC):
 
     def narrate_detection(self, objects: list[str] | str) -> str:
         return self.narrate_detection_structured(objects).text
+
+    # Streaming methods yield text deltas followed by the final GenerationResult.
+    # The default emits the whole structured answer as a single delta.
+    def chat_stream(self, user_text: str, *, seed: int | None = None) -> Iterator[str | GenerationResult]:
+        return stream_from_result(self.chat_structured(user_text, seed=seed))
+
+    def answer_stream(self, question: str, context: list[str] | str | None) -> Iterator[str | GenerationResult]:
+        return stream_from_result(self.answer_structured(question, context))
+
+    def answer_model_only_with_instruction_stream(
+        self, question: str, instruction: str | None = None
+    ) -> Iterator[str | GenerationResult]:
+        return stream_from_result(
+            self.answer_model_only_with_instruction_structured(question, instruction=instruction)
+        )
@@ -1,6 +1,6 @@
 import logging
 import time
-from typing import Optional
+from typing import Iterator, Optional
 
 try:
     from google import genai
@@ -21,9 +21,13 @@ from utils.text import (
     fallback_instruction,
 )
 from services.generation.base import BaseGenerationProvider
+from utils.cache import GenerationCache, build_generation_cache, mark_cache_miss
 
 logger = logging.getLogger(__name__)
 
+# Prompt types the local T5 decodes with sampling ("chat" mode); everything else is greedy.
+_SAMPLED_PROMPT_TYPES = {"chat", "model_only", "camera_narration"}
+
 class GeminiProvider(BaseGenerationProvider):
     def __init__(self, cfg: dict):
         if not HAS_GEMINI:
@@ -50,6 +54,8 @@ class GeminiProvider(BaseGenerationProvider):
         else:
             self.client = None
 
+        self._cache = build_generation_cache(cfg)
+
     @property
     def model_name(self) -> str:
         return self._model_name
@@ -70,9 +76,12 @@ class GeminiProvider(BaseGenerationProvider):
     def max_new_rag(self) -> int | None:
         return self.max_output_tokens
 
-    def chat_structured(self, user_text: str) -> GenerationResult:
+    def cache_stats(self) -> dict | None:
+        return self._cache.stats() if self._cache is not None else None
+
+    def chat_structured(self, user_text: str, *, seed: int | None = None) -> GenerationResult:
         prompt = build_chat_prompt(user_text, self.bot_name, self.app_name)
-        return self.generate_structured(prompt, prompt_type="chat")
+        return self.generate_structured(prompt, prompt_type="chat", seed=seed)
 
     def answer_structured(self, question: str, context: list[str] | str | None) -> GenerationResult:
         prompt = build_rag_prompt(question, context)
@@ -107,18 +116,12 @@ class GeminiProvider(BaseGenerationProvider):
         *,
         prompt_type: str = "unknown",
         fallback_text: str | None = None,
+        seed: int | None = None,
     ) -> GenerationResult:
         started = time.perf_counter()
         prompt = prompt or ""
 
-        base = {
-            "model_name": self._model_name,
-            "runtime": "gemini_api",
-            "device": "remote",
-            "prompt_type": prompt_type,
-            "input_chars": len(prompt),
-            "max_new_tokens": self.max_output_tokens,
-        }
+        base = self._result_base(prompt, prompt_type)
 
         def elapsed_ms() -> int:
             return int((time.perf_counter() - started) * 1000)
@@ -149,6 +152,12 @@ class GeminiProvider(BaseGenerationProvider):
                 error="missing_api_key",
             )
 
+        cache_key = self._cache_key(prompt, prompt_type)
+        if cache_key is not None:
+            cached = self._cache.get(cache_key, latency_ms=elapsed_ms())
+            if cached is not None:
+                return cached
+
         input_tokens = None
         output_tokens = None
 
@@ -169,6 +178,7 @@ class GeminiProvider(BaseGenerationProvider):
                 config=types.GenerateContentConfig(
                     max_output_tokens=self.max_output_tokens,
                     temperature=self.temperature,
+                    seed=seed,
                 )
             )
 
@@ -191,7 +201,7 @@ class GeminiProvider(BaseGenerationProvider):
                 fallback_used = True
                 empty_output = True
 
-            return GenerationResult(
+            result = GenerationResult(
                 text=result_text,
                 **base,
                 output_chars=len(result_text or ""),
@@ -202,6 +212,7 @@ class GeminiProvider(BaseGenerationProvider):
                 fallback_used=fallback_used,
                 fallback_reason=fallback_reason,
             )
+            return self._store_in_cache(cache_key, result)
 
         except Exception as exc:
             logger.exception("Gemini API call failed for prompt_type=%s", prompt_type)
@@ -219,6 +230,136 @@ class GeminiProvider(BaseGenerationProvider):
                 error=str(exc),
             )
 
+    def chat_stream(self, user_text: str, *, seed: int | None = None) -> Iterator[str | GenerationResult]:
+        prompt = build_chat_prompt(user_text, self.bot_name, self.app_name)
+        return self.generate_stream(prompt, prompt_type="chat", seed=seed)
+
+    def answer_stream(self, question: str, context: list[str] | str | None) -> Iterator[str | GenerationResult]:
+        prompt = build_rag_prompt(question, context)
+        return self.generate_stream(prompt, prompt_type="rag_answer")
+
+    def answer_model_only_with_instruction_stream(
+        self, question: str, instruction: str | None = None
+    ) -> Iterator[str | GenerationResult]:
+        inst = instruction if instruction is not None else fallback_instruction()
+        prompt = build_model_only_prompt(question, inst)
+        return self.generate_stream(prompt, prompt_type="model_only")
+
+    def generate_stream(
+        self,
+        prompt: str,
+        *,
+        prompt_type: str = "unknown",
+        fallback_text: str | None = None,
+        seed: int | None = None,
+    ) -> Iterator[str | GenerationResult]:
+        """
+        Stream a Gemini answer with generate_content_stream: yields text deltas
+        as chunks arrive, then the final GenerationResult.
+        """
+        started = time.perf_counter()
+        prompt = prompt or ""
+        base = self._result_base(prompt, prompt_type)
+
+        def elapsed_ms() -> int:
+            return int((time.perf_counter() - started) * 1000)
+
+        def fallback(reason: str, error: str, **extra) -> GenerationResult:
+            text = fallback_text or self._fallback_text(prompt_type)
+            return GenerationResult(
+                text=text,
+                **base,
+                output_chars=len(text),
+                latency_ms=elapsed_ms(),
+                empty_output=True,
+                fallback_used=True,
+                fallback_reason=reason,
+                error=error,
+                **extra,
+            )
+
+        if not prompt.strip():
+            yield fallback("empty_prompt", "empty_prompt")
+            return
+        if not self.client:
+            yield fallback("missing_api_key", "missing_api_key")
+            return
+
+        cache_key = self._cache_key(prompt, prompt_type)
+        if cache_key is not None:
+            cached = self._cache.get(cache_key, latency_ms=elapsed_ms())
+            if cached is not None:
+                yield cached.text
+                yield cached
+                return
+
+        input_tokens = None
+        output_tokens = None
+        parts: list[str] = []
+        try:
+            stream = self.client.models.generate_content_stream(
+                model=self._model_name,
+                contents=prompt,
+                config=types.GenerateContentConfig(
+                    max_output_tokens=self.max_output_tokens,
+                    temperature=self.temperature,
+                    seed=seed,
+                )
+            )
+            for chunk in stream:
+                delta = getattr(chunk, "text", None)
+                if delta:
+                    parts.append(delta)
+                    yield delta
+                usage = getattr(chunk, "usage_metadata", None)
+                if usage:
+                    # usage is cumulative; the last chunk carries the totals
+                    if getattr(usage, "prompt_token_count", None) is not None:
+                        input_tokens = int(usage.prompt_token_count)
+                    if getattr(usage, "candidates_token_count", None) is not None:
+                        output_tokens = int(usage.candidates_token_count)
+        except Exception as exc:
+            logger.exception("Gemini streaming call failed for prompt_type=%s", prompt_type)
+            yield fallback("api_error", str(exc), input_tokens=input_tokens)
+            return
+
+        output_text = "".join(parts)
+        fallback_reason = self._invalid_generation_reason(output_text)
+        if fallback_reason:
+            yield fallback(fallback_reason, None, input_tokens=input_tokens, output_tokens=output_tokens)
+            return
+        yield self._store_in_cache(cache_key, GenerationResult(
+            text=output_text,
+            **base,
+            output_chars=len(output_text),
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            latency_ms=elapsed_ms(),
+        ))
+
+    def _cache_key(self, prompt: str, prompt_type: str) -> tuple | None:
+        # same split as the local T5: chat-style prompts are sampled, the rest are cacheable
+        if self._cache is None or prompt_type in _SAMPLED_PROMPT_TYPES:
+            return None
+        model = f"{self._model_name}@t={self.temperature}"
+        return GenerationCache.key(prompt, mode="rag", max_new_tokens=self.max_output_tokens, model=model)
+
+    def _store_in_cache(self, cache_key: tuple | None, result: GenerationResult) -> GenerationResult:
+        if cache_key is None:
+            return result
+        self._cache.put(cache_key, result)
+        return mark_cache_miss(result)
+
+    def _result_base(self, prompt: str, prompt_type: str) -> dict:
+        return {
+            "model_name": self._model_name,
+            "runtime": "gemini_api",
+            "device": "remote",
+            "prompt_type": prompt_type,
+            "input_chars": len(prompt),
+            "max_new_tokens": self.max_output_tokens,
+        }
+
     def _fallback_text(self, prompt_type: str | None) -> str:
         if prompt_type == "camera_narration":
             return "Okay, I will handle that now."
@@ -1,4 +1,5 @@
-from services.generation.base import BaseGenerationProvider
+from typing import Iterator
+from services.generation.base import BaseGenerationProvider, seed_kwargs
 from services.t5 import T5Service
 from schemas.pipeline import GenerationResult
 
@@ -26,8 +27,14 @@ class LocalT5Provider(BaseGenerationProvider):
     def max_new_rag(self) -> int | None:
         return getattr(self.t5_service, "max_new_rag", None)
 
-    def chat_structured(self, user_text: str) -> GenerationResult:
-        return self.t5_service.chat_structured(user_text)
+    def cache_stats(self) -> dict | None:
+        return self.t5_service.cache_stats()
+
+    def warmup(self) -> None:
+        self.t5_service.warmup()
+
+    def chat_structured(self, user_text: str, *, seed: int | None = None) -> GenerationResult:
+        return self.t5_service.chat_structured(user_text, **seed_kwargs(seed))
 
     def answer_structured(self, question: str, context: list[str] | str | None) -> GenerationResult:
         return self.t5_service.answer_structured(question, context)
@@ -48,3 +55,14 @@ class LocalT5Provider(BaseGenerationProvider):
 
     def narrate_detection_structured(self, objects: list[str] | str) -> GenerationResult:
         return self.t5_service.narrate_detection_structured(objects)
+
+    def chat_stream(self, user_text: str, *, seed: int | None = None) -> Iterator[str | GenerationResult]:
+        return self.t5_service.chat_stream(user_text, **seed_kwargs(seed))
+
+    def answer_stream(self, question: str, context: list[str] | str | None) -> Iterator[str | GenerationResult]:
+        return self.t5_service.answer_stream(question, context)
+
+    def answer_model_only_with_instruction_stream(
+        self, question: str, instruction: str | None = None
+    ) -> Iterator[str | GenerationResult]:
+        return self.t5_service.answer_model_only_with_instruction_stream(question, instruction)
@@ -0,0 +1,338 @@
+# app/services/ingestion_queue.py
+from __future__ import annotations
+import json
+import logging
+import os
+import queue
+import socket
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Mapping, Optional
+from uuid import uuid4
+
+from schemas.pipeline import IndexingResult, to_serializable_dict
+from services.rag_backend.sqlite_store import SQLiteConnectionManager
+
+logger = logging.getLogger(__name__)
+
+# job stages in order; the last three are terminal
+STAGES = ("queued", "extracting", "chunking", "indexing", "done", "skipped", "failed")
+TERMINAL_STAGES = ("done", "skipped", "failed")
+RUNNING_STAGES = ("extracting", "chunking", "indexing")
+
+_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS ingest_jobs (
+    job_id TEXT PRIMARY KEY,
+    document_id TEXT,
+    filename TEXT NOT NULL,
+    saved_path TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    chunk_count INTEGER,
+    timings TEXT NOT NULL DEFAULT '{}',
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    owner TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_ingest_jobs_stage ON ingest_jobs(stage);
+"""
+
+_JOB_COLUMNS = (
+    "job_id, document_id, filename, saved_path, metadata, stage, chunk_count, "
+    "timings, result, error, created_at, started_at, finished_at"
+)
+
+IndexFn = Callable[[str, str, Dict[str, Any], Callable[..., None]], IndexingResult]
+
+
+class IngestionQueueFull(Exception):
+    """More than `max_pending` jobs are queued or running."""
+
+
+# owners (queue instances) of this process that have not been closed
+_LIVE_OWNERS: set[str] = set()
+
+
+def _create_schema(conn: sqlite3.Connection) -> None:
+    for statement in _SCHEMA_SQL.strip().split(";"):
+        if statement.strip():
+            conn.execute(statement)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(ingest_jobs);")}
+    if "owner" not in columns:  # tables created before jobs were claimed
+        conn.execute("ALTER TABLE ingest_jobs ADD COLUMN owner TEXT;")
+
+
+def _owner_alive(owner: str) -> bool:
+    """
+    `host:pid:token` of a queue instance. Another process on this host is
+    alive while its pid exists; an instance of this process until it is
+    closed. Owners on other hosts cannot be checked and count as alive.
+    """
+    host, _, rest = owner.partition(":")
+    pid_text, _, _token = rest.partition(":")
+    if host != socket.gethostname() or not pid_text.isdigit():
+        return True
+    pid = int(pid_text)
+    if pid == os.getpid():
+        return owner in _LIVE_OWNERS
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def job_status(stage: str) -> str:
+    """queued | running | done | skipped | failed"""
+    return "running" if stage in RUNNING_STAGES else stage
+
+
+class IngestionQueue:
+    """
+    Durable upload-indexing queue.
+
+    Jobs live in a small SQLite table (WAL, one writer thread, per-thread
+    readers via SQLiteConnectionManager), so `/api/upload/{job_id}` reads
+    never wait on indexing. `workers` daemon threads pick jobs in FIFO order
+    and run `index_fn(saved_path, filename, metadata, progress)`; each
+    `progress(stage, **fields)` call is persisted together with the time
+    spent in the previous stage.
+
+    Several API worker processes may open a queue on the same database. A
+    worker claims a job with one conditional UPDATE (`owner` set while it is
+    still unowned and queued), so each job runs in exactly one process. On
+    start-up, unowned queued jobs and jobs whose owner process is gone are
+    queued again; the upload is already on disk, and re-indexing a document
+    replaces its chunks. Jobs another live process is running are left alone.
+    """
+
+    def __init__(
+        self,
+        db_path: str | Path,
+        index_fn: IndexFn,
+        *,
+        workers: int = 1,
+        max_pending: int = 16,
+        sqlite_options: Optional[Mapping[str, Any]] = None,
+    ) -> None:
+        self._index_fn = index_fn
+        self.workers = max(1, int(workers))
+        self.max_pending = max(1, int(max_pending))
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = SQLiteConnectionManager(db_path, **dict(sqlite_options or {}))
+        self._db.write(_create_schema)
+
+        self._jobs: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._submit_lock = threading.Lock()
+        self._closed = False
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        _LIVE_OWNERS.add(self.owner)
+
+        resumed = self._db.write(self._requeue_unfinished)
+        for job_id in resumed:
+            self._jobs.put(job_id)
+        if resumed:
+            logger.info("Resuming %s unfinished ingestion jobs.", len(resumed))
+
+        self._threads = [
+            threading.Thread(target=self._run, name=f"ingest-worker-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    # ---------- public ----------
+    def pending(self) -> int:
+        """Jobs queued or running (compared with `max_pending`)."""
+        row = self._db.reader().execute(
+            "SELECT count(*) FROM ingest_jobs WHERE stage NOT IN (?, ?, ?);", TERMINAL_STAGES
+        ).fetchone()
+        return int(row[0])
+
+    def is_full(self) -> bool:
+        return self.pending() >= self.max_pending
+
+    def submit(self, saved_path: str | Path, filename: str, metadata: Mapping[str, Any]) -> Dict[str, Any]:
+        """
+        Queue a saved upload and return its job. While a job for the same
+        document_id is still queued or running, that job is returned instead
+        of indexing the same content twice.
+        """
+        document_id = metadata.get("document_id")
+        with self._submit_lock:
+            if self._closed:
+                raise RuntimeError("ingestion queue is closed")
+            if document_id:
+                active = self._db.reader().execute(
+                    f"SELECT {_JOB_COLUMNS} FROM ingest_jobs WHERE document_id = ? "
+                    "AND stage NOT IN (?, ?, ?) ORDER BY created_at LIMIT 1;",
+                    (document_id, *TERMINAL_STAGES),
+                ).fetchone()
+                if active is not None:
+                    return _job_dict(active)
+            if self.is_full():
+                raise IngestionQueueFull(f"ingestion queue is full ({self.max_pending} pending jobs)")
+
+            job_id = uuid4().hex
+            self._db.write(
+                lambda conn: conn.execute(
+                    f"INSERT INTO ingest_jobs({_JOB_COLUMNS}) VALUES (?, ?, ?, ?, ?, 'queued', NULL, '{{}}', NULL, NULL, ?, NULL, NULL);",
+                    (job_id, document_id, filename, str(saved_path),
+                     json.dumps(dict(metadata), ensure_ascii=False), time.time()),
+                )
+            )
+            self._jobs.put(job_id)
+        return self.get(job_id) or {}
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._db.reader().execute(
+            f"SELECT {_JOB_COLUMNS} FROM ingest_jobs WHERE job_id = ?;", (job_id,)
+        ).fetchone()
+        return _job_dict(row) if row is not None else None
+
+    def stats(self) -> Dict[str, Any]:
+        counts = dict(self._db.reader().execute("SELECT stage, count(*) FROM ingest_jobs GROUP BY stage;").fetchall())
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "queued": int(counts.get("queued", 0)),
+            "running": sum(int(counts.get(stage, 0)) for stage in RUNNING_STAGES),
+            **{stage: int(counts.get(stage, 0)) for stage in TERMINAL_STAGES},
+        }
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Stop the workers after their current job; queued jobs stay in SQLite for the next start."""
+        with self._submit_lock:
+            self._closed = True
+        _LIVE_OWNERS.discard(self.owner)
+        for _ in self._threads:
+            self._jobs.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._db.close()
+
+    # ---------- internals ----------
+    @staticmethod
+    def _requeue_unfinished(conn: sqlite3.Connection) -> list[str]:
+        rows = conn.execute(
+            "SELECT job_id, owner FROM ingest_jobs WHERE stage NOT IN (?, ?, ?) ORDER BY created_at;",
+            TERMINAL_STAGES,
+        ).fetchall()
+        resumed = []
+        for job_id, owner in rows:
+            if owner is not None:
+                if _owner_alive(owner):
+                    continue  # another worker process is running it
+                conn.execute(
+                    "UPDATE ingest_jobs SET stage = 'queued', owner = NULL, started_at = NULL, timings = '{}' "
+                    "WHERE job_id = ? AND owner = ?;",
+                    (job_id, owner),
+                )
+            resumed.append(job_id)
+        return resumed
+
+    def _claim(self, conn: sqlite3.Connection, job_id: str, started: float) -> bool:
+        cursor = conn.execute(
+            "UPDATE ingest_jobs SET owner = ?, started_at = ? WHERE job_id = ? AND stage = 'queued' AND owner IS NULL;",
+            (self.owner, started, job_id),
+        )
+        return cursor.rowcount == 1
+
+    def _run(self) -> None:
+        while True:
+            job_id = self._jobs.get()
+            if job_id is None or self._closed:
+                return
+            try:
+                self._process(job_id)
+            except Exception:
+                # closing the store mid-job lands here too; the job is resumed on the next start
+                logger.exception("Ingestion job %s crashed.", job_id)
+
+    def _process(self, job_id: str) -> None:
+        started = time.time()
+        # the same job may sit in several workers' in-memory queues; only one claim succeeds
+        if not self._db.write(self._claim, job_id, started):
+            return
+        filename, saved_path, metadata_json, created_at = self._db.reader().execute(
+            "SELECT filename, saved_path, metadata, created_at FROM ingest_jobs WHERE job_id = ?;", (job_id,)
+        ).fetchone()
+        timings: Dict[str, int] = {}
+        timings["queue_wait_ms"] = int((started - created_at) * 1000)
+        state = {"stage": None, "since": time.perf_counter()}
+        run_started = state["since"]
+
+        def close_stage() -> None:
+            if state["stage"] is not None:
+                timings[f"{state['stage']}_ms"] = int((time.perf_counter() - state["since"]) * 1000)
+
+        def progress(stage: str, **fields: Any) -> None:
+            if stage != state["stage"]:  # same stage again (streamed PDF batches): only the count moves
+                close_stage()
+                state["stage"], state["since"] = stage, time.perf_counter()
+            chunk_count = fields.get("chunk_count")
+            self._db.write(
+                lambda conn: conn.execute(
+                    "UPDATE ingest_jobs SET stage = ?, chunk_count = coalesce(?, chunk_count), "
+                    "timings = ? WHERE job_id = ? AND owner = ?;",
+                    (stage, chunk_count, json.dumps(timings), job_id, self.owner),
+                )
+            )
+
+        try:
+            result = self._index_fn(saved_path, filename, json.loads(metadata_json), progress)
+            close_stage()
+            stage = "done" if result.indexed else ("skipped" if result.skipped else "failed")
+            chunk_count, error = result.indexed_chunk_count, result.error
+            result_json = json.dumps(to_serializable_dict(result), ensure_ascii=False)
+        except Exception as exc:
+            close_stage()
+            logger.warning("Ingestion job %s failed.", job_id, exc_info=True)
+            stage, chunk_count, error, result_json = "failed", None, str(exc) or exc.__class__.__name__, None
+        timings["total_ms"] = int((time.perf_counter() - run_started) * 1000)
+
+        self._db.write(
+            lambda conn: conn.execute(
+                "UPDATE ingest_jobs SET stage = ?, chunk_count = coalesce(?, chunk_count), timings = ?, "
+                "result = ?, error = ?, finished_at = ? WHERE job_id = ? AND owner = ?;",
+                (stage, chunk_count, json.dumps(timings), result_json, error, time.time(), job_id, self.owner),
+            )
+        )
+
+
+def _job_dict(row: tuple) -> Dict[str, Any]:
+    (job_id, document_id, filename, saved_path, metadata_json, stage, chunk_count,
+     timings_json, result_json, error, created_at, started_at, finished_at) = row
+    metadata = json.loads(metadata_json or "{}")
+    return {
+        "job_id": job_id,
+        "status": job_status(stage),
+        "stage": stage,
+        "document_id": document_id,
+        "filename": filename,
+        "stored": metadata.get("saved_path"),
+        "chunk_count": chunk_count,
+        "timings_ms": json.loads(timings_json or "{}"),
+        "created_at": created_at,
+        "started_at": started_at,
+        "finished_at": finished_at,
+        "error": error,
+        "result": json.loads(result_json) if result_json else None,
+    }
+
+
+def build_ingestion_queue(cfg: Mapping[str, Any], index_fn: IndexFn) -> IngestionQueue:
+    return IngestionQueue(
+        cfg["RAG_INGEST_DB_PATH"],
+        index_fn,
+        workers=int(cfg.get("RAG_INGEST_WORKERS", 1)),
+        max_pending=int(cfg.get("RAG_INGEST_MAX_PENDING", 16)),
+        sqlite_options={"busy_timeout_ms": int(cfg.get("RAG_SQLITE_BUSY_TIMEOUT_MS", 5000))},
+    )
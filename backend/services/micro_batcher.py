@@ -0,0 +1,191 @@
+# app/services/micro_batcher.py
+from __future__ import annotations
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Mapping, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class BatchOutput:
+    value: Any
+    queue_wait_ms: int
+    batch_size: int
+
+
+@dataclass
+class _Pending:
+    payload: Any
+    future: Future
+    enqueued: float
+
+
+def length_bucket(length: int, width: int = 16) -> int:
+    """Bucket id for a sequence length, so one batch pads to at most `width` extra positions."""
+    return max(0, int(length) - 1) // max(1, int(width))
+
+
+class MicroBatcher:
+    """
+    Collects concurrent single-input calls into one batched forward pass.
+
+    `submit` queues a payload (already tokenized / preprocessed on the
+    caller's thread). A worker takes the first waiting payload, keeps
+    collecting for up to `max_wait_ms` or until `max_batch_size`, groups the
+    batch by `bucket_key` (e.g. sequence-length bucket) and calls
+    `run_batch(payloads)` once per group; the i-th returned value resolves
+    the i-th caller's future. `workers` > 1 lets several batches run at once,
+    one per session replica.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        run_batch: Callable[[List[Any]], Sequence[Any]],
+        *,
+        max_batch_size: int = 16,
+        max_wait_ms: float = 2.0,
+        bucket_key: Optional[Callable[[Any], Hashable]] = None,
+        workers: int = 1,
+    ) -> None:
+        self.name = name
+        self._run_batch = run_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_s = max(0.0, float(max_wait_ms)) / 1000.0
+        self._bucket_key = bucket_key
+        self._pending: "queue.Queue[_Pending]" = queue.Queue()
+        self._stop = threading.Event()
+
+        # counters (read by stats())
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._max_seen_batch = 0
+        self._wait_ms_total = 0
+
+        self._threads = [
+            threading.Thread(target=self._run, name=f"{name}-batcher-{i}", daemon=True)
+            for i in range(max(1, int(workers)))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    # ---------- public ----------
+    def submit(self, payload: Any) -> Future:
+        fut: Future = Future()
+        if self._stop.is_set():
+            fut.set_exception(RuntimeError(f"{self.name} micro-batcher is closed"))
+            return fut
+        self._pending.put(_Pending(payload, fut, time.perf_counter()))
+        return fut
+
+    def call(self, payload: Any, timeout: Optional[float] = None) -> Tuple[Any, int]:
+        """Submit and wait; returns (value, queue_wait_ms)."""
+        out: BatchOutput = self.submit(payload).result(timeout=timeout)
+        return out.value, out.queue_wait_ms
+
+    def close(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        closed = RuntimeError(f"{self.name} micro-batcher is closed")
+        while True:
+            try:
+                item = self._pending.get_nowait()
+            except queue.Empty:
+                break
+            if not item.future.done():
+                item.future.set_exception(closed)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "batches": self._batches,
+                "items": self._items,
+                "avg_batch_size": round(self._items / self._batches, 2) if self._batches else 0.0,
+                "max_batch_size_seen": self._max_seen_batch,
+                "avg_queue_wait_ms": round(self._wait_ms_total / self._items, 2) if self._items else 0.0,
+                "pending": self._pending.qsize(),
+            }
+
+    # ---------- worker ----------
+    def _collect(self) -> List[_Pending]:
+        try:
+            first = self._pending.get(timeout=0.1)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = first.enqueued + self.max_wait_s
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._pending.get(timeout=remaining) if remaining > 0 else self._pending.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            batch = self._collect()
+            if not batch:
+                continue
+            if self._bucket_key is None:
+                groups = [batch]
+            else:
+                buckets: Dict[Hashable, List[_Pending]] = {}
+                for item in batch:
+                    buckets.setdefault(self._bucket_key(item.payload), []).append(item)
+                groups = list(buckets.values())
+            for group in groups:
+                self._run_group(group)
+
+    def _run_group(self, group: List[_Pending]) -> None:
+        started = time.perf_counter()
+        waits = [int((started - item.enqueued) * 1000) for item in group]
+        with self._lock:
+            self._batches += 1
+            self._items += len(group)
+            self._max_seen_batch = max(self._max_seen_batch, len(group))
+            self._wait_ms_total += sum(waits)
+        try:
+            values = list(self._run_batch([item.payload for item in group]))
+            if len(values) != len(group):
+                raise RuntimeError(f"{self.name} batch returned {len(values)} results for {len(group)} inputs")
+        except Exception as exc:
+            logger.exception("%s micro-batch failed", self.name)
+            for item in group:
+                if not item.future.done():
+                    item.future.set_exception(exc)
+            return
+        for item, value, wait_ms in zip(group, values, waits):
+            if not item.future.done():
+                item.future.set_result(BatchOutput(value, wait_ms, len(group)))
+
+
+def build_micro_batcher(
+    cfg: Mapping[str, Any],
+    prefix: str,
+    name: str,
+    run_batch: Callable[[List[Any]], Sequence[Any]],
+    *,
+    max_batch_size: int = 16,
+    max_wait_ms: float = 2.0,
+    bucket_key: Optional[Callable[[Any], Hashable]] = None,
+    workers: int = 1,
+) -> Optional[MicroBatcher]:
+    """Batcher configured by `<prefix>_BATCHING_ENABLED / _MAX_BATCH_SIZE / _BATCH_WAIT_MS`, or None when off."""
+    if not bool(cfg.get(f"{prefix}_BATCHING_ENABLED", False)):
+        return None
+    return MicroBatcher(
+        name,
+        run_batch,
+        max_batch_size=int(cfg.get(f"{prefix}_MAX_BATCH_SIZE", max_batch_size)),
+        max_wait_ms=float(cfg.get(f"{prefix}_BATCH_WAIT_MS", max_wait_ms)),
+        bucket_key=bucket_key,
+        workers=workers,
+    )
@@ -0,0 +1,18 @@
+from typing import Any, Mapping
+
+from services.model_host.adapters import RemoteGenerationProvider, RemoteNLUClassifier, RemoteYOLOService
+from services.model_host.client import ModelHostClient, ModelHostError
+from services.model_host.protocol import DEFAULT_SHM_MIN_BYTES
+from services.model_host.server import ModelHostServer, build_services
+
+
+def build_model_host_client(cfg: Mapping[str, Any]) -> ModelHostClient | None:
+    """Client for MODEL_HOST_SOCKET, or None when models run in-process."""
+    socket_path = cfg.get("MODEL_HOST_SOCKET") or ""
+    if not socket_path:
+        return None
+    return ModelHostClient(
+        str(socket_path),
+        timeout_s=float(cfg.get("MODEL_HOST_TIMEOUT_SECONDS", 120.0) or 0),
+        shm_min_bytes=int(cfg.get("MODEL_HOST_SHM_MIN_BYTES", DEFAULT_SHM_MIN_BYTES)),
+    )
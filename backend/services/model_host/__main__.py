@@ -0,0 +1,42 @@
+# python -m services.model_host  (run from backend/)
+from __future__ import annotations
+import argparse
+import logging
+
+from config import CFG
+from services.model_host.protocol import DEFAULT_SHM_MIN_BYTES
+from services.model_host.server import ModelHostServer, build_services
+from services.startup import StartupTracker
+
+logger = logging.getLogger("services.model_host")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Serve the T5, NLU and YOLO models to API workers over a Unix socket.")
+    parser.add_argument("--socket", default=CFG.get("MODEL_HOST_SOCKET") or "", help="socket path (default: MODEL_HOST_SOCKET)")
+    args = parser.parse_args()
+    if not args.socket:
+        parser.error("set MODEL_HOST_SOCKET or pass --socket")
+
+    logging.basicConfig(level=logging.DEBUG if CFG.get("DEBUG") else logging.INFO)
+    startup = StartupTracker()
+    services = build_services(CFG, startup)
+    logger.info("Models loaded: %s", startup.report())
+    server = ModelHostServer(
+        args.socket,
+        services,
+        shm_min_bytes=int(CFG.get("MODEL_HOST_SHM_MIN_BYTES", DEFAULT_SHM_MIN_BYTES)),
+        startup=startup,
+    )
+    logger.info("Model host listening on %s", args.socket)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
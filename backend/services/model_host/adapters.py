@@ -0,0 +1,150 @@
+# app/services/model_host/adapters.py
+from __future__ import annotations
+from typing import Any, Iterator, List, Tuple
+
+from schemas.pipeline import DetectionResult, GenerationResult, IntentResult
+from services.generation.base import BaseGenerationProvider, seed_kwargs
+from services.model_host.client import ModelHostClient
+
+
+def _remote_stream(client: ModelHostClient, method: str, **args: Any) -> Iterator[str | GenerationResult]:
+    for item in client.stream(method, **args):
+        yield item if isinstance(item, str) else GenerationResult.model_validate(item)
+
+
+class RemoteGenerationProvider(BaseGenerationProvider):
+    """Generation provider whose model lives in the model host process."""
+
+    def __init__(self, client: ModelHostClient):
+        self.client = client
+
+    def warmup(self) -> None:
+        # the host warms its own models; this only checks it answers
+        self.client.info(refresh=True)
+
+    def _host_attr(self, name: str) -> Any:
+        return (self.client.info().get("generation") or {}).get(name)
+
+    @property
+    def model_name(self) -> str | None:
+        return self._host_attr("model_name")
+
+    @property
+    def runtime(self) -> str | None:
+        return self._host_attr("runtime")
+
+    @property
+    def device(self) -> str | None:
+        return self._host_attr("device")
+
+    @property
+    def max_new_chat(self) -> int | None:
+        return self._host_attr("max_new_chat")
+
+    @property
+    def max_new_rag(self) -> int | None:
+        return self._host_attr("max_new_rag")
+
+    def _generate(self, method: str, **args: Any) -> GenerationResult:
+        return GenerationResult.model_validate(self.client.call(f"generation.{method}", **args))
+
+    def cache_stats(self) -> dict | None:
+        return self.client.call("generation.cache_stats")
+
+    def chat_structured(self, user_text: str, *, seed: int | None = None) -> GenerationResult:
+        return self._generate("chat_structured", user_text=user_text, **seed_kwargs(seed))
+
+    def answer_structured(self, question: str, context: list[str] | str | None) -> GenerationResult:
+        return self._generate("answer_structured", question=question, context=context)
+
+    def answer_model_only_with_instruction_structured(
+        self, question: str, instruction: str | None = None
+    ) -> GenerationResult:
+        return self._generate(
+            "answer_model_only_with_instruction_structured", question=question, instruction=instruction
+        )
+
+    def narrate_open_camera_structured(self) -> GenerationResult:
+        return self._generate("narrate_open_camera_structured")
+
+    def narrate_close_camera_structured(self) -> GenerationResult:
+        return self._generate("narrate_close_camera_structured")
+
+    def narrate_take_photo_structured(self) -> GenerationResult:
+        return self._generate("narrate_take_photo_structured")
+
+    def narrate_detection_structured(self, objects: list[str] | str) -> GenerationResult:
+        return self._generate("narrate_detection_structured", objects=objects)
+
+    def chat_stream(self, user_text: str, *, seed: int | None = None) -> Iterator[str | GenerationResult]:
+        return _remote_stream(self.client, "generation.chat_stream", user_text=user_text, **seed_kwargs(seed))
+
+    def answer_stream(self, question: str, context: list[str] | str | None) -> Iterator[str | GenerationResult]:
+        return _remote_stream(self.client, "generation.answer_stream", question=question, context=context)
+
+    def answer_model_only_with_instruction_stream(
+        self, question: str, instruction: str | None = None
+    ) -> Iterator[str | GenerationResult]:
+        return _remote_stream(
+            self.client,
+            "generation.answer_model_only_with_instruction_stream",
+            question=question,
+            instruction=instruction,
+        )
+
+
+class RemoteNLUClassifier:
+    """NLUClassifier stand-in that classifies in the model host process."""
+
+    def __init__(self, client: ModelHostClient):
+        self.client = client
+        self.last_error: str | None = None
+
+    def warmup(self) -> None:
+        self.client.info(refresh=True)
+
+    def classify_intent(self, text: str, threshold: float | None = None) -> IntentResult:
+        result = IntentResult.model_validate(self.client.call("nlu.classify_intent", text=text, threshold=threshold))
+        self.last_error = result.error
+        return result
+
+    def classify_intent_batch(self, texts: List[str], threshold: float | None = None) -> List[IntentResult]:
+        rows = self.client.call("nlu.classify_intent_batch", texts=list(texts), threshold=threshold)
+        return [IntentResult.model_validate(row) for row in rows]
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        result = self.classify_intent(text)
+        return result.label, float(result.confidence or 0.0)
+
+
+class RemoteYOLOService:
+    """YOLOService stand-in; images reach the model host through shared memory."""
+
+    def __init__(self, client: ModelHostClient):
+        self.client = client
+
+    def warmup(self) -> None:
+        self.client.info(refresh=True)
+
+    @property
+    def names(self) -> List[str]:
+        return list((self.client.info().get("yolo") or {}).get("names") or [])
+
+    @property
+    def model_name(self) -> str | None:
+        return (self.client.info().get("yolo") or {}).get("model_name")
+
+    def detect_structured(self, image_bgr, image_source: str | None = None) -> DetectionResult:
+        return DetectionResult.model_validate(
+            self.client.call("yolo.detect_structured", image_bgr=image_bgr, image_source=image_source)
+        )
+
+    def detect_structured_batch(self, images_bgr: list, image_source: str | None = None) -> List[DetectionResult]:
+        rows = self.client.call(
+            "yolo.detect_structured_batch", images_bgr=list(images_bgr), image_source=image_source
+        )
+        return [DetectionResult.model_validate(row) for row in rows]
+
+    def detect_from_bgr(self, image_bgr):
+        boxes, labels, scores, cls_ids = self.client.call("yolo.detect_from_bgr", image_bgr=image_bgr)
+        return boxes, labels, scores, cls_ids
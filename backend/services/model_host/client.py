@@ -0,0 +1,113 @@
+# app/services/model_host/client.py
+from __future__ import annotations
+import queue
+import socket
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+from services.model_host.protocol import DEFAULT_SHM_MIN_BYTES, recv_message, send_message
+
+
+class ModelHostError(RuntimeError):
+    """The model host refused or failed a call."""
+
+    def __init__(self, method: str, error_type: str, message: str) -> None:
+        super().__init__(f"{method} failed in model host: {error_type}: {message}")
+        self.method = method
+        self.error_type = error_type
+
+
+class ModelHostClient:
+    """
+    Connection pool to the model host socket.
+
+    A call checks out one connection for its request/response exchange (a
+    streaming call keeps it until the final result), so concurrent request
+    threads in an API worker never interleave frames. Connections that hit a
+    socket error are dropped instead of being returned to the pool.
+    """
+
+    def __init__(
+        self,
+        socket_path: str,
+        *,
+        timeout_s: float = 120.0,
+        shm_min_bytes: int = DEFAULT_SHM_MIN_BYTES,
+    ) -> None:
+        self.socket_path = socket_path
+        self.timeout_s = float(timeout_s) if timeout_s else None
+        self.shm_min_bytes = int(shm_min_bytes)
+        self._idle: "queue.LifoQueue[socket.socket]" = queue.LifoQueue()
+        self._info: Dict[str, Any] | None = None
+        self._info_lock = threading.Lock()
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout_s)
+        try:
+            sock.connect(self.socket_path)
+        except Exception:
+            sock.close()
+            raise
+        return sock
+
+    @contextmanager
+    def _connection(self) -> Iterator[socket.socket]:
+        try:
+            sock = self._idle.get_nowait()
+        except queue.Empty:
+            sock = self._connect()
+        try:
+            yield sock
+        except BaseException:
+            sock.close()  # mid-exchange state is unknown
+            raise
+        self._idle.put(sock)
+
+    def _exchange(self, sock: socket.socket, method: str, args: Dict[str, Any]) -> None:
+        send_message(sock, {"method": method, "args": args}, shm_min_bytes=self.shm_min_bytes)
+
+    @staticmethod
+    def _result(method: str, reply: Dict[str, Any]) -> Any:
+        if reply.get("ok"):
+            return reply.get("result")
+        error = reply.get("error") or {}
+        raise ModelHostError(method, str(error.get("type") or "Error"), str(error.get("message") or ""))
+
+    def call(self, method: str, **args: Any) -> Any:
+        with self._connection() as sock:
+            self._exchange(sock, method, args)
+            return self._result(method, recv_message(sock))
+
+    def stream(self, method: str, **args: Any) -> Iterator[Any]:
+        """Yield text deltas, then the final result."""
+        with self._connection() as sock:
+            self._exchange(sock, method, args)
+            while True:
+                reply = recv_message(sock)
+                if "delta" not in reply:
+                    break
+                yield reply["delta"]
+        # connection is back in the pool even if the caller stops after the result
+        yield self._result(method, reply)
+
+    def info(self, *, refresh: bool = False) -> Dict[str, Any]:
+        """Host description (model names, YOLO labels, call counters), cached after the first call."""
+        with self._info_lock:
+            if self._info is None or refresh:
+                self._info = self.call("host.info")
+            return self._info
+
+    def ping(self) -> bool:
+        try:
+            return self.call("host.ping") == "pong"
+        except Exception:
+            return False
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
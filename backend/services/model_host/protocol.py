@@ -0,0 +1,126 @@
+# app/services/model_host/protocol.py
+from __future__ import annotations
+import json
+import socket
+import struct
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+# Wire format between API workers and the model host.
+#
+# One frame = two big-endian uint32 lengths (JSON header, inline payload), the
+# UTF-8 JSON header, then the payload. numpy arrays anywhere in a message are
+# replaced by {"__ndarray__": i} and described in header["arrays"][i]: arrays
+# of at least `shm_min_bytes` travel through a shared-memory segment created
+# by the sender and unlinked by the receiver once it has copied the data out;
+# smaller ones are appended to the inline payload.
+
+_LENGTHS = struct.Struct(">II")
+DEFAULT_SHM_MIN_BYTES = 64 * 1024
+
+
+class ProtocolError(RuntimeError):
+    """Malformed frame or a peer that closed the connection mid-message."""
+
+
+def _flatten(value: Any, arrays: List[np.ndarray]) -> Any:
+    if isinstance(value, np.ndarray):
+        arrays.append(value)
+        return {"__ndarray__": len(arrays) - 1}
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        return {str(k): _flatten(v, arrays) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_flatten(v, arrays) for v in value]
+    return value
+
+
+def _restore(value: Any, arrays: List[np.ndarray]) -> Any:
+    if isinstance(value, dict):
+        if set(value) == {"__ndarray__"}:
+            return arrays[int(value["__ndarray__"])]
+        return {k: _restore(v, arrays) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_restore(v, arrays) for v in value]
+    return value
+
+
+def send_message(sock: socket.socket, message: Dict[str, Any], *, shm_min_bytes: int = DEFAULT_SHM_MIN_BYTES) -> None:
+    arrays: List[np.ndarray] = []
+    body = _flatten(message, arrays)
+    specs: List[Dict[str, Any]] = []
+    inline: List[bytes] = []
+    offset = 0
+    segments: List[shared_memory.SharedMemory] = []
+    try:
+        for arr in arrays:
+            arr = np.ascontiguousarray(arr)
+            spec: Dict[str, Any] = {"dtype": arr.dtype.str, "shape": list(arr.shape)}
+            if arr.nbytes >= shm_min_bytes:
+                shm = shared_memory.SharedMemory(create=True, size=max(1, arr.nbytes))
+                segments.append(shm)
+                np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+                spec["shm"] = shm.name
+            else:
+                data = arr.tobytes()
+                spec["offset"], spec["nbytes"] = offset, len(data)
+                inline.append(data)
+                offset += len(data)
+            specs.append(spec)
+        header = json.dumps({"body": body, "arrays": specs}).encode("utf-8")
+        payload = b"".join(inline)
+        sock.sendall(_LENGTHS.pack(len(header), len(payload)) + header + payload)
+    except Exception:
+        for shm in segments:   # the receiver never saw them
+            shm.close()
+            shm.unlink()
+        raise
+    for shm in segments:
+        # ownership passes to the receiver, which unlinks after copying; keep
+        # this process's resource tracker from unlinking it again at exit
+        resource_tracker.unregister(shm._name, "shared_memory")
+        shm.close()
+
+
+def recv_message(sock: socket.socket) -> Dict[str, Any]:
+    header_len, payload_len = _LENGTHS.unpack(_recv_exact(sock, _LENGTHS.size))
+    header = json.loads(_recv_exact(sock, header_len).decode("utf-8"))
+    payload = _recv_exact(sock, payload_len) if payload_len else b""
+    arrays = [_load_array(spec, payload) for spec in header.get("arrays", [])]
+    return _restore(header["body"], arrays)
+
+
+def _load_array(spec: Dict[str, Any], payload: bytes) -> np.ndarray:
+    dtype, shape = np.dtype(spec["dtype"]), tuple(spec["shape"])
+    if "shm" not in spec:
+        start = int(spec["offset"])
+        return np.frombuffer(payload[start:start + int(spec["nbytes"])], dtype=dtype).reshape(shape).copy()
+    shm = shared_memory.SharedMemory(name=spec["shm"])
+    try:
+        return np.array(np.ndarray(shape, dtype=dtype, buffer=shm.buf), copy=True)
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks: List[bytes] = []
+    remaining = size
+    while remaining:
+        chunk = sock.recv(min(remaining, 1 << 20))
+        if not chunk:
+            raise ProtocolError("connection closed")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def split_method(method: str) -> Tuple[str, str]:
+    """"t5.chat_structured" -> ("t5", "chat_structured")."""
+    service, _, name = str(method).partition(".")
+    if not service or not name:
+        raise ValueError(f"invalid method name: {method!r}")
+    return service, name
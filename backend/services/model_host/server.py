@@ -0,0 +1,196 @@
+# app/services/model_host/server.py
+from __future__ import annotations
+import logging
+import os
+import socketserver
+import threading
+import time
+from typing import Any, Dict, Iterable, Mapping, Optional
+
+from pydantic import BaseModel
+
+from services.model_host.protocol import (
+    DEFAULT_SHM_MIN_BYTES,
+    ProtocolError,
+    recv_message,
+    send_message,
+    split_method,
+)
+from services.startup import StartupTracker
+
+logger = logging.getLogger(__name__)
+
+# Methods each hosted service exposes over the socket. Anything else is refused,
+# so a client cannot reach private helpers or mutate the models.
+EXPOSED_METHODS: Dict[str, tuple[str, ...]] = {
+    "generation": (
+        "chat_structured",
+        "answer_structured",
+        "answer_model_only_with_instruction_structured",
+        "narrate_open_camera_structured",
+        "narrate_close_camera_structured",
+        "narrate_take_photo_structured",
+        "narrate_detection_structured",
+        "cache_stats",
+        "chat_stream",
+        "answer_stream",
+        "answer_model_only_with_instruction_stream",
+    ),
+    "nlu": ("classify_intent", "classify_intent_batch"),
+    "yolo": ("detect_structured", "detect_structured_batch", "detect_from_bgr"),
+}
+
+# read-only attributes reported by host.info for the client adapters
+_INFO_ATTRIBUTES: Dict[str, tuple[str, ...]] = {
+    "generation": ("model_name", "runtime", "device", "max_new_chat", "max_new_rag"),
+    "nlu": ("model_path", "max_len"),
+    "yolo": ("model_name", "imgsz", "conf_thr", "iou_thr", "names"),
+}
+
+
+def _to_wire(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, (list, tuple)):
+        return [_to_wire(v) for v in value]
+    return value
+
+
+class ModelHostServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Owns the ONNX models and serves them to API workers over a Unix socket.
+
+    Every uvicorn worker then talks to one copy of the T5 / NLU / YOLO
+    sessions (and one thread budget) instead of loading its own. Each client
+    connection gets a thread; concurrent requests meet in the models' own
+    batching and session replica pools.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(
+        self,
+        socket_path: str,
+        services: Mapping[str, Any],
+        *,
+        shm_min_bytes: int = DEFAULT_SHM_MIN_BYTES,
+        exposed: Optional[Mapping[str, Iterable[str]]] = None,
+        startup: Optional[StartupTracker] = None,
+    ) -> None:
+        self.socket_path = os.fspath(socket_path)
+        self.services = dict(services)
+        self.shm_min_bytes = int(shm_min_bytes)
+        exposed = EXPOSED_METHODS if exposed is None else exposed
+        self.exposed = {name: frozenset(methods) for name, methods in exposed.items()}
+        self.startup = startup
+        self.started_at = time.time()
+        self._stats_lock = threading.Lock()
+        self._calls: Dict[str, int] = {}
+        self._errors = 0
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)  # stale socket from a previous run
+        parent = os.path.dirname(self.socket_path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        super().__init__(self.socket_path, _ConnectionHandler)
+        os.chmod(self.socket_path, 0o660)
+
+    def server_close(self) -> None:
+        super().server_close()
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+
+    # ---------- dispatch ----------
+    def resolve(self, method: str):
+        service_name, attr = split_method(method)
+        service = self.services.get(service_name)
+        if service is None or attr not in self.exposed.get(service_name, ()):
+            raise LookupError(f"unknown method: {method}")
+        return getattr(service, attr)
+
+    def info(self) -> Dict[str, Any]:
+        info: Dict[str, Any] = {"pid": os.getpid(), "uptime_s": round(time.time() - self.started_at, 1)}
+        for name, service in self.services.items():
+            info[name] = {attr: getattr(service, attr, None) for attr in _INFO_ATTRIBUTES.get(name, ())}
+        if self.startup is not None:
+            info["startup"] = self.startup.report()
+        with self._stats_lock:
+            info["calls"] = dict(self._calls)
+            info["errors"] = self._errors
+        return info
+
+    def record(self, method: str, ok: bool) -> None:
+        with self._stats_lock:
+            self._calls[method] = self._calls.get(method, 0) + 1
+            if not ok:
+                self._errors += 1
+
+
+class _ConnectionHandler(socketserver.BaseRequestHandler):
+    server: ModelHostServer
+
+    def handle(self) -> None:
+        while True:
+            try:
+                request = recv_message(self.request)
+            except (ProtocolError, ConnectionError):
+                return  # client went away
+            if not self._serve(request):
+                return
+
+    def _send(self, message: Dict[str, Any]) -> bool:
+        try:
+            send_message(self.request, message, shm_min_bytes=self.server.shm_min_bytes)
+            return True
+        except (BrokenPipeError, ConnectionError):
+            return False
+
+    def _serve(self, request: Dict[str, Any]) -> bool:
+        method = str(request.get("method") or "")
+        args = request.get("args") or {}
+        if method == "host.ping":
+            return self._send({"ok": True, "result": "pong"})
+        if method == "host.info":
+            return self._send({"ok": True, "result": self.server.info()})
+
+        try:
+            fn = self.server.resolve(method)
+            result = fn(**args)
+            if method.endswith("_stream"):
+                # text deltas go out as they arrive; the final result closes the call
+                stream, result = result, None
+                for item in stream:
+                    if not isinstance(item, str):
+                        result = item
+                    elif not self._send({"delta": item}):
+                        return False
+            result = _to_wire(result)
+        except Exception as exc:
+            logger.exception("Model host call failed: %s", method)
+            self.server.record(method, ok=False)
+            return self._send({"ok": False, "error": {"type": type(exc).__name__, "message": str(exc)}})
+        self.server.record(method, ok=True)
+        return self._send({"ok": True, "result": result})
+
+
+def build_services(cfg: Mapping[str, Any], startup: Optional[StartupTracker] = None) -> Dict[str, Any]:
+    """Load and warm up the models an API worker would otherwise load in-process."""
+    from services.generation import build_generation_provider
+    from services.nlu_classifier import NLUClassifier
+    from services.yolo import YOLOService
+
+    startup = startup or StartupTracker()
+    loaded = startup.load(
+        {
+            "nlu": lambda: NLUClassifier(dict(cfg)),
+            "generation": lambda: build_generation_provider(cfg),
+            "yolo": lambda: YOLOService(dict(cfg)),
+        },
+        max_workers=int(cfg.get("STARTUP_MAX_WORKERS", 4)),
+        warmup=bool(cfg.get("STARTUP_WARMUP_ENABLED", True)),
+    )
+    return {name: service for name, service in loaded.items() if service is not None}
@@ -2,7 +2,6 @@
 from __future__ import annotations
 import time
 import numpy as np
-import onnxruntime as ort
 from typing import Tuple, List, Dict, Any
 
 try:
@@ -15,6 +14,8 @@ except Exception:
     AutoConfig = None
 
 from schemas.pipeline import IntentResult, intent_result_from_prediction
+from services.micro_batcher import MicroBatcher, build_micro_batcher, length_bucket
+from services.runtime_resources import SessionPool, get_resource_manager
 
 _CANONICAL = {"open_camera", "close_camera", "take_photo", "object_detect", "chat"}
 
@@ -41,12 +42,26 @@ class NLUClassifier:
     MiniLM-L6 intent sınıflandırıcı (ONNX) + HF tokenizer/config.
     CLS_ONNX, CLS_TOKENIZER_DIR, CLS_MAX_LEN .env'den okunur.
     """
+    _batcher: MicroBatcher | None = None
+
     def __init__(self, cfg: dict):
         self.model_path   = cfg.get("CLS_ONNX", "assets/models/nlu/intent-minilm-int8.onnx")
         self.tok_dir      = cfg.get("CLS_TOKENIZER_DIR", "assets/models/nlu/tokenizer")
         self.max_len      = int(cfg.get("CLS_MAX_LEN", 64))
-
-        self._sess: ort.InferenceSession | None = None
+        self._resources   = get_resource_manager(cfg)
+        # concurrent classify_intent calls share forward passes (CLS_BATCHING_ENABLED)
+        self._batcher = build_micro_batcher(
+            cfg,
+            "CLS",
+            "nlu",
+            self._run_micro_batch,
+            max_batch_size=16,
+            max_wait_ms=2.0,
+            bucket_key=lambda enc: length_bucket(len(enc["input_ids"])),
+            workers=self._resources.budgets["nlu"].replicas,
+        )
+
+        self._sess: SessionPool | None = None
         self._tok  = None
         self._labels: List[str] | None = None
         self._required_inputs: List[str] | None = None
@@ -54,9 +69,9 @@ class NLUClassifier:
 
     # --- Lazy loaders ---
     @property
-    def session(self) -> ort.InferenceSession:
+    def session(self) -> SessionPool:
         if self._sess is None:
-            self._sess = ort.InferenceSession(self.model_path, providers=["CPUExecutionProvider"])
+            self._sess = self._resources.session_pool("nlu", self.model_path)
             self._required_inputs = [i.name for i in self._sess.get_inputs()]
         return self._sess
 
@@ -85,82 +100,120 @@ class NLUClassifier:
         return self._labels
 
     # --- Core ---
+    def _encode(self, text: str) -> Dict[str, np.ndarray]:
+        """Tokenize one text into 1-D int64 arrays for the model's required inputs."""
+        required = self._required_inputs or []
+        enc = self.tokenizer([text], truncation=True, max_length=self.max_len, return_tensors="np")
+        # Model 'token_type_ids' istiyorsa ve tokenizer üretmediyse sıfırlarla ekle
+        if "token_type_ids" in required and "token_type_ids" not in enc:
+            enc["token_type_ids"] = np.zeros_like(enc["input_ids"])
+        return {name: np.asarray(enc[name][0], dtype=np.int64) for name in required}
+
+    def _probs_batch(self, encodings: List[Dict[str, np.ndarray]]) -> np.ndarray:
+        """Right-pad the encodings to the longest one, run one forward pass, return (B, num_labels) probabilities."""
+        sess = self.session
+        length = max(len(e["input_ids"]) for e in encodings)
+        pad_id = int(getattr(self._tok, "pad_token_id", None) or 0)
+        feed: Dict[str, Any] = {}
+        for name in self._required_inputs or []:
+            fill = pad_id if name == "input_ids" else 0
+            batch = np.full((len(encodings), length), fill, dtype=np.int64)
+            for row, enc in enumerate(encodings):
+                batch[row, : len(enc[name])] = enc[name]
+            feed[name] = batch
+
+        outputs = sess.run(None, feed)
+        if not outputs:
+            raise RuntimeError("ONNX çıktı listesi boş.")
+        return _softmax(outputs[0])  # (B, num_labels)
+
+    def _result_from_probs(
+        self,
+        probs: np.ndarray,
+        threshold: float | None,
+        started: float,
+        queue_wait_ms: int | None = None,
+    ) -> IntentResult:
+        idx = int(np.argmax(probs))
+        score = float(probs[idx])
+
+        raw_label = self.labels[idx] if 0 <= idx < len(self.labels) else "chat"
+        canon = _normalize_label(raw_label)
+        # Beklenen 5 etiketten biri değilse güvenli varsayılanı 'chat' yap
+        if canon not in _CANONICAL:
+            canon = "chat"
+
+        raw_scores: Dict[str, float] = {}
+        for label_index, probability in enumerate(probs):
+            label = self.labels[label_index] if 0 <= label_index < len(self.labels) else "chat"
+            normalized = _normalize_label(label)
+            if normalized not in _CANONICAL:
+                normalized = "chat"
+            raw_scores[normalized] = max(raw_scores.get(normalized, 0.0), float(probability))
+
+        return intent_result_from_prediction(
+            label=canon,
+            confidence=score,
+            threshold=threshold,
+            raw_scores=raw_scores,
+            latency_ms=_elapsed_ms(started),
+            queue_wait_ms=queue_wait_ms,
+        )
+
+    def _error_result(self, threshold: float | None, started: float) -> IntentResult:
+        return intent_result_from_prediction(
+            label="chat",
+            confidence=0.0,
+            threshold=threshold,
+            raw_scores=None,
+            latency_ms=_elapsed_ms(started),
+            error=self.last_error,
+        )
+
+    def _run_micro_batch(self, encodings: List[Dict[str, np.ndarray]]) -> List[np.ndarray]:
+        return list(self._probs_batch(encodings))
+
     def classify_intent(self, text: str, threshold: float | None = None) -> IntentResult:
         """
         Metin -> IntentResult.
 
         Bu katman sadece sınıflandırma yapar; T5/RAG/YOLO/kamera/e-posta gibi
-        yan etkili servisleri çağırmaz.
+        yan etkili servisleri çağırmaz. CLS_BATCHING_ENABLED iken eşzamanlı
+        çağrılar tek bir ONNX çalıştırmasında birleşir; kuyrukta bekleme
+        süresi queue_wait_ms alanına yazılır.
         """
         started = time.perf_counter()
         self.last_error = None
         try:
-            # ORT ve giriş isimleri hazırla
-            sess = self.session
-            required = self._required_inputs or []
-
-            # Tokenize (np tensörler ile)
-            enc = self.tokenizer(
-                [text],
-                padding=True,
-                truncation=True,
-                max_length=self.max_len,
-                return_tensors="np",
-            )
-
-            # Model 'token_type_ids' istiyorsa ve tokenizer üretmediyse sıfırlarla ekle
-            if "token_type_ids" in required and "token_type_ids" not in enc:
-                enc["token_type_ids"] = np.zeros_like(enc["input_ids"])
-
-            # Sadece gereksinilen girişleri, doğru dtype (int64) ile besle
-            feed: Dict[str, Any] = {}
-            for name in required:
-                arr = enc[name]
-                if arr.dtype != np.int64:
-                    arr = arr.astype(np.int64)
-                feed[name] = arr
-
-            # Çalıştır
-            outputs = sess.run(None, feed)
-            if not outputs:
-                raise RuntimeError("ONNX çıktı listesi boş.")
-            logits = outputs[0]  # (1, num_labels)
-            probs = _softmax(logits)
-            idx = int(np.argmax(probs, axis=-1)[0])
-            score = float(probs[0, idx])
-
-            raw_label = self.labels[idx] if 0 <= idx < len(self.labels) else "chat"
-            canon = _normalize_label(raw_label)
-            # Beklenen 5 etiketten biri değilse güvenli varsayılanı 'chat' yap
-            if canon not in _CANONICAL:
-                canon = "chat"
-
-            raw_scores: Dict[str, float] = {}
-            for label_index, probability in enumerate(probs[0]):
-                label = self.labels[label_index] if 0 <= label_index < len(self.labels) else "chat"
-                normalized = _normalize_label(label)
-                if normalized not in _CANONICAL:
-                    normalized = "chat"
-                raw_scores[normalized] = max(raw_scores.get(normalized, 0.0), float(probability))
-
-            return intent_result_from_prediction(
-                label=canon,
-                confidence=score,
-                threshold=threshold,
-                raw_scores=raw_scores,
-                latency_ms=_elapsed_ms(started),
-            )
+            self.session  # ORT ve giriş isimleri hazırla
+            encoding = self._encode(text)
+            if self._batcher is not None:
+                probs, queue_wait_ms = self._batcher.call(encoding)
+                return self._result_from_probs(probs, threshold, started, queue_wait_ms)
+            return self._result_from_probs(self._probs_batch([encoding])[0], threshold, started)
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            return self._error_result(threshold, started)
 
+    def classify_intent_batch(self, texts: List[str], threshold: float | None = None) -> List[IntentResult]:
+        """Classify several texts in one forward pass (padded to the longest)."""
+        started = time.perf_counter()
+        self.last_error = None
+        if not texts:
+            return []
+        try:
+            self.session
+            probs = self._probs_batch([self._encode(text) for text in texts])
+            return [self._result_from_probs(row, threshold, started) for row in probs]
         except Exception as e:
             self.last_error = f"{type(e).__name__}: {e}"
-            return intent_result_from_prediction(
-                label="chat",
-                confidence=0.0,
-                threshold=threshold,
-                raw_scores=None,
-                latency_ms=_elapsed_ms(started),
-                error=self.last_error,
-            )
+            return [self._error_result(threshold, started) for _ in texts]
+
+    def warmup(self) -> None:
+        """Load the tokenizer/session and run one classification; raises if it failed."""
+        self.classify_intent("hello")
+        if self.last_error:
+            raise RuntimeError(self.last_error)
 
     def predict(self, text: str) -> Tuple[str, float]:
         """
@@ -0,0 +1,150 @@
+# app/services/ort_graph_cache.py
+from __future__ import annotations
+import hashlib
+import logging
+import os
+import platform
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Tuple
+
+import onnxruntime as ort
+
+logger = logging.getLogger(__name__)
+
+_HASH_CHUNK = 1 << 20
+
+
+def _elapsed_ms(start: float) -> int:
+    return int((time.perf_counter() - start) * 1000)
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class OptimizedGraphCache:
+    """
+    On-disk cache of ORT-optimized ONNX graphs.
+
+    The first session for a model runs the configured graph optimizations
+    and has ORT write the result next to the cache key
+    (`SessionOptions.optimized_model_filepath`); later sessions, in this
+    process or after a restart, load that file with optimizations disabled.
+    The key covers the model file's SHA-256, the ORT version, the
+    optimization level and the CPU architecture, so a changed model or an
+    ORT upgrade misses and replaces the old entry for that model.
+    """
+
+    def __init__(self, cache_dir: str | os.PathLike[str], enabled: bool = True) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.enabled = bool(enabled)
+        self._lock = threading.Lock()
+        self._hashes: Dict[Tuple[str, int, int], str] = {}
+        self._entries: Dict[str, Dict[str, Any]] = {}
+
+    # ---------- keys ----------
+    def _model_hash(self, path: str) -> str:
+        st = os.stat(path)
+        memo = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+        with self._lock:
+            cached = self._hashes.get(memo)
+        if cached is None:
+            cached = _file_sha256(path)
+            with self._lock:
+                self._hashes[memo] = cached
+        return cached
+
+    def key(self, path: str, level: Any) -> str:
+        parts = (
+            self._model_hash(path),
+            str(getattr(ort, "__version__", "unknown")),
+            str(level),
+            platform.machine(),
+        )
+        return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:20]
+
+    def cache_path(self, path: str, key: str) -> Path:
+        return self.cache_dir / f"{Path(path).stem}.{key}.ort.onnx"
+
+    def _drop_stale(self, path: str, keep: Path) -> None:
+        for old in self.cache_dir.glob(f"{Path(path).stem}.*.ort.onnx"):
+            if old != keep:
+                try:
+                    old.unlink()
+                    logger.info("Removed stale optimized graph %s", old.name)
+                except OSError:
+                    pass
+
+    # ---------- sessions ----------
+    def create_session(
+        self,
+        name: str,
+        path: str,
+        options: ort.SessionOptions,
+        factory: Callable[[str, ort.SessionOptions], Any],
+    ) -> Any:
+        """Build one session through `factory`, loading or filling the cache."""
+        if not self.enabled:
+            return factory(path, options)
+
+        started = time.perf_counter()
+        level = options.graph_optimization_level
+        try:
+            key = self.key(path, level)
+        except OSError as exc:
+            # model missing/unreadable: let the factory raise its usual error
+            self._record(name, status="error", error=str(exc))
+            return factory(path, options)
+        cached = self.cache_path(path, key)
+
+        if cached.is_file():
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+            try:
+                session = factory(str(cached), options)
+                self._record(name, status="hit", load_ms=_elapsed_ms(started), file=cached.name)
+                return session
+            except Exception as exc:
+                logger.warning("Cached optimized graph %s failed to load (%s); rebuilding", cached.name, exc)
+                try:
+                    cached.unlink()
+                except OSError:
+                    pass
+                options.graph_optimization_level = level
+
+        tmp = cached.with_name(f"{cached.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            options.optimized_model_filepath = str(tmp)
+        except OSError as exc:
+            logger.warning("ORT graph cache directory unusable (%s); optimizing in memory", exc)
+            self._record(name, status="error", error=str(exc))
+            return factory(path, options)
+
+        session = factory(path, options)
+        status = "miss"
+        try:
+            os.replace(tmp, cached)  # atomic: concurrent workers never see a partial file
+            self._drop_stale(path, cached)
+        except OSError as exc:
+            status = "error"
+            logger.warning("Could not store optimized graph for %s: %s", name, exc)
+        self._record(name, status=status, load_ms=_elapsed_ms(started), file=cached.name)
+        return session
+
+    def _record(self, name: str, **entry: Any) -> None:
+        with self._lock:
+            current = self._entries.setdefault(name, {"hits": 0, "misses": 0, "errors": 0})
+            counter = {"hit": "hits", "miss": "misses"}.get(entry["status"], "errors")
+            current[counter] += 1
+            current.update(entry)
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = {name: dict(entry) for name, entry in self._entries.items()}
+        return {"enabled": self.enabled, "dir": str(self.cache_dir), "sessions": entries}
@@ -3,7 +3,7 @@ from __future__ import annotations
 import logging
 import time
 from collections import Counter
-from typing import Any, Mapping
+from typing import Any, Iterator, Mapping
 
 from schemas.pipeline import (
     ClientAction,
@@ -23,7 +23,7 @@ from schemas.pipeline import (
     retrieval_result_from_legacy,
 )
 from services.route_decision import CAMERA_ACTIONS, DEFAULT_INTENT_THRESHOLD, decide_route, normalize_intent_label
-from services.generation.base import BaseGenerationProvider
+from services.generation.base import BaseGenerationProvider, seed_kwargs
 from utils.text import fallback_instruction
 
 logger = logging.getLogger(__name__)
@@ -40,6 +40,16 @@ def _metadata_bool(metadata: Mapping[str, Any], key: str, default: bool = False)
     return bool(value)
 
 
+def _metadata_seed(metadata: Mapping[str, Any]) -> int | None:
+    value = metadata.get("seed")
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
 def _detection_summary(detection: DetectionResult) -> str:
     labels = [obj.label for obj in detection.objects]
     return ", ".join(f"{count} {label}" for label, count in Counter(labels).items()) if labels else "no objects"
@@ -76,7 +86,6 @@ class PipelineOrchestrator:
     ) -> RunResult:
         started = time.perf_counter()
         warnings: list[str] = []
-        errors: list[str] = []
         text = (input_text or "").strip()
         request_options = self._request_options(metadata)
 
@@ -97,22 +106,87 @@ class PipelineOrchestrator:
             result = self._execute_route(text, route, intent, request_options, image_bgr, warnings)
         except Exception:
             logger.exception("Pipeline route failed: %s", route.route)
-            errors.append(f"{route.route} service failed")
-            return RunResult(
-                input_text=text,
+            return self._route_failed(text, route, intent, request_options, warnings, started)
+
+        return self._finalize(result, request_options, warnings, started)
+
+    def run_stream(
+        self,
+        input_text: str,
+        metadata: Mapping[str, Any] | None = None,
+        image_bgr: Any | None = None,
+    ) -> Iterator[tuple[str, Any]]:
+        """
+        Streaming variant of run(). Yields (event, payload) pairs: "intent",
+        "route" and, for RAG, "retrieval" as soon as they are known, then
+        "token" deltas ({"text": ...}) while the answer is generated, and a
+        closing "result" event carrying the same RunResult run() would return.
+        Routes without generated text only emit the closing result.
+        """
+        started = time.perf_counter()
+        warnings: list[str] = []
+        text = (input_text or "").strip()
+        request_options = self._request_options(metadata)
+
+        if not text:
+            yield "result", RunResult(
+                input_text=input_text or "",
                 status="failed",
-                intent=intent,
-                route=route,
-                errors=errors,
+                errors=["message must not be empty"],
                 warnings=warnings,
                 metadata=request_options,
                 duration_ms=_elapsed_ms(started),
             )
+            return
+
+        intent = self._predict_intent(text, warnings)
+        yield "intent", intent
+        route = self._decide_route(text, intent, request_options, image_bgr)
+        yield "route", route
+
+        try:
+            if route.route == "chat":
+                result = yield from self._stream_chat(text, route, intent, seed=request_options.get("seed"))
+            elif route.route == "rag":
+                result = yield from self._stream_rag(text, route, intent, request_options)
+            else:
+                result = self._execute_route(text, route, intent, request_options, image_bgr, warnings)
+        except Exception:
+            logger.exception("Pipeline route failed: %s", route.route)
+            yield "result", self._route_failed(text, route, intent, request_options, warnings, started)
+            return
+
+        yield "result", self._finalize(result, request_options, warnings, started)
+
+    def _route_failed(
+        self,
+        text: str,
+        route: RouteDecision,
+        intent: IntentResult,
+        request_options: dict[str, Any],
+        warnings: list[str],
+        started: float,
+    ) -> RunResult:
+        return RunResult(
+            input_text=text,
+            status="failed",
+            intent=intent,
+            route=route,
+            errors=[f"{route.route} service failed"],
+            warnings=warnings,
+            metadata=request_options,
+            duration_ms=_elapsed_ms(started),
+        )
 
+    def _finalize(
+        self,
+        result: RunResult,
+        request_options: dict[str, Any],
+        warnings: list[str],
+        started: float,
+    ) -> RunResult:
         result.duration_ms = _elapsed_ms(started)
         result.metadata = request_options
-        if errors:
-            result.errors.extend(errors)
         for warning in warnings:
             if warning not in result.warnings:
                 result.warnings.append(warning)
@@ -124,7 +198,11 @@ class PipelineOrchestrator:
         metadata = metadata or {}
         use_internet = _metadata_bool(metadata, "use_internet", False)
         web_only = _metadata_bool(metadata, "web_only", False)
-        return {"use_internet": use_internet, "web_only": web_only}
+        options: dict[str, Any] = {"use_internet": use_internet, "web_only": web_only}
+        seed = _metadata_seed(metadata)
+        if seed is not None:
+            options["seed"] = seed
+        return options
 
     def _predict_intent(self, text: str, warnings: list[str]) -> IntentResult:
         started = time.perf_counter()
@@ -189,7 +267,7 @@ class PipelineOrchestrator:
         if route.route == "detect":
             return self._run_detection(text, route, intent, image_bgr, warnings)
         if route.route == "chat":
-            return self._run_chat(text, route, intent)
+            return self._run_chat(text, route, intent, seed=request_options.get("seed"))
         return self._run_rag(text, route, intent, request_options)
 
     def _run_client_action(self, text: str, route: RouteDecision, intent: IntentResult) -> RunResult:
@@ -289,10 +367,16 @@ class PipelineOrchestrator:
             warnings=warnings,
         )
 
-    def _run_chat(self, text: str, route: RouteDecision, intent: IntentResult) -> RunResult:
+    def _run_chat(
+        self,
+        text: str,
+        route: RouteDecision,
+        intent: IntentResult,
+        seed: int | None = None,
+    ) -> RunResult:
         if hasattr(self.t5, "chat_structured"):
-            generation = self.t5.chat_structured(text)
-            answer = generation.text
+            # the sampling seed is only forwarded when the request set one
+            generation = self.t5.chat_structured(text, **seed_kwargs(seed))
         else:
             started = time.perf_counter()
             answer = self.t5.chat(text)
@@ -307,15 +391,42 @@ class PipelineOrchestrator:
                 latency_ms=_elapsed_ms(started),
             )
 
+        return self._chat_result(text, route, intent, generation)
+
+    def _chat_result(
+        self,
+        text: str,
+        route: RouteDecision,
+        intent: IntentResult,
+        generation: GenerationResult,
+    ) -> RunResult:
         return RunResult(
             input_text=text,
-            final_answer=answer,
+            final_answer=generation.text,
             status="degraded" if generation.fallback_used else "completed",
             intent=intent,
             route=route,
             generation=generation,
         )
 
+    def _stream_chat(self, text: str, route: RouteDecision, intent: IntentResult, seed: int | None = None):
+        if not hasattr(self.t5, "chat_stream"):
+            return self._run_chat(text, route, intent, seed=seed)
+        generation = yield from self._stream_generation(self.t5.chat_stream(text, **seed_kwargs(seed)))
+        return self._chat_result(text, route, intent, generation)
+
+    def _stream_generation(self, stream: Iterator[Any]):
+        """Forward provider text deltas as "token" events; return the final GenerationResult."""
+        generation: GenerationResult | None = None
+        for item in stream:
+            if isinstance(item, GenerationResult):
+                generation = item
+            elif item:
+                yield "token", {"text": str(item)}
+        if generation is None:
+            raise RuntimeError("generation stream ended without a result")
+        return generation
+
     def _run_rag(
         self,
         text: str,
@@ -323,6 +434,37 @@ class PipelineOrchestrator:
         intent: IntentResult,
         request_options: Mapping[str, Any],
     ) -> RunResult:
+        retrieval, contexts = self._retrieve_for_rag(text, intent, request_options)
+        generation = self._generate_rag_answer(text, contexts)
+        return self._rag_result(text, route, intent, retrieval, generation, contexts)
+
+    def _stream_rag(
+        self,
+        text: str,
+        route: RouteDecision,
+        intent: IntentResult,
+        request_options: Mapping[str, Any],
+    ):
+        retrieval, contexts = self._retrieve_for_rag(text, intent, request_options)
+        yield "retrieval", retrieval
+        if contexts and hasattr(self.t5, "answer_stream"):
+            stream = self.t5.answer_stream(text, contexts)
+        elif not contexts and hasattr(self.t5, "answer_model_only_with_instruction_stream"):
+            stream = self.t5.answer_model_only_with_instruction_stream(text, instruction=fallback_instruction())
+        else:
+            stream = None
+        if stream is None:
+            generation = self._generate_rag_answer(text, contexts)
+        else:
+            generation = yield from self._stream_generation(stream)
+        return self._rag_result(text, route, intent, retrieval, generation, contexts)
+
+    def _retrieve_for_rag(
+        self,
+        text: str,
+        intent: IntentResult,
+        request_options: Mapping[str, Any],
+    ) -> tuple[RetrievalResult, list[str]]:
         use_internet = bool(request_options["use_internet"])
         web_only = bool(request_options["web_only"] or (intent.label == "chat" and use_internet))
 
@@ -369,11 +511,13 @@ class PipelineOrchestrator:
                 latency_ms=_elapsed_ms(retrieval_started),
             )
 
+        return retrieval, contexts
+
+    def _generate_rag_answer(self, text: str, contexts: list[str]) -> GenerationResult:
         generation_started = time.perf_counter()
         if contexts:
             if hasattr(self.t5, "answer_structured"):
                 generation = self.t5.answer_structured(text, contexts)
-                answer = generation.text
             else:
                 answer = self.t5.answer(text, contexts)
                 generation = generation_result_from_text(
@@ -386,15 +530,12 @@ class PipelineOrchestrator:
                     max_new_tokens=getattr(self.t5, "max_new_rag", None),
                     latency_ms=_elapsed_ms(generation_started),
                 )
-            fallback_used = False
-            fallback_reason = None
         else:
             if hasattr(self.t5, "answer_model_only_with_instruction_structured"):
                 generation = self.t5.answer_model_only_with_instruction_structured(
                     text,
                     instruction=fallback_instruction(),
                 )
-                answer = generation.text
             else:
                 answer = self.t5.answer_model_only_with_instruction(text, instruction=fallback_instruction())
                 generation = generation_result_from_text(
@@ -407,18 +548,28 @@ class PipelineOrchestrator:
                     max_new_tokens=getattr(self.t5, "max_new_chat", None),
                     latency_ms=_elapsed_ms(generation_started),
                 )
-            fallback_used = True
-            fallback_reason = "no_retrieval_context"
 
+        return generation
+
+    def _rag_result(
+        self,
+        text: str,
+        route: RouteDecision,
+        intent: IntentResult,
+        retrieval: RetrievalResult,
+        generation: GenerationResult,
+        contexts: list[str],
+    ) -> RunResult:
+        fallback_used = not contexts
         if fallback_used and not generation.fallback_used:
             generation.fallback_used = True
-            generation.fallback_reason = fallback_reason
+            generation.fallback_reason = "no_retrieval_context"
 
         status = "degraded" if route.fallback_used or fallback_used or generation.fallback_used else "completed"
 
         return RunResult(
             input_text=text,
-            final_answer=answer,
+            final_answer=generation.text,
             status=status,
             intent=intent,
             route=route,
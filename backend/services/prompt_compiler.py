@@ -0,0 +1,119 @@
+# app/services/prompt_compiler.py
+from __future__ import annotations
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Probe appended to a prefix to check that splitting there does not change tokenization.
+_SPLIT_PROBE = " Hello world, 42 times."
+
+
+@dataclass
+class CompiledPrompt:
+    input_ids: np.ndarray          # (1,T) int64, already truncated to max_src_len
+    attention_mask: np.ndarray     # (1,T) int64
+    full_tokens: int               # untruncated length (incl. EOS)
+    prefix_hit: bool = False       # a precompiled instruction prefix was reused
+
+    @property
+    def truncated(self) -> bool:
+        return self.full_tokens > self.input_ids.shape[1]
+
+
+class PromptCompiler:
+    """
+    Encoder inputs for T5 prompts in a single tokenizer pass.
+
+    Instruction templates never change, so their token ids are computed once
+    (`register`). A prompt that starts with a registered prefix only has its
+    variable tail (user text, context, question) tokenized; the ids are
+    concatenated, and the untruncated count comes from the same pass. Other
+    prompts are tokenized once untruncated and cut to `max_src_len` here,
+    the same way the tokenizer truncates (keep the head, end with EOS).
+
+    Prefixes are split on a whitespace boundary, where SentencePiece
+    tokenization is independent on both sides; `register` verifies that on a
+    probe string and rejects prefixes that do not split cleanly.
+    """
+
+    def __init__(self, tokenizer: Any, *, max_src_len: int, eos_token_id: int) -> None:
+        self.tok = tokenizer
+        self.max_src_len = max(1, int(max_src_len))
+        self.eos_token_id = int(eos_token_id)
+        self._prefixes: List[Tuple[str, List[int]]] = []
+        self._lock = threading.Lock()
+
+    # ---------- setup ----------
+    def register(self, prefix: str) -> bool:
+        """Precompile the token ids of a static prompt prefix. Returns False if rejected."""
+        prefix = (prefix or "").rstrip()
+        if not prefix:
+            return False
+        try:
+            ids = self._encode(prefix)
+            if self._encode(prefix + _SPLIT_PROBE) != ids + self._encode(_SPLIT_PROBE):
+                logger.debug("Prompt prefix does not split cleanly; not precompiled: %r", prefix[:40])
+                return False
+        except Exception:
+            logger.warning("Prompt prefix tokenization failed; not precompiled.", exc_info=True)
+            return False
+        with self._lock:
+            self._prefixes = [p for p in self._prefixes if p[0] != prefix]
+            self._prefixes.append((prefix, ids))
+            self._prefixes.sort(key=lambda item: len(item[0]), reverse=True)  # longest match first
+        return True
+
+    def register_template(self, prompt: str, marker: str) -> bool:
+        """Register the static part of a template rendered with `marker` in its variable slot."""
+        head = prompt.split(marker, 1)[0] if marker else prompt
+        return self.register(head)
+
+    @property
+    def prefix_count(self) -> int:
+        return len(self._prefixes)
+
+    # ---------- per request ----------
+    def compile(self, prompt: str) -> CompiledPrompt:
+        ids: Optional[List[int]] = None
+        prefix_hit = False
+        for prefix, prefix_ids in self._prefixes:
+            if not prompt.startswith(prefix):
+                continue
+            tail = prompt[len(prefix):]
+            if tail and not tail[0].isspace():
+                continue  # prefix ends inside a word
+            ids = prefix_ids + (self._encode(tail) if tail.strip() else [])
+            ids.append(self.eos_token_id)
+            prefix_hit = True
+            break
+
+        if ids is None:
+            ids = self._encode_with_eos(prompt)
+
+        full_tokens = len(ids)
+        if full_tokens > self.max_src_len:
+            ids = ids[: self.max_src_len - 1] + [self.eos_token_id]
+        input_ids = np.asarray([ids], dtype=np.int64)
+        return CompiledPrompt(
+            input_ids=input_ids,
+            attention_mask=np.ones_like(input_ids),
+            full_tokens=full_tokens,
+            prefix_hit=prefix_hit,
+        )
+
+    # ---------- tokenizer ----------
+    def _encode_with_eos(self, text: str) -> List[int]:
+        enc = self.tok([text], padding=False, truncation=False, return_attention_mask=False)
+        return [int(i) for i in enc["input_ids"][0]]
+
+    def _encode(self, text: str) -> List[int]:
+        """Token ids of `text` without the trailing EOS the tokenizer appends."""
+        ids = self._encode_with_eos(text)
+        if ids and ids[-1] == self.eos_token_id:
+            ids = ids[:-1]
+        return ids
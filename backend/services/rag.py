@@ -5,9 +5,10 @@ from typing import List, Dict, Any
 
 # Backend (defterden taşıdığın kodların modüler hali)
 # Aşağıdaki importlar, app/services/rag_backend/ altına koyduğun dosyalardan gelmelidir.
-from services.rag_backend.search import hybrid_search
+from services.rag_backend.search import hybrid_search, retrieval_cache_stats
 from services.rag_backend.prompt import create_context
 from services.rag_backend.websearch import process_web_results
+from services.rag_backend.fanout import BranchOutcome, skipped_branch, start_branch
 from services.rag_backend import TOP_K as BACKEND_TOP_K, RAG_MAX_CTX_TOKENS as BACKEND_MAX_CTX_TOKENS # __init__.py dosyasından alıyor.
 
 from config import CFG
@@ -45,7 +46,8 @@ def build_context_from_chunks(
     context string üretir.  Evidence chunk'ları korunurken context string
     ayrıca üretilir.
     """
-    raw = [{"chunk": c.text} for c in chunks]
+    # metadata: index-time token_count ile create_context yeniden tokenize etmez
+    raw = [{"chunk": c.text, "metadata": c.metadata} for c in chunks]
     context = create_context(raw, max_tokens=max_tokens, question=question)
     if context.strip():
         return context
@@ -110,7 +112,70 @@ class RAGService:
         self.top_k: int = int(cfg.get("RAG_TOP_K", BACKEND_TOP_K))
         # Context token limiti (backend prompt.create_context ile uyumlu)
         self.max_ctx_tokens: int = int(cfg.get("RAG_MAX_CTX_TOKENS", BACKEND_MAX_CTX_TOKENS))
+        # Web dalının zaman aşımı (saniye, 0 = sınırsız)
+        self.web_timeout_s: float = float(cfg.get("RAG_WEB_TIMEOUT_SECONDS", 15.0))
 
+    def warmup(self) -> None:
+        """One local search (embedder, Chroma, FTS5) and one context build (tokenizer)."""
+        retrieved = hybrid_search("warmup", top_k=1)
+        create_context(retrieved or [{"chunk": "warmup"}], max_tokens=self.max_ctx_tokens, question="warmup")
+
+    # ------------------------------------------------------------------
+    # Fan-out: lokal (vector + BM25) ve web dalları aynı anda
+    # ------------------------------------------------------------------
+
+    def _local_search(self, question: str, timings: Dict[str, Any], deferred: bool = False) -> List[Dict[str, Any]]:
+        started = time.perf_counter()
+        retrieved = hybrid_search(question, top_k=self.top_k, timings=timings)
+        timings["local"] = {
+            "status": "ok",
+            "latency_ms": int((time.perf_counter() - started) * 1000),
+            "count": len(retrieved),
+        }
+        if deferred:
+            timings["local"]["deferred"] = True
+        return retrieved
+
+    def _fan_out(
+        self,
+        question: str,
+        should_attempt_web: bool,
+        web_only: bool,
+    ) -> tuple[List[Dict[str, Any]] | None, BranchOutcome, Dict[str, Any]]:
+        """
+        Web dalını havuzda başlatır, lokal hibrit aramayı (kendi içinde vector
+        ve BM25 paralel) bu thread'de koşturur, sonra web'i kendi zaman
+        aşımıyla bekler. Toplam süre dalların toplamı değil en yavaşıdır.
+
+        web_only isteklerinde lokal dal başlatılmaz (retrieved=None döner);
+        çağıran, web kullanılamazsa onu yedek olarak sonradan çalıştırır.
+        """
+        timings: Dict[str, Any] = {}
+        web = (
+            start_branch("web", process_web_results, question, timeout_s=self.web_timeout_s)
+            if should_attempt_web
+            else None
+        )
+        retrieved = None
+        if not (web_only and web is not None):
+            retrieved = self._local_search(question, timings)
+        web_out = web.wait() if web is not None else skipped_branch("web")
+        timings["web"] = web_out.as_metadata()
+        return retrieved, web_out, timings
+
+    @staticmethod
+    def _branch_metadata(timings: Dict[str, Any]) -> Dict[str, Any]:
+        skipped = {"status": "skipped", "latency_ms": None}
+        metadata: Dict[str, Any] = {
+            "branches": {name: timings.get(name, skipped) for name in ("local", "vector", "bm25", "web")}
+        }
+        if "result_cache" in timings:
+            metadata["result_cache"] = timings["result_cache"]
+        return metadata
+
+    def cache_stats(self) -> Dict[str, Any] | None:
+        """Sorgu embedding'i / sonuç önbelleği sayaçları (readiness için)."""
+        return retrieval_cache_stats()
 
     def retrieve(self, question: str, use_internet: bool = False, web_only: bool = False):
         """
@@ -119,23 +184,19 @@ class RAGService:
         - best_score: lokal RAG top score (web-only’ken None olabilir).
         - sources: "local:<dosya>" ve/veya web URL başlıkları.
         """
-        # 1) Lokal hibrit arama (her zaman çalıştırıyoruz; gerekirse sadece score için)
-        retrieved = hybrid_search(question, top_k=self.top_k)  # [{'chunk','score','file_name'}, ...]
-        top_score = float(max((r.get("score", 0.0) for r in retrieved), default=0.0))
-        sources_local = [f"local:{r.get('file_name','unknown')}" for r in retrieved]
-
         should_attempt_web = bool((use_internet or web_only) and question.strip())
 
-        # 2) Web chunk'ları (gerekirse)
-        web_chunks = []
-        sources_web = []
-        if should_attempt_web:
-            try:
-                web_chunks = process_web_results(question) or []
-                sources_web = [c.get('source','') for c in web_chunks if c.get('source')]
-            except Exception:
-                web_chunks = []
-                sources_web = []
+        # 1-2) Lokal hibrit arama ve web chunk'ları (paralel; web hatası -> [])
+        retrieved, web_out, timings = self._fan_out(question, should_attempt_web, web_only)
+        web_chunks = (web_out.value or []) if web_out.ok else []
+        sources_web = [c.get('source','') for c in web_chunks if c.get('source')]
+        eligible_web = web_chunks if (web_chunks and _web_strength(web_chunks) >= RAG_WEB_MIN_STRENGTH) else []
+        if retrieved is None:
+            # web_only: lokal yalnızca web kullanılamıyorsa gerekli
+            retrieved = [] if eligible_web else self._local_search(question, timings, deferred=True)
+
+        top_score = float(max((r.get("score", 0.0) for r in retrieved), default=0.0))
+        sources_local = [f"local:{r.get('file_name','unknown')}" for r in retrieved]
 
         # 3) Yardımcı (chunks -> context metni)
         def ctx_from(items):
@@ -152,9 +213,6 @@ class RAGService:
         # --- YENİ: skor-bazlı web kapısı ---
         local_ok = bool(retrieved) and (top_score is not None) and (top_score >= self.thr)
 
-        ws = _web_strength(web_chunks) if web_chunks else 0.0
-        eligible_web = web_chunks if (ws >= RAG_WEB_MIN_STRENGTH) else []
-
         if web_only:
             # "web_only" istense bile zayıf web'i zorlamıyoruz
             if eligible_web:
@@ -230,34 +288,30 @@ class RAGService:
     ) -> RetrievalResult:
         """Core structured retrieval logic (called by retrieve_structured)."""
 
-        # 1) Lokal hibrit arama
-        retrieved = hybrid_search(question, top_k=self.top_k)
-        top_score = float(max((r.get("score", 0.0) for r in retrieved), default=0.0))
-
         should_attempt_web = bool((use_internet or web_only) and question.strip())
-        web_search_attempted = False
+
+        # 1-2) Lokal hibrit arama ve web chunk'ları aynı anda (fan-out)
+        retrieved, web_out, timings = self._fan_out(question, should_attempt_web, web_only)
+        web_search_attempted = should_attempt_web
         web_search_status: str | None = None
-        web_candidate_count = 0
         web_error_type: str | None = None
-
-        # 2) Web chunk'ları (gerekirse)
         raw_web: List[Dict[str, Any]] = []
-        if should_attempt_web:
-            web_search_attempted = True
-            try:
-                raw_web = process_web_results(question) or []
-                web_search_status = "success"
-                web_candidate_count = len(raw_web)
-            except Exception as exc:
-                web_search_status = "error"
-                web_error_type = type(exc).__name__
-                raw_web = []
-                web_candidate_count = 0
+        if web_out.ok:
+            raw_web = web_out.value or []
+            web_search_status = "success"
+        elif should_attempt_web:
+            web_search_status = "timeout" if web_out.status == "timeout" else "error"
+            web_error_type = web_out.error_type
+        web_candidate_count = len(raw_web)
 
         # 3) Skor kapısı
-        local_ok = bool(retrieved) and (top_score >= self.thr)
         ws = _web_strength(raw_web) if raw_web else 0.0
         eligible_web = raw_web if (ws >= RAG_WEB_MIN_STRENGTH) else []
+        if retrieved is None:
+            # web_only: lokal sonuçlar yalnızca web kullanılamazsa yedek olarak gerekir
+            retrieved = [] if eligible_web else self._local_search(question, timings, deferred=True)
+        top_score = float(max((r.get("score", 0.0) for r in retrieved), default=0.0))
+        local_ok = bool(retrieved) and (top_score >= self.thr)
 
         # 4) Karar ağacı — chunk mapping ve mode belirleme
         if not should_attempt_web:
@@ -325,8 +379,10 @@ class RAGService:
             fallback_used=fallback_used,
             fallback_reason=fallback_reason,
             latency_ms=elapsed,
+            queue_wait_ms=timings.get("embedding_queue_wait_ms"),
             web_search_attempted=web_search_attempted,
             web_search_status=web_search_status,
             web_candidate_count=web_candidate_count,
             web_error_type=web_error_type,
+            metadata=self._branch_metadata(timings),
         )
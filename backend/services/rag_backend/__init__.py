@@ -7,6 +7,10 @@ RAG_MAX_CTX_TOKENS = int(CFG.get("RAG_MAX_CTX_TOKENS", 512))
 VECTOR_WEIGHT = float(CFG.get("VECTOR_WEIGHT", 0.75))
 BM25_WEIGHT = float(CFG.get("BM25_WEIGHT", 0.25))
 
+# Paralel alt aramaların zaman aşımları (saniye, 0 = sınırsız)
+RAG_VECTOR_TIMEOUT_SECONDS = float(CFG.get("RAG_VECTOR_TIMEOUT_SECONDS", 10.0))
+RAG_BM25_TIMEOUT_SECONDS = float(CFG.get("RAG_BM25_TIMEOUT_SECONDS", 5.0))
+
 # Web parça yeterlilik eşiği (0..1). Öneri: 0.75
 RAG_WEB_MIN_STRENGTH = float(CFG.get("RAG_WEB_MIN_STRENGTH", 0.75))
 
@@ -0,0 +1,514 @@
+# app/services/rag_backend/bulk_indexer.py
+from __future__ import annotations
+import glob
+import hashlib
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .io_loader import SUPPORTED_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+# (path, size, mtime_ns): dosyanın indexlendiği andaki imzası
+FileSig = Tuple[str, int, int]
+
+
+@dataclass
+class BulkIndexStats:
+    docs: int = 0
+    chunks: int = 0
+    failed: int = 0
+    skipped: int = 0
+    removed: int = 0
+    seconds: float = 0.0
+
+    @property
+    def docs_per_s(self) -> float:
+        return self.docs / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def chunks_per_s(self) -> float:
+        return self.chunks / self.seconds if self.seconds > 0 else 0.0
+
+
+@dataclass
+class _WriteBatch:
+    ids: List[str]
+    embeddings: np.ndarray
+    texts: List[str]
+    metadatas: List[Dict[str, Any]]
+    token_rows: List[Tuple[str, List[int]]]
+    files: List[Dict[str, Any]]  # bu batch'le tamamlanan dosyaların manifest satırları
+
+
+def default_workers() -> int:
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+def default_embed_batch() -> int:
+    # embedder kendi içinde çok çekirdekli; batch'i çekirdek sayısıyla büyüt, belleği sınırla
+    return min(1024, 64 * max(1, os.cpu_count() or 1))
+
+
+def list_corpus_files(folder: str | Path) -> List[str]:
+    """load_documents_from_folder ile aynı dosya seçimi (özyinelemesiz), sıralı."""
+    return sorted(
+        path for path in glob.glob(os.path.join(str(folder), "*"))
+        if Path(path).suffix.lower() in SUPPORTED_EXTENSIONS and os.path.isfile(path)
+    )
+
+
+def file_signature(path: str) -> FileSig:
+    st = os.stat(path)
+    return str(Path(path).resolve()), int(st.st_size), int(st.st_mtime_ns)
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def corpus_document_id(path: str) -> str:
+    """Korpus dosyasının document_id'si yoldan türer: içerik değişince aynı belge yerinde değişir."""
+    return "corpus_" + hashlib.sha1(str(Path(path).resolve()).encode("utf-8")).hexdigest()[:16]
+
+
+def load_and_chunk(
+    path: str,
+    sha256: Optional[str] = None,
+) -> Tuple[str, List[Dict[str, Any]], Optional[str], Optional[str]]:
+    """
+    1. aşama (süreç havuzunda): içerik özeti + metin çıkarma + chunking.
+    Dönüş: (path, chunk'lar, hata, sha256). Hata çağırana metin olarak döner;
+    bir bozuk dosya havuzu durdurmaz.
+    """
+    from .io_loader import load_document_from_file
+    from .preprocess import preprocess_documents, preprocess_pdf
+
+    file_name = os.path.basename(path)
+    metadata = {"file_name": file_name, "document_id": corpus_document_id(path)}
+    try:
+        sha256 = sha256 or file_sha256(path)
+        if Path(path).suffix.lower() == ".pdf":
+            # sayfa sayfa; bu süreç zaten havuzda olduğundan sayfa aralıkları ayrıca paralelleşmez
+            chunks = list(preprocess_pdf(path, metadata, workers=0))
+        else:
+            chunks = preprocess_documents([load_document_from_file(path, metadata=metadata)])
+    except Exception as exc:
+        return path, [], f"{exc.__class__.__name__}: {exc}", sha256
+    for c in chunks:
+        # chunk_id'ler eski CLI'daki gibi dosya adından; document_id yalnızca silme/değiştirme için
+        c["chunk_id"] = f"{file_name}_chunk_{c.get('chunk_index', 0)}"
+    return path, chunks, None, sha256
+
+
+def _commit_batches(conn, sql_rows, token_rows, files) -> None:
+    from .fts_schema import bump_generation, mark_files_indexed, upsert_chunks, upsert_token_ids
+
+    upsert_chunks(conn, sql_rows)
+    if token_rows:
+        upsert_token_ids(conn, token_rows)
+    now = datetime.now(timezone.utc).isoformat()
+    mark_files_indexed(conn, [{**entry, "indexed_at": now} for entry in files])
+    bump_generation(conn)
+
+
+def _drop_stale(conn, stale, removed_paths, touched) -> None:
+    from .fts_schema import bump_generation, delete_document, forget_files, touch_files
+
+    for entry in stale:
+        delete_document(conn, entry["document_id"], entry["chunk_ids"] or [])
+    forget_files(conn, removed_paths)
+    touch_files(conn, touched)
+    if stale:
+        bump_generation(conn)
+
+
+class _Writer(threading.Thread):
+    """
+    3. aşama: tek yazar. Batch'leri `commit_every` chunk'a kadar biriktirir,
+    önce vektör deposuna ekler, sonra chunks + FTS5 + ilerleme kaydını tek
+    SQLite işleminde yazar. Dosya yalnızca chunk'ları yazıldıktan sonra
+    "tamamlandı" sayılır; kesintide en fazla son commit tekrar işlenir.
+    """
+
+    def __init__(self, indexer_mod: Any, commit_every: int, max_batches: int, store_token_ids: bool) -> None:
+        super().__init__(name="bulk-index-writer", daemon=True)
+        self.indexer = indexer_mod
+        self.commit_every = max(1, int(commit_every))
+        self.store_token_ids = store_token_ids
+        self.inbox: "queue.Queue[Optional[_WriteBatch]]" = queue.Queue(maxsize=max(1, int(max_batches)))
+        self.error: Optional[BaseException] = None
+        self.committed_docs = 0
+        self.committed_chunks = 0
+
+    def run(self) -> None:
+        pending: List[_WriteBatch] = []
+        try:
+            while True:
+                batch = self.inbox.get()
+                if batch is not None:
+                    pending.append(batch)
+                if batch is None or sum(len(b.ids) for b in pending) >= self.commit_every:
+                    self._commit(pending)
+                    pending = []
+                if batch is None:
+                    return
+        except BaseException as exc:  # ana thread kontrol eder ve durur
+            self.error = exc
+            while True:  # üreticiyi bloklamamak için kuyruğu boşalt
+                if self.inbox.get() is None:
+                    return
+
+    def _commit(self, batches: List[_WriteBatch]) -> None:
+        files = [f for b in batches for f in b.files]
+        if not batches or not files:
+            return
+        from .fts_schema import chunk_row
+
+        ids = [cid for b in batches for cid in b.ids]
+        if ids:
+            texts = [t for b in batches for t in b.texts]
+            metadatas = [m for b in batches for m in b.metadatas]
+            embeddings = np.concatenate([b.embeddings for b in batches if b.ids])
+            self.indexer.vector_store.add(ids, embeddings, texts, metadatas)
+            sql_rows = [chunk_row(cid, text, meta) for cid, text, meta in zip(ids, texts, metadatas)]
+        else:
+            sql_rows = []
+        token_rows = [r for b in batches for r in b.token_rows] if self.store_token_ids else []
+        self.indexer.store.write(_commit_batches, sql_rows, token_rows, files)
+        self.committed_docs += len(files)
+        self.committed_chunks += len(ids)
+
+
+def bulk_index(
+    paths: Sequence[str],
+    *,
+    indexer_mod: Any = None,
+    workers: int = 0,
+    embed_batch: int = 0,
+    commit_every: int = 2000,
+    max_inflight_docs: int = 0,
+    max_write_batches: int = 4,
+    resume: bool = True,
+    incremental: bool = False,
+    root: Optional[str | Path] = None,
+    report_every: float = 5.0,
+) -> BulkIndexStats:
+    """
+    Üç aşamalı toplu indexleme:
+      1) süreç havuzu: load_document_from_file + preprocess_documents
+         (`workers` = 0 -> aynı süreçte, sırayla),
+      2) ana thread: chunk'ları belge sınırlarında `embed_batch`'lik
+         parçalar halinde embedding'e sokar (chunk embedding önbelleği
+         açıksa yalnızca önbellekte olmayan metinler),
+      3) yazar thread'i: vektör deposu + SQLite'a büyük işlemlerle yazar.
+    Aşamalar arası sınırlar (uçuştaki belge sayısı, yazar kuyruğu) bellek
+    kullanımını korpus boyutundan bağımsız tutar. `resume` açıkken boyutu ve
+    mtime'ı değişmemiş, daha önce tamamlanmış dosyalar atlanır.
+
+    `incremental` manifest'e (indexed_files) göre senkronlar: boyutu/mtime'ı
+    değişen dosyanın sha256'sı aynıysa yalnızca imzası güncellenir; içeriği
+    ya da chunking ayarı değişen dosyanın eski chunk'ları silinip yeniden
+    indexlenir; manifest'te olup `root` klasöründe artık bulunmayan
+    dosyaların chunk'ları silinir.
+
+    `indexer_mod`: embedding modeli / depoları taşıyan indexer modülü
+    (`python -m ...indexer` ile çalışırken `__main__`; ikinci kez yüklenmesin).
+    """
+    from .fts_schema import load_manifest
+    from .preprocess import chunking_config_hash
+
+    indexer = indexer_mod or _indexer()
+
+    started = time.perf_counter()
+    stats = BulkIndexStats()
+    embed_batch = int(embed_batch) or default_embed_batch()
+    max_inflight_docs = int(max_inflight_docs) or max(2, 4 * max(1, int(workers)))
+
+    config_hash = chunking_config_hash()
+    manifest = load_manifest(indexer.store.reader()) if resume or incremental else {}
+    todo: List[Tuple[str, FileSig, Optional[str]]] = []
+    stale: List[Dict[str, Any]] = []  # eski chunk'ları yeniden yazılmadan önce silinecekler
+    touched: List[FileSig] = []
+    for path in paths:
+        sig = file_signature(path)
+        entry = manifest.get(sig[0])
+        if entry is None:
+            todo.append((path, sig, None))
+            continue
+        same_config = entry["config_hash"] == config_hash
+        if (entry["size"], entry["mtime_ns"]) == sig[1:] and (same_config or not incremental):
+            stats.skipped += 1
+            continue
+        if not incremental:
+            todo.append((path, sig, None))
+            continue
+        digest = None
+        if same_config and entry["sha256"] and entry["size"] == sig[1]:
+            try:
+                digest = file_sha256(path)
+            except OSError:
+                digest = None  # 1. aşama hatayı raporlar
+            if digest == entry["sha256"]:
+                touched.append(sig)  # yalnızca mtime değişmiş (kopyalama, checkout)
+                stats.skipped += 1
+                continue
+        stale.append(entry)
+        todo.append((path, sig, digest))
+
+    removed: List[Dict[str, Any]] = []
+    if incremental and root is not None:
+        folder, listed = Path(root).resolve(), {str(Path(p).resolve()) for p in paths}
+        removed = [e for p, e in manifest.items() if Path(p).parent == folder and p not in listed]
+    if stale or removed or touched:
+        _remove_vectors(indexer, stale + removed)
+        indexer.store.write(_drop_stale, stale + removed, [e["path"] for e in removed], touched)
+    stats.removed = len(removed)
+    if stats.skipped or stale or removed:
+        logger.info(
+            "Manifest: %s unchanged, %s changed, %s removed files.", stats.skipped, len(stale), len(removed)
+        )
+
+    # süreç havuzu, bu süreçte hiçbir yazar thread'i yokken fork edilir
+    pool = _start_process_pool(indexer, workers) if workers > 0 and todo else None
+    writer = _Writer(indexer, commit_every, max_write_batches, bool(indexer.STORE_TOKEN_IDS))
+    writer.start()
+
+    buffer: List[Tuple[str, str, Dict[str, Any], Optional[List[int]]]] = []
+    buffer_files: List[Dict[str, Any]] = []
+    last_report = started
+
+    def flush() -> None:
+        if not buffer_files:
+            return
+        ids = [cid for cid, _, _, _ in buffer]
+        texts = [text for _, text, _, _ in buffer]
+        cache = indexer.get_embedding_cache()
+        parts = [
+            cache.encode(indexer.embedding_model, texts[i:i + embed_batch]) if cache is not None
+            else np.asarray(indexer.embedding_model.encode(
+                texts[i:i + embed_batch], convert_to_numpy=True, show_progress_bar=False
+            ), dtype=np.float32)
+            for i in range(0, len(texts), embed_batch)
+        ]
+        batch = _WriteBatch(
+            ids=ids,
+            embeddings=np.concatenate(parts) if parts else np.zeros((0, 0), dtype=np.float32),
+            texts=texts,
+            metadatas=[meta for _, _, meta, _ in buffer],
+            token_rows=[(cid, tids) for cid, _, _, tids in buffer if tids],
+            files=list(buffer_files),
+        )
+        buffer.clear()
+        buffer_files.clear()
+        _put(writer, batch)
+
+    def consume(result: Tuple[str, List[Dict[str, Any]], Optional[str], Optional[str]], sig: FileSig) -> None:
+        nonlocal last_report
+        path, chunks, error, digest = result
+        if error is not None:
+            stats.failed += 1
+            logger.warning("Skipping %s: %s", path, error)
+            return
+        chunk_ids = []
+        for c in chunks:
+            chunk_id, text, _file_name, metadata = indexer._normalize_record(c)
+            buffer.append((chunk_id, text, metadata, c.get("token_ids")))
+            chunk_ids.append(chunk_id)
+        # dosyanın tüm chunk'ları tamponda: flush her zaman belge sınırında olur
+        buffer_files.append({
+            "path": sig[0], "size": sig[1], "mtime_ns": sig[2], "chunk_count": len(chunks),
+            "sha256": digest, "config_hash": config_hash,
+            "document_id": corpus_document_id(path), "chunk_ids": chunk_ids,
+        })
+        stats.docs += 1
+        stats.chunks += len(chunks)
+        if len(buffer) >= embed_batch:
+            flush()
+        now = time.perf_counter()
+        if report_every and now - last_report >= report_every:
+            last_report = now
+            _log_throughput(stats, now - started, len(todo))
+
+    try:
+        for result, sig in _stage_one(todo, pool, max_inflight_docs):
+            if writer.error is not None:
+                break
+            consume(result, sig)
+        if writer.error is None:
+            flush()
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+        _put(writer, None)
+        writer.join()
+    if writer.error is not None:
+        raise RuntimeError("bulk index writer failed") from writer.error
+
+    stats.seconds = time.perf_counter() - started
+    _log_throughput(stats, stats.seconds, len(todo))
+    return stats
+
+
+def _indexer() -> Any:
+    from . import indexer
+
+    return indexer
+
+
+def _remove_vectors(indexer: Any, entries: List[Dict[str, Any]]) -> None:
+    for entry in entries:
+        if not (entry["document_id"] or entry["chunk_ids"]):
+            continue  # v2 manifest satırı: aynı chunk_id'ler yeniden yazılınca üzerine yazılır
+        try:
+            indexer.vector_store.delete(ids=entry["chunk_ids"] or [], document_id=entry["document_id"])
+        except Exception as exc:
+            logger.warning("Could not delete vectors of %s: %s", entry["path"], exc)
+
+
+def _put(writer: _Writer, item: Optional[_WriteBatch]) -> None:
+    while writer.is_alive():
+        try:
+            writer.inbox.put(item, timeout=0.5)
+            return
+        except queue.Full:
+            continue
+
+
+def _log_throughput(stats: BulkIndexStats, seconds: float, total: int) -> None:
+    seconds = max(seconds, 1e-9)
+    logger.info(
+        "%s/%s docs, %s chunks | %.1f docs/s, %.1f chunks/s",
+        stats.docs + stats.failed, total, stats.chunks, stats.docs / seconds, stats.chunks / seconds,
+    )
+
+
+def _process_pool(workers: int) -> Executor:
+    # fork: çocuklar ağır modülleri yeniden import etmez (-m ile çalışan indexer __main__'i
+    # spawn'da her çocukta embedding modelini yeniden yüklerdi).
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+
+def _start_process_pool(indexer: Any, workers: int) -> Executor:
+    """
+    Havuzu kurar ve tüm çocuk süreçleri hemen başlatır. fork, çağıran
+    thread dışındaki thread'leri kopyalamaz; onların tuttuğu bir kilit
+    (SQLite yazarı, logging, kuyruk) çocukta sonsuza dek kilitli kalır.
+    Bu yüzden önce SQLite yazar thread'leri durdurulur (ilk yazmada yeniden
+    açılırlar), sonra havuz ilk submit'te tüm süreçlerini fork eder; bulk
+    yazarı ve embedding bundan sonra başlar.
+    """
+    cache = getattr(indexer, "embedding_cache", None)  # henüz açılmadıysa açma
+    for store in (indexer.store, getattr(cache, "store", None)):
+        if store is not None:
+            store.stop_writer()
+    pool = _process_pool(workers)
+    try:
+        pool.submit(os.getpid).result()
+    except BaseException:
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    return pool
+
+
+def _stage_one(
+    todo: List[Tuple[str, FileSig, Optional[str]]],
+    pool: Optional[Executor],
+    max_inflight: int,
+) -> Iterable[Tuple[Tuple[str, List[Dict[str, Any]], Optional[str], Optional[str]], FileSig]]:
+    """
+    1. aşama: tamamlanma sırasıyla (sonuç, imza); uçuşta en fazla
+    `max_inflight` belge. `pool` None ise aynı süreçte, sırayla.
+    """
+    if pool is None:
+        for path, sig, digest in todo:
+            yield load_and_chunk(path, digest), sig
+        return
+
+    pending: Dict[Future, FileSig] = {}
+    items = iter(todo)
+    try:
+        for path, sig, digest in items:
+            pending[pool.submit(load_and_chunk, path, digest)] = sig
+            if len(pending) >= max_inflight:
+                break
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                sig = pending.pop(future)
+                yield future.result(), sig
+                nxt = next(items, None)
+                if nxt is not None:
+                    pending[pool.submit(load_and_chunk, nxt[0], nxt[2])] = nxt[1]
+    finally:
+        for future in pending:  # yazar hata verdiyse kuyruktaki belgeleri bekleme
+            future.cancel()
+
+
+def main(argv: Optional[Sequence[str]] = None, indexer_mod: Any = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Index a corpus folder: process-pool extraction, batched embedding, one SQLite/vector writer."
+    )
+    parser.add_argument("--src", required=True, help="Klasör: txt/pdf/docx belgeler")
+    parser.add_argument("--reset", action="store_true", help="Tüm koleksiyonu ve FTS içeriğini temizle")
+    parser.add_argument("--workers", type=int, default=default_workers(),
+                        help="extraction/chunking processes (0 = in-process)")
+    parser.add_argument("--embed-batch", type=int, default=default_embed_batch(), help="chunks per embedding call")
+    parser.add_argument("--commit-every", type=int, default=2000, help="chunks per SQLite/vector store transaction")
+    parser.add_argument("--batch-size", type=int, default=None, help=argparse.SUPPRESS)  # eski CLI uyumluluğu
+    parser.add_argument("--no-resume", action="store_true", help="re-index files already recorded as indexed")
+    parser.add_argument("--incremental", action="store_true",
+                        help="sync with the manifest: skip same-content files, replace changed ones, "
+                             "delete chunks of removed files")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    indexer = indexer_mod or _indexer()
+
+    if args.reset:
+        # Vektör deposunu temizle (Chroma: koleksiyonu yık-yap, mmap: dosyaları sil)
+        indexer.vector_store.reset()
+        # FTS5 + ilerleme kaydı temizliği
+        indexer.store.write(indexer._reset_fts)
+        logger.info("Indexer reset completed.")
+
+    paths = list_corpus_files(args.src)
+    stats = bulk_index(
+        paths,
+        indexer_mod=indexer,
+        workers=args.workers,
+        embed_batch=args.batch_size or args.embed_batch,
+        commit_every=args.commit_every,
+        resume=not args.no_resume,
+        incremental=args.incremental,
+        root=args.src,
+    )
+    print(
+        f"indexed {stats.docs} docs / {stats.chunks} chunks in {stats.seconds:.1f}s "
+        f"({stats.docs_per_s:.1f} docs/s, {stats.chunks_per_s:.1f} chunks/s); "
+        f"{stats.skipped} unchanged skipped, {stats.removed} removed, {stats.failed} failed"
+    )
+    return 1 if stats.failed and not stats.docs else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,122 @@
+# app/services/rag_backend/chunk_embedding_cache.py
+from __future__ import annotations
+import hashlib
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+from .sqlite_store import SQLiteConnectionManager, build_sqlite_store
+
+_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS chunk_embeddings (
+    model TEXT NOT NULL,
+    text_sha256 TEXT NOT NULL,
+    dim INTEGER NOT NULL,
+    vector BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (model, text_sha256)
+) WITHOUT ROWID
+"""
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _create_schema(conn: sqlite3.Connection) -> None:
+    conn.execute(_SCHEMA_SQL)
+
+
+def _insert(conn: sqlite3.Connection, rows: List[tuple]) -> None:
+    conn.executemany(
+        "INSERT INTO chunk_embeddings(model, text_sha256, dim, vector, created_at) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT(model, text_sha256) DO NOTHING;",
+        rows,
+    )
+
+
+class ChunkEmbeddingCache:
+    """
+    Persistent chunk-text -> embedding cache for the indexing paths.
+
+    Vectors are stored as float32 blobs keyed by (embedding model id,
+    sha256 of the exact chunk text), so re-uploading a document, rebuilding
+    the index after `--reset`, or indexing boilerplate shared by many files
+    only runs the embedder on text it has never seen with this model.
+    Switching EMBED_MODEL / EMBED_BACKEND changes the model id and therefore
+    never reuses vectors from another embedder. Query embeddings have their
+    own in-memory LRU (retrieval_cache.py).
+    """
+
+    def __init__(self, store: SQLiteConnectionManager, model_id: str) -> None:
+        self.store = store
+        self.model_id = model_id
+        self.hits = 0
+        self.misses = 0
+        self.store.write(_create_schema)
+
+    def lookup(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        out: Dict[str, np.ndarray] = {}
+        keys = list(dict.fromkeys(keys))
+        for start in range(0, len(keys), 500):  # stay below SQLite's variable limit
+            part = keys[start:start + 500]
+            rows = self.store.reader().execute(
+                "SELECT text_sha256, vector FROM chunk_embeddings "
+                f"WHERE model = ? AND text_sha256 IN ({', '.join('?' * len(part))});",
+                (self.model_id, *part),
+            )
+            for key, blob in rows:
+                out[key] = np.frombuffer(blob, dtype="<f4")
+        return out
+
+    def put(self, keys: Sequence[str], vectors: np.ndarray) -> None:
+        now = time.time()
+        vectors = np.asarray(vectors, dtype="<f4")
+        rows = [
+            (self.model_id, key, int(vector.shape[0]), vector.tobytes(), now)
+            for key, vector in zip(keys, vectors)
+        ]
+        if rows:
+            self.store.write(_insert, rows)
+
+    def encode(self, model: Any, texts: Sequence[str]) -> np.ndarray:
+        """`model.encode(texts)` for the cache misses only; rows come back in input order."""
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        keys = [text_key(t) for t in texts]
+        found = self.lookup(keys)
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}  # duplicates encoded once
+        self.hits += len(texts) - len(missing)  # texts that needed no forward pass
+        self.misses += len(missing)
+        if missing:
+            vectors = np.asarray(
+                model.encode(list(missing.values()), convert_to_numpy=True, show_progress_bar=False),
+                dtype=np.float32,
+            )
+            self.put(list(missing), vectors)
+            found.update(zip(missing, vectors))
+        return np.stack([np.asarray(found[key], dtype=np.float32) for key in keys])
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "model": self.model_id,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def close(self) -> None:
+        self.store.close()
+
+
+def build_chunk_embedding_cache(cfg: Mapping[str, Any], model_id: str) -> Optional[ChunkEmbeddingCache]:
+    if not bool(cfg.get("RAG_CHUNK_EMBED_CACHE", True)):
+        return None
+    path = Path(str(cfg["RAG_CHUNK_EMBED_CACHE_PATH"]))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return ChunkEmbeddingCache(build_sqlite_store(path, cfg), model_id)
@@ -0,0 +1,166 @@
+# app/services/rag_backend/embedding.py
+from __future__ import annotations
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Sequence
+
+import numpy as np
+
+try:
+    from transformers import AutoTokenizer
+except Exception:
+    AutoTokenizer = None
+
+from services.runtime_resources import SessionPool, get_resource_manager
+
+logger = logging.getLogger(__name__)
+
+EMBED_BACKENDS = ("torch", "onnx")
+
+# written next to the ONNX file by scripts/export_embedder_onnx.py
+EMBEDDER_CONFIG_NAME = "embedder_config.json"
+
+
+def mean_pool(token_embeddings: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+    """sentence-transformers' mean pooling: average of the unmasked token vectors."""
+    mask = attention_mask[..., None].astype(np.float32)
+    summed = (token_embeddings.astype(np.float32) * mask).sum(axis=1)
+    return summed / np.clip(mask.sum(axis=1), 1e-9, None)
+
+
+def l2_normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.clip(norms, 1e-12, None)
+
+
+class OnnxSentenceEmbedder:
+    """
+    SentenceTransformer stand-in running the exported transformer on ONNX Runtime.
+
+    Tokenizes with the exported HF tokenizer, runs the encoder, then applies
+    the pooling / normalization recorded in `embedder_config.json` (mean
+    pooling + L2 normalization for all-MiniLM-L6-v2), so vectors match the
+    torch model's and an existing Chroma index stays valid. `encode` accepts
+    the same arguments the indexer and search code pass to SentenceTransformer.
+    """
+
+    def __init__(self, cfg: Mapping[str, Any]):
+        self.model_path = str(cfg.get("EMBED_ONNX", "assets/models/embedder/model_int8.onnx"))
+        self.tok_dir = str(cfg.get("EMBED_TOKENIZER_DIR", "assets/models/embedder/tokenizer"))
+        self._resources = get_resource_manager(cfg)
+
+        settings = self._load_settings(Path(self.model_path).with_name(EMBEDDER_CONFIG_NAME))
+        self.pooling = str(settings.get("pooling", "mean"))
+        self.normalize = bool(settings.get("normalize", True))
+        self.max_len = int(cfg.get("EMBED_MAX_LEN") or settings.get("max_seq_length") or 256)
+
+        self._sess: SessionPool | None = None
+        self._tok = None
+        self._required_inputs: List[str] | None = None
+
+    @staticmethod
+    def _load_settings(path: Path) -> Dict[str, Any]:
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+        except Exception as exc:
+            logger.warning("Ignoring unreadable %s: %s", path, exc)
+            return {}
+
+    # --- Lazy loaders ---
+    @property
+    def session(self) -> SessionPool:
+        if self._sess is None:
+            self._sess = self._resources.session_pool("embedding", self.model_path)
+            self._required_inputs = [i.name for i in self._sess.get_inputs()]
+        return self._sess
+
+    @property
+    def tokenizer(self):
+        if self._tok is None:
+            if AutoTokenizer is None:
+                raise RuntimeError("transformers AutoTokenizer is not available")
+            self._tok = AutoTokenizer.from_pretrained(self.tok_dir, use_fast=True, local_files_only=True)
+        return self._tok
+
+    # --- Core ---
+    def _embed_batch(self, texts: Sequence[str]) -> np.ndarray:
+        sess = self.session
+        enc = self.tokenizer(
+            list(texts), padding=True, truncation=True, max_length=self.max_len, return_tensors="np"
+        )
+        feed: Dict[str, np.ndarray] = {}
+        for name in self._required_inputs or []:
+            if name in enc:
+                feed[name] = np.asarray(enc[name], dtype=np.int64)
+            elif name == "token_type_ids":
+                feed[name] = np.zeros_like(enc["input_ids"], dtype=np.int64)
+        outputs = sess.run(None, feed)
+        if not outputs:
+            raise RuntimeError("ONNX çıktı listesi boş.")
+
+        hidden = outputs[0]
+        if hidden.ndim == 2:  # graph already pools
+            pooled = hidden.astype(np.float32)
+        elif self.pooling == "cls":
+            pooled = hidden[:, 0].astype(np.float32)
+        else:
+            pooled = mean_pool(hidden, np.asarray(enc["attention_mask"]))
+        return l2_normalize(pooled) if self.normalize else pooled
+
+    def encode(
+        self,
+        sentences: str | Sequence[str],
+        batch_size: int = 32,
+        convert_to_numpy: bool = True,
+        show_progress_bar: bool = False,
+        normalize_embeddings: bool | None = None,
+        **_: Any,
+    ) -> np.ndarray:
+        """(N, D) float32 embeddings; a single string gives a (D,) vector like SentenceTransformer."""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        # longest first, like sentence-transformers, so each batch pads little
+        order = sorted(range(len(texts)), key=lambda i: -len(texts[i]))
+        out: List[np.ndarray | None] = [None] * len(texts)
+        step = max(1, int(batch_size))
+        for start in range(0, len(order), step):
+            idx = order[start:start + step]
+            for i, vector in zip(idx, self._embed_batch([texts[i] for i in idx])):
+                out[i] = vector
+        embeddings = np.stack(out)
+        if normalize_embeddings and not self.normalize:
+            embeddings = l2_normalize(embeddings)
+        return embeddings[0] if single else embeddings
+
+    def warmup(self) -> None:
+        self.encode(["warmup"])
+
+
+def embedding_model_id(cfg: Mapping[str, Any]) -> str:
+    """Names the vectors an embedder produces; cached chunk vectors are only reused under the same id."""
+    backend = str(cfg.get("EMBED_BACKEND", "torch") or "torch").lower()
+    model = str(cfg.get("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2"))
+    if backend == "onnx":
+        return f"onnx:{model}:{Path(str(cfg.get('EMBED_ONNX', ''))).name}:{int(cfg.get('EMBED_MAX_LEN') or 0)}"
+    return f"torch:{model}"
+
+
+def build_embedding_model(cfg: Mapping[str, Any]):
+    """Embedding model for indexing and queries, chosen by EMBED_BACKEND (torch | onnx)."""
+    backend = str(cfg.get("EMBED_BACKEND", "torch") or "torch").lower()
+    if backend not in EMBED_BACKENDS:
+        raise ValueError(f"Unknown EMBED_BACKEND {backend!r}; expected one of {', '.join(EMBED_BACKENDS)}")
+    if backend == "onnx":
+        return OnnxSentenceEmbedder(cfg)
+
+    # torch is only imported on this path
+    from sentence_transformers import SentenceTransformer
+
+    get_resource_manager(cfg).configure_torch()  # pin torch threads before the model spins up its pool
+    return SentenceTransformer(str(cfg.get("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")), device="cpu")
@@ -0,0 +1,117 @@
+# app/services/rag_backend/fanout.py
+from __future__ import annotations
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from config import CFG
+
+BRANCH_OK = "ok"
+BRANCH_ERROR = "error"
+BRANCH_TIMEOUT = "timeout"
+BRANCH_SKIPPED = "skipped"
+
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def _executor() -> ThreadPoolExecutor:
+    """Shared pool for retrieval branches (RAG_FANOUT_WORKERS threads)."""
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            workers = max(2, int(CFG.get("RAG_FANOUT_WORKERS", 8) or 8))
+            _EXECUTOR = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rag-branch")
+        return _EXECUTOR
+
+
+def _elapsed_ms(start: float, end: float | None = None) -> int:
+    return int(((end if end is not None else time.perf_counter()) - start) * 1000)
+
+
+@dataclass
+class BranchOutcome:
+    name: str
+    status: str
+    value: Any = None
+    latency_ms: int | None = None
+    error_type: str | None = None
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status == BRANCH_OK
+
+    def as_metadata(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"status": self.status, "latency_ms": self.latency_ms}
+        if isinstance(self.value, list):
+            out["count"] = len(self.value)
+        if self.error_type:
+            out["error_type"] = self.error_type
+            out["error"] = self.error
+        return out
+
+
+def skipped_branch(name: str) -> BranchOutcome:
+    return BranchOutcome(name, BRANCH_SKIPPED)
+
+
+class Branch:
+    """
+    One retrieval branch (vector, BM25, web) running on the shared pool.
+
+    The timeout counts from `start_branch`, so branches started together
+    share a start time and the slowest one bounds the total latency. A
+    branch that times out is abandoned: its result is ignored and, if it
+    has not started yet, it is cancelled.
+    """
+
+    def __init__(self, name: str, timeout_s: float | None) -> None:
+        self.name = name
+        self.timeout_s = timeout_s if timeout_s and timeout_s > 0 else None
+        self.started = time.perf_counter()
+        self.finished: float | None = None
+        self.future: Future | None = None
+
+    def _run(self, fn: Callable[..., Any], args: tuple, kwargs: Dict[str, Any]) -> Any:
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.finished = time.perf_counter()
+
+    def wait(self) -> BranchOutcome:
+        assert self.future is not None
+        remaining = None
+        if self.timeout_s is not None:
+            remaining = max(0.0, self.timeout_s - (time.perf_counter() - self.started))
+        # wait() rather than result(timeout=...): the branch itself may raise TimeoutError
+        done, _ = wait([self.future], timeout=remaining)
+        if not done:
+            self.future.cancel()
+            return BranchOutcome(
+                self.name,
+                BRANCH_TIMEOUT,
+                latency_ms=_elapsed_ms(self.started),
+                error_type="TimeoutError",
+                error=f"{self.name} branch exceeded {self.timeout_s:g}s",
+            )
+        try:
+            value = self.future.result()
+        except Exception as exc:
+            return BranchOutcome(
+                self.name,
+                BRANCH_ERROR,
+                latency_ms=_elapsed_ms(self.started, self.finished),
+                error_type=type(exc).__name__,
+                error=str(exc),
+            )
+        return BranchOutcome(self.name, BRANCH_OK, value, latency_ms=_elapsed_ms(self.started, self.finished))
+
+
+def start_branch(name: str, fn: Callable[..., Any], *args: Any, timeout_s: float | None = None, **kwargs: Any) -> Branch:
+    """Submit `fn(*args, **kwargs)` to the branch pool; collect it later with `.wait()`."""
+    branch = Branch(name, timeout_s)
+    branch.future = _executor().submit(branch._run, fn, args, kwargs)
+    return branch
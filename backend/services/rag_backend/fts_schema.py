@@ -0,0 +1,340 @@
+# app/services/rag_backend/fts_schema.py
+from __future__ import annotations
+import json
+import logging
+import re
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 3
+
+# metadata'dan ayrı sütunlara taşınan skaler alanlar (kalanı `metadata` JSON'unda)
+CHUNK_COLUMNS = ("document_id", "file_name", "source", "chunk_index", "content_hash")
+
+# v2: metin yalnızca `chunks.content`'te durur; FTS5 external-content index
+# onu rowid ile okur, tetikleyiciler index'i tabloyla senkron tutar.
+_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY,
+    chunk_id TEXT NOT NULL UNIQUE,
+    document_id TEXT,
+    file_name TEXT,
+    source TEXT,
+    chunk_index INTEGER,
+    content_hash TEXT,
+    content TEXT NOT NULL,
+    metadata TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_chunks_document_id ON chunks(document_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts
+USING fts5(content, content = 'chunks', content_rowid = 'id', tokenize = 'porter');
+CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN
+    INSERT INTO chunks_fts(rowid, content) VALUES (new.id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN
+    INSERT INTO chunks_fts(chunks_fts, rowid, content) VALUES ('delete', old.id, old.content);
+END;
+CREATE TRIGGER IF NOT EXISTS chunks_au AFTER UPDATE OF content ON chunks BEGIN
+    INSERT INTO chunks_fts(chunks_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    INSERT INTO chunks_fts(rowid, content) VALUES (new.id, new.content);
+END;
+CREATE TABLE IF NOT EXISTS index_meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS chunk_tokens (
+    chunk_id TEXT PRIMARY KEY,
+    width INTEGER NOT NULL,
+    ids BLOB NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS chunks_ad_tokens AFTER DELETE ON chunks BEGIN
+    DELETE FROM chunk_tokens WHERE chunk_id = old.chunk_id;
+END;
+CREATE TABLE IF NOT EXISTS indexed_files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    chunk_count INTEGER NOT NULL,
+    indexed_at TEXT NOT NULL,
+    sha256 TEXT,
+    config_hash TEXT,
+    document_id TEXT,
+    chunk_ids TEXT
+);
+"""
+
+# v3: toplu indexer manifest'i (indexed_files) içerik özeti, chunking ayarı ve chunk_id'leri tutar
+MANIFEST_COLUMNS = (
+    "path", "size", "mtime_ns", "chunk_count", "indexed_at", "sha256", "config_hash", "document_id", "chunk_ids",
+)
+
+UPSERT_CHUNK_SQL = """
+INSERT INTO chunks(chunk_id, document_id, file_name, source, chunk_index, content_hash, content, metadata)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(chunk_id) DO UPDATE SET
+    document_id = excluded.document_id,
+    file_name = excluded.file_name,
+    source = excluded.source,
+    chunk_index = excluded.chunk_index,
+    content_hash = excluded.content_hash,
+    content = excluded.content,
+    metadata = excluded.metadata;
+"""
+
+BM25_SQL = """
+SELECT c.chunk_id, c.content, bm25(chunks_fts) AS score,
+       c.document_id, c.file_name, c.source, c.chunk_index, c.content_hash, c.metadata
+FROM chunks_fts
+JOIN chunks AS c ON c.id = chunks_fts.rowid
+WHERE chunks_fts MATCH ?
+ORDER BY score ASC
+LIMIT ?
+"""
+
+_QUERY_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def fts5_match_query(text: str) -> str:
+    """
+    Serbest metin sorusunu güvenli bir FTS5 MATCH ifadesine çevirir: her
+    kelime tırnak içinde (FTS5 operatörü / sütun adı sayılmaz), terimler OR
+    ile bağlanır; sıralamayı bm25() yapar. `?`, `-`, `:` gibi karakterler
+    ham sorguda söz dizimi hatası verirdi. Kelime yoksa boş dizi.
+    """
+    terms = dict.fromkeys(term.lower() for term in _QUERY_TERM.findall(text or ""))
+    return " OR ".join(f'"{term}"' for term in terms)
+
+
+def _table_exists(conn: sqlite3.Connection, name: str) -> bool:
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?;", (name,)).fetchone()
+    return row is not None
+
+
+def bump_generation(conn: sqlite3.Connection) -> None:
+    """index_meta nesil sayacını artırır; arama sonucu önbelleği bununla geçersiz olur."""
+    conn.execute(
+        "INSERT INTO index_meta(key, value) VALUES ('generation', 1) "
+        "ON CONFLICT(key) DO UPDATE SET value = value + 1;"
+    )
+
+
+def chunk_row(chunk_id: str, text: str, metadata: Dict[str, Any]) -> Tuple[Any, ...]:
+    """UPSERT_CHUNK_SQL parametreleri: skaler sütunlar + kalan metadata JSON'u."""
+    extra = {k: v for k, v in metadata.items() if k not in CHUNK_COLUMNS}
+    return (
+        chunk_id,
+        *(metadata.get(column) for column in CHUNK_COLUMNS),
+        text,
+        json.dumps(extra, ensure_ascii=False) if extra else None,
+    )
+
+
+def row_metadata(
+    chunk_id: str,
+    columns: Iterable[Any],
+    metadata_json: Optional[str],
+) -> Dict[str, Any]:
+    """chunk_row'un tersi: sütunları ve JSON'u tek metadata dict'inde birleştirir."""
+    try:
+        metadata = json.loads(metadata_json) if metadata_json else {}
+    except Exception:
+        metadata = {}
+    for column, value in zip(CHUNK_COLUMNS, columns):
+        if value is not None:
+            metadata[column] = value
+    metadata["chunk_id"] = chunk_id
+    return metadata
+
+
+def fetch_chunks(conn: sqlite3.Connection, chunk_ids: List[str]) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+    """chunk_id -> (metadata'sız vektör sonuçları için) (metin, metadata)."""
+    out: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+    for start in range(0, len(chunk_ids), 500):  # SQLite değişken sınırının altında kal
+        part = chunk_ids[start:start + 500]
+        rows = conn.execute(
+            "SELECT chunk_id, content, document_id, file_name, source, chunk_index, content_hash, metadata "
+            f"FROM chunks WHERE chunk_id IN ({', '.join('?' * len(part))});",
+            part,
+        )
+        for chunk_id, content, *columns, metadata_json in rows:
+            out[chunk_id] = (str(content), row_metadata(chunk_id, columns, metadata_json))
+    return out
+
+
+def upsert_chunks(conn: sqlite3.Connection, rows: List[Tuple[Any, ...]]) -> None:
+    conn.executemany(UPSERT_CHUNK_SQL, rows)
+
+
+def _pack_ids(ids: List[int]) -> Tuple[int, bytes]:
+    # T5 kelime dağarcığı (32k) uint16'ya sığar: id başına 2 bayt
+    width = 2 if not ids or max(ids) < 65536 else 4
+    return width, np.asarray(ids, dtype="<u2" if width == 2 else "<u4").tobytes()
+
+
+def upsert_token_ids(conn: sqlite3.Connection, rows: List[Tuple[str, List[int]]]) -> None:
+    """Chunk başına T5 token id dizisi (RAG_STORE_TOKEN_IDS); chunk silinince tetikleyiciyle gider."""
+    conn.executemany(
+        "INSERT INTO chunk_tokens(chunk_id, width, ids) VALUES (?, ?, ?) "
+        "ON CONFLICT(chunk_id) DO UPDATE SET width = excluded.width, ids = excluded.ids;",
+        [(chunk_id, *_pack_ids(list(ids))) for chunk_id, ids in rows],
+    )
+
+
+def fetch_token_ids(conn: sqlite3.Connection, chunk_id: str) -> Optional[List[int]]:
+    row = conn.execute("SELECT width, ids FROM chunk_tokens WHERE chunk_id = ?;", (chunk_id,)).fetchone()
+    if row is None:
+        return None
+    width, blob = row
+    return np.frombuffer(blob, dtype="<u2" if width == 2 else "<u4").astype(int).tolist()
+
+
+def mark_files_indexed(conn: sqlite3.Connection, rows: List[Dict[str, Any]]) -> None:
+    """Toplu indexer manifest'i (MANIFEST_COLUMNS anahtarlı dict'ler); chunk'larla aynı işlemde yazılır."""
+    columns = ", ".join(MANIFEST_COLUMNS)
+    updates = ", ".join(f"{c} = excluded.{c}" for c in MANIFEST_COLUMNS[1:])
+    conn.executemany(
+        f"INSERT INTO indexed_files({columns}) VALUES ({', '.join('?' * len(MANIFEST_COLUMNS))}) "
+        f"ON CONFLICT(path) DO UPDATE SET {updates};",
+        [
+            tuple(
+                json.dumps(list(row.get(c) or [])) if c == "chunk_ids" else row.get(c)
+                for c in MANIFEST_COLUMNS
+            )
+            for row in rows
+        ],
+    )
+
+
+def load_manifest(conn: sqlite3.Connection) -> Dict[str, Dict[str, Any]]:
+    """path -> manifest satırı; v2'den kalan satırlarda özet/chunk_id alanları None'dır."""
+    out: Dict[str, Dict[str, Any]] = {}
+    for row in conn.execute(f"SELECT {', '.join(MANIFEST_COLUMNS)} FROM indexed_files;"):
+        entry = _manifest_entry(row)
+        out[entry["path"]] = entry
+    return out
+
+
+def indexed_document(
+    conn: sqlite3.Connection,
+    document_id: str,
+    sha256: str,
+    config_hash: str,
+) -> Optional[Dict[str, Any]]:
+    """Aynı içerik aynı chunking ayarıyla indexlenmiş ve chunk'ları hâlâ duruyorsa manifest satırı."""
+    row = conn.execute(
+        f"SELECT {', '.join('f.' + c for c in MANIFEST_COLUMNS)} FROM indexed_files AS f "
+        "WHERE f.document_id = ? AND f.sha256 = ? AND f.config_hash = ? "
+        "AND EXISTS (SELECT 1 FROM chunks AS c WHERE c.document_id = f.document_id) LIMIT 1;",
+        (document_id, sha256, config_hash),
+    ).fetchone()
+    return _manifest_entry(row) if row is not None else None
+
+
+def _manifest_entry(row: Iterable[Any]) -> Dict[str, Any]:
+    entry = dict(zip(MANIFEST_COLUMNS, row))
+    entry["chunk_ids"] = json.loads(entry["chunk_ids"]) if entry["chunk_ids"] else None
+    return entry
+
+
+def touch_files(conn: sqlite3.Connection, rows: List[Tuple[str, int, int]]) -> None:
+    """İçeriği aynı çıkan dosyaların (path, size, mtime_ns) imzasını günceller; sonraki çalıştırma özet almaz."""
+    conn.executemany(
+        "UPDATE indexed_files SET size = ?, mtime_ns = ? WHERE path = ?;",
+        [(size, mtime_ns, path) for path, size, mtime_ns in rows],
+    )
+
+
+def forget_files(conn: sqlite3.Connection, paths: Iterable[str]) -> None:
+    conn.executemany("DELETE FROM indexed_files WHERE path = ?;", [(p,) for p in paths])
+
+
+def delete_document(conn: sqlite3.Connection, document_id: str, chunk_ids: Iterable[str] = ()) -> int:
+    """document_id (indexli) ve verilen chunk_id'ler üzerinden siler; silinen satır sayısı."""
+    # rowcount tetikleyicilerin FTS değişikliklerini saymaz (total_changes sayar)
+    deleted = conn.execute("DELETE FROM chunks WHERE document_id = ?;", (document_id,)).rowcount
+    ids = [(cid,) for cid in chunk_ids]
+    if ids:
+        deleted += conn.executemany("DELETE FROM chunks WHERE chunk_id = ?;", ids).rowcount
+    return deleted
+
+
+def legacy_chunk_id(metadata: Dict[str, Any], rowid: int) -> str:
+    """indexer._normalize_record ile aynı kural; sıra bilgisi yoksa rowid'den türetilir."""
+    order = metadata.get("chunk_index")
+    if order is None:
+        return f"legacy_{rowid}"
+    owner = metadata.get("document_id") or metadata.get("file_name") or metadata.get("source") or "unknown"
+    return f"{owner}_chunk_{order}"
+
+
+def migrate_legacy_documents(conn: sqlite3.Connection, batch_size: int = 500) -> int:
+    """
+    v1 `documents` FTS5 tablosunu (content + metadata JSON) `chunks`'a taşır
+    ve eski tabloyu siler. Aynı chunk_id'ye düşen satırlarda sonuncusu kalır.
+    Dönüş: taşınan satır sayısı (v1 tablo yoksa 0).
+    """
+    if not _table_exists(conn, "documents"):
+        return 0
+
+    moved = 0
+    source = conn.execute("SELECT rowid, content, metadata FROM documents ORDER BY rowid;")
+    while True:
+        batch = source.fetchmany(batch_size)
+        if not batch:
+            break
+        rows = []
+        for rowid, content, metadata_json in batch:
+            try:
+                metadata = json.loads(metadata_json) if metadata_json else {}
+            except Exception:
+                metadata = {}
+            if not isinstance(metadata, dict):
+                metadata = {}
+            rows.append(chunk_row(legacy_chunk_id(metadata, rowid), str(content or ""), metadata))
+        upsert_chunks(conn, rows)
+        moved += len(rows)
+
+    conn.execute("DROP TABLE documents;")
+    logger.info("Migrated %s rows from the v1 FTS5 'documents' table to 'chunks'.", moved)
+    return moved
+
+
+def _add_missing_columns(conn: sqlite3.Connection, table: str, columns: Dict[str, str]) -> None:
+    # CREATE TABLE IF NOT EXISTS var olan tabloya sütun eklemez (v2 -> v3)
+    present = {row[1] for row in conn.execute(f"PRAGMA table_info({table});")}
+    for name, decl in columns.items():
+        if name not in present:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl};")
+
+
+def create_schema(conn: sqlite3.Connection) -> int:
+    """
+    v3 şemasını kurar; v1 `documents` tablosu varsa aynı işlemde taşır.
+    Dönüş: taşınan v1 satır sayısı.
+    """
+    # executescript örtük COMMIT yapar; store.write işlemi içinde kalmak için tek tek çalıştır
+    for statement in _split_statements(_SCHEMA_SQL):
+        conn.execute(statement)
+    _add_missing_columns(
+        conn, "indexed_files", {c: "TEXT" for c in ("sha256", "config_hash", "document_id", "chunk_ids")}
+    )
+    moved = migrate_legacy_documents(conn)
+    if moved:
+        bump_generation(conn)
+    conn.execute(
+        "INSERT INTO index_meta(key, value) VALUES ('schema_version', ?) "
+        "ON CONFLICT(key) DO UPDATE SET value = excluded.value;",
+        (SCHEMA_VERSION,),
+    )
+    return moved
+
+
+def _split_statements(script: str) -> List[str]:
+    statements, buf = [], ""
+    for line in script.strip().splitlines():
+        buf += line + "\n"
+        if sqlite3.complete_statement(buf):
+            statements.append(buf.strip())
+            buf = ""
+    return statements
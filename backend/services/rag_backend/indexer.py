@@ -1,47 +1,74 @@
 # app/services/rag_backend/indexer.py
 from __future__ import annotations
-from typing import Any, List, Dict, Tuple
-import json
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 import logging
+import os
+import pickle
 import sqlite3
-from datetime import datetime
+import tempfile
+import threading
+from datetime import datetime, timezone
 from pathlib import Path
 
-from sentence_transformers import SentenceTransformer
-import chromadb
 from tqdm import tqdm
 
 # .env üzerinden ayarlar (gerekirse)
-from . import EMBED_MODEL, CHROMA_PATH
+from . import CHROMA_PATH
 from config import CFG
+from .chunk_embedding_cache import ChunkEmbeddingCache, build_chunk_embedding_cache
+from .embedding import build_embedding_model, embedding_model_id
+from .fts_schema import (
+    bump_generation,
+    chunk_row,
+    create_schema,
+    delete_document,
+    indexed_document,
+    mark_files_indexed,
+    upsert_chunks,
+    upsert_token_ids,
+)
+from .preprocess import chunking_config_hash
+from .sqlite_store import build_sqlite_store
+from .vector_store import build_vector_store
 
 logger = logging.getLogger(__name__)
 
 # -------------------------
-# Model & Chroma init
+# Model & vector store init
 # -------------------------
-embedding_model = SentenceTransformer(EMBED_MODEL, device="cpu")
+# EMBED_BACKEND=torch -> SentenceTransformer, onnx -> ONNX Runtime (PyTorch is not imported)
+embedding_model = build_embedding_model(CFG)
+# (model id, sha256(chunk metni)) -> vektör; yeniden yükleme / yeniden index yalnızca yeni metinleri gömer.
+# İlk embedding'de açılır (get_embedding_cache): import SQLite dosyası ya da yazar thread'i oluşturmaz.
+embedding_cache: Optional[ChunkEmbeddingCache] = None
+_embedding_cache_lock = threading.Lock()
 
-# Chroma kalıcı istemci ve koleksiyon
-CHROMA_COLLECTION = str(CFG.get("CHROMA_COLLECTION", "pathfinder_corpus"))
-chroma_client = chromadb.PersistentClient(path=CHROMA_PATH)
-collection = chroma_client.get_or_create_collection(CHROMA_COLLECTION)
+# VECTOR_BACKEND=chroma -> Chroma kalıcı koleksiyonu, mmap -> paylaşılan .npy matris (vector_store.py)
+vector_store = build_vector_store(CFG)
 
 # -------------------------
 # SQLite (FTS5) init
 # -------------------------
 SQLITE_PATH = str(CFG.get("RAG_SQLITE_PATH") or Path(CHROMA_PATH) / "bm25.sqlite")
-Path(SQLITE_PATH).parent.mkdir(parents=True, exist_ok=True)
-conn = sqlite3.connect(SQLITE_PATH)
-cursor = conn.cursor()
-sqlite_cur = cursor
-sqlite_conn = conn  # (istersen ileride lazım olur)
-# FTS5 tablo (content ve metadata json)
-cursor.execute("""
-CREATE VIRTUAL TABLE IF NOT EXISTS documents
-USING fts5(content, metadata, tokenize = 'porter');
-""")
-conn.commit()
+# WAL modu: tek yazar thread'i + thread başına salt-okunur bağlantılar (search.bm25_search)
+store = build_sqlite_store(SQLITE_PATH, CFG)
+# preprocess'in ürettiği token id'leri chunk_tokens tablosuna da yaz (prompt.create_context kırpması)
+STORE_TOKEN_IDS = bool(CFG.get("RAG_STORE_TOKEN_IDS", False))
+
+
+def _bump_index_generation(conn: sqlite3.Connection) -> None:
+    """
+    Index değişti: nesil sayacını artır (store.write işinin içinde çağrılır).
+    Sayaç SQLite'ta durduğu için aynı index'i okuyan diğer API süreçleri de
+    eski önbellek kayıtlarını kullanmayı hemen bırakır.
+    """
+    bump_generation(conn)
+
+
+# şema: chunks tablosu + external-content FTS5 (eski `documents` tablosu varsa taşınır)
+store.write(create_schema)
+# import bir yazar thread'i bırakmasın (bulk_indexer süreç havuzunu fork eder); ilk yazma yeniden açar
+store.stop_writer()
 
 
 def _metadata_for_chunk(c: Dict, file_name: str, text: str) -> Dict[str, Any]:
@@ -95,10 +122,11 @@ def _normalize_record(c: Dict) -> Tuple[str, str, str, Dict[str, Any]]:
     return chunk_id, text, file_name, metadata
 
 
-def add_chunks_to_db(chunks: List[Dict], batch_size: int = 100) -> None:
+def add_chunks_to_db(chunks: List[Dict], batch_size: int = 100, bump: bool = True) -> None:
     """
-    Chunk'ları ChromaDB ve SQLite FTS5 veritabanına toplu (batch) şekilde ekler.
+    Chunk'ları vektör deposuna (Chroma / mmap) ve SQLite FTS5 veritabanına toplu (batch) şekilde ekler.
     Büyük veri setlerinde ciddi performans sağlar.
+    `bump=False`: nesil sayacını çağıran, tüm yazmalar bitince kendisi artırır.
     """
     if not chunks:
         logger.info("No chunks to add.")
@@ -106,6 +134,8 @@ def add_chunks_to_db(chunks: List[Dict], batch_size: int = 100) -> None:
 
     # Toplam sayaç
     total = len(chunks)
+    # FTS5 yazmaları yazar thread'ine kuyruklanır; bir sonraki batch'in embedding'i beklemeden başlar
+    pending = []
 
     for i in tqdm(range(0, total, batch_size), desc="Toplu embedding ve DB ekleme"):
         batch = chunks[i:i + batch_size]
@@ -116,40 +146,79 @@ def add_chunks_to_db(chunks: List[Dict], batch_size: int = 100) -> None:
         texts = [txt for _, txt, _, _ in norm]
         metadatas = [meta for _, _, _, meta in norm]
 
-        # ---- Embedding (toplu)
+        # ---- Embedding (toplu; önbellek açıksa yalnızca önbellekte olmayan metinler)
         # show_progress_bar=False CPU'da da yeterli
-        embs = embedding_model.encode(texts, convert_to_numpy=True, show_progress_bar=False).tolist()
-
-        # ---- ChromaDB'ye ekle
-        collection.add(
-            ids=ids,
-            embeddings=embs,
-            metadatas=metadatas,
-            documents=texts,
-        )
-
-        # ---- SQLite FTS5'e ekle (content + metadata)
-        sql_rows = [(texts[j], json.dumps(metadatas[j])) for j in range(len(texts))]
-        cursor.executemany(
-            "INSERT INTO documents(content, metadata) VALUES (?, ?);",
-            sql_rows,
-        )
-
-    conn.commit()
+        embs = embed_texts(texts)
+
+        # ---- Vektör deposuna ekle
+        vector_store.add(ids, embs, texts, metadatas)
+
+        # ---- SQLite chunks + FTS5 (chunk_id üzerinden upsert; FTS tetikleyicilerle güncellenir)
+        sql_rows = [chunk_row(ids[j], texts[j], metadatas[j]) for j in range(len(texts))]
+        pending.append(store.submit(upsert_chunks, sql_rows))
+        token_rows = [(ids[j], c["token_ids"]) for j, c in enumerate(batch) if c.get("token_ids")]
+        if STORE_TOKEN_IDS and token_rows:
+            pending.append(store.submit(upsert_token_ids, token_rows))
+
+    if bump:
+        pending.append(store.submit(_bump_index_generation))
+    for future in pending:
+        future.result()  # yazma hatası varsa çağırana taşı
     logger.info(
-        "%s chunks added to Chroma collection '%s' and SQLite '%s'.",
+        "%s chunks added to %s vector store and SQLite '%s'.",
         total,
-        CHROMA_COLLECTION,
+        vector_store.name,
         Path(SQLITE_PATH).name,
     )
 
 
+def get_embedding_cache() -> Optional[ChunkEmbeddingCache]:
+    """Chunk embedding önbelleği (RAG_CHUNK_EMBED_CACHE kapalıysa None); ilk çağrıda açılır."""
+    global embedding_cache
+    if embedding_cache is None and CFG.get("RAG_CHUNK_EMBED_CACHE", True):
+        with _embedding_cache_lock:
+            if embedding_cache is None:
+                embedding_cache = build_chunk_embedding_cache(CFG, embedding_model_id(CFG))
+    return embedding_cache
+
+
+def embed_texts(texts: List[str]):
+    cache = get_embedding_cache()
+    if cache is not None:
+        return cache.encode(embedding_model, texts)
+    return embedding_model.encode(texts, convert_to_numpy=True, show_progress_bar=False)
+
+
+def find_indexed_document(document_id: str, content_hash: str) -> Optional[Dict[str, Any]]:
+    """Aynı içerik (content_hash) geçerli chunking ayarıyla zaten indexli mi? Manifest satırı ya da None."""
+    return indexed_document(store.reader(), document_id, content_hash, chunking_config_hash())
+
+
+def record_indexed_document(path: str | Path, document_id: str, content_hash: str, chunk_count: int) -> None:
+    """
+    Yüklenen dosyayı toplu indexer manifest'ine (indexed_files) yazar: aynı
+    içerik tekrar yüklenince çıkarma atlanır, korpus klasörünü tarayan
+    bulk indexer da dosyayı ikinci kez indexlemez.
+    """
+    st = os.stat(path)
+    store.write(mark_files_indexed, [{
+        "path": str(Path(path).resolve()),
+        "size": int(st.st_size),
+        "mtime_ns": int(st.st_mtime_ns),
+        "chunk_count": int(chunk_count),
+        "indexed_at": datetime.now(timezone.utc).isoformat(),
+        "sha256": content_hash,
+        "config_hash": chunking_config_hash(),
+        "document_id": document_id,
+        "chunk_ids": [],  # silme document_id üzerinden
+    }])
+
+
 def close():
-    """Uygulama kapanırken çağırmak istersen."""
-    try:
-        conn.commit()
-    finally:
-        conn.close()
+    """Uygulama kapanırken çağırmak istersen: kuyruktaki yazmaları bitirir, bağlantıları kapatır."""
+    store.close()
+    if embedding_cache is not None:
+        embedding_cache.close()
 
 
 def _ignore_missing_delete_error(exc: Exception) -> bool:
@@ -157,38 +226,34 @@ def _ignore_missing_delete_error(exc: Exception) -> bool:
     return "not found" in text or "does not exist" in text
 
 
-def _delete_chroma_document(document_id: str, chunk_ids: List[str]) -> List[str]:
+def _delete_vector_document(document_id: str, chunk_ids: List[str]) -> List[str]:
     warnings: List[str] = []
-    if collection is None:
+    if vector_store is None:
         return warnings
 
     if chunk_ids:
         try:
-            collection.delete(ids=chunk_ids)
+            vector_store.delete(ids=chunk_ids)
         except Exception as exc:
             if not _ignore_missing_delete_error(exc):
-                warnings.append(f"chroma_delete_by_ids_failed: {exc}")
+                warnings.append(f"{vector_store.name}_delete_by_ids_failed: {exc}")
 
     try:
-        collection.delete(where={"document_id": document_id})
+        vector_store.delete(document_id=document_id)
     except Exception as exc:
         if not _ignore_missing_delete_error(exc):
-            warnings.append(f"chroma_delete_by_document_id_failed: {exc}")
+            warnings.append(f"{vector_store.name}_delete_by_document_id_failed: {exc}")
 
     return warnings
 
 
-def _delete_sqlite_document(document_id: str) -> List[str]:
+def _delete_sqlite_document(document_id: str, chunk_ids: List[str] | None = None) -> List[str]:
     warnings: List[str] = []
-    if cursor is None:
+    if store is None:
         return warnings
 
     try:
-        cursor.execute("SELECT rowid FROM documents WHERE metadata LIKE ?;", (f"%{document_id}%",))
-        row_ids = [row[0] for row in cursor.fetchall()]
-        if row_ids:
-            cursor.executemany("DELETE FROM documents WHERE rowid = ?;", [(row_id,) for row_id in row_ids])
-            conn.commit()
+        store.write(delete_document, document_id, chunk_ids or [])
     except Exception as exc:
         warnings.append(f"sqlite_delete_by_document_id_failed: {exc}")
 
@@ -198,7 +263,7 @@ def _delete_sqlite_document(document_id: str) -> List[str]:
 def add_or_replace_document_chunks(chunks: List[Dict], document_id: str, batch_size: int = 100) -> List[str]:
     """
     Upload akışı için duplicate-safe ekleme.
-    Aynı document_id yeniden gelirse önce eski Chroma/FTS kayıtları temizlenir,
+    Aynı document_id yeniden gelirse önce eski vektör/FTS kayıtları temizlenir,
     sonra mevcut add_chunks_to_db yolu ile tekrar yazılır.
     """
     if not chunks:
@@ -210,39 +275,76 @@ def add_or_replace_document_chunks(chunks: List[Dict], document_id: str, batch_s
     chunk_ids = [chunk_id for chunk_id, _, _, _ in normalized]
 
     warnings: List[str] = []
-    warnings.extend(_delete_chroma_document(document_id, chunk_ids))
-    warnings.extend(_delete_sqlite_document(document_id))
+    warnings.extend(_delete_vector_document(document_id, chunk_ids))
+    warnings.extend(_delete_sqlite_document(document_id, chunk_ids))
+    store.write(_bump_index_generation)  # eski parçalar silindi; ekleme başarısız olsa da önbellek eskimiş olur
 
     add_chunks_to_db(chunks, batch_size=batch_size)
     return warnings
 
-if __name__ == "__main__":
-    import argparse
-    from .io_loader import load_documents_from_folder
-    from .preprocess import preprocess_documents
-
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--src", required=True, help="Klasör: txt/pdf/docx belgeler")
-    parser.add_argument("--batch-size", type=int, default=100)
-    parser.add_argument("--reset", action="store_true",
-                        help="Tüm koleksiyonu ve FTS içeriğini temizle")
-    args = parser.parse_args()
-
-    if args.reset:
-        # Chroma koleksiyonunu temizle/yık-yap
+def replace_document_chunks_streaming(
+    chunks: Iterable[Dict],
+    document_id: str,
+    batch_size: int = 100,
+    on_batch: Optional[Callable[[int], None]] = None,
+) -> Tuple[int, List[str]]:
+    """
+    add_or_replace_document_chunks'ın akış sürümü (sayfa sayfa PDF), iki aşamada:
+      1) `chunks` (metin çıkarma + chunking) sonuna kadar okunup geçici bir
+         dosyaya yazılır; bellekte chunk listesi birikmez. Bu aşamada hata
+         olursa index'e dokunulmaz: belgenin eski chunk'ları aranabilir kalır.
+         Hiç chunk çıkmazsa da eski kayıtlar silinmez.
+      2) eski kayıtlar silinir, dosyadaki chunk'lar batch_size'lık gruplar
+         halinde gömülüp yazılır. Belge yalnızca bu yazma aşamasında index'te
+         eksik/yarım görünür (vektör deposu ile SQLite'ı tek işlemde
+         değiştiremiyoruz); burada hata olursa yarım belge de silinir ve hata
+         çağırana taşınır.
+    Nesil sayacı (sonuç önbelleği) en sonda bir kez artar, hata yolunda da.
+    Dönüş: (yazılan chunk sayısı, uyarılar).
+    """
+    if not document_id:
+        raise ValueError("document_id is required")
+
+    with tempfile.TemporaryFile(prefix="rag-chunks-") as spool:
+        total = 0
+        for c in chunks:
+            pickle.dump(c, spool, protocol=pickle.HIGHEST_PROTOCOL)
+            total += 1
+        if not total:
+            return 0, []
+        spool.seek(0)
+
+        warnings: List[str] = []
+        warnings.extend(_delete_vector_document(document_id, []))
+        warnings.extend(_delete_sqlite_document(document_id))
+
+        written = 0
         try:
-            chroma_client.delete_collection(CHROMA_COLLECTION)
+            while written < total:
+                batch = [pickle.load(spool) for _ in range(min(batch_size, total - written))]
+                add_chunks_to_db(batch, batch_size=batch_size, bump=False)
+                written += len(batch)
+                if on_batch is not None:
+                    on_batch(written)
         except Exception:
-            pass
-        collection = chroma_client.get_or_create_collection(CHROMA_COLLECTION)
-        # FTS5 temizliği (tabloyu boşalt)
-        cursor.execute("DELETE FROM documents;")
-        conn.commit()
-        logger.info("Indexer reset completed.")
-
-    # Belgeleri yükle → chunk'la → ekle
-    docs = load_documents_from_folder(args.src)
-    chunks = preprocess_documents(docs)
-    logger.info("%s documents produced %s chunks.", len(docs), len(chunks))
-    add_chunks_to_db(chunks, batch_size=args.batch_size)
-    logger.info("Indexing completed.")
+            _delete_vector_document(document_id, [])
+            _delete_sqlite_document(document_id)
+            raise
+        finally:
+            store.write(_bump_index_generation)
+    return total, warnings
+
+
+def _reset_fts(conn: sqlite3.Connection) -> None:
+    conn.execute("DELETE FROM chunks;")  # FTS satırları tetikleyiciyle silinir
+    conn.execute("DELETE FROM indexed_files;")  # toplu indexer baştan başlasın
+    _bump_index_generation(conn)
+
+
+if __name__ == "__main__":
+    import sys
+
+    from .bulk_indexer import main
+
+    # süreç havuzu + toplu embedding + tek yazar; bu modül (__main__) yeniden import edilmesin
+    raise SystemExit(main(indexer_mod=sys.modules[__name__]))
@@ -1,5 +1,9 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 import os, re
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import glob
@@ -22,6 +26,14 @@ except Exception:
 
 SUPPORTED_EXTENSIONS = {".txt", ".md", ".docx", ".pdf", ".html", ".htm"}
 
+# PDF: sayfa sayfa okuma; büyük dosyalarda sayfa aralıkları süreç havuzunda
+PDF_WORKERS = int(CFG.get("RAG_PDF_WORKERS", 2))
+PDF_PAGE_WINDOW = int(CFG.get("RAG_PDF_PAGE_WINDOW", 32))
+PDF_PARALLEL_MIN_PAGES = int(CFG.get("RAG_PDF_PARALLEL_MIN_PAGES", 64))
+
+_pdf_pool: Optional[ProcessPoolExecutor] = None
+_pdf_pool_lock = threading.Lock()
+
 def read_txt(file_path):
     with open(file_path, "r", encoding="utf-8", errors="replace") as f:
         return f.read()
@@ -33,13 +45,76 @@ def read_docx(file_path):
     return "\n".join([p.text for p in doc.paragraphs if p.text.strip()])
 
 def read_pdf(file_path):
+    return "".join(text for _, text in iter_pdf_pages(file_path))
+
+
+def _require_fitz():
     if fitz is None:
         raise RuntimeError("PyMuPDF is not available")
-    text = ""
-    with fitz.open(file_path) as pdf:
-        for page in pdf:
-            text += page.get_text()
-    return text
+    return fitz
+
+
+def pdf_page_count(file_path) -> int:
+    with _require_fitz().open(file_path) as pdf:
+        return pdf.page_count
+
+
+def iter_pdf_pages(file_path, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+    """(1'den başlayan sayfa no, metin); belge hiçbir zaman tek string olarak tutulmaz."""
+    with _require_fitz().open(file_path) as pdf:
+        stop = pdf.page_count if stop is None else min(stop, pdf.page_count)
+        for index in range(max(0, start), stop):
+            yield index + 1, pdf.load_page(index).get_text()
+
+
+def _extract_page_range(file_path: str, start: int, stop: int) -> List[Tuple[int, str]]:
+    return list(iter_pdf_pages(file_path, start, stop))
+
+
+def _get_pdf_pool(workers: int) -> ProcessPoolExecutor:
+    # spawn: API sürecindeki thread'lerle (ingestion worker'ları, SQLite yazarı) fork güvenli değil;
+    # havuz bir kez açılır ve sonraki büyük PDF'lerde yeniden kullanılır
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pdf_pool
+
+
+def stream_pdf_pages(
+    file_path,
+    *,
+    workers: Optional[int] = None,
+    window: Optional[int] = None,
+    min_parallel_pages: Optional[int] = None,
+) -> Iterator[Tuple[int, str]]:
+    """
+    PDF sayfalarını sırayla akıtır. `min_parallel_pages` ve üstü sayfalı
+    dosyalarda sayfa aralıkları `workers` süreçte paralel çıkarılır; aynı
+    anda en fazla `window` sayfa (çıkarılmış ama tüketilmemiş) bellekte durur.
+    """
+    workers = PDF_WORKERS if workers is None else int(workers)
+    window = max(1, PDF_PAGE_WINDOW if window is None else int(window))
+    min_parallel_pages = PDF_PARALLEL_MIN_PAGES if min_parallel_pages is None else int(min_parallel_pages)
+
+    pages = pdf_page_count(file_path)
+    if workers <= 1 or pages < max(1, min_parallel_pages):
+        yield from iter_pdf_pages(file_path)
+        return
+
+    span = max(1, window // workers)
+    ranges = deque((start, min(start + span, pages)) for start in range(0, pages, span))
+    pool = _get_pdf_pool(workers)
+    in_flight = deque()
+    try:
+        while ranges or in_flight:
+            while ranges and len(in_flight) < workers:
+                start, stop = ranges.popleft()
+                in_flight.append(pool.submit(_extract_page_range, str(file_path), start, stop))
+            yield from in_flight.popleft().result()
+    finally:
+        for future in in_flight:  # tüketici erken durduysa kalan aralıkları bırak
+            future.cancel()
 
 def read_html(file_path):
     raw = read_txt(file_path)
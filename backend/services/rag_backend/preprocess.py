@@ -1,8 +1,11 @@
 # app/services/rag_backend/preprocess.py
 from __future__ import annotations
-from typing import List, Dict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import hashlib
 import re
 from config import CFG
+from .embedding import embedding_model_id
+from .token_counts import TOKEN_COUNT_KEY, TOKENIZER_KEY, tokenizer_fingerprint
 
 # Tokenizer opsiyonel: yoksa kelime-bazlı chunking'e düşeceğiz
 try:
@@ -38,6 +41,18 @@ if _HAS_TRANSFORMERS:
         _tokenizer = AutoTokenizer.from_pretrained(_RAG_TOK_DIR, use_fast=True, local_files_only=True)
     except Exception:
         _tokenizer = None
+# create_context saklanan token sayılarını yalnızca aynı tokenizer'la kullanır
+_tokenizer_fp = tokenizer_fingerprint(_tokenizer)
+
+
+def chunking_config_hash() -> str:
+    """
+    Chunk sınırlarını ve vektörleri belirleyen ayarların özeti (manifest'te
+    saklanır): değişirse korpus dosyaları ve aynı içerikli yüklemeler yeniden
+    indexlenir.
+    """
+    parts = (CHUNK_TOKENS, OVERLAP_TOKENS, WORD_CHUNK_SIZE, WORD_OVERLAP, _tokenizer_fp, embedding_model_id(CFG))
+    return hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()[:16]
 
 
 def clean_text(text: str) -> str:
@@ -60,6 +75,19 @@ def _chunk_by_tokens(text: str, chunk_tokens: int = CHUNK_TOKENS, overlap_tokens
     """
     Tokenizer mevcutsa token bazlı chunking. Special tokens eklemiyoruz.
     """
+    return [piece for piece, _ in _chunk_by_tokens_with_ids(text, chunk_tokens, overlap_tokens)]
+
+
+def _chunk_by_tokens_with_ids(
+    text: str,
+    chunk_tokens: int = CHUNK_TOKENS,
+    overlap_tokens: int = OVERLAP_TOKENS,
+) -> List[Tuple[str, List[int]]]:
+    """
+    _chunk_by_tokens + her parçanın token id'leri. Id'ler decode edilmiş
+    parçanın yeniden encode'udur: sorgu anında create_context'in aynı metin
+    için bulacağı değerle birebir aynı.
+    """
     assert _tokenizer is not None, "Tokenizer yüklü değil."
     text = clean_text(text)
     # not: encode/decode sırasında special token eklemiyoruz
@@ -67,7 +95,7 @@ def _chunk_by_tokens(text: str, chunk_tokens: int = CHUNK_TOKENS, overlap_tokens
     if not input_ids:
         return []
 
-    chunks: List[str] = []
+    chunks: List[Tuple[str, List[int]]] = []
     start = 0
     L = len(input_ids)
 
@@ -77,7 +105,8 @@ def _chunk_by_tokens(text: str, chunk_tokens: int = CHUNK_TOKENS, overlap_tokens
         # T5 için decode ederken özel tokenları atla
         piece = _tokenizer.decode(piece_ids, skip_special_tokens=True, clean_up_tokenization_spaces=True)
         if piece.strip():
-            chunks.append(piece.strip())
+            piece = piece.strip()
+            chunks.append((piece, list(_tokenizer.encode(piece, add_special_tokens=False))))
         if end == L:
             break
         # overlap kadar geri sar
@@ -122,21 +151,56 @@ def chunk_text(text: str,
       - Tokenizer yüklüyse token bazlı,
       - değilse kelime bazlı fallback.
     """
+    return [piece for piece, _ in _chunk_records(text, chunk_tokens, overlap_tokens)]
+
+
+def _chunk_records(text: str, chunk_tokens: int, overlap_tokens: int) -> List[Tuple[str, Optional[List[int]]]]:
+    """chunk_text gövdesi: (parça, token id'leri | kelime bazlı yedekte None)."""
     if _tokenizer is not None:
         try:
-            chunks = _chunk_by_tokens(text, chunk_tokens, overlap_tokens)
+            chunks = _chunk_by_tokens_with_ids(text, chunk_tokens, overlap_tokens)
             if chunks:
                 return chunks
         except Exception:
             # herhangi bir tokenizer hatasında kelime bazlıya düş
             pass
-    return _chunk_by_words(text, WORD_CHUNK_SIZE, WORD_OVERLAP)
+    return [(piece, None) for piece in _chunk_by_words(text, WORD_CHUNK_SIZE, WORD_OVERLAP)]
+
+
+def _chunk_record(
+    file_name: str,
+    base_metadata: Dict[str, Any],
+    index: int,
+    piece: str,
+    token_ids: Optional[List[int]],
+    **extra_metadata: Any,
+) -> Dict[str, Any]:
+    chunk_metadata = dict(base_metadata)
+    chunk_metadata["chunk_index"] = index
+    chunk_metadata.update(extra_metadata)
+    record = {
+        "file_name": file_name,
+        "chunk": piece,
+        "order": index,
+        "chunk_index": index,
+        "document_id": chunk_metadata.get("document_id"),
+        "source": chunk_metadata.get("source"),
+        "metadata": chunk_metadata,
+    }
+    if token_ids is not None and _tokenizer_fp:
+        chunk_metadata[TOKEN_COUNT_KEY] = len(token_ids)
+        chunk_metadata[TOKENIZER_KEY] = _tokenizer_fp
+        record["token_ids"] = token_ids
+    return record
 
 
 def preprocess_documents(documents: List[Dict]) -> List[Dict]:
     """
     Input:  [{'file_name': str, 'text': str}, ...]
     Output: [{'file_name': str, 'chunk': str, 'order': int}, ...]
+    Token bazlı chunking'de kayıt ayrıca 'token_ids' taşır ve metadata'ya
+    token sayısı + tokenizer parmak izi yazılır (create_context yeniden
+    tokenize etmez).
     Not: Şemanın router/indexer/search ile uyumlu kalması için
          alan adlarını standartlaştırıyoruz.
     """
@@ -151,17 +215,75 @@ def preprocess_documents(documents: List[Dict]) -> List[Dict]:
         base_metadata.setdefault("file_name", file_name)
         base_metadata.setdefault("source", file_name)
 
-        pieces = chunk_text(raw_text, CHUNK_TOKENS, OVERLAP_TOKENS)
-        for i, p in enumerate(pieces):
-            chunk_metadata = dict(base_metadata)
-            chunk_metadata["chunk_index"] = i
-            results.append({
-                "file_name": file_name,
-                "chunk": p,
-                "order": i,
-                "chunk_index": i,
-                "document_id": chunk_metadata.get("document_id"),
-                "source": chunk_metadata.get("source"),
-                "metadata": chunk_metadata,
-            })
+        pieces = _chunk_records(raw_text, CHUNK_TOKENS, OVERLAP_TOKENS)
+        for i, (p, token_ids) in enumerate(pieces):
+            results.append(_chunk_record(file_name, base_metadata, i, p, token_ids))
     return results
+
+
+# -----------------------------
+# SAYFA AKIŞI (PDF)
+# -----------------------------
+def chunk_pages(
+    pages: Iterable[Tuple[int, str]],
+    chunk_tokens: int = CHUNK_TOKENS,
+    overlap_tokens: int = OVERLAP_TOKENS,
+) -> Iterator[Tuple[str, Optional[List[int]], int, int]]:
+    """
+    (sayfa no, metin) akışını chunk_text ile aynı pencere/overlap kuralıyla
+    parçalar: (parça, token id'leri | None, ilk sayfa, son sayfa). Bellekte
+    yalnızca bir pencere + son sayfanın token'ları durur; parçalar sayfa
+    sınırlarını aşabilir. Tokenizer yoksa kelime bazlı.
+    """
+    use_tokens = _tokenizer is not None
+    size, overlap = (chunk_tokens, overlap_tokens) if use_tokens else (WORD_CHUNK_SIZE, WORD_OVERLAP)
+    size, overlap = max(1, size), max(0, min(overlap, size - 1))
+    units: List[Any] = []
+    unit_pages: List[int] = []
+    covered = 0  # baştaki, önceki parçada zaten bulunan (overlap) birim sayısı
+
+    def emit(end: int):
+        if use_tokens:
+            piece = _tokenizer.decode(units[:end], skip_special_tokens=True, clean_up_tokenization_spaces=True).strip()
+            ids = list(_tokenizer.encode(piece, add_special_tokens=False)) if piece else None
+        else:
+            piece, ids = " ".join(units[:end]).strip(), None
+        return (piece, ids, unit_pages[0], unit_pages[end - 1]) if piece else None
+
+    for page_no, text in pages:
+        text = clean_text(text)
+        if not text:
+            continue
+        new = _tokenizer.encode(text, add_special_tokens=False) if use_tokens else text.split()
+        units.extend(new)
+        unit_pages.extend([page_no] * len(new))
+        while len(units) >= size:
+            chunk = emit(size)
+            if chunk is not None:
+                yield chunk
+            del units[:size - overlap], unit_pages[:size - overlap]
+            covered = overlap
+    if len(units) > covered:
+        chunk = emit(len(units))
+        if chunk is not None:
+            yield chunk
+
+
+def preprocess_pdf(file_path, metadata: Optional[Dict[str, Any]] = None, **stream_options: Any) -> Iterator[Dict]:
+    """
+    PDF'i sayfa sayfa okuyup chunk kayıtlarını akıtır (preprocess_documents
+    şeması + metadata'da page_start / page_end). Belge metni hiçbir zaman
+    bütün halinde oluşmaz. `stream_options` io_loader.stream_pdf_pages'e gider.
+    """
+    from pathlib import Path
+
+    from .io_loader import stream_pdf_pages
+
+    base_metadata = dict(metadata or {})
+    file_name = base_metadata.get("file_name") or Path(file_path).name
+    base_metadata.setdefault("file_name", file_name)
+    base_metadata.setdefault("source", file_name)
+
+    pages = stream_pdf_pages(file_path, **stream_options)
+    for i, (piece, token_ids, first, last) in enumerate(chunk_pages(pages)):
+        yield _chunk_record(file_name, base_metadata, i, piece, token_ids, page_start=first, page_end=last)
@@ -1,20 +1,68 @@
 # app/services/rag_backend/prompt.py
+from functools import lru_cache
 from typing import List, Dict, Optional
 from . import RAG_MAX_CTX_TOKENS
 import json
 from transformers import AutoTokenizer
 from config import CFG
 from utils.text import rag_instruction  # prompt iskeleti için
+from .token_counts import TOKEN_COUNT_KEY, TOKENIZER_KEY, tokenizer_fingerprint
 
 # T5 tokenizer ve sınır
 _T5_TOK_DIR = str(CFG.get("T5_TOKENIZER_DIR", "assets/models/t5/tokenizer"))
 _T5_MAX = int(CFG.get("T5_MAX_SRC_LEN", 512))
 _tok = AutoTokenizer.from_pretrained(_T5_TOK_DIR, use_fast=True, local_files_only=True)
+# index'teki token_count'lar yalnızca aynı parmak izli tokenizer'la üretildiyse kullanılır
+_TOK_FP = tokenizer_fingerprint(_tok)
+_STORE_TOKEN_IDS = bool(CFG.get("RAG_STORE_TOKEN_IDS", False))
 
 
 def _tok_len(s: str) -> int:
     return len(_tok.encode(s, add_special_tokens=False))
 
+
+@lru_cache(maxsize=256)
+def _overhead(question: str) -> int:
+    """Boş context'li prompt iskeletinin token maliyeti (aynı soru için bir kez)."""
+    return _tok_len(f"{rag_instruction()}\nContext: \nQuestion: {question}\nAnswer:")
+
+
+@lru_cache(maxsize=1)
+def _separator_len() -> int:
+    """Parçalar arasındaki "\n\n"nin token maliyeti (T5'te genelde 0)."""
+    return max(0, _tok_len("x\n\n") - _tok_len("x"))
+
+
+def _stored_len(c: Dict) -> Optional[int]:
+    """Index-time token sayısı; farklı tokenizer'la sayılmışsa None (yeniden encode edilir)."""
+    metadata = c.get("metadata") or {}
+    count = metadata.get(TOKEN_COUNT_KEY)
+    if count is None or not _TOK_FP or metadata.get(TOKENIZER_KEY) != _TOK_FP:
+        return None
+    try:
+        return int(count)
+    except (TypeError, ValueError):
+        return None
+
+
+def _chunk_ids(c: Dict, stored: bool) -> List[int]:
+    """Kırpılacak parçanın token id'leri: kayıtta / chunk_tokens tablosunda varsa encode yok."""
+    if stored:
+        if c.get("token_ids"):
+            return list(c["token_ids"])
+        chunk_id = (c.get("metadata") or {}).get("chunk_id")
+        if _STORE_TOKEN_IDS and chunk_id:
+            try:
+                from .fts_schema import fetch_token_ids
+                from .indexer import store
+
+                ids = fetch_token_ids(store.reader(), str(chunk_id))
+                if ids is not None:
+                    return ids
+            except Exception:
+                pass
+    return _tok.encode(c.get("chunk", "") or "", add_special_tokens=False)
+
 def create_context(
     chunks: List[Dict],
     max_tokens: int = RAG_MAX_CTX_TOKENS,
@@ -24,10 +72,13 @@ def create_context(
     Context'i tokenizer bazlı BÜTÜN PROMPT bütçesine göre keser.
     Yani: (instruction + "Context:" + context + "Question:" + question + "Answer:")
     toplamı T5_MAX_SRC_LEN'i aşmaz.
+
+    Chunk metadata'sında index-time `token_count` (aynı tokenizer parmak
+    iziyle) varsa parça yeniden tokenize edilmez; bütçe tamsayı toplamıyla
+    hesaplanır. Yalnızca sığmayan son parça id'leri üzerinden kırpılır.
     """
     # 1) Prompt iskeleti (context boşken) → soru ve talimatın token maliyeti
-    skeleton = f"{rag_instruction()}\nContext: \nQuestion: {question or ''}\nAnswer:"
-    overhead = _tok_len(skeleton)
+    overhead = _overhead(question or "")
 
     # 2) Bağlam için kalan bütçe = min(max_tokens, T5_MAX) - overhead
     budget = min(int(max_tokens), int(_T5_MAX)) - overhead
@@ -38,12 +89,13 @@ def create_context(
     used = 0
     for c in chunks:
         t = c.get("chunk", "") or ""
-        need = _tok_len(t + "\n\n")
+        stored = _stored_len(c)
+        need = stored + _separator_len() if stored is not None else _tok_len(t + "\n\n")
         if need <= 0:
             continue
         if used + need > budget:
             # Parça fazla geliyorsa token bazlı sağdan kırp
-            ids = _tok.encode(t, add_special_tokens=False)
+            ids = _chunk_ids(c, stored is not None)
             keep = max(0, budget - used)
             if keep > 0 and len(ids) > keep:
                 t = _tok.decode(ids[:keep], skip_special_tokens=True)
@@ -0,0 +1,87 @@
+# app/services/rag_backend/quantization.py
+from __future__ import annotations
+import math
+from typing import Any, Mapping, Optional
+
+import numpy as np
+
+QUANTIZATION_MODES = ("int8", "binary")
+
+if hasattr(np, "bitwise_count"):  # numpy >= 2.0
+    def _popcount(words: np.ndarray) -> np.ndarray:
+        return np.bitwise_count(words)
+else:
+    _POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def _popcount(words: np.ndarray) -> np.ndarray:
+        return _POPCOUNT8[words.view(np.uint8)].reshape(*words.shape, 8).sum(axis=-1)
+
+
+class EmbeddingQuantizer:
+    """
+    Birim embedding'lerin ön-eleme (prefilter) kodları.
+
+    - int8: her bileşen sabit bir aralıkta ([-c, c], c = 4/sqrt(D)) 127
+      seviyeye yuvarlanır; skor int8 kodların iç çarpımıdır. Kod dosyası
+      float32 matrisin 1/4'ü kadardır.
+    - binary: yalnızca işaret biti; skor eksi Hamming uzaklığıdır. Kodlar
+      uint64 sözcüklere hizalanır, 384 boyut 48 bayta iner (1/32).
+
+    `dims` > 0 ise yalnızca ilk `dims` boyut kodlanır (boyut kırpma). Aralık
+    sabit olduğu için kodlar ekleme sırasından bağımsızdır; dosya yalnızca
+    sona eklenerek büyüyebilir.
+    """
+
+    def __init__(self, mode: str, dims: int = 0) -> None:
+        mode = str(mode).strip().lower()
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"quantization must be one of {QUANTIZATION_MODES}, got {mode!r}")
+        self.mode = mode
+        self.dims = max(0, int(dims))
+
+    @property
+    def descr(self) -> str:
+        return "|i1" if self.mode == "int8" else "|u1"
+
+    @property
+    def file_name(self) -> str:
+        suffix = f"_d{self.dims}" if self.dims else ""
+        return f"codes_{self.mode}{suffix}.npy"
+
+    def _used_dims(self, dim: int) -> int:
+        return min(self.dims, dim) if self.dims else dim
+
+    def width(self, dim: int) -> int:
+        """Satır başına kod genişliği (bayt)."""
+        used = self._used_dims(dim)
+        return used if self.mode == "int8" else int(math.ceil(used / 64) * 8)
+
+    def encode(self, unit_rows: np.ndarray) -> np.ndarray:
+        dim = unit_rows.shape[1]
+        x = unit_rows[:, : self._used_dims(dim)]
+        if self.mode == "int8":
+            clip = min(1.0, 4.0 / math.sqrt(dim))
+            return np.clip(np.rint(x * (127.0 / clip)), -127, 127).astype(np.int8)
+        bits = np.packbits(x > 0, axis=1)
+        codes = np.zeros((len(x), self.width(dim)), dtype=np.uint8)
+        codes[:, : bits.shape[1]] = bits
+        return codes
+
+    def scores(self, query_codes: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """(Q, w) x (B, w) -> (Q, B) ön-eleme skoru; büyük değer daha yakın."""
+        if self.mode == "int8":
+            # numpy'da int32 matmul BLAS kullanmaz; float32'ye çevirip sgemm daha hızlı
+            return query_codes.astype(np.float32) @ np.asarray(codes, dtype=np.float32).T
+        words = np.ascontiguousarray(codes).view(np.uint64)
+        q_words = np.ascontiguousarray(query_codes).view(np.uint64)
+        out = np.empty((len(q_words), len(words)), dtype=np.float32)
+        for i, q in enumerate(q_words):
+            out[i] = -_popcount(words ^ q).sum(axis=1, dtype=np.int32)
+        return out
+
+
+def build_quantizer(cfg: Mapping[str, Any]) -> Optional[EmbeddingQuantizer]:
+    mode = str(cfg.get("VECTOR_QUANTIZATION", "none") or "none").strip().lower()
+    if mode in ("", "none", "off"):
+        return None
+    return EmbeddingQuantizer(mode, int(cfg.get("VECTOR_QUANT_DIMS", 0) or 0))
@@ -0,0 +1,103 @@
+# app/services/rag_backend/retrieval_cache.py
+from __future__ import annotations
+import json
+import re
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from utils.cache import LRUCache
+
+_WS = re.compile(r"\s+")
+
+
+def _embedding_bytes(vector: np.ndarray) -> int:
+    return int(vector.nbytes) + 96
+
+
+def _results_bytes(results: List[Dict[str, Any]]) -> int:
+    # chunk text + metadata dominate; json length is a close enough estimate
+    return len(json.dumps(results, ensure_ascii=False, default=str).encode("utf-8")) + 128 * len(results)
+
+
+def _copy_results(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [{**r, "metadata": dict(r.get("metadata") or {})} for r in results]
+
+
+def normalize_query(query: str) -> str:
+    """Case-folded, whitespace-collapsed query used for the result cache key."""
+    return _WS.sub(" ", query or "").strip().casefold()
+
+
+class RetrievalCache:
+    """
+    Two-level cache in front of hybrid_search.
+
+    1. query text -> query embedding (skips the MiniLM forward pass);
+    2. (normalized query, top_k, fusion weights, index generation) -> fused
+       results (skips embedding, Chroma ANN and FTS5 BM25 altogether).
+
+    The index generation is bumped by every write to the index, so entries
+    made before an upload simply stop matching; LRU order and the byte
+    budgets evict them later.
+    """
+
+    def __init__(
+        self,
+        embedding_max_bytes: int,
+        result_max_bytes: int,
+        result_ttl_seconds: float | None = None,
+    ) -> None:
+        self.embeddings = LRUCache(embedding_max_bytes, sizeof=_embedding_bytes)
+        self.results = LRUCache(result_max_bytes, ttl_seconds=result_ttl_seconds, sizeof=_results_bytes)
+
+    # ---------- level 1 ----------
+    @staticmethod
+    def embedding_key(query: str) -> str:
+        # tokenizers ignore whitespace runs, so collapsing them does not change the vector
+        return _WS.sub(" ", query or "").strip()
+
+    def get_embedding(self, query: str) -> Optional[np.ndarray]:
+        if self.embeddings.max_bytes <= 0:
+            return None
+        return self.embeddings.get(self.embedding_key(query))
+
+    def put_embedding(self, query: str, vector: Any) -> None:
+        if self.embeddings.max_bytes > 0:
+            self.embeddings.put(self.embedding_key(query), np.asarray(vector, dtype=np.float32))
+
+    # ---------- level 2 ----------
+    @staticmethod
+    def result_key(query: str, top_k: int, weights: Tuple[float, float], generation: int) -> tuple:
+        return normalize_query(query), int(top_k), tuple(float(w) for w in weights), int(generation)
+
+    def get_results(self, key: tuple) -> Optional[List[Dict[str, Any]]]:
+        if self.results.max_bytes <= 0:
+            return None
+        cached = self.results.get(key)
+        return _copy_results(cached) if cached is not None else None
+
+    def put_results(self, key: tuple, results: List[Dict[str, Any]]) -> None:
+        if self.results.max_bytes > 0:
+            self.results.put(key, _copy_results(results))
+
+    def clear(self) -> None:
+        self.embeddings.clear()
+        self.results.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"embeddings": self.embeddings.stats(), "results": self.results.stats()}
+
+
+def build_retrieval_cache(cfg: Mapping[str, Any]) -> Optional[RetrievalCache]:
+    if not bool(cfg.get("RAG_CACHE_ENABLED", True)):
+        return None
+    embedding_bytes = int(cfg.get("RAG_EMBED_CACHE_MAX_BYTES", 4 * 1024 * 1024))
+    result_bytes = int(cfg.get("RAG_RESULT_CACHE_MAX_BYTES", 8 * 1024 * 1024))
+    if embedding_bytes <= 0 and result_bytes <= 0:
+        return None
+    return RetrievalCache(
+        embedding_bytes,
+        result_bytes,
+        result_ttl_seconds=float(cfg.get("RAG_RESULT_CACHE_TTL_SECONDS", 600)),
+    )
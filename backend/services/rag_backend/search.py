@@ -1,30 +1,56 @@
 # app/rag_backend/search.py
 from __future__ import annotations
 from typing import List, Tuple, Dict, Any
-import json
 import math
+import sqlite3
+
+import numpy as np
 
 from .indexer import (
     embedding_model,
-    collection,
-    sqlite_cur as cursor,  # FTS5 için sqlite cursor (indexer.py'de oluşturuluyor)
+    store,
+    vector_store,
 )
-from . import TOP_K, VECTOR_WEIGHT, BM25_WEIGHT
+from . import TOP_K, VECTOR_WEIGHT, BM25_WEIGHT, RAG_VECTOR_TIMEOUT_SECONDS, RAG_BM25_TIMEOUT_SECONDS
+from .fanout import start_branch
+from .fts_schema import BM25_SQL, fetch_chunks, fts5_match_query, row_metadata
+from .retrieval_cache import build_retrieval_cache
+from .vector_store import VectorHit
+from config import CFG
+from services.micro_batcher import build_micro_batcher, length_bucket
+
+
+def _bm25_cursor() -> sqlite3.Cursor:
+    # BM25 aramaları fan-out havuzunda koşar; her thread indexer.store'dan kendi
+    # salt-okunur (WAL) bağlantısını alır, süren bir toplu yazma onu bekletmez.
+    return store.reader().cursor()
+
+
+# Sorgu embedding'i + birleşik sonuç önbelleği (RAG_CACHE_ENABLED)
+_cache = build_retrieval_cache(CFG)
+
+
+def index_generation() -> int | None:
+    """Indexer'ın her yazmada artırdığı nesil sayacı; okunamazsa None (sonuç önbelleği atlanır)."""
+    try:
+        row = _bm25_cursor().execute("SELECT value FROM index_meta WHERE key = 'generation';").fetchone()
+    except sqlite3.Error:
+        return None
+    return int(row[0]) if row else 0
+
+
+def retrieval_cache_stats() -> Dict[str, Any] | None:
+    if _cache is None:
+        return None
+    return {**_cache.stats(), "index_generation": index_generation()}
 
 
 # -----------------------------
 # Yardımcılar
 # -----------------------------
-def _extract_fname(metadata_json: str | None) -> str:
-    """metadata JSON içinden dosya adını çıkarmaya çalışır."""
-    if not metadata_json:
-        return "unknown"
-    try:
-        meta = json.loads(metadata_json)
-        # yaygın alan adları
-        return meta.get("file_name") or meta.get("source") or meta.get("path") or "unknown"
-    except Exception:
-        return "unknown"
+def _fusion_key(text: str, metadata: Dict[str, Any] | None) -> str:
+    chunk_id = (metadata or {}).get("chunk_id")
+    return f"id:{chunk_id}" if chunk_id else f"text:{text}"
 
 
 def _min_max_scale(values: List[float]) -> List[float]:
@@ -38,79 +64,131 @@ def _min_max_scale(values: List[float]) -> List[float]:
     return [(v - vmin) / (vmax - vmin) for v in values]
 
 
+# -----------------------------
+# Sorgu embedding'i (micro-batching)
+# -----------------------------
+def encode_queries_batch(queries: List[str]):
+    """Birden çok sorgunun embedding'i tek encoder çalıştırmasında: (N, D) numpy."""
+    return embedding_model.encode(list(queries), convert_to_numpy=True, batch_size=max(1, len(queries)))
+
+
+# EMBED_BATCHING_ENABLED iken eşzamanlı sorgular tek forward pass'te birleşir
+_query_batcher = build_micro_batcher(
+    CFG,
+    "EMBED",
+    "embedding",
+    lambda queries: list(encode_queries_batch(queries)),
+    max_batch_size=32,
+    max_wait_ms=2.0,
+    bucket_key=lambda query: length_bucket(len(query.split()), width=32),
+)
+
+
+def embed_query(query: str) -> Tuple[List[float], int | None]:
+    """Tek sorgunun embedding'i ve (batching açıksa) kuyrukta bekleme süresi (ms)."""
+    cached = _cache.get_embedding(query) if _cache is not None else None
+    if cached is not None:
+        return cached.tolist(), None
+    queue_wait_ms = None
+    if _query_batcher is not None:
+        vector, queue_wait_ms = _query_batcher.call(query)
+    else:
+        vector = encode_queries_batch([query])[0]
+    if _cache is not None:
+        _cache.put_embedding(query, vector)
+    return vector.tolist(), queue_wait_ms
+
+
 # -----------------------------
 # Arama fonksiyonları
 # -----------------------------
-def chroma_search(query: str, top_k: int = TOP_K, include_metadata: bool = False) -> List[Tuple]:
+def chroma_search(
+    query: str,
+    top_k: int = TOP_K,
+    include_metadata: bool = False,
+    timings: Dict[str, Any] | None = None,
+) -> List[Tuple]:
     """
-    ChromaDB üzerinde semantik arama.
+    Vektör deposunda (VECTOR_BACKEND: Chroma veya mmap) semantik arama.
     Dönüş: (chunk_text, distance, file_name)
 
     Not: Index tarafında embedding_model.encode() ile manuel embedding
     üretildiği için, query tarafında da aynı model kullanılır.
     query_texts yerine query_embeddings ile tutarlılık sağlanır.
+    `timings` verilirse embedding kuyruk beklemesi oraya yazılır.
     """
-    if collection is None:
+    if vector_store is None:
         return []
 
-    query_embedding = embedding_model.encode([query], convert_to_numpy=True).tolist()
-    res = collection.query(
-        query_embeddings=query_embedding,
-        n_results=top_k,
-        include=["documents", "distances", "metadatas"],
-    )
-    docs = (res.get("documents") or [[]])[0]
-    dists = (res.get("distances") or [[]])[0]
-    metas = (res.get("metadatas") or [[]])[0]
+    query_embedding, queue_wait_ms = embed_query(query)
+    if timings is not None and queue_wait_ms is not None:
+        timings["embedding_queue_wait_ms"] = queue_wait_ms
+    hits = vector_store.query(np.asarray([query_embedding], dtype=np.float32), top_k)[0]
+    return _vector_rows(hits, include_metadata)
+
+
+def chroma_search_batch(queries: List[str], top_k: int = TOP_K, include_metadata: bool = False) -> List[List[Tuple]]:
+    """chroma_search for several queries: one embedding pass and one vector-store query."""
+    if vector_store is None or not queries:
+        return [[] for _ in queries]
+
+    hits = vector_store.query(np.asarray(encode_queries_batch(queries), dtype=np.float32), top_k)
+    return [_vector_rows(query_hits, include_metadata) for query_hits in hits]
+
+
+def _vector_rows(hits: List[VectorHit], include_metadata: bool) -> List[Tuple]:
+    # mmap deposu metin/metadata tutmaz: SQLite chunks tablosundan chunk_id ile doldur
+    missing = [h.chunk_id for h in hits if h.text is None]
+    if missing:
+        found = fetch_chunks(store.reader(), missing)
+        for h in hits:
+            if h.text is None and h.chunk_id in found:
+                h.text, h.metadata = found[h.chunk_id]
 
     out: List[Tuple] = []
-    for doc, dist, meta in zip(docs, dists, metas):
-        # meta dict ise doğrudan, string ise json.loads ile al
-        if isinstance(meta, dict):
-            fname = meta.get("file_name") or meta.get("source") or meta.get("path") or "unknown"
-            metadata = meta
-        else:
-            fname = _extract_fname(meta)
-            try:
-                metadata = json.loads(meta) if meta else {}
-            except Exception:
-                metadata = {}
+    for h in hits:
+        if h.text is None:
+            continue  # vektör var, parça silinmiş (eşzamanlı silme)
+        metadata = dict(h.metadata or {})
+        metadata["chunk_id"] = h.chunk_id  # BM25 sonuçlarıyla birleştirme anahtarı
+        fname = metadata.get("file_name") or metadata.get("source") or metadata.get("path") or "unknown"
         if include_metadata:
-            out.append((str(doc), float(dist), fname, metadata))
+            out.append((str(h.text), float(h.distance), fname, metadata))
         else:
-            out.append((str(doc), float(dist), fname))
+            out.append((str(h.text), float(h.distance), fname))
     return out
 
 
-def bm25_search(query: str, top_k: int = TOP_K, include_metadata: bool = False) -> List[Tuple]:
+def bm25_search(
+    query: str,
+    top_k: int = TOP_K,
+    include_metadata: bool = False,
+    raise_errors: bool = False,
+) -> List[Tuple]:
     """
     SQLite FTS5 üzerinde anahtar kelime araması.
     Dönüş: (chunk_text, bm25_score, file_name)  -- Not: bm25_score'da DÜŞÜK değer daha iyi.
+    include_metadata=True iken metadata["chunk_id"] Chroma id'siyle aynıdır.
+    Soru kelimelere ayrılıp tırnaklı OR ifadesi olarak aranır (fts5_match_query).
+    `raise_errors=True` iken SQLite hatası (kilitli / eksik veritabanı) çağırana
+    taşınır; hybrid_search dal durumunu ve önbelleğe almayı buna göre belirler.
     """
-    if cursor is None:
+    match = fts5_match_query(query)
+    if not match:
         return []
-
-    # FTS5 MATCH söz dizimi: basit halde, gelen metni doğrudan kullanıyoruz.
-    sql = """
-        SELECT content, bm25(documents) AS score, metadata
-        FROM documents
-        WHERE documents MATCH ?
-        ORDER BY score ASC
-        LIMIT ?
-    """
     try:
-        cursor.execute(sql, (query, int(top_k)))
+        cursor = _bm25_cursor()
+        cursor.execute(BM25_SQL, (match, int(top_k)))
         rows = cursor.fetchall()
     except Exception:
+        if raise_errors:
+            raise
         return []
 
     out: List[Tuple] = []
-    for content, score, metadata_json in rows:
-        fname = _extract_fname(metadata_json)
-        try:
-            metadata = json.loads(metadata_json) if metadata_json else {}
-        except Exception:
-            metadata = {}
+    for chunk_id, content, score, *columns, metadata_json in rows:
+        metadata = row_metadata(chunk_id, columns, metadata_json)
+        fname = metadata.get("file_name") or metadata.get("source") or metadata.get("path") or "unknown"
         if include_metadata:
             out.append((str(content), float(score), fname, metadata))
         else:
@@ -118,14 +196,63 @@ def bm25_search(query: str, top_k: int = TOP_K, include_metadata: bool = False)
     return out
 
 
-def hybrid_search(query: str, top_k: int = TOP_K) -> List[Dict[str, Any]]:
+def hybrid_search(query: str, top_k: int = TOP_K, timings: Dict[str, Any] | None = None) -> List[Dict[str, Any]]:
     """
     Chroma (semantic) + BM25 (keyword) skorlarını normalize edip ağırlıklarla birleştir.
-    Dönüş: [{'chunk': str, 'score': float(0..1), 'file_name': str}, ...]  skora göre azalan
+    Dönüş: [{'chunk': str, 'score': float(0..1), 'file_name': str, 'chunk_id'?: str}, ...]  skora göre azalan
+    İki daldan gelen aynı parça chunk_id üzerinden tek sonuçta birleşir.
+
+    İki alt arama aynı anda başlar, her biri kendi zaman aşımıyla
+    (RAG_VECTOR_TIMEOUT_SECONDS / RAG_BM25_TIMEOUT_SECONDS). Biri hata verir
+    veya zaman aşımına uğrarsa diğerinin sonuçlarıyla devam edilir; `timings`
+    verilirse dal başına durum ve süre "vector" / "bm25" anahtarlarına yazılır.
+
+    Aynı (normalize) sorgu, top_k, ağırlıklar ve index nesli için birleşik
+    sonuç önbellekten döner ("result_cache": "hit"). Yalnızca iki dalın da
+    başarılı olduğu sonuçlar önbelleğe alınır.
+    """
+    key = None
+    if _cache is not None:
+        generation = index_generation()
+        if generation is not None:
+            key = _cache.result_key(query, top_k, (VECTOR_WEIGHT, BM25_WEIGHT), generation)
+            cached = _cache.get_results(key)
+            if timings is not None:
+                timings["result_cache"] = "hit" if cached is not None else "miss"
+            if cached is not None:
+                return cached
+
+    results, complete = _fused_search(query, top_k, timings)
+    if key is not None and complete:
+        _cache.put_results(key, results)
+    return results
+
+
+def _fused_search(query: str, top_k: int, timings: Dict[str, Any] | None) -> Tuple[List[Dict[str, Any]], bool]:
     """
-    # 1) alt aramalar
-    chroma_results = chroma_search(query, top_k=top_k, include_metadata=True)   # (text, distance, fname, metadata)
-    bm25_results   = bm25_search(query, top_k=top_k, include_metadata=True)     # (text, bm25,   fname, metadata)
+    hybrid_search'ün önbelleksiz gövdesi; (sonuçlar, iki dal da başarılı mı) döner.
+    Dal fonksiyonları hatayı yutmaz (bm25_search raise_errors=True): SQLite
+    hatası BranchOutcome'da "error" olarak görünür, "ok, 0 sonuç" olarak değil.
+    """
+    # 1) alt aramalar (paralel)
+    vector = start_branch(
+        "vector", chroma_search, query, top_k=top_k, include_metadata=True, timings=timings,
+        timeout_s=RAG_VECTOR_TIMEOUT_SECONDS,
+    )
+    bm25 = start_branch(
+        "bm25", bm25_search, query, top_k=top_k, include_metadata=True, raise_errors=True,
+        timeout_s=RAG_BM25_TIMEOUT_SECONDS,
+    )
+    vector_out, bm25_out = vector.wait(), bm25.wait()
+    if timings is not None:
+        timings["vector"] = vector_out.as_metadata()
+        timings["bm25"] = bm25_out.as_metadata()
+    if not vector_out.ok and not bm25_out.ok:
+        raise RuntimeError(f"local retrieval failed: vector {vector_out.error}; bm25 {bm25_out.error}")
+
+    complete = vector_out.ok and bm25_out.ok
+    chroma_results = vector_out.value or []   # (text, distance, fname, metadata)
+    bm25_results = bm25_out.value or []       # (text, bm25,   fname, metadata)
 
     # 2) Chroma: distance -> similarity (1 - d), ardından normalize
     ch_texts = [t for t, _, _, _ in chroma_results]
@@ -141,41 +268,46 @@ def hybrid_search(query: str, top_k: int = TOP_K) -> List[Dict[str, Any]]:
     bm_scores_raw = [-s for _, s, _, _ in bm25_results]  # büyük değer daha iyi olacak
     bm_scores = _min_max_scale(bm_scores_raw)
 
-    # 4) Birleştir (text bazında)
+    # 4) Birleştir (chunk_id bazında; id'siz eski kayıtlarda metin anahtar olur)
     combined: Dict[str, Dict[str, Any]] = {}
 
     # Chroma katkısı
     for text, sim, fname, metadata in zip(ch_texts, ch_sims, ch_fnames, ch_metas):
-        if text not in combined:
-            combined[text] = {"score": 0.0, "file_name": fname, "metadata": metadata}
-        combined[text]["score"] = float(combined[text]["score"]) + float(sim) * float(VECTOR_WEIGHT)
+        key = _fusion_key(text, metadata)
+        if key not in combined:
+            combined[key] = {"chunk": text, "score": 0.0, "file_name": fname, "metadata": metadata}
+        combined[key]["score"] = float(combined[key]["score"]) + float(sim) * float(VECTOR_WEIGHT)
 
     # BM25 katkısı
     for text, sc, fname, metadata in zip(bm_texts, bm_scores, bm_fnames, bm_metas):
-        if text not in combined:
-            combined[text] = {"score": 0.0, "file_name": fname, "metadata": metadata}
-        combined[text]["score"] = float(combined[text]["score"]) + float(sc) * float(BM25_WEIGHT)
-        if not combined[text].get("metadata") and metadata:
-            combined[text]["metadata"] = metadata
+        key = _fusion_key(text, metadata)
+        if key not in combined:
+            combined[key] = {"chunk": text, "score": 0.0, "file_name": fname, "metadata": metadata}
+        combined[key]["score"] = float(combined[key]["score"]) + float(sc) * float(BM25_WEIGHT)
+        if not combined[key].get("metadata") and metadata:
+            combined[key]["metadata"] = metadata
         # Eğer farklı kaynak isimleri varsa ilkini koruyoruz; istersen burada tercih yapabilirsin.
 
     if not combined:
-        return []
+        return [], complete
 
     # 5) Skoru [0,1] aralığına kırp
-    results = [
-        {
-            "chunk": text,
+    results = []
+    for data in combined.values():
+        metadata = data.get("metadata") if isinstance(data.get("metadata"), dict) else {}
+        result = {
+            "chunk": data["chunk"],
             "score": max(0.0, min(1.0, float(data["score"]))),
             "file_name": str(data["file_name"]),
-            "metadata": data.get("metadata") if isinstance(data.get("metadata"), dict) else {},
+            "metadata": metadata,
         }
-        for text, data in combined.items()
-    ]
+        if metadata.get("chunk_id"):
+            result["chunk_id"] = metadata["chunk_id"]
+        results.append(result)
 
     # 6) Sırala ve top_k
     results.sort(key=lambda x: x["score"], reverse=True)
-    return results[:top_k]
+    return results[:top_k], complete
 
 
 __all__ = ["chroma_search", "bm25_search", "hybrid_search"]
@@ -0,0 +1,203 @@
+# app/services/rag_backend/sqlite_store.py
+from __future__ import annotations
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class SQLiteConnectionManager:
+    """
+    WAL-mode SQLite access for the FTS5 index: many readers, one writer.
+
+    - `reader()` returns a read-only connection owned by the calling thread
+      (opened once per thread, `mode=ro` + `query_only`), so BM25 queries on
+      the fan-out pool and FastAPI's threadpool never share a cursor.
+    - All writes go through a queue to a single writer thread that owns the
+      only read-write connection. `submit(fn)` enqueues `fn(conn, ...)` and
+      returns a Future; `write(fn)` waits for it. Each job runs in its own
+      `BEGIN IMMEDIATE` transaction and is rolled back if it raises.
+
+    In WAL mode readers keep seeing the last committed snapshot while a bulk
+    index write is in progress, so they are never blocked by it.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        *,
+        mmap_size: int = 256 * 1024 * 1024,
+        cache_size_kib: int = 16 * 1024,
+        busy_timeout_ms: int = 5000,
+    ) -> None:
+        self.path = str(path)
+        self.mmap_size = max(0, int(mmap_size))
+        self.cache_size_kib = max(0, int(cache_size_kib))
+        self.busy_timeout_ms = max(0, int(busy_timeout_ms))
+
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        self._closed = False
+
+        self._writes = 0
+        self._write_errors = 0
+        self._write_ms_total = 0.0
+
+    # ---------- connections ----------
+    def _tune(self, conn: sqlite3.Connection) -> None:
+        conn.execute(f"PRAGMA busy_timeout = {self.busy_timeout_ms};")
+        conn.execute(f"PRAGMA mmap_size = {self.mmap_size};")
+        if self.cache_size_kib:
+            conn.execute(f"PRAGMA cache_size = -{self.cache_size_kib};")  # negatif = KiB
+
+    def _open_writer(self) -> sqlite3.Connection:
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        # isolation_level=None: işlem sınırlarını _run_job açıkça yönetir
+        conn = sqlite3.connect(self.path, isolation_level=None)
+        self._tune(conn)
+        conn.execute("PRAGMA journal_mode = WAL;")
+        conn.execute("PRAGMA synchronous = NORMAL;")  # WAL'da güvenli, commit başına fsync yok
+        return conn
+
+    def reader(self) -> sqlite3.Connection:
+        """Calling thread's read-only connection (opened on first use)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            uri = f"{Path(self.path).resolve().as_uri()}?mode=ro"
+            # check_same_thread=False yalnızca close() başka thread'den kapatabilsin diye
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            self._tune(conn)
+            conn.execute("PRAGMA query_only = ON;")
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+
+    # ---------- writer ----------
+    def _ensure_writer(self) -> None:
+        with self._writer_lock:
+            if self._closed:
+                raise RuntimeError(f"SQLite store '{Path(self.path).name}' is closed")
+            if self._writer is None:
+                ready: Future = Future()
+                self._writer = threading.Thread(
+                    target=self._writer_loop, args=(ready,), name="sqlite-writer", daemon=True
+                )
+                self._writer.start()
+                ready.result()  # bağlantı açılamazsa hatayı çağırana taşı
+
+    def _writer_loop(self, ready: Future) -> None:
+        try:
+            conn = self._open_writer()
+        except Exception as exc:
+            with self._writer_lock:
+                self._writer = None
+            ready.set_exception(exc)
+            return
+        ready.set_result(None)
+        try:
+            while True:
+                job = self._queue.get()
+                if job is _STOP:
+                    break
+                self._run_job(conn, *job)
+        finally:
+            conn.close()
+
+    def _run_job(self, conn: sqlite3.Connection, fn: Callable[..., Any], args: tuple, kwargs: dict, future: Future) -> None:
+        if not future.set_running_or_notify_cancel():
+            return
+        started = time.perf_counter()
+        try:
+            conn.execute("BEGIN IMMEDIATE;")
+            try:
+                result = fn(conn, *args, **kwargs)
+            except BaseException:
+                conn.execute("ROLLBACK;")
+                raise
+            conn.execute("COMMIT;")
+        except Exception as exc:
+            self._write_errors += 1
+            logger.warning("SQLite write job %s failed: %s", getattr(fn, "__name__", fn), exc)
+            future.set_exception(exc)
+        else:
+            future.set_result(result)
+        finally:
+            self._writes += 1
+            self._write_ms_total += (time.perf_counter() - started) * 1000
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        """Queue `fn(conn, *args, **kwargs)` for the writer thread; one transaction per job."""
+        self._ensure_writer()
+        future: Future = Future()
+        self._queue.put((fn, args, kwargs, future))
+        return future
+
+    def write(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """`submit` and wait; re-raises the job's exception."""
+        return self.submit(fn, *args, **kwargs).result()
+
+    # ---------- lifecycle ----------
+    def stats(self) -> Dict[str, Any]:
+        with self._readers_lock:
+            readers = len(self._readers)
+        return {
+            "path": self.path,
+            "reader_connections": readers,
+            "write_queue_depth": self._queue.qsize(),
+            "writes": self._writes,
+            "write_errors": self._write_errors,
+            "avg_write_ms": round(self._write_ms_total / self._writes, 2) if self._writes else None,
+        }
+
+    def stop_writer(self) -> None:
+        """
+        Drain queued writes and stop the writer thread; the next write starts
+        a new one. Lets a caller fork worker processes while no writer thread
+        (and no lock it might hold) exists.
+        """
+        with self._writer_lock:
+            writer, self._writer = self._writer, None
+            if writer is not None:
+                self._queue.put(_STOP)
+        if writer is not None:
+            writer.join()
+
+    def close(self) -> None:
+        """Drain queued writes, stop the writer and close every reader connection."""
+        with self._writer_lock:
+            self._closed = True
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            self._queue.put(_STOP)
+            writer.join()
+        with self._readers_lock:
+            readers, self._readers = self._readers, []
+        for conn in readers:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
+
+def build_sqlite_store(path: str | Path, cfg: Mapping[str, Any]) -> SQLiteConnectionManager:
+    return SQLiteConnectionManager(
+        path,
+        mmap_size=int(cfg.get("RAG_SQLITE_MMAP_BYTES", 256 * 1024 * 1024)),
+        cache_size_kib=int(cfg.get("RAG_SQLITE_CACHE_KIB", 16 * 1024)),
+        busy_timeout_ms=int(cfg.get("RAG_SQLITE_BUSY_TIMEOUT_MS", 5000)),
+    )
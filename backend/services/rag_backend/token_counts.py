@@ -0,0 +1,27 @@
+# app/services/rag_backend/token_counts.py
+from __future__ import annotations
+import hashlib
+from typing import Any, Optional
+
+# chunk metadata anahtarları (Chroma ve SQLite metadata'sında skaler olarak durur)
+TOKEN_COUNT_KEY = "token_count"
+TOKENIZER_KEY = "token_fp"
+
+_PROBE = "PathFinder tokenizer probe: Life jackets, deck 2 — ĞÜŞİÖÇ 0123."
+
+
+def tokenizer_fingerprint(tokenizer: Any) -> Optional[str]:
+    """
+    Tokenizer'ın makineden bağımsız kısa kimliği (kelime dağarcığı boyu +
+    sabit bir metnin id'leri). Index'te saklanan token sayıları yalnızca
+    aynı parmak izine sahip tokenizer için geçerlidir.
+    """
+    if tokenizer is None:
+        return None
+    try:
+        ids = tokenizer.encode(_PROBE, add_special_tokens=False)
+        size = len(tokenizer)
+    except Exception:
+        return None
+    digest = hashlib.sha1(f"{size}:{list(ids)}".encode("utf-8")).hexdigest()
+    return digest[:12]
@@ -0,0 +1,505 @@
+# app/services/rag_backend/vector_store.py
+from __future__ import annotations
+import json
+import logging
+import os
+import struct
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .quantization import EmbeddingQuantizer, build_quantizer
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class VectorHit:
+    """
+    Tek benzerlik sonucu. `distance` Chroma'nın varsayılan l2 uzayıyla aynı
+    ölçektedir (birim vektörlerde 2 - 2*cos), böylece füzyon formülü değişmez.
+    `text` / `metadata` None ise çağıran SQLite `chunks` tablosundan doldurur.
+    """
+
+    chunk_id: str
+    distance: float
+    text: Optional[str] = None
+    metadata: Optional[Dict[str, Any]] = field(default=None)
+
+
+class VectorStore:
+    """chroma_search / add_chunks_to_db'nin konuştuğu arayüz."""
+
+    name = "base"
+
+    def add(
+        self,
+        ids: Sequence[str],
+        embeddings: np.ndarray,
+        documents: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]],
+    ) -> None:
+        raise NotImplementedError
+
+    def query(self, embeddings: np.ndarray, top_k: int) -> List[List[VectorHit]]:
+        """(Q, D) sorgu matrisi -> sorgu başına en yakın top_k sonuç."""
+        raise NotImplementedError
+
+    def delete(self, ids: Sequence[str] = (), document_id: Optional[str] = None) -> None:
+        raise NotImplementedError
+
+    def reset(self) -> None:
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "vectors": self.count()}
+
+
+# -----------------------------
+# Chroma
+# -----------------------------
+class ChromaVectorStore(VectorStore):
+    name = "chroma"
+
+    def __init__(self, path: str, collection_name: str) -> None:
+        import chromadb
+
+        self.collection_name = collection_name
+        self.client = chromadb.PersistentClient(path=path)
+        self.collection = self.client.get_or_create_collection(collection_name)
+
+    def add(self, ids, embeddings, documents, metadatas) -> None:
+        self.collection.add(
+            ids=list(ids),
+            embeddings=np.asarray(embeddings).tolist(),
+            metadatas=list(metadatas),
+            documents=list(documents),
+        )
+
+    def query(self, embeddings: np.ndarray, top_k: int) -> List[List[VectorHit]]:
+        res = self.collection.query(
+            query_embeddings=np.asarray(embeddings).tolist(),
+            n_results=top_k,
+            include=["documents", "distances", "metadatas"],
+        )
+        out: List[List[VectorHit]] = []
+        for i in range(len(embeddings)):
+            ids = ((res.get("ids") or [])[i:i + 1] or [[]])[0]
+            docs = ((res.get("documents") or [])[i:i + 1] or [[]])[0]
+            dists = ((res.get("distances") or [])[i:i + 1] or [[]])[0]
+            metas = ((res.get("metadatas") or [])[i:i + 1] or [[]])[0]
+            out.append([
+                VectorHit(str(cid), float(dist), str(doc), _as_dict(meta))
+                for cid, doc, dist, meta in zip(ids, docs, dists, metas)
+            ])
+        return out
+
+    def delete(self, ids: Sequence[str] = (), document_id: Optional[str] = None) -> None:
+        # Eksik kayıt hataları çağıranda (indexer._ignore_missing_delete_error) ayıklanır
+        if ids:
+            self.collection.delete(ids=list(ids))
+        if document_id:
+            self.collection.delete(where={"document_id": document_id})
+
+    def reset(self) -> None:
+        try:
+            self.client.delete_collection(self.collection_name)
+        except Exception:
+            pass
+        self.collection = self.client.get_or_create_collection(self.collection_name)
+
+    def count(self) -> int:
+        return int(self.collection.count())
+
+
+def _as_dict(meta: Any) -> Dict[str, Any]:
+    if isinstance(meta, dict):
+        return dict(meta)
+    try:
+        return json.loads(meta) if meta else {}
+    except Exception:
+        return {}
+
+
+# -----------------------------
+# Memory-mapped float32 matris
+# -----------------------------
+_HEADER_BYTES = 128  # sabit boy: satır eklenince başlık yerinde yeniden yazılır
+
+
+def _npy_header(rows: int, width: int, descr: str = "<f4") -> bytes:
+    body = "{'descr': '%s', 'fortran_order': False, 'shape': (%d, %d), }" % (descr, rows, width)
+    body_len = _HEADER_BYTES - 10
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", body_len) + (body.ljust(body_len - 1) + "\n").encode("latin1")
+
+
+def _npy_rows(path: Path) -> int:
+    """Başlıktaki satır sayısı (dosya yoksa 0)."""
+    if not path.exists():
+        return 0
+    with path.open("rb") as f:
+        np.lib.format.read_magic(f)
+        shape, _, _ = np.lib.format.read_array_header_1_0(f)
+    return int(shape[0])
+
+
+def _open_npy(path: Path) -> Optional[np.ndarray]:
+    # boş veriyle mmap açılamaz
+    return np.load(path, mmap_mode="r") if _npy_rows(path) > 0 else None
+
+
+def _append_npy(path: Path, rows: int, block: np.ndarray, descr: str) -> None:
+    """`block`'u satır `rows`'tan itibaren yazar, sonra başlığı günceller (okuyucular başlığa güvenir)."""
+    mode = "r+b" if path.exists() else "w+b"
+    with path.open(mode) as f:
+        if mode == "w+b":
+            f.write(_npy_header(0, block.shape[1], descr))
+        f.seek(_HEADER_BYTES + rows * block.shape[1] * block.dtype.itemsize)
+        f.write(np.ascontiguousarray(block).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+        f.seek(0)
+        f.write(_npy_header(rows + len(block), block.shape[1], descr))
+
+
+def _blocked_topk(
+    score_block: Callable[[int, int], np.ndarray],
+    n: int,
+    k: int,
+    live: np.ndarray,
+    block_rows: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """[0, n) satırlarını bloklar halinde skorlayıp sorgu başına en iyi k (skor, satır); sırasız."""
+    best_scores: Optional[np.ndarray] = None
+    best_rows: Optional[np.ndarray] = None
+    for start in range(0, n, block_rows):
+        end = min(start + block_rows, n)
+        scores = np.asarray(score_block(start, end), dtype=np.float32)  # (Q, B)
+        scores[:, ~live[start:end]] = -np.inf
+        kk = min(k, end - start)
+        part = np.argpartition(-scores, kk - 1, axis=1)[:, :kk]
+        part_scores = np.take_along_axis(scores, part, axis=1)
+        if best_scores is None:
+            best_scores, best_rows = part_scores, part + start
+        else:
+            best_scores = np.concatenate([best_scores, part_scores], axis=1)
+            best_rows = np.concatenate([best_rows, part + start], axis=1)
+        if best_scores.shape[1] > k:
+            keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+            best_scores = np.take_along_axis(best_scores, keep, axis=1)
+            best_rows = np.take_along_axis(best_rows, keep, axis=1)
+    return best_scores, best_rows
+
+
+class MmapVectorStore(VectorStore):
+    """
+    Birim uzunluğa normalize edilmiş embedding'ler `embeddings.npy` içinde
+    (N, D) float32 matris olarak durur; dosya yalnızca sona eklenir.
+    `ids.jsonl` satır başına {chunk_id, document_id} tutar, `tombstones.txt`
+    silinen / üzerine yazılan satır numaralarını. Metin ve metadata burada
+    saklanmaz (SQLite `chunks` tablosu tek kaynaktır).
+
+    Sorgular dosyayı `mmap_mode="r"` ile açar: sayfalar işletim sistemi
+    önbelleğinde işçi süreçler arasında paylaşılır. Dosya büyüdüyse (başka
+    süreç yazdıysa) bir sonraki sorguda yeniden eşlenir. Yazan tek süreç
+    olmalıdır (API upload'u veya indexer CLI'ı, aynı anda ikisi değil).
+
+    `quantizer` yoksa arama tam (exact) top-k'dır: satır blokları halinde
+    matris çarpımı ve `argpartition`. Varsa matrisin yanında int8 / binary
+    kodlar (`codes_*.npy`) tutulur; sorgu önce tüm kodları tarayıp
+    top_k * rescore_factor aday seçer, sonra yalnızca adayların float32
+    satırlarıyla yeniden skorlar. Henüz kodu yazılmamış satırlar (başka
+    süreç yeni ekledi) her zaman aday sayılır.
+    """
+
+    name = "mmap"
+    block_rows = 65536
+    # int8 kodlar blok blok float32'ye çevrilir; küçük blok CPU önbelleğinde kalır
+    prefilter_block_rows = 8192
+
+    def __init__(
+        self,
+        path: str | Path,
+        quantizer: Optional[EmbeddingQuantizer] = None,
+        rescore_factor: int = 4,
+    ) -> None:
+        self.dir = Path(path)
+        self.matrix_path = self.dir / "embeddings.npy"
+        self.ids_path = self.dir / "ids.jsonl"
+        self.tombstones_path = self.dir / "tombstones.txt"
+        self.quantizer = quantizer
+        self.rescore_factor = max(1, int(rescore_factor))
+        self.codes_path = self.dir / quantizer.file_name if quantizer is not None else None
+        self._lock = threading.RLock()
+        self._signature: tuple | None = None
+        self._matrix: np.ndarray | None = None
+        self._codes: np.ndarray | None = None
+        self._ids: List[str] = []
+        self._ids_bytes = 0  # ids.jsonl'de yayımlanmış satırların bittiği bayt
+        self._docs: List[Optional[str]] = []
+        self._live: np.ndarray = np.zeros(0, dtype=bool)
+        self._rows_by_id: Dict[str, int] = {}
+
+    # ---------- okuma tarafı ----------
+    def _files(self) -> List[Path]:
+        files = [self.matrix_path, self.ids_path, self.tombstones_path]
+        return files + [self.codes_path] if self.codes_path is not None else files
+
+    def _stat_signature(self) -> tuple:
+        sig = []
+        for p in self._files():
+            try:
+                st = p.stat()
+                sig.append((st.st_size, st.st_mtime_ns))
+            except FileNotFoundError:
+                sig.append(None)
+        return tuple(sig)
+
+    def _refresh(self) -> None:
+        signature = self._stat_signature()
+        if signature == self._signature:
+            return
+        matrix = _open_npy(self.matrix_path)
+        rows = 0 if matrix is None else int(matrix.shape[0])
+        codes = _open_npy(self.codes_path) if self.codes_path is not None else None
+
+        ids: List[str] = []
+        docs: List[Optional[str]] = []
+        ids_bytes = 0
+        if self.ids_path.exists():
+            with self.ids_path.open("rb") as f:
+                for line in f:
+                    if len(ids) >= rows or not line.endswith(b"\n"):
+                        break  # başlıktan sonra yazılmış (henüz yayımlanmamış) satırlar
+                    rec = json.loads(line)
+                    ids.append(rec["id"])
+                    docs.append(rec.get("doc"))
+                    ids_bytes += len(line)
+
+        live = np.ones(rows, dtype=bool)
+        if self.tombstones_path.exists():
+            dead = np.loadtxt(self.tombstones_path, dtype=np.int64, ndmin=1)
+            live[dead[dead < rows]] = False
+
+        rows_by_id = {cid: i for i, cid in enumerate(ids) if live[i]}
+        self._matrix, self._codes, self._ids, self._docs, self._live = matrix, codes, ids, docs, live
+        self._ids_bytes = ids_bytes
+        self._rows_by_id = rows_by_id
+        self._signature = signature
+
+    def query(self, embeddings: np.ndarray, top_k: int) -> List[List[VectorHit]]:
+        queries = _unit_rows(embeddings)
+        with self._lock:
+            self._refresh()
+            matrix, codes, live, ids = self._matrix, self._codes, self._live, self._ids
+        n = len(ids)
+        if matrix is None or not n or top_k <= 0:
+            return [[] for _ in range(len(queries))]
+
+        if self.quantizer is None or codes is None or n <= top_k * self.rescore_factor:
+            scores, rows = _blocked_topk(lambda s, e: queries @ np.asarray(matrix[s:e]).T, n, top_k, live, self.block_rows)
+        else:
+            scores, rows = self._prefilter_and_rescore(queries, matrix, codes, live, n, top_k)
+
+        order = np.argsort(-scores, axis=1, kind="stable")
+        out: List[List[VectorHit]] = []
+        for qi in range(len(queries)):
+            hits = []
+            for j in order[qi]:
+                score = float(scores[qi, j])
+                if not np.isfinite(score):
+                    continue
+                hits.append(VectorHit(ids[int(rows[qi, j])], max(0.0, 2.0 - 2.0 * score)))
+            out.append(hits)
+        return out
+
+    def _prefilter_and_rescore(
+        self,
+        queries: np.ndarray,
+        matrix: np.ndarray,
+        codes: np.ndarray,
+        live: np.ndarray,
+        n: int,
+        top_k: int,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        quantizer = self.quantizer
+        coded = min(len(codes), n)
+        query_codes = quantizer.encode(queries)
+        _, candidates = _blocked_topk(
+            lambda s, e: quantizer.scores(query_codes, codes[s:e]),
+            coded,
+            top_k * self.rescore_factor,
+            live,
+            self.prefilter_block_rows,
+        )
+        tail = np.flatnonzero(live[coded:n]) + coded  # kodsuz yeni satırlar
+
+        scores = np.full((len(queries), top_k), -np.inf, dtype=np.float32)
+        rows = np.zeros((len(queries), top_k), dtype=np.int64)
+        for qi, query in enumerate(queries):
+            cand = np.unique(np.concatenate([candidates[qi], tail]))
+            cand = cand[live[cand]]
+            if not len(cand):
+                continue
+            exact = np.asarray(matrix[cand]) @ query  # yalnızca aday satırların sayfaları okunur
+            k = min(top_k, len(cand))
+            best = np.argpartition(-exact, k - 1)[:k]
+            scores[qi, :k] = exact[best]
+            rows[qi, :k] = cand[best]
+        return scores, rows
+
+    def count(self) -> int:
+        with self._lock:
+            self._refresh()
+            return int(self._live.sum())
+
+    # ---------- yazma tarafı ----------
+    def add(self, ids, embeddings, documents=(), metadatas=()) -> None:
+        vectors = _unit_rows(embeddings)
+        if not len(ids):
+            return
+        if len(ids) != len(vectors):
+            raise ValueError(f"{len(ids)} ids for {len(vectors)} embeddings")
+        metadatas = list(metadatas) or [{} for _ in ids]
+        with self._lock:
+            self._refresh()
+            self.dir.mkdir(parents=True, exist_ok=True)
+            rows, dim = (0, vectors.shape[1]) if self._matrix is None else self._matrix.shape
+            if dim != vectors.shape[1]:
+                raise ValueError(f"embedding dim {vectors.shape[1]} != store dim {dim}")
+
+            # aynı chunk_id yeniden gelirse eski satır mezar taşı olur
+            replaced = [self._rows_by_id[cid] for cid in ids if cid in self._rows_by_id]
+            # 1) id'ler, 2) vektörler, 3) başlık: okuyucular yalnızca başlıktaki satır sayısına güvenir.
+            # Yarıda kalmış bir add'in başlığa girmemiş id satırları önce kesilir; yoksa yeni id'ler
+            # onların arkasına, vektörler ise `rows`. satıra yazılır ve eşleşme kayar.
+            if self.ids_path.exists() and self.ids_path.stat().st_size > self._ids_bytes:
+                with self.ids_path.open("r+b") as f:
+                    f.truncate(self._ids_bytes)
+            with self.ids_path.open("a", encoding="utf-8") as f:
+                for cid, meta in zip(ids, metadatas):
+                    f.write(json.dumps({"id": cid, "doc": (meta or {}).get("document_id")}) + "\n")
+            _append_npy(self.matrix_path, rows, vectors.astype("<f4", copy=False), "<f4")
+            if self.quantizer is not None:
+                self._sync_codes(rows, vectors)
+            self._tombstone(replaced)
+            self._signature = None
+
+    def _sync_codes(self, rows: int, new_vectors: Optional[np.ndarray] = None) -> None:
+        """Kod dosyasını matrisle aynı boya getirir (kodlama sonradan açıldıysa eksikleri doldurur)."""
+        quantizer = self.quantizer
+        coded = _npy_rows(self.codes_path)
+        for start in range(coded, rows, self.block_rows):
+            end = min(start + self.block_rows, rows)
+            backlog = quantizer.encode(np.asarray(self._matrix[start:end]))
+            _append_npy(self.codes_path, start, backlog, quantizer.descr)
+        if new_vectors is not None:
+            _append_npy(self.codes_path, rows, quantizer.encode(new_vectors), quantizer.descr)
+
+    def sync_codes(self) -> int:
+        """Eksik kodları matristen üretir; kodlu satır sayısı."""
+        if self.quantizer is None:
+            return 0
+        with self._lock:
+            self._refresh()
+            if self._matrix is None:
+                return 0
+            self._sync_codes(len(self._matrix))
+            self._signature = None
+            return len(self._matrix)
+
+    def _tombstone(self, rows: Iterable[int]) -> None:
+        rows = list(rows)
+        if rows:
+            with self.tombstones_path.open("a", encoding="utf-8") as f:
+                f.write("".join(f"{r}\n" for r in rows))
+
+    def delete(self, ids: Sequence[str] = (), document_id: Optional[str] = None) -> None:
+        with self._lock:
+            self._refresh()
+            dead = {self._rows_by_id[cid] for cid in ids if cid in self._rows_by_id}
+            if document_id:
+                dead.update(i for i, doc in enumerate(self._docs) if doc == document_id and self._live[i])
+            self._tombstone(sorted(dead))
+            self._signature = None
+
+    def reset(self) -> None:
+        with self._lock:
+            for p in [self.matrix_path, self.ids_path, self.tombstones_path, *self.dir.glob("codes_*.npy")]:
+                p.unlink(missing_ok=True)
+            self._signature = None
+
+    def compact(self) -> int:
+        """Mezar taşlı satırları atıp dosyaları yeniden yazar; kalan vektör sayısı."""
+        with self._lock:
+            self._refresh()
+            if self._matrix is None:
+                return 0
+            keep = np.flatnonzero(self._live)
+            if not len(keep):
+                self.reset()
+                return 0
+            staging = MmapVectorStore(self.dir / ".compact", self.quantizer, self.rescore_factor)
+            staging.reset()
+            staging.add(
+                [self._ids[i] for i in keep],
+                np.asarray(self._matrix[keep]),
+                metadatas=[{"document_id": self._docs[i]} for i in keep],
+            )
+            # diğer ayarlarla üretilmiş kodlar artık eski satır numaralarını gösterir
+            for stale in self.dir.glob("codes_*.npy"):
+                stale.unlink()
+            # okuyucular eski dosyaların mmap'ini tutabilir; os.replace onları bozmaz
+            for p in staging._files():
+                if p.exists() and p.name != "tombstones.txt":
+                    os.replace(p, self.dir / p.name)
+            self.tombstones_path.unlink(missing_ok=True)
+            staging.dir.rmdir()
+            self._signature = None
+            return len(keep)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refresh()
+            rows = len(self._ids)
+            live = int(self._live.sum())
+            dim = 0 if self._matrix is None else int(self._matrix.shape[1])
+            coded = 0 if self._codes is None else int(len(self._codes))
+        out = {"backend": self.name, "vectors": live, "dead_rows": rows - live, "dim": dim, "path": str(self.dir)}
+        if self.quantizer is not None:
+            out["quantization"] = {
+                "mode": self.quantizer.mode,
+                "dims": self.quantizer.dims or dim,
+                "coded_rows": coded,
+                "rescore_factor": self.rescore_factor,
+            }
+        return out
+
+
+def _unit_rows(embeddings: Any) -> np.ndarray:
+    vectors = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def build_vector_store(cfg: Mapping[str, Any]) -> VectorStore:
+    """VECTOR_BACKEND: chroma (varsayılan) veya mmap."""
+    backend = str(cfg.get("VECTOR_BACKEND", "chroma") or "chroma").strip().lower()
+    if backend == "chroma":
+        return ChromaVectorStore(
+            str(cfg.get("CHROMA_PATH", "assets/rag/chroma_db")),
+            str(cfg.get("CHROMA_COLLECTION", "pathfinder_corpus")),
+        )
+    if backend == "mmap":
+        return MmapVectorStore(
+            str(cfg.get("VECTOR_STORE_PATH", "assets/rag/vectors")),
+            quantizer=build_quantizer(cfg),
+            rescore_factor=int(cfg.get("VECTOR_RESCORE_FACTOR", 4) or 4),
+        )
+    raise ValueError(f"VECTOR_BACKEND must be 'chroma' or 'mmap', got {backend!r}")
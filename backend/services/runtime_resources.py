@@ -0,0 +1,290 @@
+# app/services/runtime_resources.py
+from __future__ import annotations
+import logging
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Tuple
+
+import onnxruntime as ort
+
+from services.ort_graph_cache import OptimizedGraphCache
+
+logger = logging.getLogger(__name__)
+
+# Relative share of the CPU thread budget each model gets when its intra-op
+# thread count is left on auto (0). T5 runs two session pools that are busy
+# at the same time; its share is split 1 : 3 because the decoder runs once
+# per generated token and dominates chat latency.
+_AUTO_WEIGHTS: Dict[str, int] = {"t5_encoder": 1, "t5_decoder": 3, "yolo": 2, "nlu": 1, "embedding": 1}
+
+# config key prefixes per model, most specific first (T5_ENCODER_* falls back to T5_*)
+_CFG_PREFIX: Dict[str, Tuple[str, ...]] = {
+    "t5_encoder": ("T5_ENCODER", "T5"),
+    "t5_decoder": ("T5_DECODER", "T5"),
+    "nlu": ("CLS",),
+    "yolo": ("YOLO",),
+}
+_CFG_SUFFIXES = ("INTRA_OP_THREADS", "INTER_OP_THREADS", "SESSION_REPLICAS")
+
+
+def _setting(cfg: Mapping[str, Any], prefixes: Tuple[str, ...], suffix: str) -> int:
+    """First positive `<PREFIX>_<SUFFIX>` value; 0 when none is set."""
+    for prefix in prefixes:
+        value = int(cfg.get(f"{prefix}_{suffix}", 0) or 0)
+        if value > 0:
+            return value
+    return 0
+
+
+def _budget_settings(cfg: Mapping[str, Any]) -> Tuple[Any, ...]:
+    keys = ["CPU_THREAD_BUDGET", "EMBED_TORCH_THREADS"] + [
+        f"{prefix}_{suffix}" for prefixes in _CFG_PREFIX.values() for prefix in prefixes for suffix in _CFG_SUFFIXES
+    ]
+    return tuple(int(cfg.get(key, 0) or 0) for key in sorted(set(keys)))
+
+
+@dataclass(frozen=True)
+class ThreadBudget:
+    model: str
+    intra_op_threads: int
+    inter_op_threads: int
+    replicas: int
+
+    @property
+    def threads(self) -> int:
+        return self.replicas * self.intra_op_threads * max(1, self.inter_op_threads)
+
+
+class SessionPool:
+    """
+    N replicas of one ONNX model. Each `run` checks out a free replica, so up
+    to N requests run in parallel, each on its own bounded intra-op pool,
+    instead of piling onto one session's thread pool.
+
+    Drop-in for `ort.InferenceSession` where callers only use run,
+    get_inputs and get_outputs; other attributes resolve to the first
+    replica (meaningful when there is only one).
+    """
+
+    def __init__(self, name: str, sessions: List[Any]) -> None:
+        if not sessions:
+            raise ValueError("SessionPool needs at least one session")
+        self.name = name
+        self._sessions = list(sessions)
+        self._free: "queue.Queue[Any]" = queue.Queue()
+        for sess in self._sessions:
+            self._free.put(sess)
+        self._lock = threading.Lock()
+        self._runs = 0
+        self._waits = 0
+
+    @property
+    def size(self) -> int:
+        return len(self._sessions)
+
+    @contextmanager
+    def acquire(self) -> Iterator[Any]:
+        try:
+            sess = self._free.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                self._waits += 1
+            sess = self._free.get()
+        try:
+            yield sess
+        finally:
+            self._free.put(sess)
+
+    def run(self, output_names, input_feed, run_options=None):
+        with self._lock:
+            self._runs += 1
+        with self.acquire() as sess:
+            return sess.run(output_names, input_feed, run_options)
+
+    def get_inputs(self):
+        return self._sessions[0].get_inputs()
+
+    def get_outputs(self):
+        return self._sessions[0].get_outputs()
+
+    def __getattr__(self, item: str) -> Any:
+        # only reached for attributes SessionPool does not define (io_binding, ...)
+        if item.startswith("_"):
+            raise AttributeError(item)
+        return getattr(self._sessions[0], item)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "replicas": self.size,
+                "idle": self._free.qsize(),
+                "runs": self._runs,
+                "waited_for_replica": self._waits,
+            }
+
+
+class CPUResourceManager:
+    """
+    Central CPU thread budget for every model in the process.
+
+    Each ONNX model gets explicit intra/inter-op thread counts and a replica
+    count (`<PREFIX>_INTRA_OP_THREADS`, `<PREFIX>_INTER_OP_THREADS`,
+    `<PREFIX>_SESSION_REPLICAS` with T5_ENCODER / T5_DECODER (falling back
+    to T5) / CLS / YOLO prefixes); the embedder gets `EMBED_TORCH_THREADS`
+    torch threads (or ORT intra-op threads with `EMBED_BACKEND=onnx`).
+    Counts left at 0 are derived from `CPU_THREAD_BUDGET` (default: all
+    cores) by fixed weights, so the models together do not oversubscribe
+    the machine. `report()` adds up the threads of every session pool that
+    was actually built (models without a pool yet count their planned
+    budget).
+    """
+
+    def __init__(self, cfg: Mapping[str, Any], cpu_count: Optional[int] = None) -> None:
+        self.cpu_count = int(cpu_count or os.cpu_count() or 1)
+        self.total_threads = int(cfg.get("CPU_THREAD_BUDGET", 0) or 0) or self.cpu_count
+        self._lock = threading.Lock()
+        # (budget model, absolute model path, replicas) -> pool
+        self._pools: Dict[Tuple[str, str, int], SessionPool] = {}
+        self._torch: Dict[str, Any] = {"applied": False}
+
+        self.budgets: Dict[str, ThreadBudget] = {}
+        for model, prefixes in _CFG_PREFIX.items():
+            replicas = max(1, _setting(cfg, prefixes, "SESSION_REPLICAS"))
+            intra = _setting(cfg, prefixes, "INTRA_OP_THREADS") or self._auto_threads(model, replicas)
+            inter = max(1, _setting(cfg, prefixes, "INTER_OP_THREADS"))
+            self.budgets[model] = ThreadBudget(model, intra, inter, replicas)
+        embed = int(cfg.get("EMBED_TORCH_THREADS", 0) or 0) or self._auto_threads("embedding", 1)
+        self.budgets["embedding"] = ThreadBudget("embedding", embed, 1, 1)
+
+        # empty ORT_GRAPH_CACHE_DIR (the default outside config.CFG) disables the cache
+        cache_dir = str(cfg.get("ORT_GRAPH_CACHE_DIR", "") or "")
+        self.graph_cache = OptimizedGraphCache(
+            cache_dir, enabled=bool(cfg.get("ORT_GRAPH_CACHE_ENABLED", True)) and bool(cache_dir)
+        )
+
+    def _auto_threads(self, model: str, replicas: int) -> int:
+        share = self.total_threads * _AUTO_WEIGHTS[model] / sum(_AUTO_WEIGHTS.values())
+        return max(1, int(share // replicas))
+
+    # ---------- ONNX Runtime ----------
+    def session_options(self, model: str) -> ort.SessionOptions:
+        budget = self.budgets[model]
+        so = ort.SessionOptions()
+        so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        so.intra_op_num_threads = budget.intra_op_threads
+        so.inter_op_num_threads = budget.inter_op_threads
+        return so
+
+    def session_pool(
+        self,
+        model: str,
+        path: str,
+        *,
+        replicas: Optional[int] = None,
+        factory: Optional[Callable[[str, ort.SessionOptions], Any]] = None,
+        key: Optional[str] = None,
+    ) -> SessionPool:
+        """
+        Build (or reuse) the replica pool for one ONNX file of `model`.
+
+        Pools are shared per (model, absolute file path, replica count): a
+        second generator with another model file gets its own sessions, and
+        a request for a different replica count (e.g. a single decoder for
+        batching) gets its own pool instead of the cached one. `key` names
+        the pool in reports and the graph cache.
+        """
+        count = self.budgets[model].replicas if replicas is None else max(1, int(replicas))
+        cache_key = (model, os.path.abspath(path), count)
+        make = factory or (
+            lambda p, so: ort.InferenceSession(p, so, providers=["CPUExecutionProvider"])
+        )
+        with self._lock:
+            pool = self._pools.get(cache_key)
+            if pool is None:
+                name = key or model
+                if any(other.name == name for other in self._pools.values()):
+                    name = f"{name}[{os.path.basename(path)}x{count}]"
+                sessions = [
+                    self.graph_cache.create_session(name, path, self.session_options(model), make)
+                    for _ in range(count)
+                ]
+                pool = SessionPool(name, sessions)
+                self._pools[cache_key] = pool
+        return pool
+
+    # ---------- torch (SentenceTransformer) ----------
+    def configure_torch(self) -> Dict[str, Any]:
+        """Pin torch intra/inter-op threads for the embedder; a no-op when torch is missing."""
+        threads = self.budgets["embedding"].intra_op_threads
+        with self._lock:
+            if self._torch.get("applied"):
+                return dict(self._torch)
+            try:
+                import torch
+            except Exception:
+                self._torch = {"applied": False, "reason": "torch_unavailable"}
+                return dict(self._torch)
+            torch.set_num_threads(threads)
+            try:
+                torch.set_num_interop_threads(1)
+            except RuntimeError:
+                # only allowed before torch starts parallel work
+                logger.debug("torch inter-op threads already fixed")
+            self._torch = {
+                "applied": True,
+                "intra_op_threads": int(torch.get_num_threads()),
+                "inter_op_threads": int(torch.get_num_interop_threads()),
+            }
+            return dict(self._torch)
+
+    # ---------- reporting ----------
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            pools = {pool.name: pool.stats() for pool in self._pools.values()}
+            built = [(model, pool.size) for (model, _path, _count), pool in self._pools.items()]
+            torch_state = dict(self._torch)
+        planned = 0
+        for model, budget in self.budgets.items():
+            sizes = [size for owner, size in built if owner == model]
+            per_replica = budget.intra_op_threads * max(1, budget.inter_op_threads)
+            planned += sum(sizes) * per_replica if sizes else budget.threads
+        return {
+            "cpu_count": self.cpu_count,
+            "thread_budget": self.total_threads,
+            "planned_threads": planned,
+            "oversubscribed": planned > self.total_threads,
+            "models": {name: {**asdict(b), "threads": b.threads} for name, b in self.budgets.items()},
+            "session_pools": pools,
+            "graph_cache": self.graph_cache.report(),
+            "torch": torch_state,
+        }
+
+
+_MANAGER: Optional[CPUResourceManager] = None
+_MANAGER_SETTINGS: Optional[Tuple[Any, ...]] = None
+_MANAGER_LOCK = threading.Lock()
+
+
+def get_resource_manager(cfg: Optional[Mapping[str, Any]] = None) -> CPUResourceManager:
+    """
+    Process-wide manager, built from `cfg` (default: config.CFG) on first use.
+
+    There is one thread budget per process: later calls get the same manager
+    and their `cfg` is not applied. A later cfg whose thread settings differ
+    is logged as a warning; build a `CPUResourceManager` directly for a
+    separate budget (tests).
+    """
+    global _MANAGER, _MANAGER_SETTINGS
+    with _MANAGER_LOCK:
+        if _MANAGER is None:
+            if cfg is None:
+                from config import CFG
+                cfg = CFG
+            _MANAGER = CPUResourceManager(cfg)
+            _MANAGER_SETTINGS = _budget_settings(cfg)
+        elif cfg is not None and _budget_settings(cfg) != _MANAGER_SETTINGS:
+            logger.warning("CPU thread settings of a later config are ignored; the process-wide budget is already set.")
+        return _MANAGER
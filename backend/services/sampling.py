@@ -0,0 +1,152 @@
+# app/services/sampling.py
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any, Mapping, Optional, Sequence
+
+import numpy as np
+
+# Candidates kept by the argpartition prefilter before nucleus filtering.
+# Rows whose top-k mass does not reach top_p are redone with a wider prefilter.
+DEFAULT_PREFILTER_K = 64
+
+
+@dataclass(frozen=True)
+class SamplingParams:
+    temperature: float = 1.0         # <= 0 means greedy
+    top_k: int = 0                   # 0 = no top-k cut
+    top_p: float = 1.0               # nucleus mass, 1.0 = no cut
+    repetition_penalty: float = 1.0  # 1.0 = off; >1 discourages already generated tokens
+
+    @classmethod
+    def from_config(cls, cfg: Mapping[str, Any], prefix: str, **defaults: Any) -> "SamplingParams":
+        """Read `<prefix>TEMPERATURE`, `<prefix>TOP_K`, `<prefix>TOP_P`, `<prefix>REPETITION_PENALTY`."""
+        base = cls(**defaults)
+        return cls(
+            temperature=float(cfg.get(f"{prefix}TEMPERATURE", base.temperature)),
+            top_k=max(0, int(cfg.get(f"{prefix}TOP_K", base.top_k))),
+            top_p=float(cfg.get(f"{prefix}TOP_P", base.top_p)),
+            repetition_penalty=float(cfg.get(f"{prefix}REPETITION_PENALTY", base.repetition_penalty)),
+        )
+
+
+def make_rng(seed: Optional[int] = None) -> np.random.Generator:
+    """Per-request generator; a fixed seed makes sampled output reproducible."""
+    return np.random.default_rng(seed)
+
+
+def sample_next_tokens(
+    logits: np.ndarray,
+    params: Sequence[SamplingParams],
+    rngs: Sequence[np.random.Generator],
+    history: Optional[Sequence[Sequence[int]]] = None,
+    *,
+    prefilter_k: int = DEFAULT_PREFILTER_K,
+) -> np.ndarray:
+    """
+    Pick one token per row of `logits` (B,V) in a single vectorized pass:
+    repetition penalty, temperature, top-k and top-p (nucleus) filtering,
+    then an inverse-CDF draw from each row's own generator.
+
+    Instead of sorting the whole vocabulary, `np.argpartition` selects the
+    `prefilter_k` (or largest requested top_k) best candidates and only
+    those are sorted. Probabilities are still normalized over the full row,
+    so the nucleus is the same as with a full sort; rows where the
+    candidates hold less than `top_p` of the mass are redone with a wider
+    prefilter (and a full sort only once that covers the vocabulary).
+    """
+    x = np.array(logits, dtype=np.float32, copy=True)
+    if x.ndim == 1:
+        x = x[None, :]
+    batch, vocab = x.shape
+    if len(params) != batch or len(rngs) != batch:
+        raise ValueError("params and rngs must have one entry per logits row")
+
+    temperature = np.asarray([p.temperature for p in params], dtype=np.float32)
+    top_k = np.asarray([min(max(int(p.top_k), 0), vocab) for p in params], dtype=np.int64)
+    top_p = np.asarray([p.top_p for p in params], dtype=np.float32)
+    penalty = np.asarray([p.repetition_penalty for p in params], dtype=np.float32)
+
+    if history is not None:
+        _apply_repetition_penalty(x, history, penalty)
+
+    greedy = temperature <= 0.0
+    x /= np.where(greedy, 1.0, temperature)[:, None]
+
+    # ---- candidates: unsorted top-k by argpartition, then sort only those ----
+    k = int(min(vocab, max(int(prefilter_k), int(top_k.max(initial=0)), 1)))
+    if k < vocab:
+        cand = np.argpartition(x, vocab - k, axis=1)[:, vocab - k:]
+    else:
+        cand = np.broadcast_to(np.arange(vocab), (batch, vocab))
+    cand_logits = np.take_along_axis(x, cand, axis=1)
+    order = np.argsort(-cand_logits, axis=1, kind="stable")
+    cand = np.take_along_axis(cand, order, axis=1)
+    cand_logits = np.take_along_axis(cand_logits, order, axis=1)
+
+    # full-row normalizer: probabilities of candidates are exact, not renormalized over k
+    row_max = cand_logits[:, :1]
+    log_z = row_max + np.log(np.exp(x - row_max).sum(axis=1, keepdims=True))
+    probs = np.exp(cand_logits - log_z)
+
+    in_top_k = np.arange(k)[None, :] < np.where(top_k > 0, top_k, k)[:, None]
+    probs = np.where(in_top_k, probs, 0.0)
+    # top-k then top-p: with a top_k cut the nucleus is taken over the renormalized top-k
+    mass = probs.sum(axis=1, keepdims=True)
+    probs = np.where((top_k > 0)[:, None], probs / np.clip(mass, 1e-12, None), probs)
+
+    cdf = np.cumsum(probs, axis=1)
+    keep = in_top_k & ((cdf - probs) < top_p[:, None])   # keep the token that crosses top_p
+    keep[:, 0] = True
+    weights = np.where(keep, probs, 0.0)
+
+    tokens = _draw(cand, weights, rngs)
+    tokens[greedy] = cand[greedy, 0]
+
+    # nucleus not closed inside the candidates (flat distribution): redo those rows wider
+    wide = (~greedy) & (top_k == 0) & (cdf[:, -1] < top_p) & (k < vocab)
+    for row in np.flatnonzero(wide):
+        tokens[row] = _sample_wide_row(x[row], float(log_z[row, 0]), float(top_p[row]), rngs[row], k)
+    return tokens
+
+
+def _apply_repetition_penalty(
+    x: np.ndarray, history: Sequence[Sequence[int]], penalty: np.ndarray
+) -> None:
+    """CTRL-style penalty: divide positive logits, multiply negative ones, for seen tokens."""
+    rows = np.flatnonzero(penalty != 1.0)
+    if rows.size == 0:
+        return
+    row_idx = np.concatenate([np.full(len(history[r]), r, dtype=np.int64) for r in rows])
+    col_idx = np.concatenate([np.asarray(history[r], dtype=np.int64) for r in rows])
+    if col_idx.size == 0:
+        return
+    seen = x[row_idx, col_idx]
+    pen = penalty[row_idx]
+    x[row_idx, col_idx] = np.where(seen > 0, seen / pen, seen * pen)
+
+
+def _draw(cand: np.ndarray, weights: np.ndarray, rngs: Sequence[np.random.Generator]) -> np.ndarray:
+    """Inverse-CDF draw of one candidate per row; one uniform from each row's generator."""
+    cdf = np.cumsum(weights, axis=1)
+    u = np.asarray([rng.random() for rng in rngs], dtype=np.float64)[:, None] * cdf[:, -1:]
+    pick = np.minimum((cdf <= u).sum(axis=1), cand.shape[1] - 1)
+    return cand[np.arange(cand.shape[0]), pick].astype(np.int64)
+
+
+def _sample_wide_row(x: np.ndarray, log_z: float, top_p: float, rng: np.random.Generator, k: int) -> int:
+    """One row whose nucleus did not fit in `k` candidates: widen the prefilter 8x until it does."""
+    vocab = x.shape[0]
+    if top_p >= 1.0:
+        # no nucleus cut, so the order does not matter: sample the whole row unsorted
+        cand = np.arange(vocab)
+    else:
+        while True:
+            k = min(vocab, k * 8)
+            cand = np.argpartition(x, vocab - k)[vocab - k:] if k < vocab else np.arange(vocab)
+            cand = cand[np.argsort(-x[cand], kind="stable")]
+            if k >= vocab or np.exp(x[cand] - log_z).sum() >= top_p:
+                break
+    probs = np.exp(x[cand] - log_z)
+    keep = (np.cumsum(probs) - probs) < top_p
+    keep[0] = True
+    return int(_draw(cand[None, :], np.where(keep, probs, 0.0)[None, :], [rng])[0])
@@ -0,0 +1,136 @@
+# app/services/startup.py
+from __future__ import annotations
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+COMPONENT_PENDING = "pending"
+COMPONENT_LOADING = "loading"
+COMPONENT_WARMING = "warming"
+COMPONENT_READY = "ready"
+COMPONENT_FAILED = "failed"
+
+_IN_PROGRESS = {COMPONENT_PENDING, COMPONENT_LOADING, COMPONENT_WARMING}
+
+
+def _elapsed_ms(start: float) -> int:
+    return int((time.perf_counter() - start) * 1000)
+
+
+@dataclass
+class ComponentStatus:
+    name: str
+    state: str = COMPONENT_PENDING
+    load_ms: Optional[int] = None
+    warmup_ms: Optional[int] = None
+    error: Optional[str] = None
+
+
+def warmup_component(component: Any) -> bool:
+    """Run `component.warmup()` when it has one; False when there was nothing to warm."""
+    warmup = getattr(component, "warmup", None)
+    if not callable(warmup):
+        return False
+    warmup()
+    return True
+
+
+class StartupTracker:
+    """
+    Loads independent components concurrently and records their state.
+
+    Each builder runs in a thread pool: build (state "loading"), then one
+    synthetic inference through `warmup()` ("warming") so lazy ORT kernel
+    and tokenizer initialization is paid before real traffic, then "ready".
+    A builder that raises leaves its component "failed" and None; a failed
+    warmup keeps the built object (requests can still degrade gracefully)
+    but marks the component "failed".
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._components: Dict[str, ComponentStatus] = {}
+        self._started: Optional[float] = None
+        self._duration_ms: Optional[int] = None
+
+    def _set(self, name: str, **fields: Any) -> None:
+        with self._lock:
+            status = self._components[name]
+            for key, value in fields.items():
+                setattr(status, key, value)
+
+    def _load_one(self, name: str, build: Callable[[], Any], warmup: bool) -> Any:
+        self._set(name, state=COMPONENT_LOADING)
+        started = time.perf_counter()
+        try:
+            component = build()
+        except Exception as exc:
+            logger.exception("Failed to load %s", name)
+            self._set(name, state=COMPONENT_FAILED, load_ms=_elapsed_ms(started), error=f"{type(exc).__name__}: {exc}")
+            return None
+        self._set(name, load_ms=_elapsed_ms(started))
+
+        if warmup:
+            self._set(name, state=COMPONENT_WARMING)
+            started = time.perf_counter()
+            try:
+                if warmup_component(component):
+                    self._set(name, warmup_ms=_elapsed_ms(started))
+            except Exception as exc:
+                logger.exception("Warmup failed for %s", name)
+                self._set(
+                    name,
+                    state=COMPONENT_FAILED,
+                    warmup_ms=_elapsed_ms(started),
+                    error=f"warmup {type(exc).__name__}: {exc}",
+                )
+                return component
+        self._set(name, state=COMPONENT_READY)
+        return component
+
+    def load(
+        self,
+        builders: Mapping[str, Callable[[], Any]],
+        *,
+        max_workers: int = 4,
+        warmup: bool = True,
+    ) -> Dict[str, Any]:
+        """Build (and warm up) every component; returns name -> object (None when it failed)."""
+        started = time.perf_counter()
+        with self._lock:
+            self._started = started
+            self._duration_ms = None
+            for name in builders:
+                self._components[name] = ComponentStatus(name)
+        workers = max(1, min(int(max_workers), len(builders) or 1))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="startup") as pool:
+            futures = {name: pool.submit(self._load_one, name, build, warmup) for name, build in builders.items()}
+            loaded = {name: future.result() for name, future in futures.items()}
+        with self._lock:
+            self._duration_ms = _elapsed_ms(started)
+        return loaded
+
+    @property
+    def in_progress(self) -> bool:
+        with self._lock:
+            return any(c.state in _IN_PROGRESS for c in self._components.values())
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            components = {name: asdict(c) for name, c in self._components.items()}
+            duration_ms = self._duration_ms
+        states = {c["state"] for c in components.values()}
+        if not components:
+            state = "not_started"
+        elif states & _IN_PROGRESS:
+            state = "loading"
+        elif COMPONENT_FAILED in states:
+            state = "degraded"
+        else:
+            state = "ready"
+        return {"state": state, "duration_ms": duration_ms, "components": components}
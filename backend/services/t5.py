@@ -2,10 +2,11 @@
 from __future__ import annotations
 import logging
 import os
+import queue
 import time
-from typing import Optional, List, Dict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional
 import numpy as np
-import onnxruntime as ort
 from transformers import AutoTokenizer
 from schemas.pipeline import GenerationResult
 from utils.text import (
@@ -18,6 +19,13 @@ from utils.text import (
     build_model_only_prompt,  
     fallback_instruction,   
 )
+from services.t5_scheduler import ContinuousBatchScheduler
+from services.t5_iobinding import IOBindingDecodeEngine
+from services.t5_speculative import PromptLookupDecoder, decoder_accepts_multiple_tokens
+from services.prompt_compiler import CompiledPrompt, PromptCompiler
+from services.runtime_resources import get_resource_manager
+from services.sampling import DEFAULT_PREFILTER_K, SamplingParams, make_rng, sample_next_tokens
+from utils.cache import GenerationCache, build_generation_cache, mark_cache_miss
 
 logger = logging.getLogger(__name__)
 
@@ -38,6 +46,7 @@ def _softmax(x: np.ndarray) -> np.ndarray:
     return e / np.clip(e.sum(axis=-1, keepdims=True), 1e-8, None)
 
 def _top_p_sample(logits: np.ndarray, top_p: float, temperature: float) -> int:
+    """Legacy single-row sampler (full sort, global RNG); kept as the benchmark baseline."""
     if temperature and temperature > 0.0:
         logits = logits / float(temperature)
     probs = _softmax(logits[None, :])[0]
@@ -50,9 +59,6 @@ def _top_p_sample(logits: np.ndarray, top_p: float, temperature: float) -> int:
     p = p / p.sum()
     return int(np.random.choice(keep, p=p))
 
-def _greedy(logits: np.ndarray) -> int:
-    return int(np.argmax(logits))
-
 # ---------- utils: dtype helpers ----------
 def _np_dtype_for_ort(ort_type: str):
     """
@@ -66,12 +72,50 @@ def _np_dtype_for_ort(ort_type: str):
     # default float32
     return np.float32
 
+def _pad_axis(arr: np.ndarray, size: int, axis: int) -> np.ndarray:
+    """Zero-pad `arr` along `axis` up to `size`."""
+    missing = size - arr.shape[axis]
+    if missing <= 0:
+        return arr
+    widths = [(0, 0)] * arr.ndim
+    widths[axis] = (0, missing)
+    return np.pad(arr, widths)
+
+
+@dataclass
+class DecodeState:
+    """
+    Decoder-side state of one in-flight generation. The direct loop and the
+    continuous-batching scheduler both advance it one token at a time.
+    """
+    enc_out: np.ndarray                  # (1,T,H) float32
+    enc_mask: np.ndarray                 # (1,T) int64
+    max_new: int
+    do_sample: bool
+    sampling: Optional[SamplingParams]  # temperature / top-k / top-p / repetition penalty when do_sample
+    full_input_tokens: Optional[int]
+    generated: List[int]
+    past: Optional[Dict[str, np.ndarray]] = None
+    finished: bool = False
+    output_truncated: bool = False
+    engine_ctx: Any = None               # per-sequence IOBinding state (iobinding engine only)
+    on_token: Optional[Callable[[int], None]] = None  # streaming hook, called per appended token
+    rng: Optional[np.random.Generator] = None         # per-request generator (seeded when requested)
+    source_ids: Optional[np.ndarray] = None           # (T,) encoder input ids, drafts for speculative decoding
+    spec_stats: Optional[Dict[str, int]] = None       # speculative decoding counters
+
 
 class T5Service:
     """
     ONNX runtime wrapper for T5 (encoder + decoder). Produces English-only responses.
     """
 
+    _cache: GenerationCache | None = None
+    _prompt_compiler: PromptCompiler | None = None
+    _chat_sampling = SamplingParams(temperature=0.7, top_p=0.9)
+    _sampling_prefilter_k = DEFAULT_PREFILTER_K
+    _speculative: PromptLookupDecoder | None = None
+
     def __init__(self, cfg: dict):
         # paths / names
         self.tok_dir  = cfg.get("T5_TOKENIZER_DIR", "assets/models/t5/tokenizer")
@@ -88,11 +132,19 @@ class T5Service:
         self.max_new_chat = int(cfg.get("T5_MAX_NEW_TOKENS_CHAT", 256))  # Buralardaki değişkenlerin değeri yedek değerdir yani hiç bir şey yazmıyorsa .env dosyasında bu değer kullanılır.
         self.max_new_rag  = int(cfg.get("T5_MAX_NEW_TOKENS_RAG", 64))
 
-        # sessions
-        so = ort.SessionOptions()
-        so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
-        self.encoder = ort.InferenceSession(self.enc_path, so, providers=["CPUExecutionProvider"])
-        self.decoder = ort.InferenceSession(self.dec_path, so, providers=["CPUExecutionProvider"])
+        # chat-mode sampling (other modes decode greedily)
+        self._chat_sampling = SamplingParams.from_config(cfg, "T5_CHAT_", temperature=0.7, top_p=0.9)
+        self._sampling_prefilter_k = int(cfg.get("T5_SAMPLING_PREFILTER_K", DEFAULT_PREFILTER_K))
+
+        # sessions: thread budget and replica count come from the process-wide CPU manager.
+        # The batching worker and the IOBinding engine drive a single decoder session.
+        engine = str(cfg.get("T5_DECODE_ENGINE", "numpy") or "numpy").strip().lower()
+        single_decoder = bool(cfg.get("T5_BATCHING_ENABLED", False)) or engine == "iobinding"
+        resources = get_resource_manager(cfg)
+        self.encoder = resources.session_pool("t5_encoder", self.enc_path)
+        self.decoder = resources.session_pool(
+            "t5_decoder", self.dec_path, replicas=1 if single_decoder else None
+        )
 
         # io schemas
         self.enc_inputs   = [i.name for i in self.encoder.get_inputs()]
@@ -106,22 +158,76 @@ class T5Service:
         self.decoder_start_token_id = int(getattr(self.tok, "pad_token_id", 0) or 0)
         self.eos_token_id = int(getattr(self.tok, "eos_token_id", 1) or 1)
 
+        # instruction templates tokenized once; requests only tokenize their variable parts
+        self._prompt_compiler = self._build_prompt_compiler()
+
         # capabilities
         self._has_past = any(("past_key_values" in n) or ("pkv" in n) for n in self.dec_inputs)
 
+        # continuous batching: concurrent requests share batched decoder steps
+        self._scheduler: ContinuousBatchScheduler | None = None
+        if bool(cfg.get("T5_BATCHING_ENABLED", False)):
+            self._scheduler = ContinuousBatchScheduler(
+                self,
+                max_batch_size=int(cfg.get("T5_MAX_BATCH_SIZE", 8)),
+                max_wait_ms=float(cfg.get("T5_BATCH_WAIT_MS", 2.0)),
+            )
+
+        # greedy (non-chat) generations are repeatable and can be served from cache
+        self._cache = build_generation_cache(cfg)
+
+        # decode engine: "numpy" feeds dicts through decoder.run, "iobinding" keeps
+        # encoder states and KV cache bound in preallocated buffers between steps
+        self._engine: IOBindingDecodeEngine | None = None
+        if engine == "iobinding":
+            if self._scheduler is not None:
+                logger.warning("T5_DECODE_ENGINE=iobinding is ignored while T5_BATCHING_ENABLED is on")
+            else:
+                self._engine = IOBindingDecodeEngine(self)
+        elif engine != "numpy":
+            logger.warning("Unknown T5_DECODE_ENGINE=%r, using numpy", engine)
+
+        # speculative greedy decoding: drafts copied from the prompt, verified in one decoder pass
+        self._speculative = None
+        if bool(cfg.get("T5_SPECULATIVE_ENABLED", False)):
+            if self._scheduler is not None or self._engine is not None:
+                logger.warning("T5_SPECULATIVE_ENABLED is ignored with batching or the iobinding engine")
+            elif not decoder_accepts_multiple_tokens(self.decoder):
+                logger.warning("T5_SPECULATIVE_ENABLED is ignored: decoder takes one input token per step")
+            else:
+                self._speculative = PromptLookupDecoder(
+                    self,
+                    max_ngram=int(cfg.get("T5_SPECULATIVE_MAX_NGRAM", 3)),
+                    max_draft=int(cfg.get("T5_SPECULATIVE_DRAFT_TOKENS", 8)),
+                )
+
+    def cache_stats(self) -> dict[str, Any] | None:
+        return self._cache.stats() if self._cache is not None else None
+
+    def warmup(self) -> None:
+        """Encode a short prompt and decode two greedy tokens (bypassing the cache) to initialize ORT kernels."""
+        self._generate_text_with_metadata("Hello.", "rag", max_new_tokens=2)
+
+    def close(self) -> None:
+        """Stop the batch scheduler thread (if any)."""
+        if self._scheduler is not None:
+            self._scheduler.close()
+            self._scheduler = None
+
     # ============ PUBLIC API (English-only prompts) ============
-    def chat(self, user_text: str) -> str:
+    def chat(self, user_text: str, *, seed: int | None = None) -> str:
         """
         Small-talk or basic chat (no RAG). English output.
         """
-        return self.chat_structured(user_text).text
+        return self.chat_structured(user_text, seed=seed).text
 
-    def chat_structured(self, user_text: str) -> GenerationResult:
+    def chat_structured(self, user_text: str, *, seed: int | None = None) -> GenerationResult:
         prompt = build_chat_prompt(user_text, self.bot_name, self.app_name)
         return self.generate_structured(
             prompt,
             mode="chat",
             prompt_type="chat",
+            seed=seed,
         )
 
     def answer(self, question: str, context: Optional[List[str] | str]) -> str:
@@ -211,72 +317,184 @@ class T5Service:
         prompt_type: str = "unknown",
         max_new_tokens: int | None = None,
         fallback_text: str | None = None,
+        seed: int | None = None,
     ) -> GenerationResult:
         """
         Generate text and return a structured result without changing the core
         ONNX inference logic used by legacy string-returning methods.
+        `seed` fixes the sampling generator of chat-mode decoding.
         """
         prompt = prompt or ""
         resolved_max_new = self._max_new_for_mode(mode, max_new_tokens)
         started = time.perf_counter()
-
-        base = {
-            "model_name": self.model_name,
-            "runtime": self.runtime,
-            "device": self.device,
-            "prompt_type": prompt_type,
-            "input_chars": len(prompt),
-            "max_new_tokens": resolved_max_new,
-        }
+        base = self._result_base(prompt, prompt_type, resolved_max_new)
 
         if not prompt.strip():
-            text = fallback_text or self._fallback_text(prompt_type)
-            return GenerationResult(
-                text=text,
-                **base,
-                output_chars=len(text),
-                latency_ms=_elapsed_ms(started),
-                empty_output=True,
-                fallback_used=True,
-                fallback_reason="empty_prompt",
-                error="empty_prompt",
-            )
+            return self._fallback_result(base, started, prompt_type, fallback_text, "empty_prompt")
+
+        cache_key = self._cache_key(prompt, mode, resolved_max_new)
+        if cache_key is not None:
+            cached = self._cache.get(cache_key, latency_ms=_elapsed_ms(started))
+            if cached is not None:
+                cached.prompt_type = prompt_type
+                return cached
 
         try:
             output_text, meta = self._generate_text_with_metadata(
                 prompt,
                 mode=mode,
                 max_new_tokens=resolved_max_new,
+                seed=seed,
             )
-            fallback_reason = self._invalid_generation_reason(output_text)
-            result_text = output_text
-            fallback_used = False
-            empty_output = False
-
-            if fallback_reason:
-                result_text = fallback_text or self._fallback_text(prompt_type)
-                fallback_used = True
-                empty_output = True
-
-            return GenerationResult(
-                text=result_text,
-                **base,
-                output_chars=len(result_text or ""),
-                input_tokens=meta.get("input_tokens"),
-                output_tokens=meta.get("output_tokens"),
-                input_truncated=meta.get("input_truncated"),
-                output_truncated=meta.get("output_truncated"),
-                latency_ms=_elapsed_ms(started),
-                empty_output=empty_output,
-                fallback_used=fallback_used,
-                fallback_reason=fallback_reason,
-            )
+            result = self._output_result(base, started, prompt_type, fallback_text, output_text, meta)
+            return self._store_in_cache(cache_key, result)
         except T5DecodeError:
             fallback_reason = "decode_failed"
         except Exception:
             logger.exception("T5 generation failed for prompt_type=%s", prompt_type)
             fallback_reason = "inference_failed"
 
+        return self._fallback_result(base, started, prompt_type, fallback_text, fallback_reason)
+
+    # ============ STREAMING ============
+    def chat_stream(self, user_text: str, *, seed: int | None = None) -> Iterator[str | GenerationResult]:
+        prompt = build_chat_prompt(user_text, self.bot_name, self.app_name)
+        return self.generate_stream(prompt, mode="chat", prompt_type="chat", seed=seed)
+
+    def answer_stream(self, question: str, context: Optional[List[str] | str]) -> Iterator[str | GenerationResult]:
+        prompt = build_rag_prompt(question, context)
+        return self.generate_stream(prompt, mode="rag", prompt_type="rag_answer")
+
+    def answer_model_only_with_instruction_stream(
+        self,
+        question: str,
+        instruction: str | None = None,
+    ) -> Iterator[str | GenerationResult]:
+        inst = instruction if instruction is not None else fallback_instruction()
+        prompt = build_model_only_prompt(question, inst)
+        return self.generate_stream(prompt, mode="chat", prompt_type="model_only")
+
+    def generate_stream(
+        self,
+        prompt: str,
+        *,
+        mode: str = "chat",
+        prompt_type: str = "unknown",
+        max_new_tokens: int | None = None,
+        fallback_text: str | None = None,
+        seed: int | None = None,
+    ) -> Iterator[str | GenerationResult]:
+        """
+        Streaming variant of generate_structured: yields text deltas while the
+        decoder runs, then the final GenerationResult. The final text is
+        authoritative; it replaces the streamed text when a fallback was used.
+        """
+        prompt = prompt or ""
+        resolved_max_new = self._max_new_for_mode(mode, max_new_tokens)
+        started = time.perf_counter()
+        base = self._result_base(prompt, prompt_type, resolved_max_new)
+
+        if not prompt.strip():
+            yield self._fallback_result(base, started, prompt_type, fallback_text, "empty_prompt")
+            return
+
+        cache_key = self._cache_key(prompt, mode, resolved_max_new)
+        if cache_key is not None:
+            cached = self._cache.get(cache_key, latency_ms=_elapsed_ms(started))
+            if cached is not None:
+                cached.prompt_type = prompt_type
+                yield cached.text
+                yield cached
+                return
+
+        try:
+            state = self._prepare_decode(prompt, mode, resolved_max_new, seed=seed)
+            emitted = ""
+            for _ in self._iter_decode(state):
+                try:
+                    partial = self._decode_ids(state.generated)
+                except T5DecodeError:
+                    continue  # partial byte sequences may not decode yet
+                # only forward append-only growth; detokenizer cleanup can rewrite the tail
+                if len(partial) > len(emitted) and partial.startswith(emitted):
+                    yield partial[len(emitted):]
+                    emitted = partial
+            output_text, meta = self._finish_decode(state)
+            result = self._output_result(base, started, prompt_type, fallback_text, output_text, meta)
+            yield self._store_in_cache(cache_key, result)
+            return
+        except T5DecodeError:
+            fallback_reason = "decode_failed"
+        except Exception:
+            logger.exception("T5 streaming generation failed for prompt_type=%s", prompt_type)
+            fallback_reason = "inference_failed"
+
+        yield self._fallback_result(base, started, prompt_type, fallback_text, fallback_reason)
+
+    def _cache_key(self, prompt: str, mode: str, max_new_tokens: int) -> tuple | None:
+        # chat mode samples (top-p), so its outputs are not repeatable
+        if self._cache is None or mode == "chat":
+            return None
+        return GenerationCache.key(prompt, mode=mode, max_new_tokens=max_new_tokens, model=self.model_name)
+
+    def _store_in_cache(self, cache_key: tuple | None, result: GenerationResult) -> GenerationResult:
+        if cache_key is None:
+            return result
+        self._cache.put(cache_key, result)
+        return mark_cache_miss(result)
+
+    def _result_base(self, prompt: str, prompt_type: str, max_new_tokens: int) -> dict[str, Any]:
+        return {
+            "model_name": self.model_name,
+            "runtime": self.runtime,
+            "device": self.device,
+            "prompt_type": prompt_type,
+            "input_chars": len(prompt),
+            "max_new_tokens": max_new_tokens,
+        }
+
+    def _output_result(
+        self,
+        base: dict[str, Any],
+        started: float,
+        prompt_type: str,
+        fallback_text: str | None,
+        output_text: str,
+        meta: dict[str, Any],
+    ) -> GenerationResult:
+        fallback_reason = self._invalid_generation_reason(output_text)
+        result_text = output_text
+        fallback_used = False
+        empty_output = False
+
+        if fallback_reason:
+            result_text = fallback_text or self._fallback_text(prompt_type)
+            fallback_used = True
+            empty_output = True
+
+        return GenerationResult(
+            text=result_text,
+            **base,
+            output_chars=len(result_text or ""),
+            input_tokens=meta.get("input_tokens"),
+            output_tokens=meta.get("output_tokens"),
+            input_truncated=meta.get("input_truncated"),
+            output_truncated=meta.get("output_truncated"),
+            latency_ms=_elapsed_ms(started),
+            empty_output=empty_output,
+            fallback_used=fallback_used,
+            fallback_reason=fallback_reason,
+            metadata={"speculative": meta["speculative"]} if meta.get("speculative") else None,
+        )
+
+    def _fallback_result(
+        self,
+        base: dict[str, Any],
+        started: float,
+        prompt_type: str,
+        fallback_text: str | None,
+        reason: str,
+    ) -> GenerationResult:
         text = fallback_text or self._fallback_text(prompt_type)
         return GenerationResult(
             text=text,
@@ -285,11 +503,10 @@ class T5Service:
             latency_ms=_elapsed_ms(started),
             empty_output=True,
             fallback_used=True,
-            fallback_reason=fallback_reason,
-            error=fallback_reason,
+            fallback_reason=reason,
+            error=reason,
         )
 
-
     # ============ CORE ============
     def _encode(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> Dict[str, np.ndarray]:
         """
@@ -329,15 +546,27 @@ class T5Service:
             return "I don't know."
         return "I couldn't generate a response right now."
 
-    def _count_prompt_tokens(self, prompt: str) -> int | None:
-        try:
-            enc = self.tok([prompt], padding=False, truncation=False, return_attention_mask=False)
-            ids = enc.get("input_ids", [])
-            if ids and hasattr(ids[0], "__len__"):
-                return len(ids[0])
-        except Exception:
-            return None
-        return None
+    def _build_prompt_compiler(self) -> PromptCompiler:
+        compiler = PromptCompiler(self.tok, max_src_len=self.max_src_len, eos_token_id=self.eos_token_id)
+        marker = "\x00"
+        for template in (
+            build_chat_prompt(marker, self.bot_name, self.app_name),
+            build_rag_prompt("", marker),
+            build_model_only_prompt(marker, fallback_instruction()),
+            build_detection_prompt(marker, self.bot_name),
+            build_open_camera_prompt(self.bot_name),
+            build_close_camera_prompt(self.bot_name),
+            build_take_photo_prompt(self.bot_name),
+        ):
+            compiler.register_template(template, marker)
+        return compiler
+
+    def _compile_prompt(self, prompt: str) -> CompiledPrompt:
+        if self._prompt_compiler is None:
+            self._prompt_compiler = PromptCompiler(
+                self.tok, max_src_len=self.max_src_len, eos_token_id=self.eos_token_id
+            )
+        return self._prompt_compiler.compile(prompt)
 
     def _invalid_generation_reason(self, text: str | None) -> str | None:
         if text is None:
@@ -360,13 +589,63 @@ class T5Service:
         prompt: str,
         mode: str,
         max_new_tokens: int | None = None,
-    ) -> tuple[str, dict[str, int | bool | None]]:
-        full_input_tokens = self._count_prompt_tokens(prompt)
-        # tokenize
-        enc = self.tok([prompt], padding=False, truncation=True,
-                       max_length=self.max_src_len, return_tensors="np")
-        input_ids     = enc["input_ids"].astype(np.int64)
-        attention_mask = enc["attention_mask"].astype(np.int64)
+        seed: int | None = None,
+    ) -> tuple[str, dict[str, Any]]:
+        state = self._prepare_decode(prompt, mode, max_new_tokens, seed=seed)
+        scheduler = self._scheduler
+        if scheduler is not None and not state.finished:
+            # Shared batched decoder steps; blocks until this sequence leaves the batch.
+            state = scheduler.submit(state).result()
+        else:
+            for _ in self._iter_decode(state):
+                pass
+        return self._finish_decode(state)
+
+    def _iter_decode(self, state: DecodeState) -> Iterator[None]:
+        """
+        Advance `state` to completion, yielding after every decoder step that
+        may have appended tokens. Closing the iterator early abandons the sequence.
+        """
+        scheduler = self._scheduler
+        if scheduler is not None and not state.finished:
+            steps: "queue.Queue[int | None]" = queue.Queue()
+            state.on_token = steps.put
+            future = scheduler.submit(state)
+            future.add_done_callback(lambda _f: steps.put(None))
+            try:
+                while steps.get() is not None:
+                    yield
+                future.result()  # re-raise decoder failures
+            finally:
+                if not future.done():
+                    future.cancel()
+            return
+
+        speculative = self._speculative if not state.do_sample else None
+        try:
+            while not state.finished:
+                if speculative is not None:
+                    speculative.step(state)
+                else:
+                    self._decode_step([state])
+                yield
+        finally:
+            if state.engine_ctx is not None:
+                self._engine.release(state)
+
+    def _prepare_decode(
+        self,
+        prompt: str,
+        mode: str,
+        max_new_tokens: int | None = None,
+        seed: int | None = None,
+    ) -> DecodeState:
+        """Tokenize + encode one prompt and return its decoder-side state."""
+        # tokenize (single pass; also yields the untruncated length)
+        compiled = self._compile_prompt(prompt)
+        full_input_tokens = compiled.full_tokens
+        input_ids = compiled.input_ids
+        attention_mask = compiled.attention_mask
 
         # encode
         ctx = self._encode(input_ids, attention_mask)
@@ -375,88 +654,172 @@ class T5Service:
         enc_out = ctx["encoder_hidden_states"]
         if enc_out.ndim == 2:             # (T,H) -> (1,T,H)
             enc_out = enc_out[None, ...]
-        enc_out_fp32 = enc_out.astype(np.float32)   # safe default for decoder
 
         enc_mask = ctx["encoder_attention_mask"]    # (1,T) int64 expected from tokenizer
         if enc_mask.ndim == 1:                      # (T,) -> (1,T) safeguard
             enc_mask = enc_mask[None, ...]
-        enc_mask_fp32 = enc_mask.astype(np.float32)
-        enc_mask_i64  = enc_mask.astype(np.int64)
         # ---------------------------------------------------
 
         # decoding config
-        if mode == "chat":
-            max_new = self._max_new_for_mode(mode, max_new_tokens)
-            do_sample, top_p, temperature = True, 0.9, 0.7
-        else:
-            max_new = self._max_new_for_mode(mode, max_new_tokens)
-            do_sample, top_p, temperature = False, None, None
-
-        generated = [self.decoder_start_token_id]
-        past = None
-        output_truncated = True if max_new == 0 else False
-
-        for _ in range(max_new):
-            if not self._has_past:
-                # full-sequence decoding (no past)
-                dec_inp = np.asarray([generated], dtype=np.int64)
+        max_new = self._max_new_for_mode(mode, max_new_tokens)
+        do_sample = mode == "chat"
+
+        return DecodeState(
+            enc_out=enc_out.astype(np.float32),   # safe default for decoder
+            enc_mask=enc_mask.astype(np.int64),
+            max_new=max_new,
+            do_sample=do_sample,
+            sampling=self._chat_sampling if do_sample else None,
+            full_input_tokens=full_input_tokens,
+            generated=[self.decoder_start_token_id],
+            finished=max_new == 0,
+            output_truncated=max_new == 0,
+            rng=make_rng(seed) if do_sample else None,
+            source_ids=input_ids[0],
+        )
 
-                feed: Dict[str, np.ndarray] = {}
-                for n in self.dec_inputs:
-                    onnx_type = self.dec_input_types.get(n, "tensor(float)")
-                    want = _np_dtype_for_ort(onnx_type)
+    def _batch_key(self, state: DecodeState) -> int:
+        """
+        Sequences sharing a key can run in one decoder call. The past-KV decoder
+        has no self-attention mask, so only sequences at the same step (same
+        past length) are stacked; full-sequence decoding right-pads instead.
+        """
+        return len(state.generated) if self._has_past else 0
+
+    def _decode_step(self, states: List[DecodeState]) -> None:
+        """Run one decoder step for `states` (same batch key) and pick next tokens."""
+        logits = self._decoder_logits(states)
+        for state, next_id in zip(states, self._next_tokens(states, logits)):
+            self._advance(state, int(next_id))
+
+    def _next_tokens(self, states: List[DecodeState], logits: np.ndarray) -> np.ndarray:
+        """Greedy argmax for every row, then one vectorized sampling pass over the sampled rows."""
+        next_ids = np.argmax(logits, axis=-1)
+        rows = [b for b, s in enumerate(states) if s.do_sample]
+        if rows:
+            sampled = [states[b] for b in rows]
+            next_ids[rows] = sample_next_tokens(
+                logits[rows],
+                [s.sampling or self._chat_sampling for s in sampled],
+                [s.rng if s.rng is not None else make_rng() for s in sampled],
+                [s.generated for s in sampled],
+                prefilter_k=self._sampling_prefilter_k,
+            )
+        return next_ids
 
-                    if "input_ids" in n:
-                        feed[n] = dec_inp.astype(np.int64)
-                    elif "encoder_hidden_states" in n:
-                        feed[n] = enc_out_fp32.astype(want)
-                    elif "encoder_attention_mask" in n:
-                        feed[n] = enc_mask_i64 if want == np.int64 else enc_mask_fp32
+    def _decoder_logits(self, states: List[DecodeState]) -> np.ndarray:
+        """
+        One decoder forward pass for a batch of sequences.
+        Returns last-position logits (B, V) and stores each sequence's new past.
+        """
+        batch = len(states)
+        engine = self._engine
+        if engine is not None and batch == 1:
+            return engine.logits(states[0])[None, :]
 
-                outs = self.decoder.run(None, feed)
-                logits = outs[0][:, -1, :][0]
+        src_lens = [s.enc_out.shape[1] for s in states]
+        max_src = max(src_lens)
 
+        if batch == 1:
+            enc_out = states[0].enc_out
+            enc_mask = states[0].enc_mask
+        else:
+            # right-pad encoder states; padded positions are masked out (mask=0)
+            hidden = states[0].enc_out.shape[2]
+            enc_out = np.zeros((batch, max_src, hidden), dtype=np.float32)
+            enc_mask = np.zeros((batch, max_src), dtype=np.int64)
+            for b, s in enumerate(states):
+                enc_out[b, :src_lens[b]] = s.enc_out[0]
+                enc_mask[b, :src_lens[b]] = s.enc_mask[0]
+
+        if not self._has_past:
+            # full-sequence decoding (no past); causal attention makes right-padding safe
+            lengths = np.asarray([len(s.generated) for s in states], dtype=np.int64)
+            dec_inp = np.full((batch, int(lengths.max())), self.decoder_start_token_id, dtype=np.int64)
+            for b, s in enumerate(states):
+                dec_inp[b, :lengths[b]] = s.generated
+
+            feed = self._decoder_feed(dec_inp, enc_out, enc_mask)
+            outs = self.decoder.run(None, feed)
+            return outs[0][np.arange(batch), lengths - 1, :]
+
+        # step-by-step decoding with past
+        last_ids = np.asarray([[s.generated[-1]] for s in states], dtype=np.int64)
+        past = None
+        if states[0].past:
+            if batch == 1:
+                past = states[0].past
             else:
-                # step-by-step decoding with past
-                last_id = np.asarray([[generated[-1]]], dtype=np.int64)
-
-                feed: Dict[str, np.ndarray] = {}
-                for n in self.dec_inputs:
-                    onnx_type = self.dec_input_types.get(n, "tensor(float)")
-                    want = _np_dtype_for_ort(onnx_type)
-
-                    if "input_ids" in n:
-                        feed[n] = last_id.astype(np.int64)
-                    elif "encoder_hidden_states" in n:
-                        feed[n] = enc_out_fp32.astype(want)
-                    elif "encoder_attention_mask" in n:
-                        feed[n] = enc_mask_i64 if want == np.int64 else enc_mask_fp32
-                    elif "use_cache_branch" in n:
-                        feed[n] = np.asarray([1], dtype=np.bool_)
-                    elif ("past_key_values" in n or "pkv" in n) and past and n in past:
-                        feed[n] = past[n]
-
-                outs = self.decoder.run(None, feed)
-                logits = outs[0][0]
-
-                # collect new past
-                new_past: Dict[str, np.ndarray] = {}
-                for name, val in zip(self.dec_outputs[1:], outs[1:]):
-                    new_past[name] = val
-                past = new_past
-
-            # choose next token
-            next_id = _top_p_sample(logits, top_p, temperature) if do_sample else _greedy(logits)
-            if next_id == self.eos_token_id:
-                output_truncated = False
-                break
-            generated.append(int(next_id))
-
-        if max_new > 0 and len(generated) - 1 < max_new:
-            output_truncated = False
-
+                past = {}
+                for name in states[0].past:
+                    parts = [s.past[name] for s in states]
+                    if "encoder" in name:
+                        parts = [_pad_axis(p, max_src, axis=2) for p in parts]
+                    past[name] = np.concatenate(parts, axis=0)
+
+        feed = self._decoder_feed(last_ids, enc_out, enc_mask, past)
+        outs = self.decoder.run(None, feed)
+
+        # collect new past (per sequence; cross-attention entries trimmed back to own length)
+        for b, s in enumerate(states):
+            new_past: Dict[str, np.ndarray] = {}
+            for out_name, val in zip(self.dec_outputs[1:], outs[1:]):
+                name = self._past_input_name(out_name)
+                part = val if batch == 1 else val[b:b + 1]
+                if batch > 1 and "encoder" in name and part.ndim == 4:
+                    part = part[:, :, :src_lens[b], :]
+                new_past[name] = part
+            s.past = new_past
+        return outs[0][:, -1, :]
+
+    def _past_input_name(self, output_name: str) -> str:
+        """Decoder input fed by a present output (`present.*` -> `past_key_values.*`)."""
+        if output_name not in self.dec_inputs:
+            renamed = output_name.replace("present", "past_key_values", 1)
+            if renamed in self.dec_inputs:
+                return renamed
+        return output_name
+
+    def _decoder_feed(
+        self,
+        input_ids: np.ndarray,
+        enc_out: np.ndarray,
+        enc_mask: np.ndarray,
+        past: Dict[str, np.ndarray] | None = None,
+    ) -> Dict[str, np.ndarray]:
+        feed: Dict[str, np.ndarray] = {}
+        for n in self.dec_inputs:
+            onnx_type = self.dec_input_types.get(n, "tensor(float)")
+            want = _np_dtype_for_ort(onnx_type)
+
+            if "input_ids" in n:
+                feed[n] = input_ids
+            elif "encoder_hidden_states" in n:
+                feed[n] = enc_out.astype(want, copy=False)  # no per-step copy when already float32
+            elif "encoder_attention_mask" in n:
+                feed[n] = enc_mask if want == np.int64 else enc_mask.astype(np.float32)
+            elif self._has_past and "use_cache_branch" in n:
+                feed[n] = np.asarray([1], dtype=np.bool_)
+            elif ("past_key_values" in n or "pkv" in n) and past and n in past:
+                feed[n] = past[n]
+        return feed
+
+    def _advance(self, state: DecodeState, next_id: int) -> None:
+        """Append the chosen token to one sequence and update its EOS/length state."""
+        if next_id == self.eos_token_id:
+            state.finished = True
+            state.output_truncated = False
+            return
+        state.generated.append(int(next_id))
+        if len(state.generated) - 1 >= state.max_new:
+            state.finished = True
+            state.output_truncated = True
+        if state.on_token is not None:
+            state.on_token(int(next_id))
+
+    def _decode_ids(self, generated: List[int]) -> str:
         try:
-            text = self.tok.decode(
+            return self.tok.decode(
                 generated[1:],  # drop start token
                 skip_special_tokens=True,
                 clean_up_tokenization_spaces=True
@@ -464,7 +827,12 @@ class T5Service:
         except Exception as exc:
             raise T5DecodeError("tokenizer decode failed") from exc
 
-        metadata = {
+    def _finish_decode(self, state: DecodeState) -> tuple[str, dict[str, Any]]:
+        generated = state.generated
+        text = self._decode_ids(generated)
+
+        full_input_tokens = state.full_input_tokens
+        metadata: dict[str, Any] = {
             "input_tokens": full_input_tokens,
             "output_tokens": max(0, len(generated) - 1),
             "input_truncated": (
@@ -472,6 +840,8 @@ class T5Service:
                 if full_input_tokens is not None
                 else None
             ),
-            "output_truncated": output_truncated,
+            "output_truncated": state.output_truncated,
         }
+        if state.spec_stats is not None:
+            metadata["speculative"] = dict(state.spec_stats)
         return text, metadata
@@ -0,0 +1,249 @@
+# app/services/t5_iobinding.py
+from __future__ import annotations
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import onnxruntime as ort
+
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    from services.t5 import DecodeState, T5Service
+
+
+def _np_dtype(ort_type: str):
+    if "int64" in ort_type:
+        return np.int64
+    if "float16" in ort_type:
+        return np.float16
+    if "bool" in ort_type:
+        return np.bool_
+    return np.float32
+
+
+class _SequenceBinding:
+    """IOBinding plus the host buffers bound into it for one in-flight sequence."""
+
+    def __init__(self, binding: Any, capacity: int) -> None:
+        self.binding = binding
+        self.capacity = capacity              # decoder positions this sequence may reach
+        self.keep: List[np.ndarray] = []      # arrays wrapped by OrtValues must stay alive
+        self.pooled: List[np.ndarray] = []    # returned to the engine pool on release
+        self.ids: Optional[np.ndarray] = None
+        self.written = 0                      # ids[:written] already mirror state.generated
+        self.vocab: Optional[int] = None
+        self.logits: Optional[np.ndarray] = None
+        self.kv: Dict[str, Tuple[str, Tuple[int, ...], List[np.ndarray]]] = {}
+        self.past_len = 0
+        self.flip = 0
+        self.steps = 0
+        self.inputs: Dict[str, Any] = {}      # OrtValues currently bound as past inputs
+
+
+class IOBindingDecodeEngine:
+    """
+    Single-sequence decoder loop on ONNX Runtime IOBinding.
+
+    Encoder hidden states and mask are cast once and bound for the whole
+    generation. The first decoder step lets ORT allocate its outputs, which
+    tells us the KV head/dim layout and vocab size; from then on logits and
+    self-attention KV are written into preallocated host buffers (two per
+    KV output, used ping-pong as past/present) sized for `max_new` tokens, and
+    each present is bound straight back as the next step's past without a
+    numpy round trip. Cross-attention KV does not change after the first step
+    and stays bound as-is. Buffers go back to a pool when the sequence ends.
+    """
+
+    def __init__(
+        self,
+        service: "T5Service",
+        *,
+        ortvalue_factory: Optional[Callable[[np.ndarray], Any]] = None,
+    ) -> None:
+        self._service = service
+        self._session = service.decoder
+        self._ortvalue = ortvalue_factory or ort.OrtValue.ortvalue_from_numpy
+        self._pool: Dict[Tuple[Any, int], List[np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+        self._logits_name = service.dec_outputs[0]
+        # present output -> past input it feeds on the next step
+        self._feeds_back: Dict[str, str] = {}
+        for name in service.dec_outputs[1:]:
+            in_name = service._past_input_name(name)
+            if in_name in service.dec_inputs:
+                self._feeds_back[name] = in_name
+
+    # ---------- buffer pool ----------
+    def _take(self, ctx: _SequenceBinding, dtype: Any, size: int) -> np.ndarray:
+        key = (np.dtype(dtype), int(size))
+        with self._lock:
+            free = self._pool.get(key)
+            buf = free.pop() if free else None
+        if buf is None:
+            buf = np.empty(int(size), dtype=dtype)
+        ctx.pooled.append(buf)
+        return buf
+
+    def pooled_buffers(self) -> int:
+        with self._lock:
+            return sum(len(v) for v in self._pool.values())
+
+    def release(self, state: "DecodeState") -> None:
+        """Drop the sequence binding and return its buffers to the pool."""
+        ctx = state.engine_ctx
+        state.engine_ctx = None
+        if not isinstance(ctx, _SequenceBinding):
+            return
+        ctx.inputs.clear()
+        ctx.keep.clear()
+        with self._lock:
+            for buf in ctx.pooled:
+                self._pool.setdefault((buf.dtype, buf.size), []).append(buf)
+        ctx.pooled.clear()
+
+    # ---------- decoding ----------
+    def logits(self, state: "DecodeState") -> np.ndarray:
+        """
+        Run one decoder step for `state` and return its last-position logits (V,).
+        The row is a view into a reused buffer; consume it before the next step.
+        """
+        ctx = state.engine_ctx
+        if ctx is None:
+            ctx = self._start(state)
+            state.engine_ctx = ctx
+        if self._service._has_past:
+            row = self._past_step(ctx, state)
+        else:
+            row = self._full_step(ctx, state)
+        ctx.steps += 1
+        return row
+
+    def _bind_array(self, ctx: _SequenceBinding, name: str, arr: np.ndarray, *, output: bool = False) -> Any:
+        value = self._ortvalue(arr)
+        ctx.keep.append(arr)
+        if output:
+            ctx.binding.bind_ortvalue_output(name, value)
+        else:
+            ctx.binding.bind_ortvalue_input(name, value)
+        return value
+
+    def _start(self, state: "DecodeState") -> _SequenceBinding:
+        service = self._service
+        ctx = _SequenceBinding(self._session.io_binding(), capacity=len(state.generated) + state.max_new + 1)
+
+        for name in service.dec_inputs:
+            want = _np_dtype(service.dec_input_types.get(name, "tensor(float)"))
+            if "encoder_hidden_states" in name:
+                # the one cast of the encoder states for this generation
+                self._bind_array(ctx, name, np.ascontiguousarray(state.enc_out, dtype=want))
+            elif "encoder_attention_mask" in name:
+                mask = state.enc_mask if want == np.int64 else state.enc_mask.astype(np.float32)
+                self._bind_array(ctx, name, np.ascontiguousarray(mask))
+            elif service._has_past and "use_cache_branch" in name:
+                self._bind_array(ctx, name, np.ones(1, dtype=np.bool_))
+            elif service._has_past and state.past and name in state.past:
+                # caller-provided initial past (e.g. an empty cache); replaced after step one
+                self._bind_array(ctx, name, np.ascontiguousarray(state.past[name]))
+
+        width = 1 if service._has_past else ctx.capacity
+        ctx.ids = self._take(ctx, np.int64, width).reshape(1, width)
+        if service._has_past:
+            self._bind_array(ctx, self._input_ids_name(), ctx.ids)
+        return ctx
+
+    def _input_ids_name(self) -> str:
+        for name in self._service.dec_inputs:
+            if "input_ids" in name:
+                return name
+        return "input_ids"
+
+    def _run(self, ctx: _SequenceBinding) -> None:
+        self._session.run_with_iobinding(ctx.binding)
+
+    def _full_step(self, ctx: _SequenceBinding, state: "DecodeState") -> np.ndarray:
+        """No-past decoder: the whole prefix goes in, logits for every position come out."""
+        n = len(state.generated)
+        if n > ctx.capacity:
+            raise RuntimeError("IOBinding decode exceeded its preallocated length")
+        ctx.ids[0, ctx.written:n] = state.generated[ctx.written:n]
+        ctx.written = n
+        self._bind_array(ctx, self._input_ids_name(), ctx.ids[:, :n])
+
+        if ctx.vocab is None:
+            for name in self._service.dec_outputs:
+                ctx.binding.bind_output(name, "cpu")
+            self._run(ctx)
+            logits = ctx.binding.get_outputs()[0].numpy()
+            ctx.vocab = int(logits.shape[-1])
+            ctx.logits = self._take(ctx, logits.dtype, ctx.capacity * ctx.vocab)
+            return logits[0, -1]
+
+        out = ctx.logits[: n * ctx.vocab].reshape(1, n, ctx.vocab)
+        self._bind_array(ctx, self._logits_name, out, output=True)
+        self._run(ctx)
+        return out[0, -1]
+
+    def _past_step(self, ctx: _SequenceBinding, state: "DecodeState") -> np.ndarray:
+        """Decoder-with-past: one token in, present KV bound back as the next past."""
+        ctx.ids[0, 0] = state.generated[-1]
+        if ctx.steps == 0:
+            return self._first_past_step(ctx)
+
+        binding = ctx.binding
+        new_len = ctx.past_len + 1
+        outputs: Dict[str, Any] = {}
+        for out_name, (in_name, shape, bufs) in ctx.kv.items():
+            if not bufs:
+                continue  # cross-attention KV: already bound, unchanged
+            heads, dim = shape[1], shape[3]
+            if new_len > ctx.capacity:
+                raise RuntimeError("IOBinding decode exceeded its preallocated KV cache")
+            view = bufs[ctx.flip][: heads * new_len * dim].reshape(1, heads, new_len, dim)
+            outputs[in_name] = self._bind_array(ctx, out_name, view, output=True)
+
+        self._run(ctx)
+
+        # present (just written) becomes past; the other buffer is the next present
+        for in_name, value in outputs.items():
+            binding.bind_ortvalue_input(in_name, value)
+            ctx.inputs[in_name] = value
+        ctx.past_len = new_len
+        ctx.flip ^= 1
+        return ctx.logits[0, -1]
+
+    def _first_past_step(self, ctx: _SequenceBinding) -> np.ndarray:
+        """Let ORT allocate the first outputs, then size the per-sequence buffers from them."""
+        binding = ctx.binding
+        names = self._service.dec_outputs
+        for name in names:
+            binding.bind_output(name, "cpu")
+        self._run(ctx)
+        values = binding.get_outputs()
+
+        logits = values[0].numpy()
+        ctx.vocab = int(logits.shape[-1])
+        ctx.logits = self._take(ctx, logits.dtype, ctx.vocab).reshape(1, 1, ctx.vocab)
+        row = logits[0, -1].copy()
+        self._bind_array(ctx, self._logits_name, ctx.logits, output=True)
+
+        for name, value in zip(names[1:], values[1:]):
+            in_name = self._feeds_back.get(name)
+            shape = tuple(int(d) for d in value.shape())
+            dtype = _np_dtype(value.data_type())
+            if in_name is None or len(shape) != 4:
+                continue  # not fed back; stays an ORT-allocated output
+            # keep the ORT-owned present as the next past, no host copy
+            binding.bind_ortvalue_input(in_name, value)
+            ctx.inputs[in_name] = value
+            if "encoder" in name:
+                # constant across steps; give the (ignored) output a fixed scratch buffer
+                scratch = self._take(ctx, dtype, int(np.prod(shape))).reshape(shape)
+                self._bind_array(ctx, name, scratch, output=True)
+                ctx.kv[name] = (in_name, shape, [])
+            else:
+                ctx.past_len = shape[2]
+                size = shape[1] * (shape[2] + ctx.capacity) * shape[3]
+                bufs = [self._take(ctx, dtype, size), self._take(ctx, dtype, size)]
+                ctx.kv[name] = (in_name, shape, bufs)
+        ctx.capacity += ctx.past_len
+        return row
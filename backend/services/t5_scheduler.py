@@ -0,0 +1,151 @@
+# app/services/t5_scheduler.py
+from __future__ import annotations
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
+
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    from services.t5 import DecodeState, T5Service
+
+logger = logging.getLogger(__name__)
+
+
+class ContinuousBatchScheduler:
+    """
+    Continuous-batching decode loop for T5Service.
+
+    Callers tokenize/encode on their own thread and submit a DecodeState.
+    A single worker thread keeps the in-flight sequences and advances them
+    together: every iteration groups them by `service._batch_key` and runs one
+    batched decoder call per group. New sequences join between steps, finished
+    ones (EOS or max_new_tokens) leave immediately and their future resolves.
+    """
+
+    def __init__(
+        self,
+        service: "T5Service",
+        *,
+        max_batch_size: int = 8,
+        max_wait_ms: float = 2.0,
+    ) -> None:
+        self._service = service
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_s = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self._pending: "queue.Queue[Tuple[DecodeState, Future]]" = queue.Queue()
+        self._active: List[Tuple["DecodeState", Future]] = []
+        self._stop = threading.Event()
+
+        # counters (read by stats())
+        self._steps = 0
+        self._decoder_calls = 0
+        self._tokens = 0
+        self._max_seen_batch = 0
+
+        self._thread = threading.Thread(target=self._run, name="t5-batch-scheduler", daemon=True)
+        self._thread.start()
+
+    # ---------- public ----------
+    def submit(self, state: "DecodeState") -> Future:
+        fut: Future = Future()
+        if self._stop.is_set():
+            fut.set_exception(RuntimeError("T5 batch scheduler is closed"))
+            return fut
+        if state.finished:
+            fut.set_result(state)
+            return fut
+        self._pending.put((state, fut))
+        return fut
+
+    def close(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._thread.join(timeout=timeout)
+        closed = RuntimeError("T5 batch scheduler is closed")
+        for _, fut in self._active:
+            if not fut.done():
+                fut.set_exception(closed)
+        self._active = []
+        while True:
+            try:
+                _, fut = self._pending.get_nowait()
+            except queue.Empty:
+                break
+            if not fut.done():
+                fut.set_exception(closed)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": len(self._active),
+            "pending": self._pending.qsize(),
+            "max_batch_size": self.max_batch_size,
+            "steps": self._steps,
+            "decoder_calls": self._decoder_calls,
+            "tokens": self._tokens,
+            "max_observed_batch": self._max_seen_batch,
+        }
+
+    # ---------- worker ----------
+    def _admit(self, block: bool) -> None:
+        """Move pending sequences into the active set (up to max_batch_size)."""
+        if block:
+            try:
+                self._active.append(self._pending.get(timeout=0.1))
+            except queue.Empty:
+                return
+            # short gather window so requests arriving together start together
+            deadline = time.perf_counter() + self.max_wait_s
+            while len(self._active) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    self._active.append(self._pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+        while len(self._active) < self.max_batch_size:
+            try:
+                self._active.append(self._pending.get_nowait())
+            except queue.Empty:
+                break
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._admit(block=not self._active)
+            # callers that stopped listening (e.g. a closed stream) cancel their future
+            self._active = [item for item in self._active if not item[1].cancelled()]
+            if not self._active:
+                continue
+
+            self._steps += 1
+            self._max_seen_batch = max(self._max_seen_batch, len(self._active))
+
+            groups: Dict[int, List[Tuple["DecodeState", Future]]] = {}
+            for item in self._active:
+                groups.setdefault(self._service._batch_key(item[0]), []).append(item)
+
+            for items in groups.values():
+                states = [state for state, _ in items]
+                before = sum(len(s.generated) for s in states)
+                try:
+                    self._service._decode_step(states)
+                except Exception as exc:
+                    logger.exception("Batched T5 decoder step failed (batch=%s)", len(states))
+                    for state, fut in items:
+                        state.finished = True
+                        if not fut.done():
+                            fut.set_exception(exc)
+                    continue
+                self._decoder_calls += 1
+                self._tokens += sum(len(s.generated) for s in states) - before
+
+            still_active = []
+            for state, fut in self._active:
+                if not state.finished:
+                    still_active.append((state, fut))
+                elif not fut.done():
+                    fut.set_result(state)
+            self._active = still_active
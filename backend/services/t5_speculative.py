@@ -0,0 +1,108 @@
+# app/services/t5_speculative.py
+from __future__ import annotations
+import logging
+from typing import TYPE_CHECKING, List
+
+import numpy as np
+
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    from services.t5 import DecodeState, T5Service
+
+logger = logging.getLogger(__name__)
+
+
+class PromptLookupDecoder:
+    """
+    Speculative greedy decoding with prompt-lookup drafts.
+
+    RAG answers mostly copy spans of the retrieved context, so the encoder
+    input already contains the likely continuation. Each step matches the
+    last `max_ngram`..1 generated tokens against the source token ids and
+    drafts the tokens that followed the match. One decoder pass over the last
+    token plus the draft scores every drafted position; the longest prefix
+    that equals the greedy argmax is accepted together with the model's own
+    next token, and the self-attention past is cut back to the accepted
+    length. Output is identical to plain greedy decoding; steps without a
+    draft fall back to a normal single-token step.
+    """
+
+    def __init__(self, service: "T5Service", *, max_ngram: int = 3, max_draft: int = 8) -> None:
+        self._service = service
+        self.max_ngram = max(1, int(max_ngram))
+        self.max_draft = max(1, int(max_draft))
+
+    # ---------- drafting ----------
+    def draft(self, source_ids: np.ndarray, generated: List[int], budget: int) -> List[int]:
+        """Tokens following the most recent n-gram of `generated` in `source_ids` (longest n first)."""
+        tail = generated[1:]  # drop the decoder start token
+        limit = min(self.max_draft, budget)
+        if limit <= 0 or not tail or source_ids.size < 2:
+            return []
+        for n in range(min(self.max_ngram, len(tail), source_ids.size - 1), 0, -1):
+            windows = np.lib.stride_tricks.sliding_window_view(source_ids[:-1], n)
+            hits = np.flatnonzero((windows == np.asarray(tail[-n:], dtype=source_ids.dtype)).all(axis=1))
+            if hits.size:
+                start = int(hits[0]) + n
+                return [int(t) for t in source_ids[start:start + limit]]
+        return []
+
+    # ---------- decoding ----------
+    def step(self, state: "DecodeState") -> None:
+        """Advance one greedy sequence by one verified draft (or one token without a draft)."""
+        svc = self._service
+        stats = state.spec_stats
+        if stats is None:
+            stats = state.spec_stats = {"decoder_calls": 0, "drafted_tokens": 0, "accepted_tokens": 0}
+
+        budget = state.max_new - len(state.generated)  # leave room for the model's own next token
+        draft = self.draft(state.source_ids, state.generated, budget) if state.source_ids is not None else []
+        stats["decoder_calls"] += 1
+        if not draft:
+            svc._decode_step([state])
+            return
+
+        prefix_len = len(state.generated)
+        predicted = np.argmax(self._verify_logits(state, draft), axis=-1)
+        accepted = 0
+        while accepted < len(draft) and int(predicted[accepted]) == draft[accepted]:
+            accepted += 1
+        stats["drafted_tokens"] += len(draft)
+        stats["accepted_tokens"] += accepted
+
+        if state.past:
+            # the past now covers last token + whole draft; keep last token + accepted drafts
+            keep = prefix_len + accepted
+            state.past = {
+                name: (val if "encoder" in name or val.ndim != 4 else val[:, :, :keep, :])
+                for name, val in state.past.items()
+            }
+        for token in draft[:accepted] + [int(predicted[accepted])]:
+            svc._advance(state, token)
+            if state.finished:
+                break
+
+    def _verify_logits(self, state: "DecodeState", draft: List[int]) -> np.ndarray:
+        """Greedy-verification logits (len(draft)+1, V): row i predicts the token after input i."""
+        svc = self._service
+        if not svc._has_past:
+            ids = np.asarray([state.generated + draft], dtype=np.int64)
+            outs = svc.decoder.run(None, svc._decoder_feed(ids, state.enc_out, state.enc_mask))
+            return outs[0][0, len(state.generated) - 1:, :]
+
+        ids = np.asarray([[state.generated[-1]] + draft], dtype=np.int64)
+        outs = svc.decoder.run(None, svc._decoder_feed(ids, state.enc_out, state.enc_mask, state.past))
+        state.past = {svc._past_input_name(n): v for n, v in zip(svc.dec_outputs[1:], outs[1:])}
+        return outs[0][0]
+
+
+def decoder_accepts_multiple_tokens(decoder: object) -> bool:
+    """False when the decoder graph pins `input_ids` to one token per step (typical past-KV exports)."""
+    try:
+        for inp in decoder.get_inputs():
+            if "input_ids" in inp.name:
+                shape = list(inp.shape or [])
+                return not (len(shape) > 1 and isinstance(shape[1], int) and shape[1] == 1)
+    except Exception:
+        logger.debug("Could not inspect decoder inputs for speculative decoding", exc_info=True)
+    return True
+
@@ -5,7 +5,6 @@ import os, time
 from typing import Any, List, Tuple
 import numpy as np
 import cv2
-import onnxruntime as ort
 from schemas.pipeline import (
     DETECTION_STATUS_INVALID_IMAGE,
     DETECTION_STATUS_MODEL_ERROR,
@@ -13,6 +12,8 @@ from schemas.pipeline import (
     detection_result_from_legacy,
 )
 from utils.vision import nms, draw_dets  # YOLO-NAS returns xyxy boxes
+from services.micro_batcher import MicroBatcher, build_micro_batcher
+from services.runtime_resources import get_resource_manager
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +35,8 @@ class YOLOService:
       - Scales boxes back from letterbox space to original image space
       - Runs NMS and returns dets (x1,y1,x2,y2,conf,cls_id)
     """
+    _batcher: MicroBatcher | None = None
+    _batch_capable = False
 
     def __init__(self, cfg: dict):
         self.model_path  = cfg.get("YOLO_ONNX",   "assets/models/yolo_nas/yolo_nas_s_coco.onnx")
@@ -43,11 +46,26 @@ class YOLOService:
         self.conf_thr = float(cfg.get("YOLO_CONF", 0.25))
         self.iou_thr  = float(cfg.get("YOLO_IOU", 0.45))
 
-        providers = ["CPUExecutionProvider"]
-        sess_opts = ort.SessionOptions()
-        sess_opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
-        self.session = ort.InferenceSession(self.model_path, sess_opts, providers=providers)
+        # thread budget + replicas for parallel detections come from the CPU manager
+        self.session = get_resource_manager(cfg).session_pool("yolo", self.model_path)
         self.input_name = self.session.get_inputs()[0].name
+        batch_dim = self.session.get_inputs()[0].shape[0]
+        self._batch_capable = not (isinstance(batch_dim, int) and batch_dim == 1)
+
+        # concurrent detections share forward passes (YOLO_BATCHING_ENABLED); needs a dynamic batch axis
+        self._batcher = None
+        if self._batch_capable:
+            self._batcher = build_micro_batcher(
+                cfg,
+                "YOLO",
+                "yolo",
+                self._infer_blobs,
+                max_batch_size=4,
+                max_wait_ms=5.0,
+                workers=self.session.size,
+            )
+        elif cfg.get("YOLO_BATCHING_ENABLED"):
+            logger.warning("YOLO_BATCHING_ENABLED ignored: %s has a fixed batch size of 1", self.model_name)
 
         self.names = self._load_names(self.labels_path)
 
@@ -248,25 +266,21 @@ class YOLOService:
         path, _ = self.detect_draw_and_labels(img_bgr, out_dir=out_dir)
         return path
     
-    def detect_from_bgr(self, image_bgr):
-        """
-        Tarayıcıdan gelen BGR numpy resmi alır.
-        _preprocess -> onnx -> _postprocess -> kutular/etiketler döner.
-        """
-        # 1) preprocess
-        blob, s, pad = self._preprocess(image_bgr)
-        # 2) onnx inference
-        outputs = self.session.run(None, {self.input_name: blob})
-        # 3) postprocess -> dets: (N,6) [x1,y1,x2,y2,conf,cls_id]
-        dets = self._postprocess(outputs, scale=s, pad=pad, orig_shape=image_bgr.shape[:2])
-
+    def warmup(self) -> None:
+        """One inference on a blank frame of the model input size."""
+        self.detect_from_bgr(np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8))
+
+    def _infer_blobs(self, blobs: List[np.ndarray]) -> List[list]:
+        """Per-image ONNX outputs for (1,3,S,S) blobs; one stacked run when the graph has a batch axis."""
+        if len(blobs) == 1 or not self._batch_capable:
+            return [self.session.run(None, {self.input_name: blob}) for blob in blobs]
+        outputs = self.session.run(None, {self.input_name: np.concatenate(blobs, axis=0)})
+        return [[out[i:i + 1] for out in outputs] for i in range(len(blobs))]
+
+    def _legacy_from_dets(self, dets: np.ndarray):
         if dets.size == 0:
             # Boş sonuç dönerken tipler tutarlı olsun
-            boxes = []
-            labels = []
-            scores = []
-            cls_ids = []
-            return boxes, labels, scores, cls_ids
+            return [], [], [], []
 
         # Kutuları ayrı döndür (N,4)
         boxes = dets[:, :4].astype(float).tolist()
@@ -279,48 +293,125 @@ class YOLOService:
         labels = [self.names[c] if 0 <= c < len(self.names) else str(int(c)) for c in cls_ids_np]
         return boxes, labels, scores, cls_ids
 
+    def _detect_with_wait(self, image_bgr):
+        """detect_from_bgr through the micro-batcher (when enabled); also returns the queue wait in ms."""
+        blob, s, pad = self._preprocess(image_bgr)
+        queue_wait_ms = None
+        if self._batcher is not None:
+            outputs, queue_wait_ms = self._batcher.call(blob)
+        else:
+            outputs = self.session.run(None, {self.input_name: blob})
+        dets = self._postprocess(outputs, scale=s, pad=pad, orig_shape=image_bgr.shape[:2])
+        return self._legacy_from_dets(dets), queue_wait_ms
+
+    def detect_from_bgr(self, image_bgr):
+        """
+        Tarayıcıdan gelen BGR numpy resmi alır.
+        _preprocess -> onnx -> _postprocess -> kutular/etiketler döner.
+        """
+        return self._detect_with_wait(image_bgr)[0]
+
+    def detect_batch(self, images_bgr: List[np.ndarray]) -> list:
+        """detect_from_bgr for several images with one stacked ONNX run."""
+        prepared = [self._preprocess(img) for img in images_bgr]
+        outputs = self._infer_blobs([blob for blob, _, _ in prepared])
+        return [
+            self._legacy_from_dets(self._postprocess(out, scale=s, pad=pad, orig_shape=img.shape[:2]))
+            for img, (_, s, pad), out in zip(images_bgr, prepared, outputs)
+        ]
+
+    def _structured_result(
+        self,
+        legacy,
+        image_source: str | None,
+        started: float,
+        metadata: dict[str, Any],
+        queue_wait_ms: int | None = None,
+    ) -> DetectionResult:
+        boxes, labels, scores, cls_ids = legacy
+        return detection_result_from_legacy(
+            labels,
+            boxes,
+            scores,
+            cls_ids,
+            image_source=image_source,
+            model_name=self.model_name,
+            latency_ms=_elapsed_ms(started),
+            queue_wait_ms=queue_wait_ms,
+            metadata=metadata,
+        )
+
+    def _status_result(
+        self, image_source: str | None, started: float, metadata: dict[str, Any], status: str, error: str
+    ) -> DetectionResult:
+        return DetectionResult(
+            objects=[],
+            image_source=image_source,
+            model_name=self.model_name,
+            latency_ms=_elapsed_ms(started),
+            status=status,
+            error=error,
+            metadata=metadata,
+        )
+
     def detect_structured(self, image_bgr, image_source: str | None = None) -> DetectionResult:
         """
         Run YOLO and return the shared structured detection schema.
 
         Latency covers BGR validation, preprocessing, ONNX inference,
-        postprocessing, and structured result construction.
+        postprocessing, and structured result construction; with
+        YOLO_BATCHING_ENABLED the time spent waiting for a batch is also
+        reported as queue_wait_ms.
         """
         started = time.perf_counter()
         metadata = self._image_metadata(image_bgr)
         validation_error = self._validate_bgr_image(image_bgr)
         if validation_error:
-            return DetectionResult(
-                objects=[],
-                image_source=image_source,
-                model_name=self.model_name,
-                latency_ms=_elapsed_ms(started),
-                status=DETECTION_STATUS_INVALID_IMAGE,
-                error=validation_error,
-                metadata=metadata,
+            return self._status_result(
+                image_source, started, metadata, DETECTION_STATUS_INVALID_IMAGE, validation_error
             )
 
         try:
-            boxes, labels, scores, cls_ids = self.detect_from_bgr(image_bgr)
+            if self._batcher is not None:
+                legacy, queue_wait_ms = self._detect_with_wait(image_bgr)
+            else:
+                legacy, queue_wait_ms = self.detect_from_bgr(image_bgr), None
         except Exception:
             logger.exception("YOLO structured detection failed")
-            return DetectionResult(
-                objects=[],
-                image_source=image_source,
-                model_name=self.model_name,
-                latency_ms=_elapsed_ms(started),
-                status=DETECTION_STATUS_MODEL_ERROR,
-                error="yolo_inference_failed",
-                metadata=metadata,
+            return self._status_result(
+                image_source, started, metadata, DETECTION_STATUS_MODEL_ERROR, "yolo_inference_failed"
             )
 
-        return detection_result_from_legacy(
-            labels,
-            boxes,
-            scores,
-            cls_ids,
-            image_source=image_source,
-            model_name=self.model_name,
-            latency_ms=_elapsed_ms(started),
-            metadata=metadata,
-        )
+        return self._structured_result(legacy, image_source, started, metadata, queue_wait_ms)
+
+    def detect_structured_batch(self, images_bgr: list, image_source: str | None = None) -> List[DetectionResult]:
+        """detect_structured for several images; valid ones share one stacked ONNX run."""
+        started = time.perf_counter()
+        metadata = [self._image_metadata(img) for img in images_bgr]
+        errors = [self._validate_bgr_image(img) for img in images_bgr]
+        valid = [i for i, err in enumerate(errors) if not err]
+
+        legacy: dict[int, Any] = {}
+        failed = False
+        if valid:
+            try:
+                legacy = dict(zip(valid, self.detect_batch([images_bgr[i] for i in valid])))
+            except Exception:
+                logger.exception("YOLO batch detection failed")
+                failed = True
+
+        results: List[DetectionResult] = []
+        for i, err in enumerate(errors):
+            if err:
+                results.append(
+                    self._status_result(image_source, started, metadata[i], DETECTION_STATUS_INVALID_IMAGE, err)
+                )
+            elif failed:
+                results.append(
+                    self._status_result(
+                        image_source, started, metadata[i], DETECTION_STATUS_MODEL_ERROR, "yolo_inference_failed"
+                    )
+                )
+            else:
+                results.append(self._structured_result(legacy[i], image_source, started, metadata[i]))
+        return results
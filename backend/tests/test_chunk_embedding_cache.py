@@ -0,0 +1,56 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from services.rag_backend.chunk_embedding_cache import ChunkEmbeddingCache
+from services.rag_backend.sqlite_store import SQLiteConnectionManager
+
+
+class CountingModel:
+    def __init__(self, scale=1.0):
+        self.scale = scale
+        self.calls = []
+
+    def encode(self, texts, convert_to_numpy=True, show_progress_bar=False):
+        self.calls.append(list(texts))
+        return np.array([[len(t) * self.scale, 1.0] for t in texts], dtype=np.float32)
+
+
+class ChunkEmbeddingCacheTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = Path(tmp.name) / "chunk_embeddings.sqlite"
+
+    def open(self, model_id="torch:minilm"):
+        store = SQLiteConnectionManager(self.path)
+        self.addCleanup(store.close)
+        return ChunkEmbeddingCache(store, model_id)
+
+    def test_only_misses_are_encoded_and_rows_keep_input_order(self):
+        cache, model = self.open(), CountingModel()
+        first = cache.encode(model, ["safety notice", "deck plan", "safety notice"])
+        second = cache.encode(model, ["deck plan", "muster list", "safety notice"])
+
+        self.assertEqual(model.calls, [["safety notice", "deck plan"], ["muster list"]])
+        np.testing.assert_array_equal(first[0], first[2])
+        np.testing.assert_array_equal(second[[0, 2]], first[[1, 0]])
+        self.assertEqual((cache.stats()["hits"], cache.stats()["misses"]), (3, 3))
+
+    def test_vectors_persist_per_model_id(self):
+        self.open().encode(CountingModel(), ["boilerplate footer"])
+
+        reopened, model = self.open(), CountingModel()
+        reopened.encode(model, ["boilerplate footer"])
+        other_model, onnx = self.open("onnx:minilm"), CountingModel(scale=2.0)
+        vector = other_model.encode(onnx, ["boilerplate footer"])
+
+        self.assertEqual(model.calls, [])
+        self.assertEqual(onnx.calls, [["boilerplate footer"]])
+        self.assertEqual(float(vector[0, 0]), 36.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import importlib.util
+import sys
+import types
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import numpy as np
+
+for _mod_name in ("onnxruntime", "transformers"):
+    if _mod_name not in sys.modules:
+        sys.modules[_mod_name] = types.ModuleType(_mod_name)
+
+if not hasattr(sys.modules["onnxruntime"], "SessionOptions"):
+    class _SessionOptions:
+        graph_optimization_level = None
+
+    class _GraphOptimizationLevel:
+        ORT_ENABLE_ALL = "ORT_ENABLE_ALL"
+
+    sys.modules["onnxruntime"].SessionOptions = _SessionOptions
+    sys.modules["onnxruntime"].GraphOptimizationLevel = _GraphOptimizationLevel
+    sys.modules["onnxruntime"].InferenceSession = MagicMock()
+
+if not hasattr(sys.modules["transformers"], "AutoTokenizer"):
+    sys.modules["transformers"].AutoTokenizer = MagicMock()
+
+from config import CFG
+from services.rag_backend.embedding import OnnxSentenceEmbedder, build_embedding_model, mean_pool
+
+
+class FakeTokenizer:
+    def __call__(self, texts, padding=True, truncation=True, max_length=256, return_tensors="np"):
+        ids = [[1 + (sum(map(ord, word)) % 7) for word in text.split()][:max_length] for text in texts]
+        length = max(len(row) for row in ids)
+        input_ids = np.zeros((len(ids), length), dtype=np.int64)
+        mask = np.zeros((len(ids), length), dtype=np.int64)
+        for i, row in enumerate(ids):
+            input_ids[i, : len(row)] = row
+            mask[i, : len(row)] = 1
+        return {"input_ids": input_ids, "attention_mask": mask}
+
+
+class FakeEncoderSession:
+    """Token vector = one-hot of its id; pad positions get a large vector that pooling must ignore."""
+
+    def __init__(self):
+        self.batch_shapes = []
+
+    def get_inputs(self):
+        return [types.SimpleNamespace(name="input_ids"), types.SimpleNamespace(name="attention_mask")]
+
+    def run(self, _outputs, feed):
+        ids = feed["input_ids"]
+        self.batch_shapes.append(ids.shape)
+        hidden = np.eye(8, dtype=np.float32)[ids]
+        hidden[feed["attention_mask"] == 0] = 100.0
+        return [hidden]
+
+
+def make_embedder():
+    embedder = OnnxSentenceEmbedder({"EMBED_ONNX": "/nonexistent/model_int8.onnx"})
+    embedder._sess = FakeEncoderSession()
+    embedder._tok = FakeTokenizer()
+    embedder._required_inputs = ["input_ids", "attention_mask"]
+    return embedder
+
+
+class OnnxEmbedderTests(unittest.TestCase):
+    def test_mean_pool_ignores_padding(self):
+        hidden = np.array([[[1.0, 0.0], [3.0, 2.0], [50.0, 50.0]]], dtype=np.float32)
+        pooled = mean_pool(hidden, np.array([[1, 1, 0]]))
+        np.testing.assert_allclose(pooled, [[2.0, 1.0]])
+
+    def test_batched_encode_matches_single_and_keeps_order(self):
+        embedder = make_embedder()
+        texts = ["deck", "life jackets on deck two", "muster station"]
+
+        batched = embedder.encode(texts, batch_size=2)
+        single = np.stack([embedder.encode(text) for text in texts])
+
+        self.assertEqual(batched.shape, (3, 8))
+        np.testing.assert_allclose(batched, single, atol=1e-6)
+        np.testing.assert_allclose(np.linalg.norm(batched, axis=1), 1.0, atol=1e-6)
+        # longest texts are batched together first
+        self.assertEqual(embedder._sess.batch_shapes[:2], [(2, 5), (1, 1)])
+
+    def test_backend_selection(self):
+        self.assertIsInstance(build_embedding_model({"EMBED_BACKEND": "ONNX"}), OnnxSentenceEmbedder)
+        with self.assertRaises(ValueError):
+            build_embedding_model({"EMBED_BACKEND": "tensorflow"})
+
+
+@unittest.skipUnless(
+    importlib.util.find_spec("sentence_transformers") and Path(str(CFG.get("EMBED_ONNX"))).is_file(),
+    "needs sentence-transformers and an exported embedder (scripts/export_embedder_onnx.py)",
+)
+class OnnxEmbedderParityTests(unittest.TestCase):
+    def test_onnx_embeddings_match_sentence_transformers(self):
+        sentences = [
+            "Where is the nearest lifeboat station?",
+            "The engine room is located on deck two, behind the cargo hold.",
+            "kısa",
+        ]
+        reference = build_embedding_model({**CFG, "EMBED_BACKEND": "torch"}).encode(sentences, convert_to_numpy=True)
+        onnx = build_embedding_model({**CFG, "EMBED_BACKEND": "onnx"}).encode(sentences)
+
+        cosine = np.sum(reference * onnx, axis=1) / (
+            np.linalg.norm(reference, axis=1) * np.linalg.norm(onnx, axis=1)
+        )
+        self.assertTrue(np.all(cosine > 0.99), cosine)  # int8 model; fp32 export is > 0.9999
+
+
+if __name__ == "__main__":
+    unittest.main()
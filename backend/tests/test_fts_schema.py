@@ -0,0 +1,112 @@
+import json
+import sqlite3
+import unittest
+
+from services.rag_backend.fts_schema import (
+    BM25_SQL,
+    chunk_row,
+    create_schema,
+    delete_document,
+    fetch_token_ids,
+    load_manifest,
+    mark_files_indexed,
+    row_metadata,
+    touch_files,
+    upsert_chunks,
+    upsert_token_ids,
+)
+
+
+def _match(conn, query):
+    return [row[0] for row in conn.execute(BM25_SQL, (query, 10))]
+
+
+class ChunkSchemaTests(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        create_schema(self.conn)
+
+    def test_text_is_stored_once_and_metadata_round_trips(self):
+        meta = {"document_id": "doc1", "file_name": "a.txt", "chunk_index": 0, "type": "local"}
+        upsert_chunks(self.conn, [chunk_row("doc1_chunk_0", "life jackets on deck two", meta)])
+
+        row = self.conn.execute(
+            "SELECT chunk_id, content, document_id, file_name, source, chunk_index, content_hash, metadata "
+            "FROM chunks;"
+        ).fetchone()
+        self.assertEqual(json.loads(row[-1]), {"type": "local"})  # scalar columns are not repeated
+        self.assertEqual(row_metadata(row[0], row[2:7], row[7]), {**meta, "chunk_id": "doc1_chunk_0"})
+        self.assertEqual(_match(self.conn, "jackets"), ["doc1_chunk_0"])
+
+    def test_upsert_and_delete_keep_the_fts_index_in_sync(self):
+        upsert_chunks(self.conn, [
+            chunk_row("doc1_chunk_0", "life jackets", {"document_id": "doc1"}),
+            chunk_row("doc1_chunk_1", "muster station", {"document_id": "doc1"}),
+            chunk_row("doc2_chunk_0", "galley hours", {"document_id": "doc2"}),
+        ])
+        upsert_chunks(self.conn, [chunk_row("doc1_chunk_0", "lifeboat drill", {"document_id": "doc1"})])
+
+        self.assertEqual(_match(self.conn, "jackets"), [])
+        self.assertEqual(_match(self.conn, "lifeboat"), ["doc1_chunk_0"])
+
+        self.assertEqual(delete_document(self.conn, "doc1"), 2)
+        self.assertEqual(_match(self.conn, "lifeboat OR muster OR galley"), ["doc2_chunk_0"])
+        plan = " ".join(str(r) for r in self.conn.execute(
+            "EXPLAIN QUERY PLAN DELETE FROM chunks WHERE document_id = ?;", ("doc2",)
+        ))
+        self.assertIn("idx_chunks_document_id", plan)
+
+    def test_token_ids_round_trip_and_follow_chunk_deletes(self):
+        upsert_chunks(self.conn, [chunk_row("doc1_chunk_0", "life jackets", {"document_id": "doc1"})])
+        upsert_token_ids(self.conn, [("doc1_chunk_0", [3, 31999, 7]), ("wide", [70000, 1])])
+
+        self.assertEqual(fetch_token_ids(self.conn, "doc1_chunk_0"), [3, 31999, 7])
+        self.assertEqual(fetch_token_ids(self.conn, "wide"), [70000, 1])
+        blob = self.conn.execute("SELECT ids FROM chunk_tokens WHERE chunk_id = 'doc1_chunk_0';").fetchone()[0]
+        self.assertEqual(len(blob), 6)  # uint16 per token
+
+        delete_document(self.conn, "doc1")
+        self.assertIsNone(fetch_token_ids(self.conn, "doc1_chunk_0"))
+
+    def test_v1_documents_table_is_migrated(self):
+        legacy = sqlite3.connect(":memory:")
+        legacy.execute("CREATE VIRTUAL TABLE documents USING fts5(content, metadata, tokenize = 'porter');")
+        legacy.executemany("INSERT INTO documents(content, metadata) VALUES (?, ?);", [
+            ("life jackets on deck two", json.dumps({"document_id": "doc1", "chunk_index": 0, "file_name": "a.txt"})),
+            ("muster station", json.dumps({"file_name": "b.txt", "chunk_index": 3})),
+            ("no metadata at all", None),
+        ])
+
+        self.assertEqual(create_schema(legacy), 3)
+        self.assertIsNone(legacy.execute("SELECT name FROM sqlite_master WHERE name = 'documents';").fetchone())
+        self.assertEqual(
+            sorted(r[0] for r in legacy.execute("SELECT chunk_id FROM chunks;")),
+            ["b.txt_chunk_3", "doc1_chunk_0", "legacy_3"],
+        )
+        self.assertEqual(_match(legacy, "jackets"), ["doc1_chunk_0"])
+        meta = dict(legacy.execute("SELECT key, value FROM index_meta;").fetchall())
+        self.assertEqual(meta, {"generation": 1, "schema_version": 3})
+        self.assertEqual(create_schema(legacy), 0)
+
+    def test_v2_file_progress_table_gains_manifest_columns(self):
+        v2 = sqlite3.connect(":memory:")
+        v2.execute(
+            "CREATE TABLE indexed_files (path TEXT PRIMARY KEY, size INTEGER NOT NULL, "
+            "mtime_ns INTEGER NOT NULL, chunk_count INTEGER NOT NULL, indexed_at TEXT NOT NULL);"
+        )
+        v2.execute("INSERT INTO indexed_files VALUES ('/corpus/a.txt', 10, 1, 2, 'then');")
+        create_schema(v2)
+
+        self.assertIsNone(load_manifest(v2)["/corpus/a.txt"]["sha256"])
+        mark_files_indexed(v2, [{
+            "path": "/corpus/b.txt", "size": 5, "mtime_ns": 2, "chunk_count": 1, "indexed_at": "now",
+            "sha256": "ab12", "config_hash": "cfg", "document_id": "corpus_b", "chunk_ids": ["b.txt_chunk_0"],
+        }])
+        touch_files(v2, [("/corpus/b.txt", 5, 3)])
+        entry = load_manifest(v2)["/corpus/b.txt"]
+        self.assertEqual((entry["mtime_ns"], entry["sha256"]), (3, "ab12"))
+        self.assertEqual(entry["chunk_ids"], ["b.txt_chunk_0"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+import sys
+import types
+import unittest
+from unittest.mock import MagicMock
+
+
+if "onnxruntime" not in sys.modules:
+    ort_stub = types.ModuleType("onnxruntime")
+
+    class _SessionOptions:
+        graph_optimization_level = None
+
+    class _GraphOptimizationLevel:
+        ORT_ENABLE_ALL = "ORT_ENABLE_ALL"
+
+    ort_stub.SessionOptions = _SessionOptions
+    ort_stub.GraphOptimizationLevel = _GraphOptimizationLevel
+    ort_stub.InferenceSession = MagicMock()
+    sys.modules["onnxruntime"] = ort_stub
+
+if "transformers" not in sys.modules:
+    transformers_stub = types.ModuleType("transformers")
+    auto_tokenizer = MagicMock()
+    auto_tokenizer.from_pretrained = MagicMock(return_value=MagicMock())
+    transformers_stub.AutoTokenizer = auto_tokenizer
+    sys.modules["transformers"] = transformers_stub
+
+if "tokenizers" not in sys.modules:
+    tokenizers_stub = types.ModuleType("tokenizers")
+    tokenizers_stub.Tokenizer = MagicMock()
+    sys.modules["tokenizers"] = tokenizers_stub
+
+
+from schemas.pipeline import GenerationResult
+from services.t5 import T5Service
+from utils.cache import GenerationCache, LRUCache, build_generation_cache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class LRUCacheTests(unittest.TestCase):
+    def test_evicts_least_recently_used_when_over_byte_budget(self):
+        cache = LRUCache(max_bytes=30, sizeof=len)
+        cache.put("a", "x" * 10)
+        cache.put("b", "y" * 10)
+        cache.get("a")                      # "b" is now least recently used
+        cache.put("c", "z" * 15)
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "x" * 10)
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertLessEqual(cache.stats()["bytes"], 30)
+
+    def test_entries_expire_after_ttl(self):
+        clock = FakeClock()
+        cache = LRUCache(max_bytes=100, ttl_seconds=10, clock=clock)
+        cache.put("k", "v")
+        clock.now = 9
+        self.assertEqual(cache.get("k"), "v")
+        clock.now = 21
+        self.assertIsNone(cache.get("k"))
+        self.assertEqual(cache.stats()["expirations"], 1)
+        self.assertEqual(len(cache), 0)
+
+    def test_oversized_value_is_not_stored(self):
+        cache = LRUCache(max_bytes=5, sizeof=len)
+        self.assertFalse(cache.put("k", "too large"))
+        self.assertEqual(len(cache), 0)
+
+    def test_generation_cache_skips_fallbacks_and_marks_hits(self):
+        cache = GenerationCache(max_bytes=10_000)
+        key = GenerationCache.key("prompt", mode="rag", max_new_tokens=64, model="m")
+        cache.put(key, GenerationResult(text="I don't know.", fallback_used=True))
+        self.assertIsNone(cache.get(key))
+
+        cache.put(key, GenerationResult(text="answer", latency_ms=120))
+        hit = cache.get(key, latency_ms=0)
+        self.assertEqual(hit.text, "answer")
+        self.assertEqual(hit.latency_ms, 0)
+        self.assertEqual(hit.metadata, {"cache_hit": True, "cached_latency_ms": 120})
+
+    def test_build_generation_cache_respects_config(self):
+        self.assertIsNone(build_generation_cache({"GENERATION_CACHE_ENABLED": False}))
+        self.assertIsNone(build_generation_cache({"GENERATION_CACHE_MAX_BYTES": 0}))
+        self.assertIsInstance(build_generation_cache({}), GenerationCache)
+
+
+def make_service():
+    service = T5Service.__new__(T5Service)
+    service.model_name = "local-t5-onnx"
+    service.runtime = "onnxruntime"
+    service.device = "cpu"
+    service.max_new_chat = 256
+    service.max_new_rag = 64
+    service.max_src_len = 512
+    service.tok = MagicMock(all_special_tokens=[])
+    service._cache = GenerationCache(max_bytes=1_000_000)
+    service.calls = []
+
+    def fake_generate(prompt, mode, max_new_tokens=None, seed=None):
+        service.calls.append((prompt, mode, max_new_tokens))
+        return f"out:{prompt}", {"input_tokens": 3, "output_tokens": 2,
+                                 "input_truncated": False, "output_truncated": False}
+
+    service._generate_text_with_metadata = fake_generate
+    return service
+
+
+class T5GenerationCacheTests(unittest.TestCase):
+    def test_greedy_generation_is_served_from_cache(self):
+        service = make_service()
+
+        first = service.generate_structured("2 person, 1 chair", mode="rag", prompt_type="detection_narration")
+        second = service.generate_structured("2 person, 1 chair", mode="rag", prompt_type="detection_narration")
+
+        self.assertEqual(len(service.calls), 1)
+        self.assertEqual(first.metadata, {"cache_hit": False})
+        self.assertTrue(second.metadata["cache_hit"])
+        self.assertEqual(second.text, first.text)
+        self.assertEqual(service.cache_stats()["hits"], 1)
+        self.assertEqual(service.cache_stats()["misses"], 1)
+
+    def test_key_includes_max_new_tokens(self):
+        service = make_service()
+
+        service.generate_structured("p", mode="rag", max_new_tokens=16)
+        service.generate_structured("p", mode="rag", max_new_tokens=32)
+
+        self.assertEqual(len(service.calls), 2)
+
+    def test_sampled_chat_mode_bypasses_cache(self):
+        service = make_service()
+
+        first = service.generate_structured("hello", mode="chat", prompt_type="chat")
+        service.generate_structured("hello", mode="chat", prompt_type="chat")
+
+        self.assertEqual(len(service.calls), 2)
+        self.assertIsNone(first.metadata)
+        self.assertEqual(service.cache_stats()["misses"], 0)
+
+    def test_cached_result_is_not_mutated_by_callers(self):
+        service = make_service()
+
+        first = service.generate_structured("p", mode="rag")
+        first.fallback_used = True
+        first.text = "changed"
+        second = service.generate_structured("p", mode="rag")
+
+        self.assertEqual(second.text, "out:p")
+        self.assertFalse(second.fallback_used)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -172,6 +172,62 @@ class GenerationProvidersTests(unittest.TestCase):
         self.assertEqual(result.fallback_reason, "api_error")
         self.assertIn("API rate limit exceeded", result.error)
 
+    def test_gemini_provider_caches_rag_answers_but_not_chat(self):
+        provider = GeminiProvider(self.cfg_gemini)
+        mock_resp = MagicMock()
+        mock_resp.text = "Deck 5."
+        mock_resp.usage_metadata = None
+        provider.client.models.generate_content.return_value = mock_resp
+
+        first = provider.answer_structured("where is the cafe?", ["The cafe is on deck 5."])
+        second = provider.answer_structured("where is the cafe?", ["The cafe is on deck 5."])
+        provider.chat_structured("hello")
+        provider.chat_structured("hello")
+
+        self.assertEqual(provider.client.models.generate_content.call_count, 3)
+        self.assertFalse(first.metadata["cache_hit"])
+        self.assertTrue(second.metadata["cache_hit"])
+        self.assertEqual(provider.cache_stats()["hits"], 1)
+
+    def test_gemini_provider_chat_stream_yields_chunks_then_result(self):
+        provider = GeminiProvider(self.cfg_gemini)
+
+        first = MagicMock(text="Hello ", usage_metadata=None)
+        usage = MagicMock(prompt_token_count=12, candidates_token_count=3)
+        second = MagicMock(text="Passenger!", usage_metadata=usage)
+        provider.client.models.generate_content_stream.return_value = iter([first, second])
+
+        items = list(provider.chat_stream("hello"))
+
+        self.assertEqual(items[:-1], ["Hello ", "Passenger!"])
+        result = items[-1]
+        self.assertIsInstance(result, GenerationResult)
+        self.assertEqual(result.text, "Hello Passenger!")
+        self.assertEqual(result.input_tokens, 12)
+        self.assertEqual(result.output_tokens, 3)
+        self.assertFalse(result.fallback_used)
+
+    def test_gemini_provider_stream_exception_ends_with_fallback_result(self):
+        provider = GeminiProvider(self.cfg_gemini)
+        provider.client.models.generate_content_stream.side_effect = RuntimeError("stream broke")
+
+        items = list(provider.chat_stream("hello"))
+
+        self.assertEqual(len(items), 1)
+        self.assertTrue(items[0].fallback_used)
+        self.assertEqual(items[0].fallback_reason, "api_error")
+
+    @patch("services.generation.local_t5_provider.T5Service")
+    def test_local_t5_provider_delegates_streaming(self, mock_t5_service_cls):
+        mock_service = MagicMock()
+        mock_service.chat_stream.return_value = iter(["hi"])
+        mock_t5_service_cls.return_value = mock_service
+
+        provider = LocalT5Provider(self.cfg_local)
+
+        self.assertEqual(list(provider.chat_stream("hello")), ["hi"])
+        mock_service.chat_stream.assert_called_once_with("hello")
+
     @patch("config.CFG")
     @patch("config._path_exists")
     def test_readiness_report_modes(self, mock_exists, mock_cfg):
@@ -0,0 +1,142 @@
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from schemas.pipeline import IndexingResult
+from services import ingestion_queue
+from services.ingestion_queue import IngestionQueue, IngestionQueueFull
+
+
+def wait_for(queue, job_id, stages, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job and job["stage"] in stages:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not reach {stages}: {queue.get(job_id)}")
+
+
+def indexed(saved_path, filename, metadata, progress):
+    progress("extracting")
+    progress("chunking")
+    progress("indexing", chunk_count=3)
+    return IndexingResult(
+        filename=filename,
+        document_id=metadata["document_id"],
+        saved_path=metadata["saved_path"],
+        indexed=True,
+        indexed_chunk_count=3,
+    )
+
+
+def meta(document_id):
+    return {"document_id": document_id, "saved_path": f"data/rag/corpus/{document_id}.txt"}
+
+
+class IngestionQueueTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db = Path(self.tmp.name) / "jobs.sqlite"
+
+    def open(self, index_fn, **kwargs):
+        queue = IngestionQueue(self.db, index_fn, **kwargs)
+        self.addCleanup(queue.close)
+        return queue
+
+    def test_job_reports_stages_chunk_count_and_timings(self):
+        queue = self.open(indexed)
+
+        job = queue.submit("/tmp/a.txt", "a.txt", meta("doc_a"))
+        self.assertIn(job["status"], ("queued", "running", "done"))
+        done = wait_for(queue, job["job_id"], ("done",))
+
+        self.assertEqual(done["chunk_count"], 3)
+        self.assertEqual(done["stored"], "data/rag/corpus/doc_a.txt")
+        self.assertTrue(done["result"]["indexed"])
+        for key in ("queue_wait_ms", "extracting_ms", "chunking_ms", "indexing_ms", "total_ms"):
+            self.assertIn(key, done["timings_ms"])
+        self.assertEqual(queue.stats()["done"], 1)
+
+    def test_failures_are_recorded_on_the_job(self):
+        def boom(*args):
+            raise RuntimeError("disk on fire")
+
+        queue = self.open(boom)
+        job = wait_for(queue, queue.submit("/tmp/b.txt", "b.txt", meta("doc_b"))["job_id"], ("failed",))
+        self.assertEqual((job["status"], job["error"]), ("failed", "disk on fire"))
+
+    def test_depth_limit_and_same_document_dedup(self):
+        release = threading.Event()
+
+        def blocked(saved_path, filename, metadata, progress):
+            progress("extracting")
+            release.wait(5)
+            return indexed(saved_path, filename, metadata, lambda *a, **k: None)
+
+        queue = self.open(blocked, max_pending=2)
+        self.addCleanup(release.set)
+        first = queue.submit("/tmp/a.txt", "a.txt", meta("doc_a"))
+        again = queue.submit("/tmp/a.txt", "a.txt", meta("doc_a"))
+        queue.submit("/tmp/b.txt", "b.txt", meta("doc_b"))
+
+        self.assertEqual(again["job_id"], first["job_id"])
+        self.assertTrue(queue.is_full())
+        with self.assertRaises(IngestionQueueFull):
+            queue.submit("/tmp/c.txt", "c.txt", meta("doc_c"))
+
+        release.set()
+        wait_for(queue, first["job_id"], ("done",))
+
+    def test_unfinished_jobs_resume_after_restart(self):
+        release = threading.Event()
+
+        def stuck(saved_path, filename, metadata, progress):
+            progress("extracting")
+            release.wait(5)
+            raise RuntimeError("process died")
+
+        crashed = IngestionQueue(self.db, stuck)
+        job_id = crashed.submit("/tmp/a.txt", "a.txt", meta("doc_a"))["job_id"]
+        wait_for(crashed, job_id, ("extracting",))
+        crashed._db.close()  # the worker's final write now fails, as if the process had died
+        ingestion_queue._LIVE_OWNERS.discard(crashed.owner)
+
+        queue = self.open(indexed)
+        release.set()
+        resumed = wait_for(queue, job_id, ("done",))
+        self.assertEqual(resumed["chunk_count"], 3)
+        crashed.close()
+
+    def test_queues_sharing_a_database_run_each_job_once(self):
+        release = threading.Event()
+        runs = []
+
+        def counted(saved_path, filename, metadata, progress):
+            runs.append(metadata["document_id"])
+            progress("extracting")
+            release.wait(5)
+            return indexed(saved_path, filename, metadata, progress)
+
+        first = self.open(counted, workers=2)  # e.g. two uvicorn worker processes
+        running = first.submit("/tmp/a.txt", "a.txt", meta("doc_a"))["job_id"]
+        wait_for(first, running, ("extracting",))
+        first._db.write(lambda conn: conn.execute(  # queued but not yet picked up by anyone
+            "INSERT INTO ingest_jobs(job_id, document_id, filename, saved_path, metadata, stage, created_at) "
+            "VALUES ('waiting', 'doc_b', 'b.txt', '/tmp/b.txt', ?, 'queued', 0);",
+            ('{"document_id": "doc_b", "saved_path": "b.txt"}',),
+        ))
+        first._jobs.put("waiting")
+        second = self.open(counted, workers=2)
+
+        release.set()
+        wait_for(second, running, ("done",))
+        wait_for(second, "waiting", ("done",))
+        self.assertEqual(sorted(runs), ["doc_a", "doc_b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,179 @@
+import sys
+import threading
+import types
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import numpy as np
+
+for _mod_name in ("onnxruntime", "transformers"):
+    if _mod_name not in sys.modules:
+        sys.modules[_mod_name] = types.ModuleType(_mod_name)
+
+if not hasattr(sys.modules["onnxruntime"], "SessionOptions"):
+    class _SessionOptions:
+        graph_optimization_level = None
+
+    class _GraphOptimizationLevel:
+        ORT_ENABLE_ALL = "ORT_ENABLE_ALL"
+
+    sys.modules["onnxruntime"].SessionOptions = _SessionOptions
+    sys.modules["onnxruntime"].GraphOptimizationLevel = _GraphOptimizationLevel
+    sys.modules["onnxruntime"].InferenceSession = MagicMock()
+
+if not hasattr(sys.modules["transformers"], "AutoTokenizer"):
+    sys.modules["transformers"].AutoTokenizer = MagicMock()
+
+from services.micro_batcher import MicroBatcher, build_micro_batcher, length_bucket
+from services.nlu_classifier import NLUClassifier
+from services.yolo import YOLOService
+
+
+class MicroBatcherTests(unittest.TestCase):
+    def test_concurrent_calls_share_one_batch(self):
+        batches = []
+
+        def run_batch(items):
+            batches.append(list(items))
+            return [item * 10 for item in items]
+
+        batcher = MicroBatcher("unit", run_batch, max_batch_size=8, max_wait_ms=200)
+        try:
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                outputs = list(pool.map(batcher.call, [1, 2, 3, 4]))
+        finally:
+            batcher.close()
+
+        self.assertEqual([value for value, _ in outputs], [10, 20, 30, 40])
+        self.assertEqual(len(batches), 1)
+        self.assertEqual(sorted(batches[0]), [1, 2, 3, 4])
+        self.assertTrue(all(wait >= 0 for _, wait in outputs))
+        self.assertEqual(batcher.stats()["max_batch_size_seen"], 4)
+
+    def test_bucket_key_splits_batches_and_errors_reach_callers(self):
+        batches = []
+
+        def run_batch(items):
+            batches.append(sorted(items))
+            if "boom" in items:
+                raise ValueError("bad batch")
+            return [item.upper() for item in items]
+
+        batcher = MicroBatcher("unit", run_batch, max_batch_size=8, max_wait_ms=200, bucket_key=len)
+        try:
+            futures = [batcher.submit(item) for item in ("ab", "cd", "xyz", "boom")]
+            values = [f.result(timeout=2).value for f in futures[:3]]
+            with self.assertRaises(ValueError):
+                futures[3].result(timeout=2)
+        finally:
+            batcher.close()
+
+        self.assertEqual(values, ["AB", "CD", "XYZ"])
+        self.assertEqual(sorted(batches), [["ab", "cd"], ["boom"], ["xyz"]])
+
+    def test_builder_is_off_by_default(self):
+        self.assertIsNone(build_micro_batcher({}, "CLS", "nlu", list))
+        batcher = build_micro_batcher(
+            {"CLS_BATCHING_ENABLED": True, "CLS_MAX_BATCH_SIZE": 3, "CLS_BATCH_WAIT_MS": 1}, "CLS", "nlu", list
+        )
+        try:
+            self.assertEqual(batcher.max_batch_size, 3)
+        finally:
+            batcher.close()
+        self.assertEqual(length_bucket(16), length_bucket(1))
+        self.assertNotEqual(length_bucket(17), length_bucket(16))
+
+
+class FakeTokenizer:
+    pad_token_id = 0
+
+    def __call__(self, texts, truncation=True, max_length=64, return_tensors="np"):
+        n = len(texts[0].split())
+        return {
+            "input_ids": np.arange(1, n + 1, dtype=np.int64)[None, :],
+            "attention_mask": np.ones((1, n), dtype=np.int64),
+        }
+
+
+class FakeNLUSession:
+    """Label index = number of real (unmasked) tokens, so padding mistakes change the answer."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def run(self, _outputs, feed):
+        self.calls += 1
+        lengths = feed["attention_mask"].sum(axis=1)
+        logits = np.zeros((len(lengths), 5), dtype=np.float32)
+        logits[np.arange(len(lengths)), (lengths - 1) % 5] = 8.0
+        return [logits]
+
+
+def make_classifier():
+    clf = NLUClassifier.__new__(NLUClassifier)
+    clf._sess = FakeNLUSession()
+    clf._tok = FakeTokenizer()
+    clf._labels = ["open_camera", "close_camera", "take_photo", "object_detect", "chat"]
+    clf._required_inputs = ["input_ids", "attention_mask"]
+    clf.max_len = 64
+    clf.last_error = None
+    return clf
+
+
+class NLUBatchingTests(unittest.TestCase):
+    texts = ["a", "a b", "a b c", "a b c d e"]
+
+    def test_batch_matches_single_calls(self):
+        clf = make_classifier()
+        single = [clf.classify_intent(text).label for text in self.texts]
+        batched = clf.classify_intent_batch(self.texts)
+
+        self.assertEqual([r.label for r in batched], single)
+        self.assertEqual(single, ["open_camera", "close_camera", "take_photo", "chat"])
+        self.assertEqual(clf._sess.calls, len(self.texts) + 1)
+
+    def test_concurrent_calls_report_queue_wait(self):
+        clf = make_classifier()
+        clf._batcher = MicroBatcher(
+            "nlu", clf._run_micro_batch, max_batch_size=8, max_wait_ms=200,
+            bucket_key=lambda enc: length_bucket(len(enc["input_ids"])),
+        )
+        barrier = threading.Barrier(len(self.texts))
+
+        def classify(text):
+            barrier.wait()
+            return clf.classify_intent(text)
+
+        try:
+            with ThreadPoolExecutor(max_workers=len(self.texts)) as pool:
+                results = list(pool.map(classify, self.texts))
+        finally:
+            clf._batcher.close()
+
+        self.assertEqual([r.label for r in results], ["open_camera", "close_camera", "take_photo", "chat"])
+        self.assertTrue(all(r.queue_wait_ms is not None for r in results))
+        self.assertEqual(clf._sess.calls, 1)
+
+
+class YOLOBatchingTests(unittest.TestCase):
+    def test_infer_blobs_stacks_and_splits_outputs(self):
+        service = YOLOService.__new__(YOLOService)
+        service.input_name = "images"
+        service._batch_capable = True
+        service.session = MagicMock()
+        service.session.run.side_effect = lambda _names, feed: [feed["images"] * 2, feed["images"][:, :1]]
+
+        blobs = [np.full((1, 3, 4, 4), i, dtype=np.float32) for i in range(3)]
+        outputs = service._infer_blobs(blobs)
+
+        self.assertEqual(service.session.run.call_count, 1)
+        self.assertEqual(len(outputs), 3)
+        for i, (doubled, first_channel) in enumerate(outputs):
+            self.assertEqual(doubled.shape, (1, 3, 4, 4))
+            self.assertTrue(np.all(doubled == 2 * i))
+            self.assertEqual(first_channel.shape, (1, 1, 4, 4))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,188 @@
+import os
+import sys
+import tempfile
+import threading
+import types
+import unittest
+from unittest.mock import MagicMock
+
+import numpy as np
+
+
+if "onnxruntime" not in sys.modules:
+    ort_stub = types.ModuleType("onnxruntime")
+
+    class _SessionOptions:
+        graph_optimization_level = None
+
+    class _GraphOptimizationLevel:
+        ORT_ENABLE_ALL = "ORT_ENABLE_ALL"
+
+    ort_stub.SessionOptions = _SessionOptions
+    ort_stub.GraphOptimizationLevel = _GraphOptimizationLevel
+    ort_stub.InferenceSession = MagicMock()
+    sys.modules["onnxruntime"] = ort_stub
+
+if "transformers" not in sys.modules:
+    transformers_stub = types.ModuleType("transformers")
+    transformers_stub.AutoTokenizer = MagicMock()
+    sys.modules["transformers"] = transformers_stub
+
+if "tokenizers" not in sys.modules:
+    tokenizers_stub = types.ModuleType("tokenizers")
+    tokenizers_stub.Tokenizer = MagicMock()
+    sys.modules["tokenizers"] = tokenizers_stub
+
+
+from schemas.pipeline import DetectionResult, GenerationResult, IntentResult, detection_result_from_legacy
+from services.model_host import (
+    ModelHostClient,
+    ModelHostError,
+    ModelHostServer,
+    RemoteGenerationProvider,
+    RemoteNLUClassifier,
+    RemoteYOLOService,
+)
+
+
+class FakeGeneration:
+    model_name = "fake-t5"
+    max_new_chat = 32
+
+    def __init__(self):
+        self.calls = []
+
+    def chat_structured(self, user_text, seed=None):
+        self.calls.append(("chat_structured", user_text, seed))
+        return GenerationResult(text=f"echo:{user_text}", model_name=self.model_name, metadata={"seed": seed})
+
+    def answer_structured(self, question, context):
+        return GenerationResult(text=f"{question}|{len(context or [])}")
+
+    def chat_stream(self, user_text, seed=None):
+        yield "ec"
+        yield "ho"
+        yield GenerationResult(text="echo", model_name=self.model_name)
+
+    def cache_stats(self):
+        return {"hits": 3}
+
+
+class FakeNLU:
+    def classify_intent(self, text, threshold=None):
+        return IntentResult(label="chat", confidence=0.9, threshold=threshold)
+
+
+class FakeYOLO:
+    names = ["person", "boat"]
+    model_name = "fake-yolo"
+
+    def detect_from_bgr(self, image_bgr):
+        # prove the full image arrived: the box encodes its shape and checksum
+        h, w = image_bgr.shape[:2]
+        return [[0.0, 0.0, float(w), float(h)]], ["boat"], [float(image_bgr.sum() % 1000) / 1000], [1]
+
+    def detect_structured(self, image_bgr, image_source=None):
+        boxes, labels, scores, cls_ids = self.detect_from_bgr(image_bgr)
+        return detection_result_from_legacy(labels, boxes, scores, cls_ids, image_source=image_source)
+
+    def _private(self):
+        return "hidden"
+
+
+class ModelHostRoundTripTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.tmp.name, "models.sock")
+        self.generation = FakeGeneration()
+        self.server = ModelHostServer(
+            self.socket_path,
+            {"generation": self.generation, "nlu": FakeNLU(), "yolo": FakeYOLO()},
+            shm_min_bytes=1024,
+        )
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.client = ModelHostClient(self.socket_path, timeout_s=5, shm_min_bytes=1024)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join(timeout=5)
+        self.tmp.cleanup()
+
+    def test_generation_adapter_round_trips_results_and_seed(self):
+        provider = RemoteGenerationProvider(self.client)
+
+        result = provider.chat_structured("hello", seed=7)
+
+        self.assertIsInstance(result, GenerationResult)
+        self.assertEqual(result.text, "echo:hello")
+        self.assertEqual(result.metadata, {"seed": 7})
+        self.assertEqual(provider.answer("q", ["a", "b"]), "q|2")
+        self.assertEqual(provider.cache_stats(), {"hits": 3})
+        self.assertEqual(provider.model_name, "fake-t5")
+        self.assertEqual(provider.max_new_chat, 32)
+
+    def test_stream_relays_deltas_then_final_result(self):
+        items = list(RemoteGenerationProvider(self.client).chat_stream("hi"))
+
+        self.assertEqual(items[:2], ["ec", "ho"])
+        self.assertIsInstance(items[-1], GenerationResult)
+        self.assertEqual(items[-1].text, "echo")
+        # the connection went back to the pool and still works
+        self.assertTrue(self.client.ping())
+
+    def test_nlu_adapter_keeps_legacy_predict(self):
+        nlu = RemoteNLUClassifier(self.client)
+
+        self.assertEqual(nlu.classify_intent("x", threshold=0.5).threshold, 0.5)
+        self.assertEqual(nlu.predict("x"), ("chat", 0.9))
+        self.assertIsNone(nlu.last_error)
+
+    def test_large_images_travel_through_shared_memory(self):
+        yolo = RemoteYOLOService(self.client)
+        image = np.arange(120 * 160 * 3, dtype=np.uint8).reshape(120, 160, 3)
+
+        boxes, labels, scores, cls_ids = yolo.detect_from_bgr(image)
+        detection = yolo.detect_structured(image, image_source="upload")
+
+        self.assertEqual(boxes, [[0.0, 0.0, 160.0, 120.0]])
+        self.assertAlmostEqual(scores[0], float(image.sum() % 1000) / 1000)
+        self.assertEqual((labels, cls_ids), (["boat"], [1]))
+        self.assertIsInstance(detection, DetectionResult)
+        self.assertEqual(detection.image_source, "upload")
+        self.assertEqual(yolo.names, ["person", "boat"])
+
+    def test_small_arrays_are_sent_inline(self):
+        image = np.ones((4, 4, 3), dtype=np.uint8)
+
+        boxes, *_ = RemoteYOLOService(self.client).detect_from_bgr(image)
+
+        self.assertEqual(boxes, [[0.0, 0.0, 4.0, 4.0]])
+
+    def test_unexposed_methods_are_refused(self):
+        with self.assertRaises(ModelHostError) as ctx:
+            self.client.call("yolo._private")
+
+        self.assertEqual(ctx.exception.error_type, "LookupError")
+        self.assertEqual(self.server.info()["errors"], 1)
+
+    def test_concurrent_callers_do_not_interleave_frames(self):
+        provider = RemoteGenerationProvider(self.client)
+        results = {}
+
+        def worker(i):
+            results[i] = provider.chat(f"m{i}", seed=i)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(results, {i: f"echo:m{i}" for i in range(8)})
+
+
+if __name__ == "__main__":
+    unittest.main()
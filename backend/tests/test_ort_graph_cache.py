@@ -0,0 +1,132 @@
+import os
+import sys
+import tempfile
+import types
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+
+if "onnxruntime" not in sys.modules:
+    ort_stub = types.ModuleType("onnxruntime")
+
+    class _SessionOptions:
+        graph_optimization_level = None
+
+    class _GraphOptimizationLevel:
+        ORT_ENABLE_ALL = "ORT_ENABLE_ALL"
+
+    ort_stub.SessionOptions = _SessionOptions
+    ort_stub.GraphOptimizationLevel = _GraphOptimizationLevel
+    ort_stub.InferenceSession = MagicMock()
+    sys.modules["onnxruntime"] = ort_stub
+
+
+import services.ort_graph_cache as graph_cache_module
+from services.ort_graph_cache import OptimizedGraphCache
+from services.runtime_resources import CPUResourceManager
+
+FAKE_ORT = types.SimpleNamespace(
+    __version__="1.99.0",
+    GraphOptimizationLevel=types.SimpleNamespace(ORT_ENABLE_ALL="ORT_ENABLE_ALL", ORT_DISABLE_ALL="ORT_DISABLE_ALL"),
+)
+
+
+class Options:
+    def __init__(self):
+        self.graph_optimization_level = "ORT_ENABLE_ALL"
+        self.optimized_model_filepath = ""
+
+
+class FakeSession:
+    """Mimics ORT: writes the optimized graph when optimized_model_filepath is set."""
+
+    loads = []
+
+    def __init__(self, path, options):
+        FakeSession.loads.append((os.path.basename(path), options.graph_optimization_level))
+        if Path(path).read_bytes() == b"corrupt":
+            raise RuntimeError("invalid graph")
+        if options.optimized_model_filepath:
+            Path(options.optimized_model_filepath).write_bytes(b"optimized:" + Path(path).read_bytes())
+
+
+@patch.object(graph_cache_module, "ort", FAKE_ORT)
+class OptimizedGraphCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.model = Path(self.tmp.name) / "decoder.onnx"
+        self.model.write_bytes(b"graph-v1")
+        self.cache_dir = Path(self.tmp.name) / "cache"
+        FakeSession.loads = []
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_miss_writes_graph_then_hit_loads_it_unoptimized(self):
+        cache = OptimizedGraphCache(self.cache_dir)
+
+        cache.create_session("dec", str(self.model), Options(), FakeSession)
+        cache.create_session("dec", str(self.model), Options(), FakeSession)
+
+        cached = list(self.cache_dir.glob("decoder.*.ort.onnx"))
+        self.assertEqual(len(cached), 1)
+        self.assertEqual(cached[0].read_bytes(), b"optimized:graph-v1")
+        self.assertEqual(FakeSession.loads, [("decoder.onnx", "ORT_ENABLE_ALL"), (cached[0].name, "ORT_DISABLE_ALL")])
+        entry = cache.report()["sessions"]["dec"]
+        self.assertEqual((entry["hits"], entry["misses"], entry["status"]), (1, 1, "hit"))
+        self.assertIn("load_ms", entry)
+
+    def test_changed_model_or_ort_version_invalidates_entry(self):
+        cache = OptimizedGraphCache(self.cache_dir)
+        cache.create_session("dec", str(self.model), Options(), FakeSession)
+        first = {p.name for p in self.cache_dir.glob("*.ort.onnx")}
+
+        self.model.write_bytes(b"graph-v2-longer")
+        cache.create_session("dec", str(self.model), Options(), FakeSession)
+        second = {p.name for p in self.cache_dir.glob("*.ort.onnx")}
+
+        with patch.object(FAKE_ORT, "__version__", "2.0.0"):
+            cache.create_session("dec", str(self.model), Options(), FakeSession)
+        third = {p.name for p in self.cache_dir.glob("*.ort.onnx")}
+
+        self.assertEqual(len(second), 1)
+        self.assertNotEqual(first, second)   # stale entry replaced
+        self.assertNotEqual(second, third)
+        self.assertEqual(cache.report()["sessions"]["dec"]["misses"], 3)
+
+    def test_unloadable_cached_graph_is_rebuilt(self):
+        cache = OptimizedGraphCache(self.cache_dir)
+        cache.create_session("dec", str(self.model), Options(), FakeSession)
+        cached = next(self.cache_dir.glob("*.ort.onnx"))
+        cached.write_bytes(b"corrupt")
+
+        cache.create_session("dec", str(self.model), Options(), FakeSession)
+
+        self.assertEqual(cached.read_bytes(), b"optimized:graph-v1")
+        self.assertEqual(FakeSession.loads[-1], ("decoder.onnx", "ORT_ENABLE_ALL"))
+
+    def test_disabled_cache_passes_through(self):
+        cache = OptimizedGraphCache(self.cache_dir, enabled=False)
+
+        cache.create_session("dec", str(self.model), Options(), FakeSession)
+
+        self.assertFalse(self.cache_dir.exists())
+        self.assertEqual(cache.report()["sessions"], {})
+
+    def test_resource_manager_replicas_share_one_cache_entry(self):
+        manager = CPUResourceManager(
+            {"ORT_GRAPH_CACHE_DIR": str(self.cache_dir), "YOLO_SESSION_REPLICAS": 3}, cpu_count=4
+        )
+        with patch.object(manager, "session_options", side_effect=lambda model: Options()):
+            pool = manager.session_pool("yolo", str(self.model), factory=FakeSession)
+
+        self.assertEqual(pool.size, 3)
+        graph_cache = manager.report()["graph_cache"]
+        self.assertTrue(graph_cache["enabled"])
+        self.assertEqual(graph_cache["sessions"]["yolo"]["misses"], 1)
+        self.assertEqual(graph_cache["sessions"]["yolo"]["hits"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
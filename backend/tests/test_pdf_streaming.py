@@ -0,0 +1,134 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from services.rag_backend import io_loader, preprocess
+
+
+class FakePage:
+    def __init__(self, text):
+        self.text = text
+
+    def get_text(self):
+        return self.text
+
+
+class FakePdf:
+    def __init__(self, pages, loads):
+        self.pages = pages
+        self.loads = loads
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    @property
+    def page_count(self):
+        return len(self.pages)
+
+    def load_page(self, index):
+        self.loads.append(index)
+        return FakePage(self.pages[index])
+
+
+class FakeFitz:
+    def __init__(self, pages):
+        self.pages = pages
+        self.loads = []
+
+    def open(self, path):
+        return FakePdf(self.pages, self.loads)
+
+
+def word_pages(count, words_per_page=40):
+    return [" ".join(f"p{page}w{i}" for i in range(words_per_page)) for page in range(1, count + 1)]
+
+
+class WordTokenizer:
+    def __init__(self):
+        self.vocab = {}
+
+    def encode(self, text, add_special_tokens=False):
+        return [self.vocab.setdefault(word, len(self.vocab)) for word in text.split()]
+
+    def decode(self, ids, skip_special_tokens=True, clean_up_tokenization_spaces=True):
+        words = {v: k for k, v in self.vocab.items()}
+        return " ".join(words[i] for i in ids)
+
+
+class PdfStreamingTests(unittest.TestCase):
+    def test_read_pdf_joins_pages_in_order(self):
+        fake = FakeFitz(["one ", "two ", "three"])
+        with patch.object(io_loader, "fitz", fake):
+            self.assertEqual(io_loader.read_pdf("manual.pdf"), "one two three")
+
+    def test_parallel_ranges_keep_page_order_within_the_window(self):
+        fake = FakeFitz(word_pages(23, words_per_page=1))
+        pool = ThreadPoolExecutor(max_workers=3)
+        self.addCleanup(pool.shutdown)
+        submitted = []
+        real_submit = pool.submit
+
+        def submit(fn, path, start, stop):
+            submitted.append((start, stop))
+            return real_submit(fn, path, start, stop)
+
+        pool.submit = submit
+        with patch.object(io_loader, "fitz", fake), patch.object(io_loader, "_get_pdf_pool", return_value=pool):
+            pages = list(io_loader.stream_pdf_pages("big.pdf", workers=3, window=9, min_parallel_pages=10))
+
+        self.assertEqual([number for number, _ in pages], list(range(1, 24)))
+        self.assertEqual(submitted[:3], [(0, 3), (3, 6), (6, 9)])  # window / workers pages per range
+        self.assertTrue(all(stop - start <= 3 for start, stop in submitted))
+
+    def test_small_pdf_is_read_sequentially(self):
+        fake = FakeFitz(word_pages(5, words_per_page=1))
+        with patch.object(io_loader, "fitz", fake), patch.object(io_loader, "_get_pdf_pool") as pool:
+            pages = list(io_loader.stream_pdf_pages("small.pdf", workers=4, min_parallel_pages=10))
+        pool.assert_not_called()
+        self.assertEqual(len(pages), 5)
+
+    def test_page_stream_chunks_match_whole_text_chunking(self):
+        pages = [(n, text) for n, text in enumerate(word_pages(7), start=1)]
+        whole = " ".join(text for _, text in pages)
+        for tokenizer in (None, WordTokenizer()):
+            with self.subTest(tokenizer=type(tokenizer).__name__), patch.object(preprocess, "_tokenizer", tokenizer):
+                streamed = list(preprocess.chunk_pages(iter(pages), 90, 20))
+                expected = [piece for piece, _ in preprocess._chunk_records(whole, 90, 20)]
+                self.assertEqual([piece for piece, _, _, _ in streamed], expected)
+
+                first = streamed[0]
+                self.assertEqual((first[2], first[3]), (1, 3))  # 90 units of 40-word pages
+                self.assertEqual(streamed[-1][3], 7)
+                if tokenizer is not None:
+                    self.assertEqual(len(first[1]), 90)
+
+    def test_preprocess_pdf_streams_records_with_page_metadata(self):
+        fake = FakeFitz(word_pages(4))
+        pulled = []
+
+        def counting_stream(path, **options):
+            for page in io_loader.iter_pdf_pages(path):
+                pulled.append(page[0])
+                yield page
+
+        with (
+            patch.object(io_loader, "fitz", fake),
+            patch.object(io_loader, "stream_pdf_pages", side_effect=counting_stream),
+            patch.object(preprocess, "_tokenizer", None),
+        ):
+            records = preprocess.preprocess_pdf("manual.pdf", {"document_id": "doc_1", "file_name": "manual.pdf"})
+            first = next(records)
+            self.assertLess(len(pulled), 4)  # the first chunk is ready before the last page is read
+            rest = list(records)
+
+        self.assertEqual(first["metadata"]["page_start"], 1)
+        self.assertEqual(first["metadata"]["document_id"], "doc_1")
+        self.assertEqual([r["chunk_index"] for r in [first, *rest]], list(range(1 + len(rest))))
+        self.assertEqual(rest[-1]["metadata"]["page_end"], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,7 @@
 import sys
 import tempfile
+import threading
+import time
 import types
 import unittest
 import warnings
@@ -163,6 +165,14 @@ class FakeStructuredT5(FakeT5):
         )
 
 
+class FakeStreamingT5(FakeStructuredT5):
+    def answer_stream(self, question, context):
+        result = self.answer_structured(question, context)
+        for word in result.text.split(":"):
+            yield word + ":"
+        yield result
+
+
 class FakeRAG:
     top_k = 2
     thr = 0.4
@@ -253,6 +263,26 @@ class PipelineOrchestratorTests(unittest.TestCase):
         self.assertEqual(result.generation.device, "cpu")
         self.assertEqual(result.generation.max_new_tokens, 256)
 
+    def test_chat_route_forwards_request_seed_only_when_set(self):
+        class SeededT5(FakeStructuredT5):
+            def __init__(self):
+                super().__init__()
+                self.kwargs = []
+
+            def chat_structured(self, text, **kwargs):
+                self.kwargs.append(kwargs)
+                return super().chat_structured(text)
+
+        t5 = SeededT5()
+        pipeline = self.make_pipeline(nlu=FakeNLU("chat", 0.96), t5=t5)
+
+        seeded = pipeline.run("hello", metadata={"seed": "42"})
+        pipeline.run("hello")
+        pipeline.run("hello", metadata={"seed": "not-a-number"})
+
+        self.assertEqual(t5.kwargs, [{"seed": 42}, {}, {}])
+        self.assertEqual(seeded.metadata["seed"], 42)
+
     def test_rag_route_prefers_structured_t5_generation(self):
         class LegacyContextRAG:
             top_k = 2
@@ -393,6 +423,28 @@ class PipelineOrchestratorTests(unittest.TestCase):
         self.assertEqual(result.final_answer, "chat:hello")
         self.assertTrue(result.warnings)
 
+    def test_run_stream_emits_evidence_then_tokens_then_result(self):
+        pipeline = self.make_pipeline(nlu=FakeNLU("rag", 0.91), t5=FakeStreamingT5())
+
+        events = list(pipeline.run_stream("what is in the document?"))
+        names = [name for name, _ in events]
+
+        self.assertEqual(names[:3], ["intent", "route", "retrieval"])
+        self.assertEqual(names[-1], "result")
+        self.assertTrue(all(name == "token" for name in names[3:-1]))
+        self.assertGreater(len(names[3:-1]), 1)
+        result = events[-1][1]
+        self.assertEqual(result.model_dump(exclude={"duration_ms"}),
+                         pipeline.run("what is in the document?").model_dump(exclude={"duration_ms"}))
+
+    def test_run_stream_without_streaming_provider_still_closes_with_result(self):
+        pipeline = self.make_pipeline(nlu=FakeNLU("chat", 0.96), t5=FakeStructuredT5())
+
+        events = list(pipeline.run_stream("hello"))
+
+        self.assertEqual([name for name, _ in events], ["intent", "route", "result"])
+        self.assertEqual(events[-1][1].final_answer, "structured-chat:hello")
+
 
 class RunEndpointTests(unittest.TestCase):
     class RecordingDiagentClient:
@@ -732,6 +784,33 @@ class RunEndpointTests(unittest.TestCase):
         self.assertEqual(body["metadata"]["web_only"], False)
         self.assertIsNotNone(body["duration_ms"])
 
+    def test_run_stream_endpoint_sends_sse_events_and_closing_result(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            import web.app as web_app
+
+        class FakeStreamingPipeline:
+            def run_stream(self, input_text, metadata=None, image_bgr=None):
+                yield "intent", IntentResult(label="chat", confidence=0.9)
+                yield "token", {"text": "o"}
+                yield "token", {"text": "k"}
+                yield "result", RunResult(input_text=input_text, final_answer="ok", status="completed")
+
+        previous_pipeline = web_app.PIPELINE
+        web_app.PIPELINE = FakeStreamingPipeline()
+        try:
+            client = TestClient(web_app.app)
+            response = client.post("/api/run/stream", json={"message": "hello"})
+        finally:
+            web_app.PIPELINE = previous_pipeline
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/event-stream"))
+        blocks = [block for block in response.text.split("\n\n") if block.strip()]
+        events = [block.split("\n", 1)[0].removeprefix("event: ") for block in blocks]
+        self.assertEqual(events, ["intent", "token", "token", "result"])
+        self.assertIn('"final_answer": "ok"', blocks[-1])
+
     def test_intent_endpoint_returns_intent_without_t5_side_effect(self):
         with warnings.catch_warnings():
             warnings.simplefilter("ignore", DeprecationWarning)
@@ -1029,5 +1108,85 @@ class RunEndpointTests(unittest.TestCase):
         self.assertEqual(fake_client.finished[0][1]["status"], "finished")
 
 
+    def test_upload_endpoint_queues_indexing_and_reports_job_progress(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            import web.app as web_app
+        from services.document_indexing import index_saved_upload
+        from services.ingestion_queue import IngestionQueue
+
+        with tempfile.TemporaryDirectory() as tmp:
+            release = threading.Event()
+
+            def add_chunks(chunks, document_id):
+                release.wait(5)
+                return []
+
+            ingest = IngestionQueue(Path(tmp) / "jobs.sqlite", index_saved_upload)
+            previous = web_app.INGEST
+            web_app.INGEST = ingest
+            try:
+                with (
+                    patch.dict(web_app.CFG, {"RAG_CORPUS_DIR": tmp, "RAG_INGEST_ASYNC": True}),
+                    patch("services.document_indexing._add_chunks_to_index", side_effect=add_chunks),
+                    patch("services.document_indexing._find_indexed_document", return_value=None),
+                    patch("services.document_indexing._record_indexed_document") as record,
+                ):
+                    client = TestClient(web_app.app)
+                    response = client.post(
+                        "/api/upload",
+                        files={"file": ("manual.txt", b"the muster station is on deck seven", "text/plain")},
+                    )
+                    job = response.json()
+                    self.assertEqual(response.status_code, 202)
+                    self.assertIn(job["status"], ("queued", "running"))  # indexing is still blocked
+                    self.assertTrue(job["document_id"].startswith("doc_"))
+
+                    release.set()
+                    deadline = time.monotonic() + 5
+                    while time.monotonic() < deadline:
+                        status = client.get(job["status_url"]).json()
+                        if status["status"] == "done":
+                            break
+                        time.sleep(0.01)
+                    missing = client.get("/api/upload/does-not-exist")
+            finally:
+                release.set()
+                web_app.INGEST = previous
+                ingest.close()
+
+        self.assertEqual(status["status"], "done")
+        self.assertGreater(status["chunk_count"], 0)
+        self.assertTrue(status["result"]["indexed"])
+        self.assertIn("indexing_ms", status["timings_ms"])
+        self.assertEqual(missing.status_code, 404)
+        record.assert_called_once()
+
+    def test_identical_upload_returns_skipped_without_queueing(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            import web.app as web_app
+
+        ingest = MagicMock()
+        ingest.is_full.return_value = False
+        previous = web_app.INGEST
+        web_app.INGEST = ingest
+        try:
+            with tempfile.TemporaryDirectory() as tmp, (
+                patch.dict(web_app.CFG, {"RAG_CORPUS_DIR": tmp, "RAG_INGEST_ASYNC": True})
+            ), patch("services.document_indexing._find_indexed_document", return_value={"chunk_count": 3}):
+                response = TestClient(web_app.app).post(
+                    "/api/upload",
+                    files={"file": ("manual.txt", b"the muster station is on deck seven", "text/plain")},
+                )
+        finally:
+            web_app.INGEST = previous
+
+        body = response.json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((body["skipped"], body["skip_reason"]), (True, "already_indexed"))
+        ingest.submit.assert_not_called()
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+
+from services.prompt_compiler import PromptCompiler
+
+EOS = 1
+
+
+class WordTokenizer:
+    """Whitespace word tokenizer with a growing vocab; records every text it tokenizes."""
+
+    def __init__(self):
+        self.vocab = {}
+        self.calls = []
+
+    def __call__(self, texts, padding=False, truncation=False, max_length=None, return_attention_mask=True):
+        self.calls.extend(texts)
+        rows = []
+        for text in texts:
+            ids = [self.vocab.setdefault(word, len(self.vocab) + 2) for word in text.split()]
+            rows.append(ids + [EOS])
+        return {"input_ids": rows}
+
+
+class PairTokenizer(WordTokenizer):
+    """Merges every two characters regardless of spaces, so splits are not clean."""
+
+    def __call__(self, texts, padding=False, truncation=False, max_length=None, return_attention_mask=True):
+        self.calls.extend(texts)
+        rows = []
+        for text in texts:
+            pairs = [text[i:i + 2] for i in range(0, len(text), 2)]
+            rows.append([self.vocab.setdefault(p, len(self.vocab) + 2) for p in pairs] + [EOS])
+        return {"input_ids": rows}
+
+
+INSTRUCTION = "Answer strictly using only the Context.\nContext:"
+
+
+class PromptCompilerTests(unittest.TestCase):
+    def test_prefix_hit_matches_full_tokenization_and_only_tokenizes_tail(self):
+        tok = WordTokenizer()
+        compiler = PromptCompiler(tok, max_src_len=512, eos_token_id=EOS)
+        self.assertTrue(compiler.register(INSTRUCTION))
+        prompt = f"{INSTRUCTION} deck five has a cafe\nQuestion: where is the cafe?\nAnswer:"
+        expected = tok([prompt])["input_ids"][0]
+        tok.calls.clear()
+
+        compiled = compiler.compile(prompt)
+
+        self.assertTrue(compiled.prefix_hit)
+        self.assertEqual(compiled.input_ids.tolist(), [expected])
+        self.assertEqual(compiled.full_tokens, len(expected))
+        self.assertEqual(len(tok.calls), 1)
+        self.assertNotIn("strictly", tok.calls[0])
+
+    def test_static_prompt_needs_no_tokenizer_call(self):
+        tok = WordTokenizer()
+        compiler = PromptCompiler(tok, max_src_len=512, eos_token_id=EOS)
+        compiler.register("You are a bot. Confirm the camera is open.\nAssistant:")
+        tok.calls.clear()
+
+        compiled = compiler.compile("You are a bot. Confirm the camera is open.\nAssistant:")
+
+        self.assertEqual(tok.calls, [])
+        self.assertEqual(compiled.input_ids[0, -1], EOS)
+
+    def test_prefix_ending_inside_a_word_is_not_used(self):
+        tok = WordTokenizer()
+        compiler = PromptCompiler(tok, max_src_len=512, eos_token_id=EOS)
+        compiler.register("Question")
+
+        compiled = compiler.compile("Questions are welcome")
+
+        self.assertFalse(compiled.prefix_hit)
+        self.assertEqual(compiled.input_ids.tolist(), [tok(["Questions are welcome"])["input_ids"][0]])
+
+    def test_truncation_keeps_head_and_eos_with_untruncated_count(self):
+        tok = WordTokenizer()
+        compiler = PromptCompiler(tok, max_src_len=5, eos_token_id=EOS)
+        compiler.register(INSTRUCTION)
+
+        compiled = compiler.compile(f"{INSTRUCTION} a b c d e f")
+
+        self.assertEqual(compiled.input_ids.shape, (1, 5))
+        self.assertEqual(compiled.input_ids[0, -1], EOS)
+        self.assertEqual(compiled.full_tokens, 7 + 6 + 1)
+        self.assertTrue(compiled.truncated)
+        self.assertEqual(compiled.attention_mask.tolist(), [[1] * 5])
+
+    def test_unregistered_prompt_uses_a_single_untruncated_pass(self):
+        tok = WordTokenizer()
+        compiler = PromptCompiler(tok, max_src_len=3, eos_token_id=EOS)
+
+        compiled = compiler.compile("one two three four")
+
+        self.assertEqual(tok.calls, ["one two three four"])
+        self.assertEqual(compiled.full_tokens, 5)
+        self.assertEqual(compiled.input_ids.shape, (1, 3))
+
+    def test_prefix_that_does_not_split_cleanly_is_rejected(self):
+        compiler = PromptCompiler(PairTokenizer(), max_src_len=512, eos_token_id=EOS)
+
+        self.assertFalse(compiler.register("odd prefix!"))
+        self.assertEqual(compiler.prefix_count, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,12 +7,18 @@ Covers:
 4. RAGService.retrieve_structured() with mock hybrid_search
 5. PipelineOrchestrator._run_rag() fills RunResult.retrieval
 6. build_context_from_chunks / chunk mapping helpers
+7. create_context packing from index-time token counts
 """
 import sys
+import threading
+import time
 import types
 import unittest
+from pathlib import Path
 from unittest.mock import patch, MagicMock
 
+import numpy as np
+
 # ---------------------------------------------------------------------------
 # Stub heavy ML dependencies that may be absent in test environment.
 # This lets us import pipeline_orchestrator without installing sentence_transformers etc.
@@ -288,6 +294,620 @@ class WebSearchEvidenceTests(unittest.TestCase):
         self.assertTrue(result.fallback_used)
 
 
+class RetrievalFanOutTests(unittest.TestCase):
+    strong_web = [
+        {"chunk": f"web evidence {i}", "source": f"https://example.test/{i}", "title": str(i), "score": 1.0}
+        for i in range(3)
+    ]
+
+    def test_local_and_web_branches_overlap(self):
+        from services.rag import RAGService
+
+        def slow_local(*args, **kwargs):
+            time.sleep(0.2)
+            return [{"chunk": "local evidence", "score": 0.8, "file_name": "manual.txt"}]
+
+        def slow_web(question):
+            time.sleep(0.2)
+            return self.strong_web
+
+        started = time.perf_counter()
+        with (
+            patch("services.rag.hybrid_search", side_effect=slow_local),
+            patch("services.rag.process_web_results", side_effect=slow_web),
+        ):
+            result = RAGService({"RAG_SCORE_THRESHOLD": 0.4}).retrieve_structured(
+                "manual question", use_internet=True
+            )
+        elapsed = time.perf_counter() - started
+
+        self.assertLess(elapsed, 0.35)  # max of the branches, not their sum
+        self.assertEqual(result.retrieval_mode, "hybrid_local_web")
+        branches = result.metadata["branches"]
+        self.assertEqual(branches["local"]["status"], "ok")
+        self.assertEqual(branches["web"]["status"], "ok")
+        self.assertEqual(branches["web"]["count"], 3)
+        self.assertGreaterEqual(branches["web"]["latency_ms"], 150)
+
+    def test_web_only_skips_local_branch_when_web_is_usable(self):
+        from services.rag import RAGService
+
+        with (
+            patch("services.rag.hybrid_search") as local_search,
+            patch("services.rag.process_web_results", return_value=self.strong_web),
+        ):
+            result = RAGService({"RAG_SCORE_THRESHOLD": 0.4}).retrieve_structured("news", web_only=True)
+
+        local_search.assert_not_called()
+        self.assertEqual(result.retrieval_mode, "web_only")
+        self.assertIsNone(result.best_score)
+        self.assertEqual(result.metadata["branches"]["local"]["status"], "skipped")
+
+    def test_web_timeout_falls_back_to_local(self):
+        from services.rag import RAGService
+
+        release = threading.Event()
+        with (
+            patch("services.rag.hybrid_search", return_value=[
+                {"chunk": "local evidence", "score": 0.8, "file_name": "manual.txt"},
+            ]),
+            patch("services.rag.process_web_results", side_effect=lambda q: release.wait(2) and []),
+        ):
+            result = RAGService(
+                {"RAG_SCORE_THRESHOLD": 0.4, "RAG_WEB_TIMEOUT_SECONDS": 0.05}
+            ).retrieve_structured("manual question", use_internet=True)
+            release.set()
+
+        self.assertEqual(result.web_search_status, "timeout")
+        self.assertEqual(result.web_error_type, "TimeoutError")
+        self.assertEqual(result.metadata["branches"]["web"]["status"], "timeout")
+        self.assertEqual(result.retrieval_mode, "local_only")
+
+    def test_hybrid_search_keeps_bm25_results_when_vector_branch_fails(self):
+        from services.rag_backend import search
+
+        timings = {}
+        with (
+            patch.object(search, "chroma_search", side_effect=RuntimeError("chroma down")),
+            patch.object(search, "bm25_search", return_value=[("keyword hit", -3.0, "manual.txt", {})]),
+        ):
+            results = search.hybrid_search("keyword", top_k=2, timings=timings)
+
+        self.assertEqual([r["chunk"] for r in results], ["keyword hit"])
+        self.assertEqual(timings["vector"]["status"], "error")
+        self.assertEqual(timings["vector"]["error_type"], "RuntimeError")
+        self.assertEqual(timings["bm25"]["status"], "ok")
+        self.assertEqual(timings["bm25"]["count"], 1)
+
+    def test_bm25_database_errors_reach_the_branch_status(self):
+        import sqlite3
+
+        from services.rag_backend import search
+
+        def locked():
+            raise sqlite3.OperationalError("database is locked")
+
+        timings = {}
+        with (
+            patch.object(search, "_cache", None),
+            patch.object(search, "_bm25_cursor", side_effect=locked),
+            patch.object(search, "chroma_search", return_value=[("vector hit", 0.2, "a.txt", {})]),
+        ):
+            results = search.hybrid_search("life jackets?", top_k=2, timings=timings)
+            search.chroma_search.side_effect = RuntimeError("chroma down")
+            with self.assertRaisesRegex(RuntimeError, "bm25 database is locked"):
+                search.hybrid_search("life jackets?", top_k=2)
+
+        self.assertEqual([r["chunk"] for r in results], ["vector hit"])
+        self.assertEqual(timings["bm25"]["status"], "error")
+        self.assertEqual(timings["bm25"]["error_type"], "OperationalError")
+        self.assertNotIn("count", timings["bm25"])
+
+
+class RetrievalCacheTests(unittest.TestCase):
+    def setUp(self):
+        import sqlite3
+
+        from services.rag_backend import indexer, search
+        from services.rag_backend.retrieval_cache import RetrievalCache
+
+        self.search = search
+        self.real_bm25_search = search.bm25_search
+        db = sqlite3.connect(":memory:")
+        db.execute("CREATE TABLE index_meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);")
+        patches = [
+            patch.object(search, "_cache", RetrievalCache(1 << 20, 1 << 20)),
+            patch.object(search, "_bm25_cursor", side_effect=db.cursor),
+            patch.object(search, "chroma_search", return_value=[("vector hit", 0.2, "a.txt", {})]),
+            patch.object(search, "bm25_search", return_value=[("keyword hit", -3.0, "b.txt", {})]),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.bump = lambda: indexer._bump_index_generation(db)
+
+    def test_repeated_query_is_served_from_result_cache(self):
+        first_timings, second_timings = {}, {}
+        first = self.search.hybrid_search("Life  Jackets", top_k=2, timings=first_timings)
+        second = self.search.hybrid_search("life jackets", top_k=2, timings=second_timings)
+
+        self.assertEqual(first, second)
+        self.assertEqual(first_timings["result_cache"], "miss")
+        self.assertEqual(second_timings["result_cache"], "hit")
+        self.assertEqual(self.search.chroma_search.call_count, 1)
+        second[0]["metadata"]["mutated"] = True  # callers get copies
+        self.assertNotIn("mutated", self.search.hybrid_search("life jackets", top_k=2)[0]["metadata"])
+
+        stats = self.search.retrieval_cache_stats()
+        self.assertEqual(stats["results"]["hits"], 2)
+        self.assertEqual(stats["index_generation"], 0)
+
+    def test_index_write_invalidates_cached_results(self):
+        self.search.hybrid_search("life jackets", top_k=2)
+        self.bump()
+        timings = {}
+        self.search.hybrid_search("life jackets", top_k=2, timings=timings)
+
+        self.assertEqual(timings["result_cache"], "miss")
+        self.assertEqual(self.search.chroma_search.call_count, 2)
+        self.assertEqual(self.search.index_generation(), 1)
+
+    def test_partial_results_are_not_cached(self):
+        self.search.chroma_search.side_effect = RuntimeError("chroma down")
+        self.search.hybrid_search("life jackets", top_k=2)
+        self.search.hybrid_search("life jackets", top_k=2)
+
+        self.assertEqual(self.search.bm25_search.call_count, 2)
+
+    def test_bm25_database_error_is_not_cached(self):
+        self.search.bm25_search.side_effect = self.real_bm25_search  # no chunks_fts table in this db
+        timings = {}
+        self.search.hybrid_search("life jackets", top_k=2, timings=timings)
+        self.search.hybrid_search("life jackets", top_k=2)
+
+        self.assertEqual(timings["bm25"]["status"], "error")
+        self.assertEqual(self.search.chroma_search.call_count, 2)
+
+    def test_query_embedding_cache_skips_the_encoder(self):
+        with patch.object(self.search, "encode_queries_batch", return_value=np.ones((1, 4), dtype=np.float32)) as enc:
+            first, _ = self.search.embed_query("where is deck two")
+            second, _ = self.search.embed_query("where is  deck two ")
+
+        self.assertEqual(first, second)
+        enc.assert_called_once()
+        self.assertEqual(self.search.retrieval_cache_stats()["embeddings"]["hits"], 1)
+
+
+class ChunkIdFusionTests(unittest.TestCase):
+    def test_bm25_search_returns_chunk_ids_from_the_chunks_table(self):
+        import sqlite3
+
+        from services.rag_backend import search
+        from services.rag_backend.fts_schema import chunk_row, create_schema, upsert_chunks
+
+        db = sqlite3.connect(":memory:")
+        create_schema(db)
+        upsert_chunks(db, [
+            chunk_row("doc1_chunk_0", "life jackets are on deck two", {"document_id": "doc1", "file_name": "a.txt"}),
+            chunk_row("doc2_chunk_0", "the galley opens at noon", {"document_id": "doc2", "file_name": "b.txt"}),
+        ])
+        with patch.object(search, "_bm25_cursor", side_effect=db.cursor):
+            rows = search.bm25_search("jackets", top_k=5, include_metadata=True)
+
+        self.assertEqual(len(rows), 1)
+        text, _score, fname, metadata = rows[0]
+        self.assertEqual((text, fname), ("life jackets are on deck two", "a.txt"))
+        self.assertEqual(metadata["chunk_id"], "doc1_chunk_0")
+        self.assertEqual(metadata["document_id"], "doc1")
+
+    def test_bm25_search_accepts_fts5_operator_characters(self):
+        import sqlite3
+
+        from services.rag_backend import search
+        from services.rag_backend.fts_schema import chunk_row, create_schema, fts5_match_query, upsert_chunks
+
+        db = sqlite3.connect(":memory:")
+        create_schema(db)
+        upsert_chunks(db, [chunk_row("doc1_chunk_0", "life jackets are on deck two", {"file_name": "a.txt"})])
+        with patch.object(search, "_bm25_cursor", side_effect=db.cursor):
+            for question in ("where are the life-jackets?", 'deck: "two" AND (NOT', "jacket*"):
+                rows = search.bm25_search(question, top_k=5, raise_errors=True)
+                self.assertEqual([r[0] for r in rows], ["life jackets are on deck two"], question)
+            self.assertEqual(search.bm25_search("?!", top_k=5, raise_errors=True), [])
+
+        self.assertEqual(fts5_match_query("Life-jacket life?"), '"life" OR "jacket"')
+
+    def test_hybrid_fusion_joins_branches_by_chunk_id(self):
+        from services.rag_backend import search
+
+        with (
+            patch.object(search, "_cache", None),
+            patch.object(search, "chroma_search", return_value=[
+                ("Life jackets are on deck two.", 0.1, "a.txt", {"chunk_id": "doc1_chunk_0"}),
+                ("The galley opens at noon.", 0.6, "b.txt", {"chunk_id": "doc2_chunk_0"}),
+            ]),
+            patch.object(search, "bm25_search", return_value=[
+                ("life jackets are on deck two", -4.0, "a.txt", {"chunk_id": "doc1_chunk_0"}),
+                ("muster station", -1.0, "c.txt", {}),
+            ]),
+        ):
+            results = search.hybrid_search("life jackets", top_k=5)
+
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0]["chunk_id"], "doc1_chunk_0")
+        self.assertAlmostEqual(results[0]["score"], 1.0)
+        self.assertEqual(results[0]["chunk"], "Life jackets are on deck two.")
+        self.assertNotIn("chunk_id", [r for r in results if r["file_name"] == "c.txt"][0])
+
+
+class MmapVectorSearchTests(unittest.TestCase):
+    def test_chroma_search_reads_text_from_chunks_table(self):
+        import tempfile
+
+        from services.rag_backend import search
+        from services.rag_backend.fts_schema import chunk_row, create_schema, upsert_chunks
+        from services.rag_backend.sqlite_store import SQLiteConnectionManager
+        from services.rag_backend.vector_store import MmapVectorStore
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        store = SQLiteConnectionManager(f"{tmp.name}/bm25.sqlite")
+        self.addCleanup(store.close)
+        store.write(create_schema)
+        store.write(upsert_chunks, [
+            chunk_row("doc1_chunk_0", "life jackets are on deck two", {"document_id": "doc1", "file_name": "a.txt"}),
+        ])
+        vectors = MmapVectorStore(f"{tmp.name}/vectors")
+        vectors.add(["doc1_chunk_0", "gone_chunk_0"], np.array([[1.0, 0.0], [0.9, 0.1]], dtype=np.float32))
+
+        with (
+            patch.object(search, "store", store),
+            patch.object(search, "vector_store", vectors),
+            patch.object(search, "embed_query", return_value=([1.0, 0.0], None)),
+        ):
+            rows = search.chroma_search("life jackets", top_k=2, include_metadata=True)
+
+        self.assertEqual(len(rows), 1)  # vector without a chunks row is dropped
+        text, distance, fname, metadata = rows[0]
+        self.assertEqual((text, fname, metadata["chunk_id"]), ("life jackets are on deck two", "a.txt", "doc1_chunk_0"))
+        self.assertAlmostEqual(distance, 0.0, places=5)
+
+
+class _WordTokenizer:
+    """Whitespace tokenizer with a growing vocabulary; counts encode calls."""
+
+    def __init__(self):
+        self.vocab = {}
+        self.encode_calls = 0
+
+    def __len__(self):
+        return 32_000
+
+    def encode(self, text, add_special_tokens=False):
+        self.encode_calls += 1
+        return [self.vocab.setdefault(word, len(self.vocab)) for word in text.split()]
+
+    def decode(self, ids, skip_special_tokens=True, clean_up_tokenization_spaces=True):
+        words = {v: k for k, v in self.vocab.items()}
+        return " ".join(words[i] for i in ids)
+
+
+class ContextPackingTests(unittest.TestCase):
+    def setUp(self):
+        from services.rag_backend import prompt, token_counts
+
+        self.prompt = prompt
+        self.tok = _WordTokenizer()
+        fp = token_counts.tokenizer_fingerprint(self.tok)
+        for name, value in (("_tok", self.tok), ("_TOK_FP", fp)):
+            patcher = patch.object(prompt, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        prompt._overhead.cache_clear()
+        prompt._separator_len.cache_clear()
+        self.addCleanup(prompt._overhead.cache_clear)
+        self.addCleanup(prompt._separator_len.cache_clear)
+        prompt._separator_len()  # computed once per process, like the skeleton cost
+        self.fp = fp
+
+    def _chunk(self, text, fp=None, **extra):
+        metadata = {"token_count": len(text.split()), "token_fp": fp or self.fp}
+        return {"chunk": text, "metadata": metadata, **extra}
+
+    def test_stored_token_counts_skip_reencoding(self):
+        chunks = [self._chunk("alpha beta gamma"), self._chunk("delta epsilon")]
+        plain = [{"chunk": c["chunk"]} for c in chunks]
+
+        expected = self.prompt.create_context(plain, max_tokens=500, question="q")
+        self.tok.encode_calls = 0
+        context = self.prompt.create_context(chunks, max_tokens=500, question="q")
+
+        self.assertEqual(context, expected)
+        self.assertEqual(self.tok.encode_calls, 0)  # skeleton and separator costs are cached too
+
+    def test_foreign_tokenizer_counts_are_ignored(self):
+        self.prompt.create_context([], max_tokens=500, question="q")
+        self.tok.encode_calls = 0
+        self.prompt.create_context([self._chunk("alpha beta", fp="other")], max_tokens=500, question="q")
+        self.assertEqual(self.tok.encode_calls, 1)
+
+    def test_last_chunk_is_trimmed_from_stored_token_ids(self):
+        overhead = self.prompt._overhead("q")
+        words = "one two three four five six".split()
+        ids = self.tok.encode(" ".join(words))
+        self.tok.encode_calls = 0
+
+        context = self.prompt.create_context(
+            [self._chunk("zero"), self._chunk(" ".join(words), token_ids=ids)],
+            max_tokens=overhead + 4,
+            question="q",
+        )
+
+        self.assertEqual(context, "zero\n\none two three")
+        self.assertEqual(self.tok.encode_calls, 0)
+
+    def test_preprocess_records_carry_token_counts(self):
+        from services.rag_backend import preprocess
+
+        with (
+            patch.object(preprocess, "_tokenizer", self.tok),
+            patch.object(preprocess, "_tokenizer_fp", self.fp),
+        ):
+            records = preprocess.preprocess_documents([{"file_name": "a.txt", "text": "one two three four five"}])
+
+        self.assertTrue(records)
+        for record in records:
+            self.assertEqual(record["metadata"]["token_count"], len(record["chunk"].split()))
+            self.assertEqual(record["metadata"]["token_fp"], self.fp)
+            self.assertEqual(self.tok.decode(record["token_ids"]), record["chunk"])
+
+    def test_build_context_from_chunks_forwards_metadata(self):
+        chunk = RetrievedChunk(text="alpha beta", metadata={"token_count": 2, "token_fp": self.fp})
+        self.prompt.create_context([], max_tokens=500, question="q")
+        self.tok.encode_calls = 0
+
+        from services.rag import build_context_from_chunks
+
+        self.assertEqual(build_context_from_chunks([chunk], max_tokens=500, question="q"), "alpha beta")
+        self.assertEqual(self.tok.encode_calls, 0)
+
+
+class BulkIndexerTests(unittest.TestCase):
+    def setUp(self):
+        import tempfile
+
+        from services.rag_backend.fts_schema import create_schema
+        from services.rag_backend.indexer import _normalize_record
+        from services.rag_backend.sqlite_store import SQLiteConnectionManager
+        from services.rag_backend.vector_store import MmapVectorStore
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        self.src = self.root / "corpus"
+        self.src.mkdir()
+        store = SQLiteConnectionManager(self.root / "bm25.sqlite")
+        self.addCleanup(store.close)
+        store.write(create_schema)
+        self.encoded = []
+        self.cache = None
+
+        def encode(texts, **kwargs):
+            self.encoded.append(len(texts))
+            return np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+
+        self.indexer = types.SimpleNamespace(
+            store=store,
+            vector_store=MmapVectorStore(self.root / "vectors"),
+            embedding_model=types.SimpleNamespace(encode=encode),
+            get_embedding_cache=lambda: self.cache,
+            STORE_TOKEN_IDS=False,
+            _normalize_record=_normalize_record,
+        )
+        for i in range(3):
+            (self.src / f"doc{i}.txt").write_text(" ".join(f"word{i}_{j}" for j in range(150)), encoding="utf-8")
+        (self.src / "notes.bin").write_text("not a corpus file", encoding="utf-8")
+
+    def run_bulk(self, **kwargs):
+        from services.rag_backend.bulk_indexer import bulk_index, list_corpus_files
+
+        kwargs.setdefault("embed_batch", 2)
+        kwargs.setdefault("commit_every", 3)
+        return bulk_index(list_corpus_files(self.src), indexer_mod=self.indexer, report_every=0, **kwargs)
+
+    def chunk_ids(self):
+        rows = self.indexer.store.reader().execute("SELECT chunk_id FROM chunks ORDER BY chunk_id;")
+        return [row[0] for row in rows]
+
+    def test_pipeline_writes_chunks_vectors_and_progress(self):
+        stats = self.run_bulk(workers=0)
+
+        self.assertEqual((stats.docs, stats.skipped, stats.failed), (3, 0, 0))
+        self.assertEqual(len(self.chunk_ids()), stats.chunks)
+        self.assertEqual(self.indexer.vector_store.count(), stats.chunks)
+        self.assertLessEqual(max(self.encoded), 2)
+        self.assertIn("doc0.txt_chunk_0", self.chunk_ids())
+        done = self.indexer.store.reader().execute("SELECT count(*), sum(chunk_count) FROM indexed_files;").fetchone()
+        self.assertEqual(done, (3, stats.chunks))
+
+    def test_rerun_resumes_and_reindexes_only_changed_files(self):
+        import os
+
+        first = self.run_bulk(workers=0)
+        changed = self.src / "doc1.txt"
+        changed.write_text("a much shorter body", encoding="utf-8")
+        os.utime(changed, ns=(changed.stat().st_atime_ns, changed.stat().st_mtime_ns + 1_000_000))
+        self.encoded.clear()
+
+        second = self.run_bulk(workers=0)
+
+        self.assertEqual((second.docs, second.skipped, second.chunks), (1, 2, 1))
+        self.assertEqual(sum(self.encoded), 1)
+        self.assertEqual(len(self.chunk_ids()), first.chunks)  # doc1's chunks were upserted, not duplicated
+
+    def test_process_pool_matches_in_process_run(self):
+        self.run_bulk(workers=2)
+        pooled = self.chunk_ids()
+        self.indexer.store.write(lambda conn: conn.execute("DELETE FROM chunks;"))
+
+        self.run_bulk(workers=0, resume=False)
+        self.assertEqual(self.chunk_ids(), pooled)
+
+    def test_process_pool_forks_before_any_writer_thread_starts(self):
+        import threading
+
+        from services.rag_backend import bulk_indexer
+        from services.rag_backend.chunk_embedding_cache import build_chunk_embedding_cache
+
+        self.cache = build_chunk_embedding_cache(
+            {"RAG_CHUNK_EMBED_CACHE_PATH": str(self.root / "cache" / "chunk_embeddings.sqlite")}, "test-model"
+        )
+        self.addCleanup(self.cache.close)
+        self.indexer.embedding_cache = self.cache
+        at_fork = []
+        real_pool = bulk_indexer._process_pool
+
+        def recording_pool(workers):
+            writers = {"sqlite-writer", "bulk-index-writer"}
+            at_fork.append(sorted(t.name for t in threading.enumerate() if t.name in writers))
+            return real_pool(workers)
+
+        with patch.object(bulk_indexer, "_process_pool", recording_pool):
+            stats = self.run_bulk(workers=2)
+
+        self.assertEqual(at_fork, [[]])
+        self.assertEqual((stats.docs, stats.failed), (3, 0))
+        self.assertEqual(len(self.chunk_ids()), stats.chunks)
+        self.assertEqual(self.indexer.vector_store.count(), stats.chunks)
+        self.assertEqual(sum(self.encoded), stats.chunks)
+        done = self.indexer.store.reader().execute("SELECT count(*) FROM indexed_files;").fetchone()[0]
+        self.assertEqual(done, 3)
+
+    def test_unreadable_files_are_counted_and_retried(self):
+        (self.src / "broken.docx").write_bytes(b"not a docx")
+        with patch("services.rag_backend.io_loader.docx", None):
+            stats = self.run_bulk(workers=0)
+            again = self.run_bulk(workers=0)
+
+        self.assertEqual((stats.docs, stats.failed), (3, 1))
+        self.assertEqual((again.skipped, again.failed), (3, 1))
+
+    def test_incremental_sync_replaces_changed_and_drops_removed_files(self):
+        import os
+
+        from services.rag_backend import preprocess
+
+        first = self.run_bulk(workers=0, incremental=True, root=self.src)
+        doc1_before = [cid for cid in self.chunk_ids() if cid.startswith("doc1.txt")]
+        (self.src / "doc0.txt").unlink()
+        changed = self.src / "doc1.txt"
+        changed.write_text("a much shorter body", encoding="utf-8")
+        os.utime(changed, ns=(changed.stat().st_atime_ns, changed.stat().st_mtime_ns + 1_000_000))
+        copied = self.src / "doc2.txt"  # same bytes, newer mtime
+        os.utime(copied, ns=(copied.stat().st_atime_ns, copied.stat().st_mtime_ns + 1_000_000))
+        self.encoded.clear()
+
+        second = self.run_bulk(workers=0, incremental=True, root=self.src)
+
+        self.assertGreater(len(doc1_before), 1)
+        self.assertEqual((second.docs, second.skipped, second.removed, second.chunks), (1, 1, 1, 1))
+        self.assertEqual(sum(self.encoded), 1)
+        ids = self.chunk_ids()
+        self.assertFalse([cid for cid in ids if cid.startswith("doc0.txt")])
+        self.assertEqual([cid for cid in ids if cid.startswith("doc1.txt")], ["doc1.txt_chunk_0"])
+        self.assertEqual(self.indexer.vector_store.count(), len(ids))
+        self.assertEqual(len(ids), first.chunks - first.chunks // 3 - len(doc1_before) + 1)
+
+        self.encoded.clear()
+        third = self.run_bulk(workers=0, incremental=True, root=self.src)
+        self.assertEqual((third.docs, third.skipped, sum(self.encoded)), (0, 2, 0))
+
+        with patch.object(preprocess, "chunking_config_hash", return_value="new-chunking"):
+            rebuilt = self.run_bulk(workers=0, incremental=True, root=self.src)
+        self.assertEqual((rebuilt.docs, rebuilt.skipped), (2, 0))
+        self.assertEqual(self.chunk_ids(), ids)
+
+    def test_rebuild_embeds_only_texts_missing_from_the_chunk_cache(self):
+        from services.rag_backend.chunk_embedding_cache import build_chunk_embedding_cache
+
+        self.cache = build_chunk_embedding_cache(
+            {"RAG_CHUNK_EMBED_CACHE_PATH": str(self.root / "cache" / "chunk_embeddings.sqlite")}, "test-model"
+        )
+        self.addCleanup(self.cache.close)
+        first = self.run_bulk(workers=0)
+        vectors = self.indexer.vector_store.count()
+        self.assertEqual(sum(self.encoded), first.chunks)
+
+        self.indexer.vector_store.reset()
+        self.indexer.store.write(lambda conn: conn.execute("DELETE FROM chunks;"))
+        (self.src / "doc3.txt").write_text("a brand new file", encoding="utf-8")
+        self.encoded.clear()
+        rebuilt = self.run_bulk(workers=0, resume=False)
+
+        self.assertEqual(rebuilt.chunks, first.chunks + 1)
+        self.assertEqual(sum(self.encoded), 1)
+        self.assertEqual(self.indexer.vector_store.count(), vectors + 1)
+        self.assertEqual(self.cache.stats()["hits"], first.chunks)
+
+
+class StreamingReplaceTests(unittest.TestCase):
+    def setUp(self):
+        import tempfile
+
+        from services.rag_backend import indexer
+        from services.rag_backend.fts_schema import create_schema
+        from services.rag_backend.sqlite_store import SQLiteConnectionManager
+        from services.rag_backend.vector_store import MmapVectorStore
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        store = SQLiteConnectionManager(Path(tmp.name) / "bm25.sqlite")
+        self.addCleanup(store.close)
+        store.write(create_schema)
+        self.indexer = indexer
+        encode = lambda texts, **kwargs: np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+        patches = [
+            patch.object(indexer, "store", store),
+            patch.object(indexer, "vector_store", MmapVectorStore(Path(tmp.name) / "vectors")),
+            patch.object(indexer, "embedding_model", types.SimpleNamespace(encode=encode)),
+            patch.object(indexer, "get_embedding_cache", return_value=None),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def chunks(self, words, fail_after=None):
+        for i, word in enumerate(words):
+            if i == fail_after:
+                raise RuntimeError("broken page")
+            yield {"file_name": "manual.pdf", "chunk": word, "chunk_index": i, "metadata": {"document_id": "doc"}}
+
+    def state(self):
+        conn = self.indexer.store.reader()
+        texts = [row[0] for row in conn.execute("SELECT content FROM chunks ORDER BY chunk_id;")]
+        generation = conn.execute("SELECT value FROM index_meta WHERE key = 'generation';").fetchone()
+        return texts, generation[0] if generation else 0
+
+    def test_replace_writes_batches_and_bumps_generation_once(self):
+        progress = []
+        count, _ = self.indexer.replace_document_chunks_streaming(
+            self.chunks(["a", "b", "c", "d", "e"]), "doc", batch_size=2, on_batch=progress.append
+        )
+
+        self.assertEqual((count, progress), (5, [2, 4, 5]))
+        self.assertEqual(self.state(), (["a", "b", "c", "d", "e"], 1))
+        self.assertEqual(self.indexer.vector_store.count(), 5)
+
+    def test_extraction_failure_keeps_the_previous_chunks(self):
+        self.indexer.replace_document_chunks_streaming(self.chunks(["old1", "old2"]), "doc")
+
+        with self.assertRaises(RuntimeError):
+            self.indexer.replace_document_chunks_streaming(self.chunks(["new1", "new2", "new3"], fail_after=2), "doc")
+
+        self.assertEqual(self.state(), (["old1", "old2"], 1))
+        self.assertEqual(self.indexer.vector_store.count(), 2)
+
+
 # ---------------------------------------------------------------------------
 # 4. PipelineOrchestrator structured RAG (mock-based, no ML imports)
 # ---------------------------------------------------------------------------
@@ -0,0 +1,153 @@
+import sys
+import threading
+import time
+import types
+import unittest
+from unittest.mock import MagicMock
+
+
+if "onnxruntime" not in sys.modules:
+    ort_stub = types.ModuleType("onnxruntime")
+
+    class _SessionOptions:
+        graph_optimization_level = None
+
+    class _GraphOptimizationLevel:
+        ORT_ENABLE_ALL = "ORT_ENABLE_ALL"
+
+    ort_stub.SessionOptions = _SessionOptions
+    ort_stub.GraphOptimizationLevel = _GraphOptimizationLevel
+    ort_stub.InferenceSession = MagicMock()
+    sys.modules["onnxruntime"] = ort_stub
+
+
+from config import readiness_report
+from services.runtime_resources import CPUResourceManager, SessionPool
+
+
+class FakeSession:
+    def __init__(self, path, options):
+        self.path = path
+        self.options = options
+        self.active = 0
+        self.peak = 0
+
+    def run(self, output_names, feed, run_options=None):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        time.sleep(0.02)
+        self.active -= 1
+        return [feed["x"]]
+
+    def get_inputs(self):
+        return [types.SimpleNamespace(name="x")]
+
+
+class CPUResourceManagerTests(unittest.TestCase):
+    def test_auto_budget_splits_cores_by_weight_and_replicas(self):
+        manager = CPUResourceManager({"T5_SESSION_REPLICAS": 2}, cpu_count=16)
+
+        self.assertEqual(manager.budgets["t5_encoder"].intra_op_threads, 1)   # 16 * 1/8 over 2 replicas
+        self.assertEqual(manager.budgets["t5_decoder"].intra_op_threads, 3)   # 16 * 3/8 over 2 replicas
+        self.assertEqual(manager.budgets["yolo"].intra_op_threads, 4)
+        self.assertEqual(manager.budgets["nlu"].intra_op_threads, 2)
+        self.assertEqual(manager.budgets["embedding"].intra_op_threads, 2)
+        self.assertFalse(manager.report()["oversubscribed"])
+
+    def test_explicit_settings_win_and_oversubscription_is_reported(self):
+        manager = CPUResourceManager(
+            {"CPU_THREAD_BUDGET": 4, "CLS_INTRA_OP_THREADS": 3, "CLS_INTER_OP_THREADS": 2, "YOLO_SESSION_REPLICAS": 3},
+            cpu_count=64,
+        )
+
+        report = manager.report()
+        self.assertEqual(report["thread_budget"], 4)
+        self.assertEqual(report["models"]["nlu"]["threads"], 6)
+        self.assertEqual(report["models"]["yolo"]["replicas"], 3)
+        self.assertTrue(report["oversubscribed"])
+
+    def test_session_pool_applies_thread_options_and_is_reused(self):
+        manager = CPUResourceManager({"YOLO_INTRA_OP_THREADS": 3, "YOLO_SESSION_REPLICAS": 2}, cpu_count=8)
+
+        pool = manager.session_pool("yolo", "model.onnx", factory=FakeSession)
+
+        self.assertEqual(pool.size, 2)
+        self.assertIs(manager.session_pool("yolo", "model.onnx", factory=FakeSession), pool)
+        options = pool._sessions[0].options
+        self.assertEqual(options.intra_op_num_threads, 3)
+        self.assertEqual(options.inter_op_num_threads, 1)
+        self.assertEqual(manager.report()["session_pools"]["yolo"]["replicas"], 2)
+
+    def test_replica_override(self):
+        manager = CPUResourceManager({"T5_SESSION_REPLICAS": 4}, cpu_count=8)
+
+        pool = manager.session_pool("t5_decoder", "decoder.onnx", replicas=1, factory=FakeSession)
+
+        self.assertEqual(pool.size, 1)
+
+    def test_pools_are_shared_per_file_and_replica_count(self):
+        manager = CPUResourceManager({"T5_SESSION_REPLICAS": 3}, cpu_count=8)
+
+        shared = manager.session_pool("t5_decoder", "decoder.onnx", factory=FakeSession)
+        single = manager.session_pool("t5_decoder", "decoder.onnx", replicas=1, factory=FakeSession)
+        other = manager.session_pool("t5_decoder", "other/decoder.onnx", factory=FakeSession)
+
+        self.assertEqual((shared.size, single.size), (3, 1))
+        self.assertIs(manager.session_pool("t5_decoder", "./decoder.onnx", factory=FakeSession), shared)
+        self.assertIsNot(other, shared)
+        self.assertEqual(other._sessions[0].path, "other/decoder.onnx")
+        self.assertEqual(len(manager.report()["session_pools"]), 3)
+
+    def test_t5_prefix_applies_to_both_pools_and_per_pool_keys_override(self):
+        manager = CPUResourceManager(
+            {"T5_INTRA_OP_THREADS": 2, "T5_SESSION_REPLICAS": 2, "T5_DECODER_INTRA_OP_THREADS": 5}, cpu_count=8
+        )
+
+        self.assertEqual(manager.budgets["t5_encoder"].intra_op_threads, 2)
+        self.assertEqual(manager.budgets["t5_decoder"].intra_op_threads, 5)
+        self.assertEqual(manager.budgets["t5_decoder"].replicas, 2)
+
+    def test_planned_threads_count_every_built_pool(self):
+        manager = CPUResourceManager({"T5_SESSION_REPLICAS": 2}, cpu_count=8)
+        self.assertFalse(manager.report()["oversubscribed"])
+
+        manager.session_pool("t5_encoder", "encoder.onnx", factory=FakeSession)
+        manager.session_pool("t5_decoder", "decoder.onnx", replicas=1, factory=FakeSession)
+        manager.session_pool("yolo", "a.onnx", key="yolo_a", factory=FakeSession)
+        manager.session_pool("yolo", "b.onnx", key="yolo_b", factory=FakeSession)
+
+        report = manager.report()
+        # encoder 2 replicas x 1 + decoder 1 x 1 + two yolo pools 2 x 1 x 2 + nlu 1 + embedding 1
+        self.assertEqual(report["planned_threads"], 9)
+        self.assertTrue(report["oversubscribed"])
+
+
+class SessionPoolTests(unittest.TestCase):
+    def test_concurrent_runs_use_separate_replicas(self):
+        sessions = [FakeSession("m", None), FakeSession("m", None)]
+        pool = SessionPool("m", sessions)
+
+        threads = [threading.Thread(target=pool.run, args=(None, {"x": i})) for i in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertTrue(all(s.peak == 1 for s in sessions))   # a replica never runs twice at once
+        self.assertEqual(pool.stats()["runs"], 6)
+        self.assertEqual(pool.stats()["idle"], 2)
+        self.assertEqual(pool.get_inputs()[0].name, "x")
+        self.assertEqual(pool.path, "m")                     # other attributes come from replica 0
+
+
+class ReadinessResourcesTests(unittest.TestCase):
+    def test_readiness_reports_runtime_resources(self):
+        report = readiness_report()
+
+        self.assertIn("models", report["runtime_resources"])
+        self.assertIn("t5_encoder", report["runtime_resources"]["models"])
+        self.assertIn("t5_decoder", report["runtime_resources"]["models"])
+
+
+if __name__ == "__main__":
+    unittest.main()
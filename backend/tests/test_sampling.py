@@ -0,0 +1,73 @@
+import unittest
+
+import numpy as np
+
+from services.sampling import SamplingParams, make_rng, sample_next_tokens
+
+
+def reference_distribution(logits, params):
+    """Full-sort nucleus distribution, the behaviour the prefilter has to reproduce."""
+    x = logits.astype(np.float64) / params.temperature
+    probs = np.exp(x - x.max())
+    probs /= probs.sum()
+    order = np.argsort(-probs, kind="stable")
+    keep = (np.cumsum(probs[order]) - probs[order]) < params.top_p
+    out = np.zeros_like(probs)
+    out[order[keep]] = probs[order[keep]]
+    return out / out.sum()
+
+
+def empirical(logits, params, draws, prefilter_k):
+    rng = make_rng(0)
+    counts = np.zeros(logits.shape[-1])
+    for _ in range(draws):
+        counts[sample_next_tokens(logits[None, :], [params], [rng], prefilter_k=prefilter_k)[0]] += 1
+    return counts / draws
+
+
+class SamplingTests(unittest.TestCase):
+    def setUp(self):
+        self.logits = (np.random.default_rng(3).standard_normal(40) * 2).astype(np.float32)
+
+    def test_prefilter_matches_full_sort_nucleus(self):
+        params = SamplingParams(temperature=0.7, top_p=0.9)
+        expected = reference_distribution(self.logits, params)
+
+        for prefilter_k in (40, 8, 2):   # 2 forces the widened-prefilter path
+            got = empirical(self.logits, params, 5000, prefilter_k)
+            self.assertLess(np.abs(got - expected).max(), 0.03, prefilter_k)
+            self.assertLessEqual(set(np.flatnonzero(got)), set(np.flatnonzero(expected)))
+
+    def test_top_k_limits_candidates(self):
+        params = SamplingParams(temperature=1.0, top_k=3)
+        rng = make_rng(1)
+
+        seen = {int(sample_next_tokens(self.logits[None, :], [params], [rng])[0]) for _ in range(300)}
+
+        self.assertEqual(seen, set(np.argsort(-self.logits)[:3].tolist()))
+
+    def test_rows_are_independent_and_seeded(self):
+        logits = np.tile(self.logits, (3, 1))
+        params = [SamplingParams(temperature=0.0), SamplingParams(temperature=1.5), SamplingParams(temperature=1.5)]
+
+        first = sample_next_tokens(logits, params, [make_rng(s) for s in (0, 1, 2)])
+        again = sample_next_tokens(logits, params, [make_rng(s) for s in (9, 1, 2)])
+
+        self.assertEqual(first.tolist(), again.tolist())
+        self.assertEqual(first[0], int(np.argmax(self.logits)))
+
+    def test_repetition_penalty_demotes_generated_tokens(self):
+        best, second = np.argsort(-self.logits)[:2]
+        params = [SamplingParams(temperature=0.0, repetition_penalty=50.0)]
+
+        token = sample_next_tokens(self.logits[None, :], params, [make_rng(0)], [[int(best)]])
+
+        self.assertEqual(int(token[0]), int(second))
+
+    def test_params_must_match_batch(self):
+        with self.assertRaises(ValueError):
+            sample_next_tokens(np.zeros((2, 5)), [SamplingParams()], [make_rng(0)])
+
+
+if __name__ == "__main__":
+    unittest.main()
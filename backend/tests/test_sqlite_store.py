@@ -0,0 +1,104 @@
+import sqlite3
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from services.rag_backend.sqlite_store import SQLiteConnectionManager, build_sqlite_store
+
+
+def _schema(conn):
+    conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS documents USING fts5(content, metadata);")
+
+
+def _insert(conn, rows):
+    conn.executemany("INSERT INTO documents(content, metadata) VALUES (?, ?);", rows)
+
+
+def _count(conn):
+    return conn.execute("SELECT count(*) FROM documents;").fetchone()[0]
+
+
+class SQLiteConnectionManagerTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store = SQLiteConnectionManager(Path(tmp.name) / "index" / "bm25.sqlite", cache_size_kib=1024)
+        self.addCleanup(self.store.close)
+        self.store.write(_schema)
+
+    def test_wal_mode_and_read_only_readers(self):
+        self.store.write(_insert, [("life jackets on deck two", "{}")])
+        reader = self.store.reader()
+
+        self.assertEqual(reader.execute("PRAGMA journal_mode;").fetchone()[0], "wal")
+        self.assertEqual(reader.execute("PRAGMA cache_size;").fetchone()[0], -1024)
+        self.assertIs(self.store.reader(), reader)
+        self.assertEqual(_count(reader), 1)
+        with self.assertRaises(sqlite3.OperationalError):
+            reader.execute("DELETE FROM documents;")
+
+    def test_each_thread_gets_its_own_reader(self):
+        self.store.write(_insert, [("muster station", "{}")])
+        barrier = threading.Barrier(4)
+
+        def read(_):
+            barrier.wait()
+            conn = self.store.reader()
+            return id(conn), _count(conn)
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(read, range(4)))
+
+        self.assertEqual(len({conn_id for conn_id, _ in results}), 4)
+        self.assertEqual([count for _, count in results], [1, 1, 1, 1])
+        self.assertEqual(self.store.stats()["reader_connections"], 4)
+
+    def test_readers_are_not_blocked_by_an_open_write(self):
+        self.store.write(_insert, [("committed row", "{}")])
+        in_write, release = threading.Event(), threading.Event()
+
+        def slow_bulk_write(conn):
+            _insert(conn, [("uncommitted row", "{}")])
+            in_write.set()
+            release.wait(5)
+
+        pending = self.store.submit(slow_bulk_write)
+        self.assertTrue(in_write.wait(5))
+        try:
+            self.assertEqual(_count(self.store.reader()), 1)  # last committed snapshot, no lock wait
+        finally:
+            release.set()
+        pending.result(timeout=5)
+        self.assertEqual(_count(self.store.reader()), 2)
+
+    def test_writes_are_serialized_and_failed_jobs_roll_back(self):
+        futures = [self.store.submit(_insert, [(f"row {i}", "{}")]) for i in range(20)]
+        for future in futures:
+            future.result(timeout=5)
+
+        def half_then_fail(conn):
+            _insert(conn, [("half", "{}")])
+            raise ValueError("bad row")
+
+        with self.assertRaises(ValueError):
+            self.store.write(half_then_fail)
+
+        self.assertEqual(_count(self.store.reader()), 20)
+        stats = self.store.stats()
+        self.assertEqual(stats["writes"], 22)
+        self.assertEqual(stats["write_errors"], 1)
+
+    def test_closed_store_rejects_writes(self):
+        self.store.close()
+        with self.assertRaises(RuntimeError):
+            self.store.write(_insert, [])
+
+    def test_builder_reads_config(self):
+        store = build_sqlite_store("unused.sqlite", {"RAG_SQLITE_MMAP_BYTES": 0, "RAG_SQLITE_BUSY_TIMEOUT_MS": 10})
+        self.assertEqual((store.mmap_size, store.busy_timeout_ms, store.cache_size_kib), (0, 10, 16 * 1024))
+
+
+if __name__ == "__main__":
+    unittest.main()
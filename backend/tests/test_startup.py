@@ -0,0 +1,127 @@
+import sys
+import threading
+import time
+import types
+import unittest
+import warnings
+from unittest.mock import MagicMock
+
+
+for _mod_name in ("tokenizers", "onnxruntime", "transformers"):
+    if _mod_name not in sys.modules:
+        sys.modules[_mod_name] = types.ModuleType(_mod_name)
+
+if not hasattr(sys.modules["tokenizers"], "Tokenizer"):
+    sys.modules["tokenizers"].Tokenizer = MagicMock()
+
+if not hasattr(sys.modules["onnxruntime"], "SessionOptions"):
+    class _SessionOptions:
+        graph_optimization_level = None
+
+    class _GraphOptimizationLevel:
+        ORT_ENABLE_ALL = "ORT_ENABLE_ALL"
+
+    sys.modules["onnxruntime"].SessionOptions = _SessionOptions
+    sys.modules["onnxruntime"].GraphOptimizationLevel = _GraphOptimizationLevel
+    sys.modules["onnxruntime"].InferenceSession = MagicMock()
+
+if not hasattr(sys.modules["transformers"], "AutoTokenizer"):
+    sys.modules["transformers"].AutoTokenizer = MagicMock()
+
+from fastapi.testclient import TestClient
+
+from services.startup import StartupTracker
+
+
+class WarmModel:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.warmed = 0
+
+    def warmup(self):
+        if self.fail:
+            raise RuntimeError("no kernels")
+        self.warmed += 1
+
+
+class StartupTrackerTests(unittest.TestCase):
+    def test_components_load_concurrently_and_warm_up(self):
+        barrier = threading.Barrier(3, timeout=2)
+
+        def build():
+            barrier.wait()  # only passes when all three builders run at once
+            return WarmModel()
+
+        tracker = StartupTracker()
+        loaded = tracker.load({"a": build, "b": build, "c": build}, max_workers=3)
+
+        self.assertEqual({name: m.warmed for name, m in loaded.items()}, {"a": 1, "b": 1, "c": 1})
+        report = tracker.report()
+        self.assertEqual(report["state"], "ready")
+        for status in report["components"].values():
+            self.assertEqual(status["state"], "ready")
+            self.assertIsNotNone(status["load_ms"])
+            self.assertIsNotNone(status["warmup_ms"])
+
+    def test_failed_build_and_failed_warmup_are_reported(self):
+        def broken():
+            raise FileNotFoundError("model.onnx")
+
+        tracker = StartupTracker()
+        cold = WarmModel(fail=True)
+        loaded = tracker.load({"broken": broken, "cold": lambda: cold, "plain": object})
+
+        self.assertIsNone(loaded["broken"])
+        self.assertIs(loaded["cold"], cold)  # still usable, but not ready
+        components = tracker.report()["components"]
+        self.assertEqual(components["broken"]["state"], "failed")
+        self.assertIn("model.onnx", components["broken"]["error"])
+        self.assertEqual(components["cold"]["state"], "failed")
+        self.assertTrue(components["cold"]["error"].startswith("warmup"))
+        self.assertEqual(components["plain"]["state"], "ready")
+        self.assertIsNone(components["plain"]["warmup_ms"])
+        self.assertEqual(tracker.report()["state"], "degraded")
+
+    def test_warmup_can_be_disabled(self):
+        model = WarmModel()
+        tracker = StartupTracker()
+        tracker.load({"m": lambda: model}, warmup=False)
+
+        self.assertEqual(model.warmed, 0)
+        self.assertEqual(tracker.report()["components"]["m"]["state"], "ready")
+
+
+class ReadinessEndpointTests(unittest.TestCase):
+    def test_readiness_answers_503_while_components_load(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            import web.app as web_app
+
+        release = threading.Event()
+        tracker = StartupTracker()
+        loader = threading.Thread(
+            target=tracker.load, args=({"slow": lambda: release.wait(2) and WarmModel()},), daemon=True
+        )
+        previous = web_app.STARTUP
+        web_app.STARTUP = tracker
+        try:
+            loader.start()
+            while not tracker.in_progress:
+                time.sleep(0.001)
+            client = TestClient(web_app.app)
+            loading = client.get("/api/readiness")
+            release.set()
+            loader.join(timeout=2)
+            ready = client.get("/api/readiness")
+        finally:
+            web_app.STARTUP = previous
+
+        self.assertEqual(loading.status_code, 503)
+        self.assertEqual(loading.json()["status"], "starting")
+        self.assertEqual(loading.json()["startup"]["components"]["slow"]["state"], "loading")
+        self.assertEqual(ready.status_code, 200)
+        self.assertEqual(ready.json()["startup"]["components"]["slow"]["state"], "ready")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,349 @@
+import sys
+import time
+import types
+import unittest
+from unittest.mock import MagicMock
+
+import numpy as np
+
+
+if "onnxruntime" not in sys.modules:
+    ort_stub = types.ModuleType("onnxruntime")
+
+    class _SessionOptions:
+        graph_optimization_level = None
+
+    class _GraphOptimizationLevel:
+        ORT_ENABLE_ALL = "ORT_ENABLE_ALL"
+
+    ort_stub.SessionOptions = _SessionOptions
+    ort_stub.GraphOptimizationLevel = _GraphOptimizationLevel
+    ort_stub.InferenceSession = MagicMock()
+    sys.modules["onnxruntime"] = ort_stub
+
+if "transformers" not in sys.modules:
+    transformers_stub = types.ModuleType("transformers")
+    auto_tokenizer = MagicMock()
+    auto_tokenizer.from_pretrained = MagicMock(return_value=MagicMock())
+    transformers_stub.AutoTokenizer = auto_tokenizer
+    sys.modules["transformers"] = transformers_stub
+
+if "tokenizers" not in sys.modules:
+    tokenizers_stub = types.ModuleType("tokenizers")
+    tokenizers_stub.Tokenizer = MagicMock()
+    sys.modules["tokenizers"] = tokenizers_stub
+
+
+from services.t5 import T5Service
+from services.t5_scheduler import ContinuousBatchScheduler
+
+VOCAB = 12
+EOS = 1
+
+
+class DigitTokenizer:
+    """Prompt "3 5 7" -> ids [3, 5, 7, </s>]; decode joins ids with spaces."""
+
+    all_special_tokens = ["<pad>", "</s>"]
+    pad_token_id = 0
+    eos_token_id = EOS
+
+    def __call__(self, texts, padding=False, truncation=False, max_length=None,
+                 return_tensors=None, return_attention_mask=True):
+        rows = []
+        for text in texts:
+            ids = [int(w) for w in text.split()] + [EOS]
+            if truncation and max_length:
+                ids = ids[: max_length - 1] + [EOS] if len(ids) > max_length else ids
+            rows.append(ids)
+        if return_tensors == "np":
+            return {
+                "input_ids": np.asarray(rows, dtype=np.int64),
+                "attention_mask": np.ones((len(rows), len(rows[0])), dtype=np.int64),
+            }
+        return {"input_ids": rows}
+
+    def decode(self, ids, skip_special_tokens=True, clean_up_tokenization_spaces=True):
+        return " ".join(str(i) for i in ids)
+
+
+class FakeEncoder:
+    def run(self, _, feed):
+        ids = feed["input_ids"].astype(np.float32)
+        return [np.stack([ids, np.ones_like(ids)], axis=-1)]  # (1,T,2)
+
+
+def _next_token(last_id, step, enc_row, mask_row):
+    """Deterministic toy LM: answer length and tokens depend on the (masked) source."""
+    src = enc_row[mask_row > 0, 0]
+    stop_len = int(len(src))
+    if step >= stop_len:
+        return EOS
+    return 2 + int(last_id + src.sum()) % (VOCAB - 2)
+
+
+def _one_hot(token):
+    row = np.zeros(VOCAB, dtype=np.float32)
+    row[token] = 10.0
+    return row
+
+
+class FullSequenceDecoder:
+    """No-past decoder: logits for every position, causal by construction."""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def run(self, _, feed):
+        ids = feed["input_ids"]
+        enc = feed["encoder_hidden_states"]
+        mask = feed["encoder_attention_mask"]
+        self.batch_sizes.append(ids.shape[0])
+        logits = np.zeros((ids.shape[0], ids.shape[1], VOCAB), dtype=np.float32)
+        for b in range(ids.shape[0]):
+            for j in range(ids.shape[1]):
+                logits[b, j] = _one_hot(_next_token(ids[b, j], j, enc[b], mask[b]))
+        return [logits]
+
+
+class PastDecoder:
+    """Decoder-with-past: self-attn past stores previous ids, cross-attn past the source."""
+
+    names = ["logits", "past_key_values.0.decoder.key", "past_key_values.0.encoder.key"]
+
+    def __init__(self):
+        self.batch_shapes = []
+
+    def run(self, _, feed):
+        ids = feed["input_ids"]
+        mask = feed["encoder_attention_mask"]
+        batch = ids.shape[0]
+        dec_past = feed.get("past_key_values.0.decoder.key")
+        enc_past = feed.get("past_key_values.0.encoder.key")
+        if dec_past is None:
+            dec_past = np.zeros((batch, 1, 0, 1), dtype=np.float32)
+            enc_past = feed["encoder_hidden_states"][:, None, :, :1]
+        self.batch_shapes.append((batch, dec_past.shape[2]))
+
+        logits = np.zeros((batch, 1, VOCAB), dtype=np.float32)
+        for b in range(batch):
+            step = dec_past.shape[2]
+            logits[b, 0] = _one_hot(_next_token(ids[b, 0], step, enc_past[b, 0], mask[b]))
+        new_dec = np.concatenate([dec_past, ids[:, None, :, None].astype(np.float32)], axis=2)
+        return [logits, new_dec, enc_past]
+
+
+def make_service(decoder, has_past=False):
+    service = T5Service.__new__(T5Service)
+    service.tok = DigitTokenizer()
+    service.encoder = FakeEncoder()
+    service.enc_inputs = ["input_ids", "attention_mask"]
+    service.decoder = decoder
+    if has_past:
+        service.dec_inputs = ["input_ids", "encoder_attention_mask", "encoder_hidden_states",
+                              "past_key_values.0.decoder.key", "past_key_values.0.encoder.key"]
+        service.dec_outputs = list(PastDecoder.names)
+    else:
+        service.dec_inputs = ["input_ids", "encoder_attention_mask", "encoder_hidden_states"]
+        service.dec_outputs = ["logits"]
+    service.dec_input_types = {
+        n: ("tensor(float)" if "hidden" in n or "past" in n else "tensor(int64)") for n in service.dec_inputs
+    }
+    service._has_past = has_past
+    service.decoder_start_token_id = 0
+    service.eos_token_id = EOS
+    service.max_src_len = 512
+    service.max_new_chat = 16
+    service.max_new_rag = 16
+    service._scheduler = None
+    service._engine = None
+    return service
+
+
+PROMPTS = ["3 5 7", "2", "4 4 4 4 4 6", "9 1 8 2"]
+
+
+class ContinuousBatchingTests(unittest.TestCase):
+    def _sequential(self, service):
+        return [service._generate_text_with_metadata(p, mode="rag") for p in PROMPTS]
+
+    def _batched(self, service):
+        scheduler = ContinuousBatchScheduler(service, max_batch_size=8, max_wait_ms=50)
+        try:
+            states = [service._prepare_decode(p, "rag") for p in PROMPTS]
+            futures = [scheduler.submit(state) for state in states]
+            results = [service._finish_decode(f.result(timeout=5)) for f in futures]
+            return results, scheduler.stats()
+        finally:
+            scheduler.close()
+
+    def test_full_sequence_batch_matches_sequential_decoding(self):
+        expected = self._sequential(make_service(FullSequenceDecoder()))
+
+        decoder = FullSequenceDecoder()
+        results, stats = self._batched(make_service(decoder))
+
+        self.assertEqual(results, expected)
+        self.assertGreater(max(decoder.batch_sizes), 1)
+        self.assertGreater(stats["max_observed_batch"], 1)
+        self.assertLess(stats["decoder_calls"], sum(len(t.split()) + 1 for t, _ in expected))
+
+    def test_past_decoder_batches_only_sequences_at_same_step(self):
+        expected = self._sequential(make_service(PastDecoder(), has_past=True))
+
+        decoder = PastDecoder()
+        results, _ = self._batched(make_service(decoder, has_past=True))
+
+        self.assertEqual(results, expected)
+        self.assertTrue(any(batch > 1 for batch, _ in decoder.batch_shapes))
+
+    def test_sequences_join_and_leave_between_steps(self):
+        decoder = FullSequenceDecoder()
+        service = make_service(decoder)
+        long_state = service._prepare_decode("4 4 4 4 4 6", "rag")
+        short_state = service._prepare_decode("2", "rag")
+
+        service._decode_step([long_state])
+        while not short_state.finished:                  # short joins at step 2
+            service._decode_step([long_state, short_state])
+        self.assertFalse(long_state.finished)            # EOS only removes the short one
+        while not long_state.finished:
+            service._decode_step([long_state])
+
+        alone = make_service(FullSequenceDecoder())
+        self.assertEqual(service._finish_decode(long_state), alone._generate_text_with_metadata("4 4 4 4 4 6", "rag"))
+        self.assertEqual(service._finish_decode(short_state), alone._generate_text_with_metadata("2", "rag"))
+
+    def test_max_new_tokens_is_enforced_per_sequence(self):
+        service = make_service(FullSequenceDecoder())
+        capped = service._prepare_decode("4 4 4 4 4 6", "rag", max_new_tokens=2)
+        free = service._prepare_decode("9 1 8 2", "rag")
+
+        while not (capped.finished and free.finished):
+            service._decode_step([s for s in (capped, free) if not s.finished])
+
+        _, capped_meta = service._finish_decode(capped)
+        _, free_meta = service._finish_decode(free)
+        self.assertEqual(capped_meta["output_tokens"], 2)
+        self.assertTrue(capped_meta["output_truncated"])
+        self.assertFalse(free_meta["output_truncated"])
+
+    def test_generate_structured_goes_through_scheduler(self):
+        decoder = FullSequenceDecoder()
+        service = make_service(decoder)
+        service.model_name = "local-t5-onnx"
+        service.runtime = "onnxruntime"
+        service.device = "cpu"
+        service._scheduler = ContinuousBatchScheduler(service, max_batch_size=4, max_wait_ms=1)
+        try:
+            result = service.generate_structured("3 5 7", mode="rag", prompt_type="rag_answer")
+            stats = service._scheduler.stats()
+        finally:
+            service.close()
+
+        self.assertFalse(result.fallback_used)
+        self.assertEqual(result.output_tokens, 4)
+        self.assertGreater(stats["decoder_calls"], 0)
+
+    def test_decoder_failure_is_reported_to_every_sequence_in_the_group(self):
+        class BrokenDecoder:
+            def run(self, _, feed):
+                raise RuntimeError("ort failure")
+
+        service = make_service(BrokenDecoder())
+        scheduler = ContinuousBatchScheduler(service, max_batch_size=4, max_wait_ms=20)
+        try:
+            futures = [scheduler.submit(service._prepare_decode(p, "rag")) for p in PROMPTS[:2]]
+            for fut in futures:
+                with self.assertRaises(RuntimeError):
+                    fut.result(timeout=5)
+        finally:
+            scheduler.close()
+
+
+class FlatDecoder(FullSequenceDecoder):
+    """Near-uniform logits so chat-mode sampling actually varies; EOS is never likely."""
+
+    def run(self, _, feed):
+        ids = feed["input_ids"]
+        self.batch_sizes.append(ids.shape[0])
+        logits = np.zeros((ids.shape[0], ids.shape[1], VOCAB), dtype=np.float32)
+        logits[:, :, EOS] = -30.0
+        return [logits]
+
+
+class SeededSamplingTests(unittest.TestCase):
+    def _chat(self, service, seed):
+        return service._generate_text_with_metadata("3 5 7", mode="chat", seed=seed)[0]
+
+    def test_same_seed_reproduces_chat_output(self):
+        service = make_service(FlatDecoder())
+
+        first = self._chat(service, seed=7)
+
+        self.assertEqual(self._chat(service, seed=7), first)
+        self.assertNotEqual({self._chat(service, seed=s) for s in range(5)}, {first})
+
+    def test_seeded_output_does_not_depend_on_batch_neighbours(self):
+        expected = [self._chat(make_service(FlatDecoder()), seed=s) for s in range(3)]
+
+        service = make_service(FlatDecoder())
+        scheduler = ContinuousBatchScheduler(service, max_batch_size=8, max_wait_ms=50)
+        try:
+            states = [service._prepare_decode("3 5 7", "chat", seed=s) for s in range(3)]
+            futures = [scheduler.submit(state) for state in states]
+            results = [service._finish_decode(f.result(timeout=5))[0] for f in futures]
+        finally:
+            scheduler.close()
+
+        self.assertEqual(results, expected)
+
+
+class StreamingDecodeTests(unittest.TestCase):
+    def _service(self, decoder=None):
+        service = make_service(decoder or FullSequenceDecoder())
+        service.model_name = "local-t5-onnx"
+        service.runtime = "onnxruntime"
+        service.device = "cpu"
+        return service
+
+    def test_stream_deltas_concatenate_to_final_text(self):
+        service = self._service()
+        expected = service.generate_structured("4 4 4 4 4 6", mode="rag", prompt_type="rag_answer")
+
+        items = list(service.generate_stream("4 4 4 4 4 6", mode="rag", prompt_type="rag_answer"))
+        deltas, final = items[:-1], items[-1]
+
+        self.assertGreater(len(deltas), 1)
+        self.assertTrue(all(isinstance(d, str) for d in deltas))
+        self.assertEqual("".join(deltas), final.text)
+        self.assertEqual(final.text, expected.text)
+        self.assertEqual(final.output_tokens, expected.output_tokens)
+
+    def test_stream_through_scheduler_and_early_close_cancels_sequence(self):
+        service = self._service()
+        service._scheduler = ContinuousBatchScheduler(service, max_batch_size=4, max_wait_ms=1)
+        try:
+            items = list(service.generate_stream("3 5 7", mode="rag", prompt_type="rag_answer"))
+            self.assertEqual("".join(items[:-1]), items[-1].text)
+
+            stream = service.generate_stream("4 4 4 4 4 6", mode="rag", prompt_type="rag_answer")
+            next(stream)
+            stream.close()
+            deadline = time.time() + 5
+            while service._scheduler.stats()["active"] and time.time() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(service._scheduler.stats()["active"], 0)
+        finally:
+            service.close()
+
+    def test_stream_empty_prompt_yields_only_fallback_result(self):
+        items = list(self._service().generate_stream("  ", prompt_type="chat"))
+
+        self.assertEqual(len(items), 1)
+        self.assertTrue(items[0].fallback_used)
+        self.assertEqual(items[0].fallback_reason, "empty_prompt")
+
+
+if __name__ == "__main__":
+    unittest.main()
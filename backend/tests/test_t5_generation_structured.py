@@ -52,7 +52,7 @@ class T5StructuredGenerationTests(unittest.TestCase):
         service.tok = FakeTokenizer()
         service.called = False
 
-        def fake_generate(prompt, mode, max_new_tokens=None):
+        def fake_generate(prompt, mode, max_new_tokens=None, seed=None):
             service.called = True
             if exc:
                 raise exc
@@ -0,0 +1,273 @@
+import sys
+import types
+import unittest
+from unittest.mock import MagicMock
+
+import numpy as np
+
+
+if "onnxruntime" not in sys.modules:
+    ort_stub = types.ModuleType("onnxruntime")
+
+    class _SessionOptions:
+        graph_optimization_level = None
+
+    class _GraphOptimizationLevel:
+        ORT_ENABLE_ALL = "ORT_ENABLE_ALL"
+
+    ort_stub.SessionOptions = _SessionOptions
+    ort_stub.GraphOptimizationLevel = _GraphOptimizationLevel
+    ort_stub.InferenceSession = MagicMock()
+    sys.modules["onnxruntime"] = ort_stub
+
+if "transformers" not in sys.modules:
+    transformers_stub = types.ModuleType("transformers")
+    auto_tokenizer = MagicMock()
+    auto_tokenizer.from_pretrained = MagicMock(return_value=MagicMock())
+    transformers_stub.AutoTokenizer = auto_tokenizer
+    sys.modules["transformers"] = transformers_stub
+
+if "tokenizers" not in sys.modules:
+    tokenizers_stub = types.ModuleType("tokenizers")
+    tokenizers_stub.Tokenizer = MagicMock()
+    sys.modules["tokenizers"] = tokenizers_stub
+
+
+from services.t5 import T5Service
+from services.t5_iobinding import IOBindingDecodeEngine
+
+VOCAB = 12
+EOS = 1
+
+
+class DigitTokenizer:
+    """Prompt "3 5 7" -> ids [3, 5, 7, </s>]; decode joins ids with spaces."""
+
+    all_special_tokens = ["<pad>", "</s>"]
+    pad_token_id = 0
+    eos_token_id = EOS
+
+    def __call__(self, texts, padding=False, truncation=False, max_length=None,
+                 return_tensors=None, return_attention_mask=True):
+        rows = [[int(w) for w in text.split()] + [EOS] for text in texts]
+        if return_tensors == "np":
+            return {
+                "input_ids": np.asarray(rows, dtype=np.int64),
+                "attention_mask": np.ones((len(rows), len(rows[0])), dtype=np.int64),
+            }
+        return {"input_ids": rows}
+
+    def decode(self, ids, skip_special_tokens=True, clean_up_tokenization_spaces=True):
+        return " ".join(str(i) for i in ids)
+
+
+class FakeEncoder:
+    def run(self, _, feed):
+        ids = feed["input_ids"].astype(np.float32)
+        return [np.stack([ids, np.ones_like(ids)], axis=-1)]  # (1,T,2)
+
+
+def _logits_for(last_id, step, src):
+    token = EOS if step >= len(src) else 2 + int(last_id + src.sum()) % (VOCAB - 2)
+    row = np.full(VOCAB, -1.0, dtype=np.float32)
+    row[token] = 10.0
+    return row
+
+
+class FullSequenceDecoder:
+    def run(self, _, feed):
+        ids = feed["input_ids"]
+        src = feed["encoder_hidden_states"][0, :, 0]
+        logits = np.zeros((1, ids.shape[1], VOCAB), dtype=np.float32)
+        for j in range(ids.shape[1]):
+            logits[0, j] = _logits_for(ids[0, j], j, src)
+        return [logits]
+
+
+class PastDecoder:
+    """Self-attn KV stores previous ids (2 heads), cross-attn KV the source."""
+
+    names = ["logits", "present.0.decoder.key", "present.0.encoder.key"]
+
+    def run(self, _, feed):
+        ids = feed["input_ids"]
+        dec_past = feed.get("past_key_values.0.decoder.key")
+        enc_past = feed.get("past_key_values.0.encoder.key")
+        if dec_past is None:
+            dec_past = np.zeros((1, 2, 0, 3), dtype=np.float32)
+            enc_past = np.repeat(feed["encoder_hidden_states"][:, None, :, :1], 2, axis=1)
+        logits = _logits_for(ids[0, 0], dec_past.shape[2], enc_past[0, 0, :, 0])[None, None, :]
+        step_kv = np.full((1, 2, 1, 3), float(ids[0, 0]), dtype=np.float32)
+        return [logits, np.concatenate([dec_past, step_kv], axis=2), enc_past.copy()]
+
+
+class FakeOrtValue:
+    def __init__(self, array):
+        self.array = array
+
+    def numpy(self):
+        return self.array.copy()
+
+    def shape(self):
+        return list(self.array.shape)
+
+    def data_type(self):
+        return "tensor(float)" if self.array.dtype == np.float32 else "tensor(int64)"
+
+
+class FakeBinding:
+    def __init__(self, log):
+        self.inputs = {}
+        self.outputs = {}
+        self.values = []
+        self.log = log
+
+    def bind_ortvalue_input(self, name, value):
+        self.log.append(("input", name))
+        self.inputs[name] = value
+
+    def bind_ortvalue_output(self, name, value):
+        self.outputs[name] = value
+
+    def bind_output(self, name, device_type="cpu"):
+        self.outputs[name] = device_type
+
+    def get_outputs(self):
+        return self.values
+
+
+class IOBindingSession:
+    """Runs a numpy fake decoder through an IOBinding-shaped API, writing into bound buffers."""
+
+    def __init__(self, decoder, output_names):
+        self.decoder = decoder
+        self.output_names = output_names
+        self.bind_log = []
+        self.allocated_outputs = 0
+
+    def io_binding(self):
+        return FakeBinding(self.bind_log)
+
+    def run_with_iobinding(self, binding):
+        feed = {name: value.array for name, value in binding.inputs.items()}
+        results = self.decoder.run(None, feed)
+        binding.values = []
+        for name, result in zip(self.output_names, results):
+            target = binding.outputs.get(name, "cpu")
+            if isinstance(target, FakeOrtValue):
+                assert target.array.shape == result.shape, (name, target.array.shape, result.shape)
+                np.copyto(target.array, result)
+                binding.values.append(target)
+            else:
+                self.allocated_outputs += 1
+                binding.values.append(FakeOrtValue(np.array(result)))
+
+
+def make_service(decoder, has_past=False):
+    service = T5Service.__new__(T5Service)
+    service.tok = DigitTokenizer()
+    service.encoder = FakeEncoder()
+    service.enc_inputs = ["input_ids", "attention_mask"]
+    service.decoder = decoder
+    if has_past:
+        service.dec_inputs = ["input_ids", "encoder_attention_mask", "encoder_hidden_states",
+                              "past_key_values.0.decoder.key", "past_key_values.0.encoder.key"]
+        service.dec_outputs = list(PastDecoder.names)
+    else:
+        service.dec_inputs = ["input_ids", "encoder_attention_mask", "encoder_hidden_states"]
+        service.dec_outputs = ["logits"]
+    service.dec_input_types = {
+        n: ("tensor(float)" if "hidden" in n or "past" in n else "tensor(int64)") for n in service.dec_inputs
+    }
+    service._has_past = has_past
+    service.decoder_start_token_id = 0
+    service.eos_token_id = EOS
+    service.max_src_len = 512
+    service.max_new_chat = 16
+    service.max_new_rag = 16
+    service._scheduler = None
+    service._engine = None
+    return service
+
+
+def with_engine(service):
+    session = IOBindingSession(service.decoder, service.dec_outputs)
+    service.decoder = session
+    service._engine = IOBindingDecodeEngine(service, ortvalue_factory=FakeOrtValue)
+    return session
+
+
+PROMPTS = ["3 5 7", "2", "4 4 4 4 4 6", "9 1 8 2"]
+
+
+class IOBindingDecodeTests(unittest.TestCase):
+    def _assert_parity(self, decoder_cls, has_past):
+        expected = [
+            make_service(decoder_cls(), has_past=has_past)._generate_text_with_metadata(p, mode="rag")
+            for p in PROMPTS
+        ]
+        service = make_service(decoder_cls(), has_past=has_past)
+        with_engine(service)
+        actual = [service._generate_text_with_metadata(p, mode="rag") for p in PROMPTS]
+        self.assertEqual(actual, expected)
+        return service
+
+    def test_full_sequence_decoder_matches_numpy_path(self):
+        self._assert_parity(FullSequenceDecoder, has_past=False)
+
+    def test_past_decoder_matches_numpy_path(self):
+        self._assert_parity(PastDecoder, has_past=True)
+
+    def test_encoder_states_bound_once_and_kv_written_into_preallocated_buffers(self):
+        service = make_service(PastDecoder(), has_past=True)
+        session = with_engine(service)
+
+        text, meta = service._generate_text_with_metadata("4 4 4 4 4 6", mode="rag")
+
+        self.assertEqual(meta["output_tokens"], 7)
+        self.assertEqual(session.bind_log.count(("input", "encoder_hidden_states")), 1)
+        # only the first step lets ORT allocate outputs (logits + 2 KV entries)
+        self.assertEqual(session.allocated_outputs, 3)
+
+    def test_buffers_return_to_pool_and_are_reused(self):
+        service = make_service(PastDecoder(), has_past=True)
+        with_engine(service)
+        engine = service._engine
+
+        service._generate_text_with_metadata("3 5 7", mode="rag")
+        pooled = engine.pooled_buffers()
+        self.assertGreater(pooled, 0)
+
+        service._generate_text_with_metadata("9 1 8", mode="rag")
+        self.assertEqual(engine.pooled_buffers(), pooled)
+
+    def test_buffers_released_when_decoder_fails(self):
+        service = make_service(PastDecoder(), has_past=True)
+        session = with_engine(service)
+        engine = service._engine
+        calls = {"n": 0}
+        real_run = session.run_with_iobinding
+
+        def flaky(binding):
+            calls["n"] += 1
+            if calls["n"] == 3:
+                raise RuntimeError("decoder crashed")
+            real_run(binding)
+
+        session.run_with_iobinding = flaky
+        with self.assertRaises(RuntimeError):
+            service._generate_text_with_metadata("3 5 7", mode="rag")
+        self.assertGreater(engine.pooled_buffers(), 0)
+
+    def test_numpy_feed_does_not_copy_float32_encoder_states(self):
+        service = make_service(FullSequenceDecoder())
+        enc_out = np.zeros((1, 3, 2), dtype=np.float32)
+        enc_mask = np.ones((1, 3), dtype=np.int64)
+
+        feed = service._decoder_feed(np.zeros((1, 1), dtype=np.int64), enc_out, enc_mask)
+
+        self.assertIs(feed["encoder_hidden_states"], enc_out)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,209 @@
+import sys
+import types
+import unittest
+from unittest.mock import MagicMock
+
+import numpy as np
+
+
+if "onnxruntime" not in sys.modules:
+    ort_stub = types.ModuleType("onnxruntime")
+    ort_stub.SessionOptions = MagicMock
+    ort_stub.GraphOptimizationLevel = MagicMock()
+    ort_stub.InferenceSession = MagicMock()
+    sys.modules["onnxruntime"] = ort_stub
+
+if "transformers" not in sys.modules:
+    transformers_stub = types.ModuleType("transformers")
+    transformers_stub.AutoTokenizer = MagicMock()
+    sys.modules["transformers"] = transformers_stub
+
+if "tokenizers" not in sys.modules:
+    tokenizers_stub = types.ModuleType("tokenizers")
+    tokenizers_stub.Tokenizer = MagicMock()
+    sys.modules["tokenizers"] = tokenizers_stub
+
+
+from services.t5 import T5Service
+from services.t5_speculative import PromptLookupDecoder, decoder_accepts_multiple_tokens
+
+VOCAB = 12
+EOS = 1
+
+
+class DigitTokenizer:
+    """Prompt "3 5 7" -> ids [3, 5, 7, </s>]; decode joins ids with spaces."""
+
+    all_special_tokens = ["<pad>", "</s>"]
+
+    def __call__(self, texts, padding=False, truncation=False, max_length=None, return_attention_mask=True):
+        return {"input_ids": [[int(w) for w in text.split()] + [EOS] for text in texts]}
+
+    def decode(self, ids, skip_special_tokens=True, clean_up_tokenization_spaces=True):
+        return " ".join(str(i) for i in ids)
+
+
+class FakeEncoder:
+    def run(self, _, feed):
+        ids = feed["input_ids"].astype(np.float32)
+        return [np.stack([ids, np.ones_like(ids)], axis=-1)]  # (1,T,2)
+
+
+def _copy_token(position, src):
+    """Toy extractive LM: copies the source, but answers 9 with 8 so some drafts are rejected."""
+    if position >= len(src) - 1:
+        return EOS
+    token = int(src[position])
+    return 8 if token == 9 else token
+
+
+def _one_hot(token):
+    row = np.zeros(VOCAB, dtype=np.float32)
+    row[token] = 10.0
+    return row
+
+
+class FullSequenceCopyDecoder:
+    def __init__(self):
+        self.calls = 0
+
+    def run(self, _, feed):
+        self.calls += 1
+        ids = feed["input_ids"]
+        src = feed["encoder_hidden_states"][0, :, 0]
+        logits = np.stack([_one_hot(_copy_token(j, src)) for j in range(ids.shape[1])])
+        return [logits[None, :, :]]
+
+
+class PastCopyDecoder:
+    """Past-KV decoder taking any number of new tokens; self-attn past stores the fed ids."""
+
+    names = ["logits", "present.0.decoder.key", "present.0.encoder.key"]
+
+    def __init__(self):
+        self.calls = 0
+        self.past_lengths = []
+
+    def run(self, _, feed):
+        self.calls += 1
+        ids = feed["input_ids"]
+        dec_past = feed.get("past_key_values.0.decoder.key")
+        enc_past = feed.get("past_key_values.0.encoder.key")
+        if dec_past is None:
+            dec_past = np.zeros((1, 1, 0, 1), dtype=np.float32)
+            enc_past = feed["encoder_hidden_states"][:, None, :, :1]
+        self.past_lengths.append(dec_past.shape[2])
+        start = dec_past.shape[2]
+        src = enc_past[0, 0, :, 0]
+        logits = np.stack([_one_hot(_copy_token(start + i, src)) for i in range(ids.shape[1])])
+        new_dec = np.concatenate([dec_past, ids[:, None, :, None].astype(np.float32)], axis=2)
+        return [logits[None, :, :], new_dec, enc_past]
+
+
+def make_service(decoder, has_past=False, speculative=True):
+    service = T5Service.__new__(T5Service)
+    service.tok = DigitTokenizer()
+    service.encoder = FakeEncoder()
+    service.enc_inputs = ["input_ids", "attention_mask"]
+    service.decoder = decoder
+    if has_past:
+        service.dec_inputs = ["input_ids", "encoder_attention_mask", "encoder_hidden_states",
+                              "past_key_values.0.decoder.key", "past_key_values.0.encoder.key"]
+        service.dec_outputs = list(PastCopyDecoder.names)
+    else:
+        service.dec_inputs = ["input_ids", "encoder_attention_mask", "encoder_hidden_states"]
+        service.dec_outputs = ["logits"]
+    service.dec_input_types = {
+        n: ("tensor(float)" if "hidden" in n or "past" in n else "tensor(int64)") for n in service.dec_inputs
+    }
+    service._has_past = has_past
+    service.decoder_start_token_id = 0
+    service.eos_token_id = EOS
+    service.max_src_len = 512
+    service.max_new_chat = 32
+    service.max_new_rag = 32
+    service.model_name = "local-t5-onnx"
+    service.runtime = "onnxruntime"
+    service.device = "cpu"
+    service._scheduler = None
+    service._engine = None
+    service._speculative = PromptLookupDecoder(service, max_ngram=2, max_draft=4) if speculative else None
+    return service
+
+
+PROMPTS = ["3 5 7 2 4 6 3 5 11", "2 9 4 4 9 4 4 9 3", "7", "5 5 5 5 5 5 5 5 5 5 5 5"]
+
+
+class PromptLookupDraftTests(unittest.TestCase):
+    def test_draft_continues_longest_matching_ngram(self):
+        drafter = PromptLookupDecoder(MagicMock(), max_ngram=2, max_draft=3)
+        source = np.asarray([4, 5, 6, 7, 5, 8, 9, EOS])
+
+        self.assertEqual(drafter.draft(source, [0, 4, 5], budget=10), [6, 7, 5])
+        self.assertEqual(drafter.draft(source, [0, 7, 5], budget=10), [8, 9, EOS])
+        self.assertEqual(drafter.draft(source, [0, 5], budget=2), [6, 7])
+        self.assertEqual(drafter.draft(source, [0, 3], budget=10), [])
+        self.assertEqual(drafter.draft(source, [0], budget=10), [])
+
+    def test_single_token_decoder_inputs_are_detected(self):
+        def decoder(shape):
+            return MagicMock(get_inputs=MagicMock(return_value=[types.SimpleNamespace(name="input_ids", shape=shape)]))
+
+        self.assertFalse(decoder_accepts_multiple_tokens(decoder(["batch_size", 1])))
+        self.assertTrue(decoder_accepts_multiple_tokens(decoder(["batch_size", "decoder_sequence_length"])))
+
+
+class SpeculativeDecodingTests(unittest.TestCase):
+    def _compare(self, has_past):
+        decoder_cls = PastCopyDecoder if has_past else FullSequenceCopyDecoder
+        for prompt in PROMPTS:
+            plain_decoder, spec_decoder = decoder_cls(), decoder_cls()
+            expected = make_service(plain_decoder, has_past, speculative=False)._generate_text_with_metadata(prompt, "rag")
+            text, meta = make_service(spec_decoder, has_past)._generate_text_with_metadata(prompt, "rag")
+
+            self.assertEqual(text, expected[0], prompt)
+            self.assertEqual({k: v for k, v in meta.items() if k != "speculative"}, expected[1])
+            self.assertEqual(meta["speculative"]["decoder_calls"], spec_decoder.calls)
+            self.assertLessEqual(spec_decoder.calls, plain_decoder.calls)
+        return plain_decoder, spec_decoder
+
+    def test_full_sequence_output_matches_greedy_with_fewer_calls(self):
+        self._compare(has_past=False)
+        plain, spec = FullSequenceCopyDecoder(), FullSequenceCopyDecoder()
+        make_service(plain, speculative=False)._generate_text_with_metadata(PROMPTS[0], "rag")
+        make_service(spec)._generate_text_with_metadata(PROMPTS[0], "rag")
+        self.assertLessEqual(spec.calls * 2, plain.calls)
+
+    def test_past_decoder_output_matches_greedy_and_past_is_trimmed(self):
+        _, spec = self._compare(has_past=True)
+        # every step starts from a past that covers exactly the accepted tokens
+        self.assertEqual(spec.past_lengths, sorted(spec.past_lengths))
+        self.assertLess(len(spec.past_lengths), len(PROMPTS[-1].split()))
+
+    def test_max_new_tokens_is_respected(self):
+        for has_past in (False, True):
+            decoder_cls = PastCopyDecoder if has_past else FullSequenceCopyDecoder
+            plain = make_service(decoder_cls(), has_past, speculative=False)
+            spec = make_service(decoder_cls(), has_past)
+
+            expected = plain._generate_text_with_metadata(PROMPTS[3], "rag", max_new_tokens=5)
+            text, meta = spec._generate_text_with_metadata(PROMPTS[3], "rag", max_new_tokens=5)
+
+            self.assertEqual(text, expected[0])
+            self.assertEqual(meta["output_tokens"], 5)
+            self.assertTrue(meta["output_truncated"])
+
+    def test_structured_result_reports_acceptance_and_chat_is_not_speculative(self):
+        service = make_service(FullSequenceCopyDecoder())
+
+        result = service.generate_structured(PROMPTS[0], mode="rag", prompt_type="rag_answer")
+        state = service._prepare_decode(PROMPTS[0], "chat")
+        for _ in service._iter_decode(state):
+            pass
+
+        self.assertGreater(result.metadata["speculative"]["accepted_tokens"], 0)
+        self.assertIsNone(state.spec_stats)
+
+
+if __name__ == "__main__":
+    unittest.main()
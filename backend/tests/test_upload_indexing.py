@@ -32,6 +32,23 @@ def make_cfg(corpus_dir, max_bytes=1024 * 1024):
 
 
 class UploadIndexingTests(unittest.TestCase):
+    def setUp(self):
+        # in-memory stand-in for the indexed_files manifest: document_id -> content hash
+        self.manifest = {}
+
+        def find(document_id, content_hash):
+            if self.manifest.get(document_id) == content_hash:
+                return {"document_id": document_id, "sha256": content_hash}
+            return None
+
+        def record(saved_path, document_id, content_hash, chunk_count):
+            self.manifest[document_id] = content_hash
+
+        for name, fake in (("_find_indexed_document", find), ("_record_indexed_document", record)):
+            patcher = patch(f"services.document_indexing.{name}", side_effect=fake)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
     def test_supported_txt_upload_is_saved_chunked_and_indexed(self):
         with tempfile.TemporaryDirectory() as tmp:
             captured = {}
@@ -90,7 +107,7 @@ class UploadIndexingTests(unittest.TestCase):
             self.assertEqual(result.indexed_chunk_count, 0)
             self.assertEqual(len(list(Path(tmp).glob("empty__*.txt"))), 1)
 
-    def test_duplicate_upload_uses_stable_document_id_and_path(self):
+    def test_identical_upload_is_skipped_before_extraction(self):
         with tempfile.TemporaryDirectory() as tmp:
             calls = []
 
@@ -101,13 +118,70 @@ class UploadIndexingTests(unittest.TestCase):
             cfg = make_cfg(tmp)
             with patch("services.document_indexing._add_chunks_to_index", side_effect=fake_add):
                 first = run(index_upload_file(FakeUploadFile("manual.txt", b"same document body"), cfg))
-                second = run(index_upload_file(FakeUploadFile("manual.txt", b"same document body"), cfg))
+                with patch("services.rag_backend.io_loader.load_document_from_file") as load:
+                    second = run(index_upload_file(FakeUploadFile("manual.txt", b"same document body"), cfg))
+                self.manifest.clear()  # e.g. the chunking settings changed
+                third = run(index_upload_file(FakeUploadFile("manual.txt", b"same document body"), cfg))
 
             self.assertEqual(first.document_id, second.document_id)
             self.assertEqual(first.saved_path, second.saved_path)
             self.assertEqual(len(list(Path(tmp).glob("manual__*.txt"))), 1)
+            load.assert_not_called()
+            self.assertEqual((second.skipped, second.skip_reason, second.indexed), (True, "already_indexed", False))
+            self.assertTrue(third.indexed)
             self.assertEqual(len(calls), 2)
 
+    def test_pdf_upload_streams_pages_into_the_index(self):
+        from services.rag_backend import io_loader, preprocess
+
+        class Page:
+            def __init__(self, number):
+                self.number = number
+
+            def get_text(self):
+                if self.number == 3 and fail:
+                    raise RuntimeError("broken page")
+                return " ".join(f"p{self.number}w{i}" for i in range(60))
+
+        class Pdf:
+            page_count = 4
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def load_page(self, index):
+                return Page(index + 1)
+
+        fitz = type("FakeFitz", (), {"open": staticmethod(lambda path: Pdf())})
+        progress = []
+
+        def fake_stream(chunks, document_id, on_batch):
+            received = list(chunks)
+            on_batch(len(received))
+            return len(received), []
+
+        with tempfile.TemporaryDirectory() as tmp, (
+            patch.object(io_loader, "fitz", fitz)
+        ), patch.object(preprocess, "_tokenizer", None), patch(
+            "services.document_indexing._stream_chunks_to_index", side_effect=fake_stream
+        ):
+            from services.document_indexing import index_saved_upload, save_upload
+
+            fail = False
+            saved_path, filename, metadata = run(save_upload(FakeUploadFile("manual.pdf", b"%PDF-1.7"), make_cfg(tmp)))
+            result = index_saved_upload(saved_path, filename, metadata, lambda stage, **kw: progress.append(stage))
+            fail = True
+            self.manifest.clear()  # index the same bytes again instead of short-circuiting
+            broken = index_saved_upload(saved_path, filename, metadata)
+
+        self.assertTrue(result.indexed)
+        self.assertGreater(result.indexed_chunk_count, 1)
+        self.assertEqual(progress, ["extracting", "indexing"])
+        self.assertEqual((broken.indexed, broken.error), (False, "text_extraction_failed"))
+
     def test_uploaded_text_is_available_to_stubbed_retrieval_path(self):
         with tempfile.TemporaryDirectory() as tmp:
             in_memory_index = []
@@ -0,0 +1,143 @@
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from services.rag_backend.quantization import EmbeddingQuantizer, build_quantizer
+from services.rag_backend.vector_store import MmapVectorStore, build_vector_store
+
+
+def _unit(x):
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+class MmapVectorStoreTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = tmp.name
+        rng = np.random.default_rng(7)
+        self.vectors = rng.normal(size=(300, 12)).astype(np.float32)
+        self.ids = [f"doc{i % 5}_chunk_{i}" for i in range(300)]
+        self.store = MmapVectorStore(self.path)
+        self.store.block_rows = 64  # exercise the cross-block merge
+        self.store.add(self.ids, self.vectors, metadatas=[{"document_id": f"doc{i % 5}"} for i in range(300)])
+
+    def test_exact_top_k_matches_brute_force(self):
+        queries = np.random.default_rng(1).normal(size=(4, 12)).astype(np.float32)
+        hits = self.store.query(queries, top_k=7)
+
+        sims = _unit(queries) @ _unit(self.vectors).T
+        for qi, query_hits in enumerate(hits):
+            expected = [self.ids[i] for i in np.argsort(-sims[qi])[:7]]
+            self.assertEqual([h.chunk_id for h in query_hits], expected)
+            np.testing.assert_allclose(
+                [h.distance for h in query_hits], 2 - 2 * np.sort(sims[qi])[::-1][:7], atol=1e-5
+            )
+
+    def test_file_is_a_plain_npy_matrix_of_unit_rows(self):
+        matrix = np.load(f"{self.path}/embeddings.npy", mmap_mode="r")
+        self.assertEqual(matrix.shape, (300, 12))
+        np.testing.assert_allclose(np.linalg.norm(matrix, axis=1), 1.0, atol=1e-5)
+
+    def test_deletes_and_replacements_are_seen_by_other_readers(self):
+        reader = MmapVectorStore(self.path)  # e.g. another API worker
+        self.assertEqual(reader.count(), 300)
+
+        self.store.delete(document_id="doc1")
+        self.store.delete(ids=["doc0_chunk_0"])
+        self.store.add(["doc2_chunk_2"], self.vectors[:1])
+
+        self.assertEqual(reader.count(), 300 - 60 - 1)
+        top = reader.query(self.vectors[:1], top_k=2)[0]
+        self.assertEqual(top[0].chunk_id, "doc2_chunk_2")
+        self.assertNotIn("doc0_chunk_0", [h.chunk_id for h in top])
+        self.assertTrue(all(not h.chunk_id.startswith("doc1_") for h in reader.query(self.vectors, 5)[1]))
+
+        self.assertEqual(self.store.compact(), 239)
+        self.assertEqual(reader.stats()["dead_rows"], 0)
+        self.assertEqual(reader.query(self.vectors[:1], top_k=1)[0][0].chunk_id, "doc2_chunk_2")
+
+    def test_interrupted_add_does_not_shift_later_ids(self):
+        fresh = MmapVectorStore(f"{self.path}/fresh")
+        fresh.add(["a", "b"], self.vectors[:2])
+        with patch("services.rag_backend.vector_store._append_npy", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                fresh.add(["c"], self.vectors[2:3])
+        fresh.add(["d"], self.vectors[3:4])
+
+        self.assertEqual(fresh.count(), 3)
+        for row, cid in ((0, "a"), (1, "b"), (3, "d")):
+            self.assertEqual(fresh.query(self.vectors[row:row + 1], top_k=1)[0][0].chunk_id, cid)
+        with open(f"{self.path}/fresh/ids.jsonl", encoding="utf-8") as f:
+            self.assertEqual(len(f.readlines()), 3)
+
+    def test_dimension_mismatch_and_unknown_backend_raise(self):
+        with self.assertRaises(ValueError):
+            self.store.add(["x"], np.ones((1, 3), dtype=np.float32))
+        with self.assertRaises(ValueError):
+            build_vector_store({"VECTOR_BACKEND": "faiss"})
+        self.assertIsInstance(build_vector_store({"VECTOR_BACKEND": "MMAP", "VECTOR_STORE_PATH": self.path}), MmapVectorStore)
+
+
+class QuantizedPrefilterTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = tmp.name
+        rng = np.random.default_rng(3)
+        centers = rng.normal(size=(20, 64))
+        self.vectors = (centers[rng.integers(0, 20, 2000)] + rng.normal(scale=0.7, size=(2000, 64))).astype(np.float32)
+        self.ids = [str(i) for i in range(2000)]
+        self.queries = (self.vectors[:20] + rng.normal(scale=0.3, size=(20, 64))).astype(np.float32)
+        exact = MmapVectorStore(f"{self.path}/exact")
+        exact.add(self.ids, self.vectors)
+        self.exact = [[h.chunk_id for h in hits] for hits in exact.query(self.queries, 10)]
+
+    def _recall(self, store):
+        got = [[h.chunk_id for h in hits] for hits in store.query(self.queries, 10)]
+        return np.mean([len(set(a) & set(b)) / 10 for a, b in zip(got, self.exact)])
+
+    def test_codes_are_compact_and_prefilter_keeps_recall(self):
+        int8 = MmapVectorStore(f"{self.path}/int8", EmbeddingQuantizer("int8"), rescore_factor=4)
+        binary = MmapVectorStore(f"{self.path}/binary", EmbeddingQuantizer("binary"), rescore_factor=20)
+        for store in (int8, binary):
+            store.prefilter_block_rows = 512
+            store.add(self.ids, self.vectors)
+
+        self.assertEqual(np.load(int8.codes_path).shape, (2000, 64))
+        self.assertEqual(np.load(binary.codes_path).shape, (2000, 8))  # 64 sign bits
+        self.assertGreaterEqual(self._recall(int8), 0.98)
+        self.assertGreaterEqual(self._recall(binary), 0.9)
+        # rescoring returns exact float32 distances for the candidates it keeps
+        top = int8.query(self.vectors[:1], 1)[0][0]
+        self.assertEqual(top.chunk_id, "0")
+        self.assertAlmostEqual(top.distance, 0.0, places=5)
+
+    def test_uncoded_rows_are_rescored_and_backfilled_on_write(self):
+        plain = MmapVectorStore(self.path + "/late")
+        plain.add(self.ids[:1500], self.vectors[:1500])
+
+        quantized = MmapVectorStore(self.path + "/late", EmbeddingQuantizer("binary", dims=32), rescore_factor=2)
+        self.assertEqual(quantized.stats()["quantization"]["coded_rows"], 0)
+        self.assertEqual(quantized.query(self.vectors[1400:1401], 1)[0][0].chunk_id, "1400")
+
+        quantized.add(self.ids[1500:], self.vectors[1500:])
+        self.assertEqual(quantized.stats()["quantization"]["coded_rows"], 2000)
+        self.assertEqual(np.load(quantized.codes_path).shape, (2000, 8))
+
+        quantized.delete(ids=["5"])
+        self.assertEqual(quantized.compact(), 1999)
+        self.assertEqual(quantized.stats()["quantization"]["coded_rows"], 1999)
+        self.assertEqual(quantized.query(self.vectors[6:7], 1)[0][0].chunk_id, "6")
+
+    def test_quantizer_config(self):
+        self.assertIsNone(build_quantizer({}))
+        self.assertEqual(build_quantizer({"VECTOR_QUANTIZATION": "INT8", "VECTOR_QUANT_DIMS": 128}).file_name, "codes_int8_d128.npy")
+        with self.assertRaises(ValueError):
+            build_quantizer({"VECTOR_QUANTIZATION": "pq"})
+
+
+if __name__ == "__main__":
+    unittest.main()
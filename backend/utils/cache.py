@@ -0,0 +1,152 @@
+# backend/utils/cache.py
+from __future__ import annotations
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Mapping, Optional, Tuple
+
+from schemas.pipeline import GenerationResult
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache bounded by total size in bytes, with optional TTL.
+    `sizeof(value)` estimates the bytes an entry holds; entries larger than
+    the whole budget are not stored.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        ttl_seconds: float | None = None,
+        sizeof: Callable[[Any], int] = lambda value: 1,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_bytes = max(0, int(max_bytes))
+        self.ttl_seconds = float(ttl_seconds) if ttl_seconds and ttl_seconds > 0 else None
+        self._sizeof = sizeof
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, Tuple[Any, int, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, size, stored_at = entry
+            if self.ttl_seconds is not None and self._clock() - stored_at > self.ttl_seconds:
+                self._drop(key, size)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> bool:
+        size = max(1, int(self._sizeof(value)))
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            if size > self.max_bytes:
+                return False
+            self._data[key] = (value, size, self._clock())
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._data:
+                old_key, (_, old_size, _) = next(iter(self._data.items()))
+                self._drop(old_key, old_size)
+                self.evictions += 1
+            return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def _drop(self, key: Hashable, size: int) -> None:
+        del self._data[key]
+        self._bytes -= size
+
+
+def _result_bytes(result: GenerationResult) -> int:
+    # text dominates; the rest of the model is a few hundred bytes of scalars
+    return len(result.text.encode("utf-8")) + 512
+
+
+class GenerationCache:
+    """
+    Cache of finished GenerationResults for deterministic (greedy) decoding.
+    Keyed on the prompt hash, decode mode, max_new_tokens and the model identity.
+    Callers decide what is deterministic; sampled chat generation must bypass it.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: float | None = None) -> None:
+        self._cache = LRUCache(max_bytes, ttl_seconds=ttl_seconds, sizeof=_result_bytes)
+
+    @staticmethod
+    def key(prompt: str, *, mode: str, max_new_tokens: int | None, model: str) -> Tuple[str, str, int | None, str]:
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return digest, mode, max_new_tokens, model
+
+    def get(self, key: Tuple[str, str, int | None, str], *, latency_ms: int | None = None) -> GenerationResult | None:
+        cached = self._cache.get(key)
+        if cached is None:
+            return None
+        metadata = dict(cached.metadata or {})
+        metadata["cache_hit"] = True
+        metadata["cached_latency_ms"] = cached.latency_ms
+        return cached.model_copy(update={"metadata": metadata, "latency_ms": latency_ms})
+
+    def put(self, key: Tuple[str, str, int | None, str], result: GenerationResult) -> None:
+        if result.fallback_used or result.error:
+            return  # never replay failures
+        self._cache.put(key, result.model_copy(deep=True))
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+
+def mark_cache_miss(result: GenerationResult) -> GenerationResult:
+    metadata = dict(result.metadata or {})
+    metadata["cache_hit"] = False
+    result.metadata = metadata
+    return result
+
+
+def build_generation_cache(cfg: Mapping[str, Any]) -> Optional[GenerationCache]:
+    if not bool(cfg.get("GENERATION_CACHE_ENABLED", True)):
+        return None
+    max_bytes = int(cfg.get("GENERATION_CACHE_MAX_BYTES", 4 * 1024 * 1024))
+    if max_bytes <= 0:
+        return None
+    return GenerationCache(max_bytes, ttl_seconds=float(cfg.get("GENERATION_CACHE_TTL_SECONDS", 600)))
@@ -1,13 +1,16 @@
 # backend/web/app.py
 # --- Üstte FastAPI ve standart importlar ---
+import json
 import logging
 import time
 from fastapi import FastAPI, UploadFile, File, Form, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import Any, Dict, List, Mapping, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Mapping, Optional
+import threading
 from collections import Counter
 from pathlib import Path
 from uuid import uuid4
@@ -23,18 +26,33 @@ from utils.text import fallback_instruction
 
 from services.nlu_classifier import NLUClassifier
 from services.pipeline_orchestrator import PipelineOrchestrator
-from services.document_indexing import UploadIndexingError, index_upload_file, upload_error_response
+from services.document_indexing import (
+    UploadIndexingError,
+    already_indexed_result,
+    index_saved_upload,
+    index_upload_file,
+    save_upload,
+    upload_error_response,
+)
+from services.ingestion_queue import IngestionQueue, IngestionQueueFull, build_ingestion_queue
 from services.generation.base import BaseGenerationProvider
 from services.generation.factory import build_generation_provider
+from services.model_host import (
+    RemoteGenerationProvider,
+    RemoteNLUClassifier,
+    RemoteYOLOService,
+    build_model_host_client,
+)
 from services.observability import DiagentSafeClient
 from services.observability.diagent_mapper import emit_run_result_telemetry, sanitize_metadata
-from services.rag import RAGService
+from services.startup import StartupTracker
 from services.yolo import YOLOService
 from schemas.pipeline import (
     DETECTION_STATUS_INVALID_IMAGE,
     DETECTION_STATUS_MODEL_ERROR,
     DetectionResult,
     GenerationResult,
+    IndexingResult,
     RunResult,
     detection_result_from_legacy,
     generation_result_from_text,
@@ -43,6 +61,10 @@ from schemas.pipeline import (
 )
 from utils.vision import draw_dets
 
+if TYPE_CHECKING:
+    # imported lazily at startup: loads the embedder, Chroma and tokenizers
+    from services.rag import RAGService
+
 logger = logging.getLogger(__name__)
 DIAGENT_CLIENT_FACTORY = DiagentSafeClient.from_config
 
@@ -399,23 +421,82 @@ app.add_middleware(
 NLU: Optional[NLUClassifier] = None
 GENERATION: Optional[BaseGenerationProvider] = None
 T5: Optional[BaseGenerationProvider] = None
-RAG: Optional[RAGService] = None
+RAG: Optional["RAGService"] = None
 YOLO: Optional[YOLOService] = None
 PIPELINE: Optional[PipelineOrchestrator] = None
+INGEST: Optional[IngestionQueue] = None
+_INGEST_LOCK = threading.Lock()
+
+
+STARTUP = StartupTracker()
+
+
+def _ingest_queue() -> IngestionQueue:
+    """Upload ingestion queue, created on first use (or at startup to resume unfinished jobs)."""
+    global INGEST
+    with _INGEST_LOCK:
+        if INGEST is None:
+            INGEST = build_ingestion_queue(CFG, index_saved_upload)
+        return INGEST
+
+
+def _build_rag():
+    from services.rag import RAGService  # heavy import, runs in the startup pool
+
+    return RAGService(CFG)
+
+
+def _component_builders() -> Dict[str, Any]:
+    model_host = build_model_host_client(CFG)
+    if model_host is not None:
+        # models live in the shared model host process (python -m services.model_host)
+        logger.info("Using model host at %s", model_host.socket_path)
+        return {
+            "nlu": lambda: RemoteNLUClassifier(model_host),
+            "generation": lambda: RemoteGenerationProvider(model_host),
+            "rag": _build_rag,
+            "yolo": lambda: RemoteYOLOService(model_host),
+        }
+    return {
+        "nlu": lambda: NLUClassifier(CFG),
+        "generation": lambda: build_generation_provider(CFG),
+        "rag": _build_rag,
+        "yolo": lambda: YOLOService(CFG),
+    }
+
+
+def load_services() -> None:
+    """Load and warm up NLU, generation, RAG and YOLO concurrently, then build the pipeline."""
+    global NLU, GENERATION, T5, RAG, YOLO, PIPELINE
+    loaded = STARTUP.load(
+        _component_builders(),
+        max_workers=int(CFG.get("STARTUP_MAX_WORKERS", 4)),
+        warmup=bool(CFG.get("STARTUP_WARMUP_ENABLED", True)),
+    )
+    NLU = loaded["nlu"]
+    GENERATION = loaded["generation"]
+    T5 = GENERATION
+    RAG = loaded["rag"]
+    YOLO = loaded["yolo"]
+    PIPELINE = PipelineOrchestrator(CFG, NLU, GENERATION, RAG, YOLO)
+    logger.info("Startup %s", STARTUP.report()["state"])
 
 
 @app.on_event("startup")
 def startup_event():
-    global NLU, GENERATION, T5, RAG, YOLO, PIPELINE
     report = readiness_report()
     if report["status"] != "ok":
         logger.warning("Startup readiness degraded; missing assets: %s", ", ".join(report["missing"]))
-    NLU = NLUClassifier(CFG)
-    GENERATION = build_generation_provider(CFG)
-    T5 = GENERATION
-    RAG = RAGService(CFG)
-    YOLO = YOLOService(CFG)
-    PIPELINE = PipelineOrchestrator(CFG, NLU, GENERATION, RAG, YOLO)
+    if CFG.get("RAG_INGEST_ASYNC", True):
+        try:
+            _ingest_queue()  # re-queues uploads a previous process left unfinished
+        except Exception:
+            logger.warning("Ingestion queue could not be opened; uploads will retry on demand.", exc_info=True)
+    if CFG.get("STARTUP_BACKGROUND_LOADING", False):
+        # accept connections now; /api/readiness answers 503 until loading finishes
+        threading.Thread(target=load_services, name="startup-loader", daemon=True).start()
+    else:
+        load_services()
 
 
 @app.get("/api/health")
@@ -425,7 +506,19 @@ def health():
 
 @app.get("/api/readiness")
 def readiness():
-    return readiness_report()
+    report = readiness_report()
+    cache_stats = getattr(GENERATION, "cache_stats", None)
+    report["generation_cache"] = cache_stats() if callable(cache_stats) else None
+    rag_cache_stats = getattr(RAG, "cache_stats", None)
+    report["retrieval_cache"] = rag_cache_stats() if callable(rag_cache_stats) else None
+    report["ingestion"] = INGEST.stats() if INGEST is not None else None
+    report["startup"] = STARTUP.report()
+    if report["startup"]["state"] == "degraded":
+        report["status"] = "degraded"
+    if STARTUP.in_progress:
+        report["status"] = "starting"
+        return JSONResponse(status_code=503, content=report)
+    return report
 
 
 # ---------- Intent ----------
@@ -568,6 +661,79 @@ def run_api(body: RunRequest):
     return result
 
 
+def _sse_event(event: str, payload: Any) -> str:
+    data = json.dumps(to_serializable_dict(payload), ensure_ascii=False)
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+@app.post("/api/run/stream")
+def run_stream_api(body: RunRequest):
+    """
+    Server-Sent Events version of /api/run: intent, route and retrieval events
+    first, then "token" deltas, and the final RunResult as the "result" event.
+    """
+    diagent_client = _create_diagent_client()
+    diagent_run_id = diagent_client.create_run(body.message)
+
+    def events():
+        started = time.perf_counter()
+        result: RunResult | None = None
+        try:
+            if PIPELINE is None:
+                logger.error("Pipeline is not initialized.")
+                metadata = body.metadata or {}
+                result = RunResult(
+                    input_text=body.message,
+                    status="failed",
+                    errors=["pipeline is not initialized"],
+                    metadata={
+                        "use_internet": bool(metadata.get("use_internet", False)),
+                        "web_only": bool(metadata.get("web_only", False)),
+                    },
+                    duration_ms=_elapsed_ms(started),
+                )
+            else:
+                for event, payload in PIPELINE.run_stream(body.message, metadata=body.metadata):
+                    if event == "result":
+                        result = payload
+                        break
+                    yield _sse_event(event, payload)
+        except Exception as exc:
+            logger.exception("Streaming pipeline run failed.")
+            diagent_client.finish_run(
+                diagent_run_id,
+                status="failed",
+                error=f"{type(exc).__name__}: {exc}",
+            )
+            diagent_client.close()
+            yield _sse_event("error", {"error": "pipeline run failed"})
+            return
+
+        if result is None:
+            diagent_client.finish_run(diagent_run_id, status="failed", error="stream ended without a result")
+            diagent_client.close()
+            yield _sse_event("error", {"error": "pipeline run failed"})
+            return
+
+        _ensure_client_action_correlation(result, request_metadata=body.metadata)
+        try:
+            _finish_diagent_run(
+                diagent_client,
+                diagent_run_id,
+                result,
+                request_metadata=body.metadata,
+            )
+        finally:
+            diagent_client.close()
+        yield _sse_event("result", result)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.post("/api/photo")
 async def take_photo_api(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
     """
@@ -768,20 +934,72 @@ async def detect_api(
 # (Opsiyonel) Belgeleri yükleyip indeksleme için bir uç nokta:
 @app.post("/api/upload")
 async def upload_doc(file: UploadFile = File(...)):
+    if CFG.get("RAG_INGEST_ASYNC", True):
+        return await _enqueue_upload(file)
     try:
         result = await index_upload_file(file, CFG)
     except UploadIndexingError as exc:
         return JSONResponse(status_code=exc.status_code, content=upload_error_response(exc))
+    return _upload_result_body(result)
+
 
+def _upload_result_body(result: IndexingResult) -> dict[str, Any]:
     body = to_serializable_dict(result)
     body["ok"] = bool(result.saved_path)
     body["stored"] = result.saved_path
 
     if result.indexed:
         body["message"] = "File uploaded and indexed successfully"
+    elif result.skip_reason == "already_indexed":
+        body["message"] = "File uploaded; identical content is already indexed"
     elif result.skipped:
         body["message"] = "File uploaded but indexing skipped"
     else:
         body["message"] = "File uploaded but indexing failed"
 
     return body
+
+
+def _queue_full_response(filename: str | None) -> JSONResponse:
+    exc = UploadIndexingError(
+        "ingest_queue_full",
+        "Too many uploads are being indexed; retry later",
+        status_code=503,
+        filename=filename,
+    )
+    return JSONResponse(status_code=503, content=upload_error_response(exc), headers={"Retry-After": "5"})
+
+
+async def _enqueue_upload(file: UploadFile) -> JSONResponse:
+    """Save and hash the upload, then hand extraction/chunking/indexing to the ingestion workers."""
+    ingest = _ingest_queue()
+    filename = Path(file.filename or "").name or None
+    if ingest.is_full():
+        return _queue_full_response(filename)  # before spending disk I/O on the upload
+    try:
+        saved_path, filename, metadata = await save_upload(file, CFG)
+        # off the event loop: the lookup imports the RAG indexer (the embedder may still be loading) and reads SQLite
+        existing = await run_in_threadpool(already_indexed_result, filename, metadata)
+        if existing is not None:
+            return JSONResponse(status_code=200, content=_upload_result_body(existing))  # no job, no extraction
+        job = ingest.submit(saved_path, filename, metadata)
+    except UploadIndexingError as exc:
+        return JSONResponse(status_code=exc.status_code, content=upload_error_response(exc))
+    except IngestionQueueFull:
+        return _queue_full_response(filename)
+
+    body = {
+        **job,
+        "ok": True,
+        "message": "File uploaded; indexing queued",
+        "status_url": f"/api/upload/{job['job_id']}",
+    }
+    return JSONResponse(status_code=202, content=body)
+
+
+@app.get("/api/upload/{job_id}")
+def upload_job_status(job_id: str):
+    job = _ingest_queue().get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"ok": False, "job_id": job_id, "error": "job_not_found"})
+    return {**job, "ok": job["status"] != "failed"}